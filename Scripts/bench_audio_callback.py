@@ -0,0 +1,216 @@
+"""
+bench_audio_callback.py — Per-frame cost of the audio callback path
+
+Runs synthetic 2-channel int16 blocks through the FrameProcessor used by
+mic_stream's audio-processing thread and reports per-frame latency and
+Python allocations (tracemalloc), next to a replica of the previous
+callback path (astype copies, deque pre-roll, ~6 session lock round trips
+and a manual-trigger stat() per frame). The "callback" row is what the
+PortAudio thread itself now does: one FrameRing push.
+
+No microphone, Porcupine or Whisper needed:
+    python Scripts/bench_audio_callback.py --frames 5000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+
+from core.audio.frame_ring import FrameRing
+from core.audio.front_end import FrontEnd, FrontEndConfig
+from core.audio.frame_processor import FrameProcessor
+from core.audio.recorder import SpeechRecorder
+from core.audio.session_manager import SessionConfig, SessionManager
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 512
+CHANNELS = 2
+MISSING_TRIGGER = Path("/nonexistent/safebox/manual_voice_trigger")
+
+
+def _make_frames(count: int) -> list[np.ndarray]:
+    rng = np.random.default_rng(1234)
+    return [
+        rng.integers(-300, 300, size=(FRAME_SIZE, CHANNELS), dtype=np.int16)
+        for _ in range(count)
+    ]
+
+
+def _session() -> SessionManager:
+    fps = SAMPLE_RATE / FRAME_SIZE
+    # Long timeouts so the LISTENING scenario never finalizes mid-run.
+    return SessionManager(
+        SessionConfig(
+            post_wake_grace_frames=int(0.2 * fps),
+            speech_start_timeout_frames=10**9,
+            max_utterance_frames=10**9,
+            cooldown_frames=int(0.5 * fps),
+        )
+    )
+
+
+def _front_end() -> FrontEnd:
+    return FrontEnd(FrontEndConfig(sample_rate=SAMPLE_RATE, frame_size=FRAME_SIZE))
+
+
+def legacy_frame_fn(listening: bool):
+    """Replica of the per-frame work audio_callback did before FrameProcessor."""
+    session = _session()
+    vad = _front_end().vad
+    preroll: deque = deque()
+    preroll_count = [0]
+    preroll_max = SAMPLE_RATE
+    recorded: list = []
+
+    if listening:
+        session.start_listening()
+
+    def frame(indata: np.ndarray) -> None:
+        session.tick()
+        left = indata[:, 0].astype(np.int16)
+        right = indata[:, 1].astype(np.int16)
+        mono = right.reshape(-1, 1)
+
+        p = np.asarray(right, dtype=np.int16).reshape(-1)
+        preroll.append(p)
+        preroll_count[0] += len(p)
+        while preroll_count[0] > preroll_max and preroll:
+            preroll_count[0] -= len(preroll.popleft())
+
+        if session.can_run_wake():
+            MISSING_TRIGGER.exists()
+        if session.listening():
+            recorded.append(np.asarray(mono, dtype=np.int16).reshape(-1, 1).copy())
+            if session.get_post_wake_remaining() > 0:
+                return
+            x = right.astype(np.float32)
+            float(np.sqrt(np.mean(np.square(x))))
+            vad.is_speech(right)
+            session.get_has_seen_speech()
+            session.get_speech_start_timeout_remaining()
+            session.get_max_utterance_remaining()
+        del left
+
+    return frame
+
+
+def current_frame_fn(listening: bool):
+    session = _session()
+    recorder = SpeechRecorder(sample_rate=SAMPLE_RATE, min_duration=0.0)
+    processor = FrameProcessor(_front_end(), session, recorder)
+
+    if listening:
+        recorder.start()
+        session.start_listening()
+
+    return processor.process
+
+
+def callback_frame_fn(listening: bool):
+    ring = FrameRing(slots=64, frame_size=FRAME_SIZE, channels=CHANNELS)
+
+    def frame(indata: np.ndarray) -> None:
+        ring.push(indata)
+        ring.release()
+
+    return frame
+
+
+def _measure(frame_fn, frames: list[np.ndarray], warmup: int) -> dict:
+    for f in frames[:warmup]:
+        frame_fn(f)
+
+    timings = []
+    for f in frames[warmup:]:
+        t0 = time.perf_counter_ns()
+        frame_fn(f)
+        timings.append(time.perf_counter_ns() - t0)
+
+    tracemalloc.start()
+    peaks = []
+    blocks_before = len(tracemalloc.take_snapshot().traces)
+    for f in frames[warmup:]:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        frame_fn(f)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    blocks_after = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+
+    timings.sort()
+    n = len(timings)
+    return {
+        "mean_us": statistics.fmean(timings) / 1000,
+        "p50_us": timings[n // 2] / 1000,
+        "p99_us": timings[min(n - 1, int(n * 0.99))] / 1000,
+        "peak_alloc_bytes": statistics.fmean(peaks),
+        "retained_blocks_per_frame": (blocks_after - blocks_before) / max(1, n),
+    }
+
+
+def _preroll_snapshot_us(frames: list[np.ndarray], repeats: int = 200) -> tuple[float, float]:
+    """Wake-time cost of moving 1 s of pre-roll into the recorder, old vs new."""
+    old_frames = deque(f[:, 1].astype(np.int16) for f in frames[: SAMPLE_RATE // FRAME_SIZE])
+    front_end = _front_end()
+    for f in frames[: 2 * SAMPLE_RATE // FRAME_SIZE]:
+        front_end.push_preroll(front_end.speech_frame(f))
+    recorder = SpeechRecorder(sample_rate=SAMPLE_RATE, min_duration=0.0)
+
+    t0 = time.perf_counter_ns()
+    for _ in range(repeats):
+        preroll = np.concatenate(list(old_frames), axis=0).reshape(-1, 1)
+        [preroll.copy()]
+    old_us = (time.perf_counter_ns() - t0) / repeats / 1000
+
+    t0 = time.perf_counter_ns()
+    for _ in range(repeats):
+        recorder.start(preroll=front_end.preroll)
+    new_us = (time.perf_counter_ns() - t0) / repeats / 1000
+    return old_us, new_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+
+    frames = _make_frames(args.frames + args.warmup)
+    budget_us = FRAME_SIZE / SAMPLE_RATE * 1e6
+
+    print(f"frame budget: {budget_us:.0f} us ({FRAME_SIZE} samples @ {SAMPLE_RATE} Hz)")
+    print(
+        f"{'path':<9} {'state':<10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} "
+        f"{'% budget':>9} {'alloc B/frame':>14} {'kept blk/frame':>15}"
+    )
+
+    for state, listening in (("idle", False), ("listening", True)):
+        for name, factory in (
+            ("before", legacy_frame_fn),
+            ("after", current_frame_fn),
+            ("callback", callback_frame_fn),
+        ):
+            r = _measure(factory(listening), frames, args.warmup)
+            print(
+                f"{name:<9} {state:<10} {r['mean_us']:>9.1f} {r['p50_us']:>9.1f} "
+                f"{r['p99_us']:>9.1f} {100 * r['mean_us'] / budget_us:>8.2f}% "
+                f"{r['peak_alloc_bytes']:>14.0f} {r['retained_blocks_per_frame']:>15.2f}"
+            )
+
+    old_us, new_us = _preroll_snapshot_us(frames)
+    print(f"pre-roll snapshot at wake: before {old_us:.1f} us, after {new_us:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bench_compound_intents.py — Compound commands: concurrent versus one after another
+
+Each utterance goes through process_utterance. The clauses of a compound
+command are then executed twice:
+
+  sequential  execute_intent per clause in spoken order, the way the
+              commands would run if they were given one at a time
+  concurrent  execute_compound, which overlaps clauses on different
+              devices on the intent worker pool
+
+and the wall time of both is printed with the merged reply.
+
+By default the real handlers run (smart plug, Bluetooth, music), so run
+it on the device. --simulate replaces every handler with a sleep of the
+given per-intent latency (ms) to compare the two without hardware.
+
+    python Scripts/bench_compound_intents.py --simulate
+    python Scripts/bench_compound_intents.py "turn off the light and pause the music" --rounds 5
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.execution import executor
+from core.intent.pipeline import COMPOUND, process_utterance
+
+DEFAULT_UTTERANCES = [
+    "turn off the light and pause the music",
+    "turn on the light and play music",
+    "what is the temperature and is the plug on",
+    "turn off the light then volume down and next song",
+]
+
+# Typical handler latencies on the device (Tapo over Wi-Fi, BlueZ D-Bus).
+SIMULATED_MS = {
+    "PLUG_ON": 450, "PLUG_OFF": 450, "PLUG_STATUS": 400,
+    "PLAY_MUSIC": 300, "PAUSE_MUSIC": 250, "NEXT_TRACK": 250, "PREV_TRACK": 250,
+    "VOLUME_UP": 120, "VOLUME_DOWN": 120, "BT_STATUS": 150,
+    "GET_TEMPERATURE": 80, "STATUS": 5,
+}
+
+
+def _simulated(result: dict, deadline=None) -> str:
+    intent = result.get("intent")
+    if intent == COMPOUND:
+        return executor.execute_compound(result.get("clauses") or [], deadline)
+    time.sleep(SIMULATED_MS.get(intent, 100) / 1000)
+    return f"Done {intent.lower().replace('_', ' ')}"
+
+
+def _timed(fn) -> tuple[float, object]:
+    started = time.perf_counter()
+    value = fn()
+    return (time.perf_counter() - started) * 1000, value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("utterances", nargs="*", default=DEFAULT_UTTERANCES)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--simulate", action="store_true", help="sleep instead of running handlers")
+    args = parser.parse_args()
+
+    if args.simulate:
+        executor.execute_intent = _simulated
+
+    print(f"{'utterance':<52} {'clauses':>7} {'seq ms':>8} {'conc ms':>8} {'saved':>6}")
+    for text in args.utterances:
+        result = process_utterance(text)
+        clauses = result.get("clauses") if result["intent"] == COMPOUND else [result]
+        if not result["safe"]:
+            print(f"{text[:52]:<52} no safe intent (confidence {result['confidence']:.2f})")
+            continue
+
+        sequential, concurrent = [], []
+        reply = None
+        for _ in range(args.rounds):
+            ms, _ = _timed(lambda: [executor.execute_intent(c) for c in clauses])
+            sequential.append(ms)
+            ms, reply = _timed(lambda: executor.execute_compound(clauses))
+            concurrent.append(ms)
+        seq, conc = statistics.median(sequential), statistics.median(concurrent)
+        print(
+            f"{text[:52]:<52} {len(clauses):>7} {seq:>8.0f} {conc:>8.0f} "
+            f"{100 * (1 - conc / seq) if seq else 0:>5.0f}%"
+        )
+        print(f"  -> {reply}")
+
+
+if __name__ == "__main__":
+    main()
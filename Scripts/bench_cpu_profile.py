@@ -0,0 +1,220 @@
+"""
+bench_cpu_profile.py — Compare CPU profiles under a simulated voice turn
+
+For each profile in core/cpu_profile.PROFILES it runs, at the same time:
+
+  audio       a thread on the profile's audio cores waking every 32 ms
+              (one 512-sample frame) and doing VAD-sized work; reports
+              how late each wake-up was
+  stt         repeated decodes on the stt cores with the profile's thread
+              count: a faster-whisper model (--whisper) or a synthetic
+              CPU-bound job split across that many processes
+  background  --background busy-looping processes on the music/web cores
+              standing in for ffmpeg and Flask; with --boost they are
+              moved to boost_cores while each decode runs
+
+and prints decode latency and audio wake-up lateness per profile.
+
+    python Scripts/bench_cpu_profile.py --duration 20 --background 2
+    python Scripts/bench_cpu_profile.py --whisper tiny.en --boost samples/q.wav
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+
+from core import cpu_profile
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 512
+FRAME_SECONDS = FRAME_SIZE / SAMPLE_RATE
+ALL_CORES = set(range(os.cpu_count() or 1))
+
+
+def _pin(cpus: set[int] | None, tid: int = 0) -> None:
+    os.sched_setaffinity(tid, cpus or ALL_CORES)
+
+
+def _busy(cpus, stop) -> None:
+    _pin(cpus)
+    x = 0
+    while not stop.is_set():
+        for i in range(20000):
+            x += i * i
+
+
+def _work(cpus, iterations: int) -> None:
+    _pin(cpus)
+    x = 0
+    for i in range(iterations):
+        x += i * i
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _audio_loop(cpus, stop: threading.Event, lateness: list[float]) -> None:
+    _pin(cpus, threading.get_native_id())
+    frame = np.random.default_rng(0).integers(-2000, 2000, FRAME_SIZE).astype(np.float32)
+    next_at = time.perf_counter()
+    while not stop.is_set():
+        next_at += FRAME_SECONDS
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append(max(0.0, time.perf_counter() - next_at) * 1000)
+        float(np.sqrt(np.mean(frame * frame)))
+
+
+class SyntheticDecoder:
+    """A fixed amount of CPU work split across `threads` pinned processes."""
+
+    def __init__(self, cpus, threads: int, work: int):
+        self.cpus = cpus
+        self.threads = threads or len(cpus or ALL_CORES)
+        self.work = work
+
+    def decode(self) -> None:
+        procs = [
+            mp.Process(target=_work, args=(self.cpus, self.work // self.threads))
+            for _ in range(self.threads)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+
+
+class WhisperDecoder:
+    def __init__(self, model: str, cpus, threads: int, audio: np.ndarray):
+        from faster_whisper import WhisperModel
+
+        self.cpus = cpus
+        self.audio = audio
+        self.model = WhisperModel(model, device="cpu", compute_type="int8", cpu_threads=threads)
+
+    def decode(self) -> None:
+        # CTranslate2 workers are created on first use and inherit this mask.
+        _pin(self.cpus, threading.get_native_id())
+        segments, _ = self.model.transcribe(self.audio, beam_size=1, language="en")
+        list(segments)
+
+
+def _load_audio(path: str | None) -> np.ndarray:
+    if path is None:
+        return (np.random.default_rng(1).standard_normal(SAMPLE_RATE * 3) * 0.05).astype(np.float32)
+    import wave
+
+    with wave.open(path, "rb") as wf:
+        data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if wf.getnchannels() > 1:
+            data = data.reshape(-1, wf.getnchannels())[:, 0]
+    return data.astype(np.float32) / 32768.0
+
+
+def run_profile(name: str, args, audio: np.ndarray) -> dict:
+    stt_cpus = cpu_profile.cores("stt", name)
+    threads = cpu_profile.threads("stt", name)
+    if args.whisper:
+        decoder = WhisperDecoder(args.whisper, stt_cpus, threads, audio)
+        decoder.decode()  # warm-up, not measured
+    else:
+        decoder = SyntheticDecoder(stt_cpus, threads, args.work)
+
+    stop = mp.Event()
+    background = []
+    for i in range(args.background):
+        component = ("music", "web")[i % 2]
+        p = mp.Process(target=_busy, args=(cpu_profile.cores(component, name), stop), daemon=True)
+        p.start()
+        background.append((component, p))
+
+    audio_stop = threading.Event()
+    lateness: list[float] = []
+    audio_thread = threading.Thread(
+        target=_audio_loop, args=(cpu_profile.cores("audio", name), audio_stop, lateness), daemon=True
+    )
+    audio_thread.start()
+
+    boost_cpus = cpu_profile.boost_cores(name) if args.boost else None
+    decodes: list[float] = []
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        if boost_cpus:
+            for _, p in background:
+                _pin(boost_cpus, p.pid)
+        started = time.perf_counter()
+        decoder.decode()
+        decodes.append((time.perf_counter() - started) * 1000)
+        if boost_cpus:
+            for component, p in background:
+                _pin(cpu_profile.cores(component, name), p.pid)
+        time.sleep(args.gap)
+
+    audio_stop.set()
+    audio_thread.join()
+    stop.set()
+    for _, p in background:
+        p.join(timeout=2)
+
+    return {
+        "decodes": len(decodes),
+        "decode_p50": statistics.median(decodes),
+        "decode_p95": _percentile(decodes, 95),
+        "late_p50": statistics.median(lateness) if lateness else 0.0,
+        "late_p99": _percentile(lateness, 99),
+        "late_max": max(lateness, default=0.0),
+        "late_frames": sum(1 for v in lateness if v > FRAME_SECONDS * 1000),
+        "frames": len(lateness),
+        "threads": threads or "default",
+        "boost": bool(boost_cpus),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("wav", nargs="?", help="16 kHz WAV for --whisper (default: 3 s noise)")
+    parser.add_argument("--profiles", nargs="+", default=list(cpu_profile.PROFILES))
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per profile")
+    parser.add_argument("--background", type=int, default=2, help="busy background processes")
+    parser.add_argument("--boost", action="store_true", help="apply the interaction boost per decode")
+    parser.add_argument("--whisper", default=None, help="faster-whisper model, e.g. tiny.en")
+    parser.add_argument("--work", type=int, default=6_000_000, help="synthetic decode size")
+    parser.add_argument("--gap", type=float, default=0.2, help="idle seconds between decodes")
+    args = parser.parse_args()
+
+    audio = _load_audio(args.wav)
+    print(
+        f"cores={len(ALL_CORES)} background={args.background} boost={args.boost} "
+        f"decoder={args.whisper or 'synthetic'}"
+    )
+    print(
+        f"{'profile':<8} {'threads':>7} {'decodes':>7} {'dec p50 ms':>10} {'dec p95 ms':>10} "
+        f"{'late p50':>9} {'late p99':>9} {'late max':>9} {'late frames':>12}"
+    )
+    for name in args.profiles:
+        r = run_profile(name, args, audio)
+        print(
+            f"{name:<8} {r['threads']:>7} {r['decodes']:>7} {r['decode_p50']:>10.1f} "
+            f"{r['decode_p95']:>10.1f} {r['late_p50']:>9.2f} {r['late_p99']:>9.2f} "
+            f"{r['late_max']:>9.2f} {r['late_frames']:>5}/{r['frames']:<6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
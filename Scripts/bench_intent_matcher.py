@@ -0,0 +1,137 @@
+"""
+bench_intent_matcher.py — Linear intent scan versus the compiled PhraseIndex
+
+Grows the INTENTS table to each --sizes phrase count with synthetic
+custom phrases (word recombinations and misspellings of the real ones,
+spread over extra intents), then runs the same utterances through
+matcher.match_intent_linear (the original SequenceMatcher scan) and
+core.intent.index.PhraseIndex and prints build time, per-utterance
+latency and the number of utterances where the two disagree (must be 0).
+
+Utterances: real phrases, phrases with extra words before / after,
+misspelled phrases and unrelated word salad, in equal parts.
+
+    python Scripts/bench_intent_matcher.py
+    python Scripts/bench_intent_matcher.py --sizes 150 1500 15000 --queries 200
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.intent.index import PhraseIndex
+from core.intent.intents import INTENTS
+from core.intent.matcher import match_intent_linear
+from core.intent.normalize import normalize
+
+FILLER = ["please", "now", "can you", "hey", "for me", "the", "right now", "again", "okay"]
+
+
+def _misspell(rng: random.Random, text: str, edits: int) -> str:
+    chars = list(text)
+    for _ in range(edits):
+        if not chars:
+            break
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.33:
+            del chars[i]
+        elif op < 0.66:
+            chars.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        else:
+            chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def build_table(size: int, rng: random.Random) -> dict[str, list[str]]:
+    """INTENTS plus synthetic phrases until there are `size` phrases."""
+    table = {intent: list(phrases) for intent, phrases in INTENTS.items()}
+    base = [p for phrases in INTENTS.values() for p in phrases]
+    words = sorted({w for p in base for w in p.split()})
+    count = len(base)
+    extra = 0
+    while count < size:
+        intent = f"CUSTOM_{extra // 10}"
+        if rng.random() < 0.5:
+            phrase = " ".join(rng.choices(words, k=rng.randint(2, 5)))
+        else:
+            phrase = _misspell(rng, rng.choice(base), rng.randint(1, 3))
+        table.setdefault(intent, []).append(phrase)
+        count += 1
+        extra += 1
+    return table
+
+
+def build_queries(count: int, rng: random.Random) -> list[str]:
+    base = [p for phrases in INTENTS.values() for p in phrases]
+    words = sorted({w for p in base for w in p.split()})
+    queries = []
+    for i in range(count):
+        kind = i % 4
+        phrase = rng.choice(base)
+        if kind == 0:
+            queries.append(phrase)
+        elif kind == 1:
+            queries.append(f"{rng.choice(FILLER)} {phrase} {rng.choice(FILLER)}")
+        elif kind == 2:
+            queries.append(_misspell(rng, phrase, rng.randint(1, 3)))
+        else:
+            queries.append(" ".join(rng.choices(words + FILLER, k=rng.randint(2, 7))))
+    return [normalize(q) for q in queries]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _timed(fn, queries: list[str]) -> tuple[list, list[float]]:
+    results, times = [], []
+    for q in queries:
+        started = time.perf_counter()
+        results.append(fn(q))
+        times.append((time.perf_counter() - started) * 1000)
+    return results, times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[150, 1500, 15000])
+    parser.add_argument("--queries", type=int, default=100, help="utterances per size")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = build_queries(args.queries, rng)
+    print(f"{args.queries} utterances per size")
+    print(
+        f"{'phrases':>8} {'build ms':>9} {'linear p50':>11} {'linear p95':>11} "
+        f"{'index p50':>10} {'index p95':>10} {'speed-up':>9} {'mismatch':>9}"
+    )
+    for size in args.sizes:
+        table = build_table(size, random.Random(args.seed + size))
+        started = time.perf_counter()
+        index = PhraseIndex(table)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        linear, linear_ms = _timed(lambda q: match_intent_linear(q, table), queries)
+        compiled, index_ms = _timed(index.match, queries)
+        mismatches = sum(1 for a, b in zip(linear, compiled) if a != b)
+        print(
+            f"{len(index):>8} {build_ms:>9.0f} {statistics.median(linear_ms):>11.2f} "
+            f"{_percentile(linear_ms, 95):>11.2f} {statistics.median(index_ms):>10.3f} "
+            f"{_percentile(index_ms, 95):>10.3f} "
+            f"{statistics.fmean(linear_ms) / max(statistics.fmean(index_ms), 1e-9):>8.0f}x "
+            f"{mismatches:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+bench_model_residency.py — Cold versus warm model load from the page cache
+
+For each model file core/model_residency would keep resident (or the
+files given on the command line) it measures:
+
+  cold   pages dropped from the page cache (POSIX_FADV_DONTNEED, works
+         for clean pages without root), then every page faulted in
+  warm   the same read again, right after
+  locked the share of pages still resident after --evict-mb of other
+         file I/O, with and without an mlock()ed mapping held open
+
+Dropping pages only affects files no other process has mapped or
+locked, so stop safebox-wake / safebox-stt / llama-server first for
+meaningful cold numbers.
+
+    python Scripts/bench_model_residency.py
+    python Scripts/bench_model_residency.py --rounds 5 --evict-mb 2048 /opt/safebox/models/*.gguf
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core import model_residency
+from core.model_residency import LLM_FILE, ModelFile, _Mapping, discover_model_files
+
+
+def drop_cache(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def timed_touch(model: ModelFile) -> tuple[float, float]:
+    """ms to fault in every page, and % resident before the read."""
+    mapping = _Mapping(model)
+    try:
+        before = 100.0 * mapping.resident_pages() / max(1, mapping.pages)
+        started = time.perf_counter()
+        mapping.touch(lambda: False)
+        return (time.perf_counter() - started) * 1000, before
+    finally:
+        mapping.close()
+
+
+def churn(directory: str, mb: int) -> None:
+    """Read mb of freshly written data to push other pages out of the cache."""
+    path = Path(directory) / "churn.bin"
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(mb):
+            f.write(block)
+    with open(path, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+    path.unlink()
+
+
+def resident_after_churn(model: ModelFile, mb: int, lock: bool) -> float:
+    held = _Mapping(model)
+    try:
+        held.touch(lambda: False)
+        if lock and not held.lock():
+            return float("nan")
+        with tempfile.TemporaryDirectory() as directory:
+            churn(directory, mb)
+        return 100.0 * held.resident_pages() / max(1, held.pages)
+    finally:
+        held.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("files", nargs="*", type=Path, help="default: the device's model files")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--evict-mb", type=int, default=0, help="I/O churn for the locked column (0 = skip)")
+    args = parser.parse_args()
+
+    if model_residency._libc is None:
+        print("needs Linux libc (mmap / mincore)")
+        return
+    files = [ModelFile(p.name, p, True) for p in args.files] or (
+        discover_model_files() + ([LLM_FILE] if LLM_FILE.path.is_file() else [])
+    )
+    if not files:
+        print("no model files found")
+        return
+
+    print(f"{'file':<24} {'MB':>7} {'cold ms':>9} {'warm ms':>9} {'cold MB/s':>10}", end="")
+    print(f" {'kept %':>7} {'locked %':>9}" if args.evict_mb else "")
+    for model in files:
+        cold, warm, resident = [], [], []
+        for _ in range(args.rounds):
+            drop_cache(model.path)
+            ms, before = timed_touch(model)
+            cold.append(ms)
+            resident.append(before)
+            warm.append(timed_touch(model)[0])
+        mb = model.path.stat().st_size / (1024 * 1024)
+        cold_ms = statistics.median(cold)
+        line = (
+            f"{model.name:<24} {mb:>7.1f} {cold_ms:>9.1f} {statistics.median(warm):>9.1f} "
+            f"{mb / max(cold_ms / 1000, 1e-6):>10.0f}"
+        )
+        if args.evict_mb:
+            kept = resident_after_churn(model, args.evict_mb, lock=False)
+            locked = resident_after_churn(model, args.evict_mb, lock=True)
+            line += f" {kept:>7.1f} {locked:>9.1f}"
+        print(line)
+        if max(resident) > 50:
+            print(f"  note: {max(resident):.0f}% stayed resident after the drop (mapped elsewhere?)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+bench_stt_cascade.py — STT cascade latency, escalation share and accuracy
+
+Decodes every utterance in a recorded corpus with the fast model
+(STT_MODEL, tiny.en) and the accurate model (STT_CASCADE_MODEL), timing
+each, then evaluates the cascade at one or more avg_logprob thresholds:
+a request costs the fast decode, plus the accurate decode when the
+fast result's confidence escalates it (same rule as SpeechToText).
+
+Reports mean / p95 STT latency, the share of requests that escalate,
+WER against <name>.txt reference transcripts where present, and how
+many transcripts match an intent (so fewer commands fall through to
+the LLM).
+
+Samples are 16 kHz mono WAVs (e.g. archived with AUDIO_ARCHIVE_ENABLED=true).
+
+    python Scripts/bench_stt_cascade.py /tmp/safebox_utterances --thresholds -0.5 -0.7 -0.9
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import soundfile as sf
+from faster_whisper import WhisperModel
+
+from Scripts.bench_stt_trim import word_errors
+from core.audio.stt import (
+    STT_CASCADE_MAX_NO_SPEECH_PROB,
+    STT_CASCADE_MIN_AVG_LOGPROB,
+    STT_CASCADE_MODEL,
+    STT_MODEL,
+    _confidence,
+    _decode,
+    _needs_escalation,
+)
+from core.intent.normalize import strip_wake_prefix
+from core.intent.pipeline import process_command
+
+SAMPLE_RATE = 16000
+MIN_INTENT_CONFIDENCE = 0.60
+
+
+def _load(path: Path) -> np.ndarray:
+    audio, sr = sf.read(str(path), dtype="float32", always_2d=True)
+    if sr != SAMPLE_RATE:
+        raise ValueError(f"{path.name}: expected {SAMPLE_RATE} Hz, got {sr}")
+    return np.ascontiguousarray(audio[:, 0])
+
+
+def _timed_decode(model, audio: np.ndarray, repeat: int) -> tuple[list, float]:
+    raw, best = [], float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        raw = _decode(model, audio, None)
+        best = min(best, time.perf_counter() - t0)
+    return raw, best * 1000
+
+
+def _text(raw: list) -> str:
+    return " ".join(seg.text.strip() for seg in raw).strip()
+
+
+def _intent_hit(text: str) -> bool:
+    text = strip_wake_prefix(text)
+    if not text:
+        return False
+    result = process_command(text)
+    return result["safe"] and result["confidence"] >= MIN_INTENT_CONFIDENCE
+
+
+def _p95(samples: list[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("samples", type=Path, help="directory of 16 kHz WAVs")
+    parser.add_argument("--fast", default=STT_MODEL)
+    parser.add_argument("--accurate", default=STT_CASCADE_MODEL)
+    parser.add_argument("--thresholds", type=float, nargs="+",
+                        default=[STT_CASCADE_MIN_AVG_LOGPROB],
+                        help="avg_logprob escalation thresholds to evaluate")
+    parser.add_argument("--max-no-speech", type=float, default=STT_CASCADE_MAX_NO_SPEECH_PROB)
+    parser.add_argument("--repeat", type=int, default=2, help="runs per decode (best kept)")
+    args = parser.parse_args()
+
+    files = sorted(args.samples.glob("*.wav"))
+    if not files:
+        sys.exit(f"No WAV files in {args.samples}")
+
+    fast = WhisperModel(args.fast, device="cpu", compute_type="int8")
+    accurate = WhisperModel(args.accurate, device="cpu", compute_type="int8")
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    _decode(fast, silence, None)
+    _decode(accurate, silence, None)
+
+    rows = []
+    print(f"{'file':<32} {'fast ms':>8} {'acc ms':>8} {'logprob':>8} {'no_sp':>6}  fast / accurate")
+    for path in files:
+        audio = _load(path)
+        fast_raw, fast_ms = _timed_decode(fast, audio, args.repeat)
+        acc_raw, acc_ms = _timed_decode(accurate, audio, args.repeat)
+        avg_logprob, no_speech_prob = _confidence(fast_raw)
+        ref_path = path.with_suffix(".txt")
+        rows.append({
+            "fast_raw": fast_raw,
+            "avg_logprob": avg_logprob,
+            "fast_ms": fast_ms,
+            "acc_ms": acc_ms,
+            "fast_text": _text(fast_raw),
+            "acc_text": _text(acc_raw),
+            "reference": ref_path.read_text(encoding="utf-8") if ref_path.exists() else None,
+        })
+        print(
+            f"{path.name[:32]:<32} {fast_ms:>8.0f} {acc_ms:>8.0f} "
+            f"{avg_logprob if avg_logprob is not None else float('nan'):>8.2f} "
+            f"{no_speech_prob if no_speech_prob is not None else float('nan'):>6.2f}  "
+            f"{rows[-1]['fast_text']!r} / {rows[-1]['acc_text']!r}"
+        )
+
+    def evaluate(label: str, escalate, run_fast: bool = True) -> None:
+        latency, escalated, hits, errors, words = [], 0, 0, 0, 0
+        for row in rows:
+            up = escalate(row)
+            escalated += up
+            latency.append(
+                (row["fast_ms"] if run_fast else 0.0) + (row["acc_ms"] if up else 0.0)
+            )
+            text = row["acc_text"] if up else row["fast_text"]
+            hits += _intent_hit(text)
+            if row["reference"] is not None:
+                e, n = word_errors(row["reference"], text)
+                errors += e
+                words += n
+        wer = f"{100 * errors / words:5.1f}%" if words else "    -"
+        print(
+            f"{label:<24} {statistics.fmean(latency):>8.0f} {_p95(latency):>8.0f} "
+            f"{100 * escalated / len(rows):>9.1f}% {wer:>7} {hits:>4}/{len(rows)}"
+        )
+
+    print()
+    print(f"files: {len(files)}  fast={args.fast} accurate={args.accurate} "
+          f"max_no_speech={args.max_no_speech}")
+    print(f"{'config':<24} {'mean ms':>8} {'p95 ms':>8} {'escalated':>10} {'WER':>7} {'intents':>9}")
+    evaluate(f"{args.fast} only", lambda row: False)
+    for threshold in args.thresholds:
+        evaluate(
+            f"cascade @ {threshold:+.2f}",
+            lambda row, t=threshold: _needs_escalation(
+                row["fast_raw"], row["avg_logprob"], t, args.max_no_speech
+            ),
+        )
+    evaluate(f"{args.accurate} only", lambda row: True, run_fast=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+bench_stt_service.py — STT service throughput under concurrent clients
+
+Starts N client threads that each send M transcription requests to the
+STT service and reports requests/s, audio seconds decoded per second,
+latency (p50/p95) per priority and how many requests backpressure
+refused. Clients send PCM from the given WAVs (16 kHz mono), or
+synthetic noise bursts when none are given.
+
+By default it talks to the running safebox-stt service. --in-process
+starts a private service on a temporary socket instead; with --stub-ms
+that service sleeps instead of decoding, which isolates queueing and
+socket overhead from Whisper.
+
+    python Scripts/bench_stt_service.py --clients 4 --requests 10 samples/*.wav
+    python Scripts/bench_stt_service.py --in-process --stub-ms 300 --clients 8 --background 0.5
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+
+from core.audio.stt_client import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_LIVE,
+    PRIORITY_NAMES,
+    STT_SERVICE_SOCKET,
+    STTClient,
+    STTResult,
+    STTServiceBusy,
+)
+
+SAMPLE_RATE = 16000
+
+
+class StubSTT:
+    """Sleeps for a fixed time per request instead of decoding."""
+
+    def __init__(self, decode_ms: float):
+        self.decode_seconds = decode_ms / 1000.0
+
+    def transcribe_detailed(self, audio, initial_prompt=None, cascade=True, escalate=False):
+        time.sleep(self.decode_seconds)
+        return STTResult([(0.0, 1.0, "stub")], "stub")
+
+
+def _load_clips(paths: list[Path]) -> list[np.ndarray]:
+    if not paths:
+        rng = np.random.default_rng(0)
+        return [
+            (0.05 * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+            for seconds in (1.5, 2.5, 4.0)
+        ]
+    import soundfile as sf
+
+    clips = []
+    for path in paths:
+        audio, sr = sf.read(str(path), dtype="float32", always_2d=True)
+        if sr != SAMPLE_RATE:
+            sys.exit(f"{path}: sample rate {sr} != {SAMPLE_RATE}")
+        clips.append(audio[:, 0].copy())
+    return clips
+
+
+def _start_in_process(stub_ms: float | None) -> tuple[str, object]:
+    from core.audio.stt_service import STTService, serve
+
+    if stub_ms is not None:
+        stt = StubSTT(stub_ms)
+    else:
+        from core.audio.stt import SpeechToText
+
+        stt = SpeechToText()
+        stt.warm_up()
+    service = STTService(stt)
+    socket_path = str(Path(tempfile.mkdtemp(prefix="safebox-stt-")) / "stt.sock")
+    server = serve(service, socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return socket_path, server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("wavs", nargs="*", type=Path, help="16 kHz WAVs to send")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent client threads")
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--background", type=float, default=0.0,
+                        help="fraction of requests sent at background priority")
+    parser.add_argument("--socket", default=STT_SERVICE_SOCKET)
+    parser.add_argument("--in-process", action="store_true", help="start a private service")
+    parser.add_argument("--stub-ms", type=float, default=None,
+                        help="with --in-process: fake decode time instead of Whisper")
+    args = parser.parse_args()
+
+    clips = _load_clips(args.wavs)
+    socket_path = args.socket
+    server = None
+    if args.in_process:
+        socket_path, server = _start_in_process(args.stub_ms)
+    elif not STTClient(socket_path).ping():
+        sys.exit(f"No STT service answering on {socket_path} (try --in-process)")
+
+    latencies = {p: [] for p in PRIORITY_NAMES}
+    refused = {p: 0 for p in PRIORITY_NAMES}
+    failed = [0]
+    audio_seconds = [0.0]
+    lock = threading.Lock()
+
+    def client(index: int) -> None:
+        rng = random.Random(index)
+        for _ in range(args.requests):
+            priority = PRIORITY_BACKGROUND if rng.random() < args.background else PRIORITY_LIVE
+            clip = clips[rng.randrange(len(clips))]
+            t0 = time.perf_counter()
+            try:
+                STTClient(socket_path, priority).transcribe_segments(clip)
+            except STTServiceBusy:
+                with lock:
+                    refused[priority] += 1
+                continue
+            except Exception:
+                with lock:
+                    failed[0] += 1
+                continue
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            with lock:
+                latencies[priority].append(elapsed_ms)
+                audio_seconds[0] += len(clip) / SAMPLE_RATE
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    done = sum(len(v) for v in latencies.values())
+    print(f"clients={args.clients} requests={args.clients * args.requests} wall_s={wall:.2f}")
+    print(f"completed={done} refused={sum(refused.values())} failed={failed[0]}")
+    print(f"throughput: {done / wall:.2f} req/s, {audio_seconds[0] / wall:.2f} audio s/s")
+    print(f"{'priority':<12} {'done':>5} {'refused':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for p, name in PRIORITY_NAMES.items():
+        samples = sorted(latencies[p])
+        if not samples and not refused[p]:
+            continue
+        p50 = statistics.median(samples) if samples else 0.0
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))] if samples else 0.0
+        mx = samples[-1] if samples else 0.0
+        print(f"{name:<12} {len(samples):>5} {refused[p]:>8} {p50:>8.0f} {p95:>8.0f} {mx:>8.0f}")
+
+    stats = STTClient(socket_path).stats()
+    print(f"service: high_water={stats['high_water']} max_queue={stats['max_queue']} "
+          f"max_background={stats['max_background']}")
+
+    if server is not None:
+        server.shutdown()
+        Path(socket_path).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+bench_stt_trim.py — STT time and WER with and without silence trimming
+
+Transcribes recorded utterances twice with the device STT model: once
+as captured and once after core.audio.trim cuts leading/trailing
+silence. Reports per-file and mean decode time, seconds trimmed and
+word error rate against reference transcripts.
+
+Samples are 16 kHz mono WAVs (e.g. archived with AUDIO_ARCHIVE_ENABLED=true).
+A reference transcript sits next to each WAV as <name>.txt; files
+without one are timed but left out of the WER.
+
+    python Scripts/bench_stt_trim.py /tmp/safebox_utterances --repeat 3
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import soundfile as sf
+
+from core.audio.stt import SpeechToText
+from core.audio.trim import AUDIO_TRIM_GUARD_SECONDS, trim_silence
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 512
+
+
+def _words(text: str) -> list[str]:
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """(edit distance in words, reference word count)."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1], len(ref)
+
+
+def _load(path: Path) -> np.ndarray:
+    audio, sr = sf.read(str(path), dtype="float32", always_2d=True)
+    if sr != SAMPLE_RATE:
+        raise ValueError(f"{path.name}: expected {SAMPLE_RATE} Hz, got {sr}")
+    return np.ascontiguousarray(audio[:, 0])
+
+
+def _timed(stt: SpeechToText, audio: np.ndarray, repeat: int) -> tuple[str, float]:
+    text = ""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        text = stt.transcribe(audio)
+        best = min(best, time.perf_counter() - t0)
+    return text, best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("samples", type=Path, help="directory of 16 kHz WAVs")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per file (best kept)")
+    parser.add_argument("--guard", type=float, default=AUDIO_TRIM_GUARD_SECONDS)
+    parser.add_argument("--speech-threshold", type=float, default=260.0)
+    parser.add_argument("--silence-threshold", type=float, default=180.0)
+    args = parser.parse_args()
+
+    files = sorted(args.samples.glob("*.wav"))
+    if not files:
+        sys.exit(f"No WAV files in {args.samples}")
+
+    stt = SpeechToText()
+    stt.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32))  # warm-up
+
+    full_ms, trim_ms, saved = [], [], []
+    errors = {"full": [0, 0], "trim": [0, 0]}
+
+    print(f"{'file':<36} {'len s':>6} {'saved s':>8} {'full ms':>8} {'trim ms':>8}")
+    for path in files:
+        audio = _load(path)
+        trimmed, result = trim_silence(
+            audio,
+            SAMPLE_RATE,
+            FRAME_SIZE,
+            args.speech_threshold,
+            args.silence_threshold,
+            args.guard,
+        )
+
+        full_text, f_ms = _timed(stt, audio, args.repeat)
+        trim_text, t_ms = _timed(stt, trimmed, args.repeat)
+        full_ms.append(f_ms)
+        trim_ms.append(t_ms)
+        saved.append(result.saved_seconds)
+
+        ref_path = path.with_suffix(".txt")
+        if ref_path.exists():
+            reference = ref_path.read_text(encoding="utf-8")
+            for key, hyp in (("full", full_text), ("trim", trim_text)):
+                e, n = word_errors(reference, hyp)
+                errors[key][0] += e
+                errors[key][1] += n
+
+        print(
+            f"{path.name[:36]:<36} {len(audio) / SAMPLE_RATE:>6.2f} "
+            f"{result.saved_seconds:>8.2f} {f_ms:>8.0f} {t_ms:>8.0f}"
+        )
+        if full_text != trim_text:
+            print(f"    full: {full_text!r}\n    trim: {trim_text!r}")
+
+    print()
+    print(f"files: {len(files)}  guard: {args.guard:.2f} s")
+    print(f"mean trimmed: {statistics.fmean(saved):.2f} s per utterance")
+    print(
+        f"mean STT: full {statistics.fmean(full_ms):.0f} ms, "
+        f"trimmed {statistics.fmean(trim_ms):.0f} ms "
+        f"({100 * (1 - statistics.fmean(trim_ms) / statistics.fmean(full_ms)):.1f}% less)"
+    )
+    for key in ("full", "trim"):
+        e, n = errors[key]
+        if n:
+            print(f"WER {key}: {100 * e / n:.1f}% ({e}/{n} words)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+eval_vad.py — Offline endpointing comparison: SimpleVAD vs AdaptiveVAD
+
+Replays labelled recordings through each VAD with the same endpoint
+rules as FrameProcessor (speech-start timeout, trailing silence,
+max utterance) and reports:
+- endpointing latency: finalize time minus the labelled end of speech
+- false-cut rate: utterances finalized before the labelled end of speech
+- how often each run fell through to max_utterance or the start timeout
+
+Samples are 16 kHz mono WAVs with an Audacity label track exported
+next to each as <name>.labels ("start<TAB>end[<TAB>text]" per speech
+region, seconds). Audio before the first region (minus --lead) is
+treated as IDLE time, which is when AdaptiveVAD learns the noise floor.
+
+    python Scripts/eval_vad.py samples/ --noise kitchen.wav --noise-gain 0.5
+"""
+
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import soundfile as sf
+
+from core.audio.front_end import (
+    VAD_IMPL_ADAPTIVE,
+    VAD_IMPL_SIMPLE,
+    FrontEndConfig,
+    build_vad,
+)
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 512
+FALSE_CUT_TOLERANCE_SECONDS = 0.1
+
+
+def load_labels(path: Path) -> list[tuple[float, float]]:
+    regions = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        parts = line.strip().split("\t")
+        if len(parts) >= 2:
+            regions.append((float(parts[0]), float(parts[1])))
+    return sorted(regions)
+
+
+def load_audio(path: Path, noise: np.ndarray | None, noise_gain: float) -> np.ndarray:
+    audio, sr = sf.read(str(path), dtype="int16", always_2d=True)
+    if sr != SAMPLE_RATE:
+        raise ValueError(f"{path.name}: expected {SAMPLE_RATE} Hz, got {sr}")
+    audio = audio[:, 0].astype(np.float32)
+    if noise is not None:
+        reps = int(np.ceil(len(audio) / len(noise)))
+        audio += noise_gain * np.tile(noise, reps)[: len(audio)]
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def run_endpoint(
+    vad,
+    audio: np.ndarray,
+    listen_at: float,
+    speech_start_timeout: float,
+    max_utterance: float,
+) -> tuple[float, str]:
+    """Return (finalize time in seconds, reason), mirroring FrameProcessor._listen."""
+    frame_seconds = FRAME_SIZE / SAMPLE_RATE
+    listen_frame = int(listen_at / frame_seconds)
+    frames = [audio[i:i + FRAME_SIZE] for i in range(0, len(audio) - FRAME_SIZE + 1, FRAME_SIZE)]
+
+    for frame in frames[:listen_frame]:
+        vad.observe_noise(frame)
+
+    vad.reset()
+    has_seen_speech = False
+    start_budget = int(speech_start_timeout / frame_seconds)
+    max_budget = int(max_utterance / frame_seconds)
+
+    for n, frame in enumerate(frames[listen_frame:], 1):
+        speech_active = vad.is_speech(frame)
+        if speech_active:
+            has_seen_speech = True
+        t = (listen_frame + n) * frame_seconds
+        if not has_seen_speech and n >= start_budget:
+            return t, "speech_start_timeout"
+        if has_seen_speech and not speech_active:
+            return t, "trailing_silence"
+        if n >= max_budget:
+            return t, "max_utterance"
+
+    return len(audio) / SAMPLE_RATE, "end_of_file"
+
+
+def _pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("samples", type=Path, help="directory of WAV + .labels pairs")
+    parser.add_argument("--lead", type=float, default=0.3,
+                        help="start listening this long before the first speech label")
+    parser.add_argument("--speech-start-timeout", type=float, default=2.5)
+    parser.add_argument("--max-utterance", type=float, default=8.0)
+    parser.add_argument("--noise", type=Path, help="16 kHz WAV mixed into every sample")
+    parser.add_argument("--noise-gain", type=float, default=1.0)
+    args = parser.parse_args()
+
+    noise = None
+    if args.noise:
+        noise, sr = sf.read(str(args.noise), dtype="int16", always_2d=True)
+        if sr != SAMPLE_RATE:
+            sys.exit(f"{args.noise}: expected {SAMPLE_RATE} Hz, got {sr}")
+        noise = noise[:, 0].astype(np.float32)
+
+    pairs = [
+        (wav, wav.with_suffix(".labels"))
+        for wav in sorted(args.samples.glob("*.wav"))
+        if wav.with_suffix(".labels").exists()
+    ]
+    if not pairs:
+        sys.exit(f"No WAV + .labels pairs in {args.samples}")
+
+    results: dict[str, dict] = {}
+    for impl in (VAD_IMPL_SIMPLE, VAD_IMPL_ADAPTIVE):
+        r = {"latency": [], "false_cut": 0, "reasons": {}}
+        for wav, labels_path in pairs:
+            regions = load_labels(labels_path)
+            if not regions:
+                continue
+            audio = load_audio(wav, noise, args.noise_gain)
+            speech_start, speech_end = regions[0][0], regions[-1][1]
+
+            vad = build_vad(
+                FrontEndConfig(sample_rate=SAMPLE_RATE, frame_size=FRAME_SIZE, vad_impl=impl)
+            )
+            t_end, reason = run_endpoint(
+                vad,
+                audio,
+                max(0.0, speech_start - args.lead),
+                args.speech_start_timeout,
+                args.max_utterance,
+            )
+            r["reasons"][reason] = r["reasons"].get(reason, 0) + 1
+            if t_end < speech_end - FALSE_CUT_TOLERANCE_SECONDS:
+                r["false_cut"] += 1
+            else:
+                r["latency"].append(t_end - speech_end)
+        results[impl] = r
+
+    total = len(pairs)
+    print(f"utterances: {total}" + (f"  noise: {args.noise} x{args.noise_gain}" if noise is not None else ""))
+    print(f"{'vad':<9} {'mean ms':>8} {'p50 ms':>8} {'p90 ms':>8} {'false cut':>10}  reasons")
+    for impl, r in results.items():
+        lat = [x * 1000 for x in r["latency"]]
+        stats = (
+            f"{statistics.fmean(lat):>8.0f} {_pct(lat, 0.5):>8.0f} {_pct(lat, 0.9):>8.0f}"
+            if lat else f"{'-':>8} {'-':>8} {'-':>8}"
+        )
+        reasons = " ".join(f"{k}={v}" for k, v in sorted(r["reasons"].items()))
+        print(f"{impl:<9} {stats} {100 * r['false_cut'] / total:>9.1f}%  {reasons}")
+
+
+if __name__ == "__main__":
+    main()
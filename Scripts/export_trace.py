@@ -0,0 +1,65 @@
+"""
+export_trace.py — Export voice pipeline traces as Chrome trace-event JSON
+
+Reads per-request traces from the on-disk store (SAFEBOX_TRACE_DIR,
+see core/tracing.py) and writes one JSON file that chrome://tracing or
+ui.perfetto.dev can open. Each request is a row; wake-process and
+web-process spans appear as separate tracks under it. With --summary
+the per-stage milliseconds are printed instead.
+
+    python Scripts/export_trace.py --last 5 -o /tmp/safebox_trace.json
+    python Scripts/export_trace.py 3f2b9c1e-... --summary
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core import tracing
+
+
+def _print_summary(request_id: str) -> None:
+    parts = tracing.load_trace(request_id)
+    if not parts:
+        print(f"{request_id}: not found")
+        return
+    started = min(p["started_at"] for p in parts)
+    print(f"{request_id}")
+    spans = sorted((s for p in parts for s in p["spans"]), key=lambda s: s["start"])
+    for s in spans:
+        offset = (s["start"] - started) * 1000
+        if s["end"] is None:
+            print(f"  {offset:9.1f} ms  {'':>9}  {s['name']}")
+        else:
+            print(f"  {offset:9.1f} ms  {(s['end'] - s['start']) * 1000:7.1f} ms  {s['name']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("request_ids", nargs="*", help="device_request_ids (default: --last)")
+    parser.add_argument("--last", type=int, default=1, help="export the N most recent traces")
+    parser.add_argument("-o", "--output", type=Path, default=Path("safebox_trace.json"))
+    parser.add_argument("--summary", action="store_true", help="print stage timings instead")
+    args = parser.parse_args()
+
+    request_ids = args.request_ids or tracing.list_traces(args.last)
+    if not request_ids:
+        sys.exit(f"No traces in {tracing.TRACE_DIR}")
+
+    if args.summary:
+        for request_id in request_ids:
+            _print_summary(request_id)
+        return
+
+    data = tracing.to_chrome_trace(request_ids)
+    args.output.write_text(json.dumps(data), encoding="utf-8")
+    print(f"Wrote {len(data['traceEvents'])} events for {len(request_ids)} request(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
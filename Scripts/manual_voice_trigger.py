@@ -5,6 +5,7 @@ audio frame, starting the voice loop without a wake word.
 Logs the trigger so it appears in journalctl for signoff evidence.
 """
 
+import json
 import sys
 import time
 from pathlib import Path
@@ -14,6 +15,7 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from core.logger import get_logger
+from core.request_context import new_request_id
 
 log = get_logger("trigger_voice")
 
@@ -21,10 +23,20 @@ TRIGGER_FILE = Path("/opt/safebox/runtime/manual_voice_trigger")
 
 
 def main() -> None:
+    device_request_id = new_request_id()
     TRIGGER_FILE.parent.mkdir(parents=True, exist_ok=True)
-    TRIGGER_FILE.write_text(str(time.time()), encoding="utf-8")
-    log.info("manual.voice_trigger.armed | trigger_file written")
-    print({"ok": True, "trigger": "manual_voice_trigger_armed"})
+    TRIGGER_FILE.write_text(
+        json.dumps({"device_request_id": device_request_id, "requested_at": time.time()}),
+        encoding="utf-8",
+    )
+    log.info(f"manual.voice_trigger.armed | trigger_file written device_request_id={device_request_id}")
+    print(
+        {
+            "ok": True,
+            "trigger": "manual_voice_trigger_armed",
+            "device_request_id": device_request_id,
+        }
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+"""
+memory_report.py — Anonymous resident memory per component over time
+
+Reads the RssAnon history the model lifecycle manager (safebox-device)
+appends every MEMORY_SAMPLE_SECONDS and prints, per component, the
+current / min / mean / max resident MB and a timeline of the last
+--hours bucketed into --buckets columns, plus the total against
+MODEL_MEMORY_BUDGET_MB. Model loads and unloads from the current
+"memory" metrics section are listed underneath.
+
+    python Scripts/memory_report.py
+    python Scripts/memory_report.py --hours 24 --buckets 48 --json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core import metrics
+from core.model_lifecycle import MEMORY_HISTORY_FILE, MODEL_MEMORY_BUDGET_MB, load_history
+
+TOTAL = "total"
+
+
+def _series(entries: list[dict]) -> dict[str, list[tuple[float, float]]]:
+    series: dict[str, list[tuple[float, float]]] = {TOTAL: []}
+    for entry in entries:
+        at = entry.get("at", 0.0)
+        series[TOTAL].append((at, entry.get("total_mb", 0.0)))
+        for name, mb in (entry.get("components") or {}).items():
+            series.setdefault(name, []).append((at, mb))
+    return series
+
+
+def _timeline(points: list[tuple[float, float]], start: float, end: float, buckets: int) -> list:
+    """Max MB per time bucket; None where the component was not running."""
+    width = (end - start) / buckets
+    cells: list[float | None] = [None] * buckets
+    for at, mb in points:
+        index = min(buckets - 1, int((at - start) / width))
+        cells[index] = mb if cells[index] is None else max(cells[index], mb)
+    return cells
+
+
+def build_report(entries: list[dict], hours: float, buckets: int) -> dict:
+    end = time.time()
+    start = end - hours * 3600
+    entries = [e for e in entries if e.get("at", 0) >= start]
+    report = {"budget_mb": MODEL_MEMORY_BUDGET_MB, "samples": len(entries), "components": {}}
+    for name, points in _series(entries).items():
+        if not points:
+            continue
+        values = [mb for _, mb in points]
+        report["components"][name] = {
+            "current_mb": values[-1],
+            "min_mb": min(values),
+            "mean_mb": round(statistics.fmean(values), 1),
+            "max_mb": max(values),
+            "timeline_mb": _timeline(points, start, end, buckets),
+        }
+    return report
+
+
+def _bar(cells: list, scale: float) -> str:
+    blocks = " ▁▂▃▄▅▆▇█"
+    out = []
+    for value in cells:
+        if value is None:
+            out.append("·")
+        else:
+            out.append(blocks[min(len(blocks) - 1, int(value / scale * (len(blocks) - 1)))])
+    return "".join(out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--history", type=Path, default=MEMORY_HISTORY_FILE)
+    parser.add_argument("--hours", type=float, default=6.0)
+    parser.add_argument("--buckets", type=int, default=36)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = build_report(load_history(args.history), args.hours, args.buckets)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    if not report["samples"]:
+        print(f"no samples in {args.history} for the last {args.hours:g} h")
+        return
+
+    components = report["components"]
+    scale = max(c["max_mb"] for name, c in components.items() if name != TOTAL) or 1.0
+    print(
+        f"last {args.hours:g} h, {report['samples']} samples, "
+        f"budget {report['budget_mb']:.0f} MB (· = not running)"
+    )
+    print(f"{'component':<10} {'now':>7} {'min':>7} {'mean':>7} {'max':>7}  timeline")
+    for name in sorted(components, key=lambda n: (n == TOTAL, n)):
+        c = components[name]
+        bar = _bar(c["timeline_mb"], report["budget_mb"] if name == TOTAL else scale)
+        print(
+            f"{name:<10} {c['current_mb']:>7.0f} {c['min_mb']:>7.0f} {c['mean_mb']:>7.0f} "
+            f"{c['max_mb']:>7.0f}  {bar}"
+        )
+
+    current = metrics.read_section("memory") or {}
+    events = current.get("events") or []
+    if events:
+        print("\nrecent model loads / unloads:")
+        for event in events:
+            when = time.strftime("%H:%M:%S", time.localtime(event["at"]))
+            print(f"  {when} {event['action']:<7} {event['target']:<12} {event['reason']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+replay_pipeline.py — Deterministic replay of WAV files through the voice pipeline
+
+Feeds recordings through the same audio callback, FrameRing,
+FrameProcessor, FrontEnd, SessionManager and SpeechRecorder that
+mic_stream uses, with the sounddevice stream replaced by
+core.audio.file_stream.FileInputStream. No ReSpeaker needed.
+
+Pluggable stages:
+  --wake porcupine   real WakeWordEngine (needs PICOVOICE_ACCESS_KEY)
+  --wake stub        fires at the end of each "wake" label, or --wake-at
+  --stt whisper      real SpeechToText (faster-whisper tiny.en)
+  --stt stub         returns <name>.txt after --stub-stt-ms
+
+--speed 1.0 replays in real time; --speed 0 runs as fast as possible and
+pauses the stream while an utterance is processed, so endpoint and wake
+timings are identical from run to run and machine to machine.
+
+After STT the transcript goes through strip_wake_prefix and
+process_command; "reply ready" is the point where the device would
+start executing the intent or call the LLM. LLM and TTS are not run.
+
+Labels (optional): Audacity label track exported as <name>.labels,
+"start<TAB>end<TAB>text" per region. A region labelled "wake" is the
+wake word; the other regions are the command speech. One command per
+file is assumed for the labelled metrics.
+
+Per utterance it reports:
+  time_to_wake  wake fired minus end of the "wake" label
+  endpoint      recording finalized minus end of labelled speech
+  stt           wall time of the STT call
+  reply         finalize event -> reply ready (trim + STT + intent)
+  total         end of labelled speech -> reply ready (endpoint + reply)
+
+Examples:
+    python Scripts/replay_pipeline.py samples/*.wav --wake stub --stt stub
+    python Scripts/replay_pipeline.py samples/*.wav --stt whisper --speed 0 --json out.json
+"""
+
+import argparse
+import json
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.audio.file_stream import FileInputStream
+from core.audio.frame_processor import (
+    EVENT_COMMAND,
+    EVENT_ERROR,
+    EVENT_WAKE,
+    FrameProcessor,
+    make_audio_callback,
+)
+from core.audio.frame_ring import FrameRing
+from core.audio.front_end import FrontEnd, FrontEndConfig
+from core.audio.recorder import SpeechRecorder
+from core.audio.session_manager import (
+    STATE_COOLDOWN,
+    STATE_IDLE,
+    STATE_PROCESSING,
+    SessionConfig,
+    SessionManager,
+)
+from core.audio.trim import find_speech
+from core.intent.normalize import strip_wake_prefix
+from core.intent.pipeline import process_command
+
+SAMPLE_RATE = int(os.getenv("AUDIO_INPUT_SAMPLE_RATE", "16000"))
+FRAME_SIZE = int(os.getenv("AUDIO_FRAME_SIZE", "512"))
+CHANNELS = int(os.getenv("AUDIO_INPUT_CHANNELS", "2"))
+
+
+@dataclass
+class Utterance:
+    request_id: str
+    file: str
+    source: str
+    wake_s: float
+    time_to_wake_ms: float | None = None
+    endpoint_s: float | None = None
+    endpoint_reason: str | None = None
+    endpoint_ms: float | None = None
+    trimmed_s: float | None = None
+    stt_ms: float | None = None
+    reply_ms: float | None = None
+    total_ms: float | None = None
+    text: str | None = None
+    intent: str | None = None
+    command: str | None = None
+    notes: list = field(default_factory=list)
+
+
+class StampedEvents:
+    """FrameProcessor event queue that records the stream time of each put()."""
+
+    def __init__(self):
+        self._q = queue.SimpleQueue()
+        self.clock = lambda: 0.0
+
+    def put(self, item) -> None:
+        self._q.put((item, self.clock(), time.monotonic()))
+
+    def get(self, timeout: float | None = None):
+        return self._q.get(timeout=timeout)
+
+    def empty(self) -> bool:
+        return self._q.empty()
+
+
+class StubWakeWord:
+    """
+    Fires once the stream passes each wake time. process_audio() is only
+    called while IDLE/SPEAKING, so the position comes from `clock`.
+    """
+
+    def __init__(self, wake_seconds: list[float], clock):
+        self.wake_seconds = sorted(wake_seconds)
+        self.clock = clock
+        self._next = 0
+
+    def process_audio(self, pcm) -> bool:
+        if self._next < len(self.wake_seconds) and self.clock() >= self.wake_seconds[self._next]:
+            self._next += 1
+            return True
+        return False
+
+
+def load_labels(wav: Path) -> list[tuple[float, float, str]]:
+    path = wav.with_suffix(".labels")
+    if not path.exists():
+        return []
+    regions = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        parts = line.strip().split("\t")
+        if len(parts) >= 2:
+            regions.append((float(parts[0]), float(parts[1]), parts[2] if len(parts) > 2 else ""))
+    return sorted(regions)
+
+
+def _file_at(stream: FileInputStream, seconds: float) -> tuple[Path, float]:
+    """(file, file start in stream seconds) containing stream time `seconds`."""
+    current = stream.file_starts[0]
+    for path, start in stream.file_starts:
+        if start / SAMPLE_RATE <= seconds:
+            current = (path, start)
+    return current[0], current[1] / SAMPLE_RATE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1.0 real time, >1 faster, 0 = as fast as processing allows")
+    parser.add_argument("--wake", choices=("stub", "porcupine"), default="stub")
+    parser.add_argument("--wake-at", type=str, default="",
+                        help="stub wake times in seconds into each file, comma separated")
+    parser.add_argument("--stt", choices=("stub", "whisper"), default="stub")
+    parser.add_argument("--stub-stt-ms", type=float, default=0.0)
+    parser.add_argument("--no-trim", action="store_true")
+    parser.add_argument("--vad", choices=("simple", "adaptive"), default=None)
+    parser.add_argument("--gap", type=float, default=1.5, help="silence between files (s)")
+    parser.add_argument("--json", type=Path, help="write per-utterance results here")
+    args = parser.parse_args()
+
+    fps = SAMPLE_RATE / FRAME_SIZE
+    post_wake = float(os.getenv("AUDIO_POST_WAKE_SECONDS", "1.2"))
+    max_utterance = float(os.getenv("AUDIO_MAX_UTTERANCE_SECONDS", "8.0"))
+    preroll = float(os.getenv("AUDIO_PREROLL_SECONDS", "1.0"))
+
+    session = SessionManager(
+        SessionConfig.from_seconds(
+            fps,
+            post_wake=post_wake,
+            speech_start_timeout=float(os.getenv("AUDIO_SPEECH_START_TIMEOUT_SECONDS", "2.5")),
+            max_utterance=max_utterance,
+            cooldown=float(os.getenv("AUDIO_COOLDOWN_SECONDS", "0.5")),
+        )
+    )
+    config = FrontEndConfig(sample_rate=SAMPLE_RATE, frame_size=FRAME_SIZE)
+    if args.vad:
+        config.vad_impl = args.vad
+    front_end = FrontEnd(config)
+    recorder = SpeechRecorder(
+        sample_rate=SAMPLE_RATE,
+        min_duration=float(os.getenv("AUDIO_MIN_RECORD_SECONDS", "0.60")),
+        capacity_seconds=max_utterance + preroll,
+    )
+    events = StampedEvents()
+    processor = FrameProcessor(front_end, session, recorder, events=events)
+    events.clock = lambda: (processor.processed + 1) * FRAME_SIZE / SAMPLE_RATE
+
+    ring = FrameRing(slots=max(2, int(2.0 * fps)), frame_size=FRAME_SIZE, channels=CHANNELS)
+    stream = FileInputStream(
+        args.files,
+        samplerate=SAMPLE_RATE,
+        channels=CHANNELS,
+        blocksize=FRAME_SIZE,
+        callback=make_audio_callback(processor, ring),
+        speed=args.speed,
+        gap_seconds=args.gap,
+        # --speed 0: hold the stream while an utterance is being processed,
+        # so results do not depend on how fast this machine runs STT.
+        ready=lambda: (
+            ring.depth() < ring.slots - 1
+            and events.empty()
+            and session.get_state() != STATE_PROCESSING
+        ),
+    )
+
+    labels = {path: load_labels(path) for path, _ in stream.file_starts}
+
+    if args.wake == "porcupine":
+        from core.audio.wake_word import WakeWordEngine
+
+        processor.wake_word = WakeWordEngine(
+            keyword=os.getenv("AUDIO_WAKE_WORD", "hey-clarity"),
+            sensitivity=float(os.getenv("AUDIO_WAKE_SENSITIVITY", "0.58")),
+        )
+    else:
+        wake_at = [float(x) for x in args.wake_at.split(",") if x.strip()]
+        times = []
+        for path, start in stream.file_starts:
+            offsets = wake_at or [end for _, end, text in labels[path] if text == "wake"]
+            times.extend(start / SAMPLE_RATE + t for t in offsets)
+        if not times:
+            sys.exit("Stub wake needs --wake-at or 'wake' regions in .labels files")
+        processor.wake_word = StubWakeWord(times, events.clock)
+
+    stt = None
+    if args.stt == "whisper":
+        import numpy as np
+        from core.audio.stt import SpeechToText
+
+        stt = SpeechToText()
+        stt.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32))  # warm-up
+
+    utterances: dict[str, Utterance] = {}
+    results: list[Utterance] = []
+
+    def handle(event, stream_s: float, wall: float) -> None:
+        kind = event[0]
+        if kind == EVENT_WAKE:
+            _, source, rid, _ = event
+            path, file_start = _file_at(stream, stream_s)
+            utt = Utterance(rid, path.name, source, round(stream_s - file_start, 3))
+            wakes = [end for _, end, text in labels[path] if text == "wake"]
+            if wakes:
+                utt.time_to_wake_ms = round((utt.wake_s - wakes[0]) * 1000, 1)
+            utterances[rid] = utt
+            results.append(utt)
+            return
+
+        if kind == EVENT_ERROR:
+            print(f"[error] {event[1]} | {event[2]}")
+            return
+
+        rid = event[2]
+        utt = utterances.get(rid)
+        if utt is None:
+            return
+        path, file_start = _file_at(stream, stream_s)
+        utt.endpoint_s = round(stream_s - file_start, 3)
+        speech = [end for _, end, text in labels[path] if text != "wake"]
+
+        if kind == EVENT_COMMAND:
+            utt.command = event[1]
+            utt.endpoint_reason = "command"
+            utt.reply_ms = round((time.monotonic() - wall) * 1000, 1)
+        else:
+            utt.endpoint_reason = event[1]
+            audio = recorder.finish()
+            if audio is None:
+                utt.notes.append("too_short")
+                session.set_cooldown()
+                return
+
+            start, end = 0, len(audio)
+            if not args.no_trim:
+                trim = find_speech(
+                    audio, SAMPLE_RATE, FRAME_SIZE,
+                    config.speech_threshold, config.silence_threshold,
+                )
+                start, end = trim.start, trim.end
+                utt.trimmed_s = round(trim.saved_seconds, 3)
+
+            t0 = time.monotonic()
+            if stt is not None:
+                text = stt.transcribe(audio[start:end])
+            else:
+                time.sleep(args.stub_stt_ms / 1000)
+                ref = path.with_suffix(".txt")
+                text = ref.read_text(encoding="utf-8").strip() if ref.exists() else ""
+            utt.stt_ms = round((time.monotonic() - t0) * 1000, 1)
+
+            utt.text = strip_wake_prefix(text)
+            if utt.text:
+                result = process_command(utt.text)
+                utt.intent = result["intent"] if result["safe"] else None
+            utt.reply_ms = round((time.monotonic() - wall) * 1000, 1)
+
+        if speech:
+            utt.endpoint_ms = round((utt.endpoint_s - speech[-1]) * 1000, 1)
+            utt.total_ms = round(utt.endpoint_ms + utt.reply_ms, 1)
+        session.set_cooldown()
+
+    threading.Thread(target=processor.run, args=(ring,), daemon=True, name="audio-processing").start()
+
+    started = time.monotonic()
+    with stream:
+        while True:
+            try:
+                item, stream_s, wall = events.get(timeout=0.05)
+                handle(item, stream_s, wall)
+                continue
+            except queue.Empty:
+                pass
+            if (
+                stream.finished.is_set()
+                and ring.depth() == 0
+                and session.get_state() in (STATE_IDLE, STATE_COOLDOWN)
+            ):
+                break
+    elapsed = time.monotonic() - started
+
+    print(
+        f"replayed {stream.duration:.1f} s of audio in {elapsed:.1f} s "
+        f"(speed={args.speed}, wake={args.wake}, stt={args.stt}, vad={config.vad_impl}, "
+        f"ring overruns={ring.overruns})"
+    )
+    columns = ("file", "wake_s", "time_to_wake_ms", "endpoint_reason", "endpoint_ms",
+               "trimmed_s", "stt_ms", "reply_ms", "total_ms", "intent")
+    print("  ".join(columns))
+    for u in results:
+        row = asdict(u)
+        print("  ".join("-" if row[c] is None else str(row[c]) for c in columns)
+              + (f"  [{u.command}]" if u.command else "")
+              + (f"  {' '.join(u.notes)}" if u.notes else ""))
+
+    for metric in ("time_to_wake_ms", "endpoint_ms", "stt_ms", "reply_ms", "total_ms"):
+        values = [getattr(u, metric) for u in results if getattr(u, metric) is not None]
+        if values:
+            print(f"{metric:<16} mean {statistics.fmean(values):>8.1f}  max {max(values):>8.1f}  n={len(values)}")
+
+    if args.json:
+        args.json.write_text(json.dumps([asdict(u) for u in results], indent=2), encoding="utf-8")
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import math
+
+import numpy as np
+
+
+class AdaptiveVAD:
+    """
+    Noise-floor relative VAD with hysteresis.
+
+    Per frame it measures three features:
+    - energy: RMS in dB (int16 units), compared with a learned noise floor
+    - zero-crossing rate: fraction of sign changes (voiced speech is low,
+      hiss and fans are high)
+    - band-energy ratio: share of (Hann-windowed) energy in the speech
+      band, 300-3400 Hz by default
+
+    Two noise floors are learned with observe_noise() while the session
+    is IDLE, as the minimum level over the last `floor_window_seconds`
+    (minimum statistics: a wake word or a door slam shorter than the
+    window does not lift the floor, a new fan does once it has run for
+    the window), and may also fall while listening: the full-band level
+    and the in-band level (level plus band ratio, in dB). Speech starts on a frame whose in-band level is
+    `speech_snr_db` above its floor with a voiced ZCR, so hum and hiss
+    outside the band do not count. Speech continues while either level
+    stays `silence_snr_db` above its floor (fricatives sit above the
+    band) and ends after `trailing_silence_frames` quieter frames, like
+    SimpleVAD.
+
+    The band energy comes from a precomputed DFT basis for the band's
+    bins (one matmul per frame), and all per-frame work goes into
+    preallocated scratch arrays, so nothing is allocated per frame.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_size: int = 512,
+        speech_snr_db: float = 10.0,
+        silence_snr_db: float = 5.0,
+        trailing_silence_frames: int = 22,
+        max_zcr: float = 0.35,
+        band_hz: tuple[float, float] = (300.0, 3400.0),
+        initial_floor: float = 120.0,
+        min_floor: float = 30.0,
+        floor_window_seconds: float = 3.0,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.speech_snr_db = speech_snr_db
+        self.silence_snr_db = silence_snr_db
+        self.trailing_silence_frames = trailing_silence_frames
+        self.max_zcr = max_zcr
+        self.band_hz = band_hz
+        self.min_floor_db = _db(min_floor)
+
+        self.floor_db = max(_db(initial_floor), self.min_floor_db)
+        self.floor_band_db = self.floor_db
+
+        # Recent IDLE levels (dB); +inf until filled so min() only sees real frames.
+        window = max(1, int(floor_window_seconds * sample_rate / frame_size))
+        self._levels = np.full(window, np.inf)
+        self._band_levels = np.full(window, np.inf)
+        self._level_pos = 0
+
+        self._in_speech = False
+        self._silence_count = 0
+
+        # Last frame's features, for logging and offline evaluation.
+        self.last_db = 0.0
+        self.last_zcr = 0.0
+        self.last_band_ratio = 0.0
+
+        self._build(frame_size)
+
+    def _build(self, n: int) -> None:
+        self._n = n
+        self._window = np.hanning(n).astype(np.float32)
+        self._x = np.zeros(n, dtype=np.float32)
+        self._xw = np.zeros(n, dtype=np.float32)
+        self._signs = np.zeros(n, dtype=bool)
+        self._changes = np.zeros(max(0, n - 1), dtype=bool)
+
+        lo_hz, hi_hz = self.band_hz
+        bins = np.arange(n // 2 + 1)
+        freqs = bins * self.sample_rate / n
+        band = bins[(freqs >= lo_hz) & (freqs <= hi_hz)]
+        t = np.arange(n)[:, None]
+        angle = 2.0 * np.pi * t * band[None, :] / n
+        # [cos | sin] for the band bins: |X_k|^2 = (x.cos_k)^2 + (x.sin_k)^2
+        self._basis = np.hstack([np.cos(angle), np.sin(angle)]).astype(np.float32)
+        self._proj = np.zeros(self._basis.shape[1], dtype=np.float32)
+
+    def reset(self):
+        """Start of a new utterance. The learned noise floor is kept."""
+        self._in_speech = False
+        self._silence_count = 0
+
+    # ── Features ──────────────────────────────────────────────────────────────
+
+    def _features(self, frame: np.ndarray) -> tuple[float, float, float]:
+        """(level dB, zero-crossing rate, in-band level dB) of one frame."""
+        n = frame.shape[0]
+        if n == 0:
+            return self.min_floor_db, 0.0, self.min_floor_db
+        if n != self._n:
+            # Only happens if the stream delivers a non-default blocksize.
+            self._build(n)
+
+        x = self._x
+        np.copyto(x, frame, casting="unsafe")
+        energy = float(np.dot(x, x))
+        level_db = _db(math.sqrt(energy / n))
+
+        np.signbit(x, out=self._signs)
+        np.not_equal(self._signs[1:], self._signs[:-1], out=self._changes)
+        zcr = np.count_nonzero(self._changes) / max(1, n - 1)
+
+        xw = self._xw
+        np.multiply(x, self._window, out=xw)
+        windowed = float(np.dot(xw, xw))
+        if windowed > 0.0:
+            np.matmul(xw, self._basis, out=self._proj)
+            # Parseval for a one-sided spectrum: sum|X_k|^2 ~ n/2 * sum(x^2)
+            band_ratio = float(np.dot(self._proj, self._proj)) / (0.5 * n * windowed)
+            band_ratio = min(1.0, band_ratio)
+        else:
+            band_ratio = 0.0
+
+        self.last_db = level_db
+        self.last_zcr = zcr
+        self.last_band_ratio = band_ratio
+        band_db = level_db + 10.0 * math.log10(max(band_ratio, 1e-6))
+        return level_db, zcr, band_db
+
+    def _lower_floor(self, level_db: float, band_db: float) -> None:
+        if level_db < self.floor_db:
+            self.floor_db = max(self.min_floor_db, level_db)
+        if band_db < self.floor_band_db:
+            self.floor_band_db = max(self.min_floor_db, band_db)
+
+    # ── FrontEnd interface ────────────────────────────────────────────────────
+
+    def observe_noise(self, frame: np.ndarray) -> None:
+        """Learn the noise floor from a frame known not to be a command (IDLE)."""
+        level_db, _, band_db = self._features(frame)
+        pos = self._level_pos
+        self._levels[pos] = level_db
+        self._band_levels[pos] = band_db
+        self._level_pos = (pos + 1) % self._levels.shape[0]
+        self.floor_db = max(self.min_floor_db, float(self._levels.min()))
+        self.floor_band_db = max(self.min_floor_db, float(self._band_levels.min()))
+
+    def rms_thresholds(self) -> tuple[float, float]:
+        """
+        (speech, silence) levels in int16 RMS units: the full-band noise
+        floor plus speech_snr_db / silence_snr_db.
+        """
+        return (
+            10.0 ** ((self.floor_db + self.speech_snr_db) / 20.0),
+            10.0 ** ((self.floor_db + self.silence_snr_db) / 20.0),
+        )
+
+    def energy(self, frame: np.ndarray) -> float:
+        """SNR of `frame` over the noise floor, in dB."""
+        level_db, _, _ = self._features(frame)
+        return level_db - self.floor_db
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        level_db, zcr, band_db = self._features(frame)
+        snr_db = level_db - self.floor_db
+        band_snr_db = band_db - self.floor_band_db
+
+        if not self._in_speech:
+            # Quiet gaps before speech can only pull the floors down.
+            self._lower_floor(level_db, band_db)
+            if band_snr_db >= self.speech_snr_db and zcr <= self.max_zcr:
+                self._in_speech = True
+                self._silence_count = 0
+                return True
+            return False
+
+        # already in speech: energy alone keeps it going (fricatives have high ZCR)
+        if snr_db < self.silence_snr_db and band_snr_db < self.silence_snr_db:
+            self._silence_count += 1
+        else:
+            self._silence_count = 0
+
+        if self._silence_count >= self.trailing_silence_frames:
+            self._in_speech = False
+            return False
+
+        return True
+
+
+def _db(rms: float) -> float:
+    return 20.0 * math.log10(max(rms, 1e-3))
@@ -0,0 +1,324 @@
+"""
+command_spotter.py — SafeBox on-device command spotting
+
+Recognises a small fixed command set (stop, pause, volume up/down,
+next) in the first seconds after wake, so those commands act at once
+instead of waiting for Whisper and the intent pipeline.
+
+Two backends, both fed one ASR frame at a time by FrameProcessor:
+
+- PorcupineCommandSpotter: a second Porcupine instance over keyword
+  files models/commands/<command>_raspberry-pi.ppn (e.g.
+  volume-up_raspberry-pi.ppn). Per-frame native call, like wake word.
+- TemplateCommandSpotter: enrolled example WAVs under
+  models/commands/<command>/*.wav, matched with DTW over log filterbank
+  features once the first short burst of speech ends.
+
+create_command_spotter() picks whichever has models on disk
+(AUDIO_COMMAND_SPOTTER=auto), or None, in which case every utterance
+goes through STT as before.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+from core.logger import get_logger
+
+log = get_logger("command_spotter")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+COMMAND_MODEL_PATH = Path(
+    os.getenv("AUDIO_COMMAND_MODEL_DIR", str(PROJECT_ROOT / "models" / "commands"))
+)
+
+AUDIO_COMMAND_SPOTTER = os.getenv("AUDIO_COMMAND_SPOTTER", "auto").strip().lower()
+AUDIO_COMMAND_SENSITIVITY = float(os.getenv("AUDIO_COMMAND_SENSITIVITY", "0.6"))
+AUDIO_COMMAND_TEMPLATE_THRESHOLD = float(os.getenv("AUDIO_COMMAND_TEMPLATE_THRESHOLD", "0.35"))
+
+# Spotted command -> executor intent
+COMMAND_STOP = "stop"
+COMMAND_PAUSE = "pause"
+COMMAND_VOLUME_UP = "volume-up"
+COMMAND_VOLUME_DOWN = "volume-down"
+COMMAND_NEXT = "next"
+
+COMMANDS = {
+    COMMAND_STOP: "STOP",
+    COMMAND_PAUSE: "PAUSE_MUSIC",
+    COMMAND_VOLUME_UP: "VOLUME_UP",
+    COMMAND_VOLUME_DOWN: "VOLUME_DOWN",
+    COMMAND_NEXT: "NEXT_TRACK",
+}
+
+
+class PorcupineCommandSpotter:
+    def __init__(self, sensitivity: float = AUDIO_COMMAND_SENSITIVITY):
+        import pvporcupine
+
+        self.commands = [
+            c for c in COMMANDS
+            if (COMMAND_MODEL_PATH / f"{c}_raspberry-pi.ppn").exists()
+        ]
+        if not self.commands:
+            raise FileNotFoundError(f"No command keyword files in {COMMAND_MODEL_PATH}")
+
+        access_key = os.environ.get("PICOVOICE_ACCESS_KEY")
+        if not access_key:
+            raise EnvironmentError("PICOVOICE_ACCESS_KEY is not set")
+
+        self.porcupine = pvporcupine.create(
+            access_key=access_key,
+            keyword_paths=[
+                str(COMMAND_MODEL_PATH / f"{c}_raspberry-pi.ppn") for c in self.commands
+            ],
+            sensitivities=[sensitivity] * len(self.commands),
+        )
+        log.info(f"command_spotter.porcupine.init commands={self.commands}")
+
+    def reset(self) -> None:
+        pass
+
+    def process(self, pcm: np.ndarray) -> str | None:
+        # Runs on the audio path: no logging here.
+        index = self.porcupine.process(pcm)
+        return self.commands[index] if index >= 0 else None
+
+    def cleanup(self) -> None:
+        if getattr(self, "porcupine", None) is not None:
+            self.porcupine.delete()
+            self.porcupine = None
+
+    def __del__(self):
+        self.cleanup()
+
+
+class TemplateCommandSpotter:
+    """
+    DTW template matcher.
+
+    Each frame gets a log filterbank vector written into a preallocated
+    feature buffer. A burst starts on a frame above `speech_threshold`
+    (RMS, like SimpleVAD) and ends after `end_frames` frames below
+    `silence_threshold`; if it lasted between `min_seconds` and
+    `max_seconds` it is compared with every template and the best
+    command is returned when its normalised DTW distance is under
+    `threshold`. Only the first burst after wake is considered.
+    """
+
+    def __init__(
+        self,
+        templates: dict[str, list[np.ndarray]],
+        sample_rate: int = 16000,
+        frame_size: int = 512,
+        speech_threshold: float = 260.0,
+        silence_threshold: float = 180.0,
+        threshold: float = AUDIO_COMMAND_TEMPLATE_THRESHOLD,
+        min_seconds: float = 0.15,
+        max_seconds: float = 1.2,
+        end_frames: int = 6,
+        n_bands: int = 20,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.speech_threshold = speech_threshold
+        self.silence_threshold = silence_threshold
+        self.threshold = threshold
+        frame_seconds = frame_size / sample_rate
+        self.min_frames = max(1, int(min_seconds / frame_seconds))
+        self.max_frames = max(self.min_frames, int(max_seconds / frame_seconds))
+        self.end_frames = end_frames
+
+        # The windowed DFT of the bins the filterbank uses, as one
+        # [cos | sin] matrix, so a frame's power spectrum is a matmul into
+        # preallocated scratch (np.fft.rfft allocates its result).
+        filters = _filterbank(n_bands, frame_size, sample_rate)
+        bins = np.flatnonzero(filters.any(axis=0))
+        self._filters = np.ascontiguousarray(filters[:, bins])
+        angle = 2.0 * np.pi * np.arange(frame_size)[:, None] * bins[None, :] / frame_size
+        window = np.hanning(frame_size)[:, None]
+        self._basis = (window * np.hstack([np.cos(angle), -np.sin(angle)])).astype(np.float32)
+        self._proj = np.zeros(self._basis.shape[1], dtype=np.float32)
+        self._power = np.zeros(bins.shape[0], dtype=np.float32)
+        self._bands = np.zeros(n_bands, dtype=np.float32)
+        self._x = np.zeros(frame_size, dtype=np.float32)
+        self._features = np.zeros((self.max_frames + end_frames, n_bands), dtype=np.float32)
+
+        self.templates = {
+            command: [self._normalise(self._extract(t)) for t in examples if len(t)]
+            for command, examples in templates.items()
+        }
+        self.templates = {c: t for c, t in self.templates.items() if t}
+        if not self.templates:
+            raise ValueError("TemplateCommandSpotter needs at least one template")
+        self.reset()
+
+    @classmethod
+    def from_directory(cls, directory: Path = COMMAND_MODEL_PATH, **kwargs):
+        import soundfile as sf
+
+        templates: dict[str, list[np.ndarray]] = {}
+        for command in COMMANDS:
+            for wav in sorted((directory / command).glob("*.wav")):
+                audio, _ = sf.read(str(wav), dtype="int16", always_2d=True)
+                templates.setdefault(command, []).append(audio[:, 0])
+        if not templates:
+            raise FileNotFoundError(f"No command templates in {directory}")
+        spotter = cls(templates, **kwargs)
+        log.info(
+            "command_spotter.template.init "
+            + " ".join(f"{c}={len(t)}" for c, t in spotter.templates.items())
+        )
+        return spotter
+
+    def reset(self) -> None:
+        self._count = 0
+        self._silent = 0
+        self._active = False
+        self._done = False
+
+    def process(self, pcm: np.ndarray) -> str | None:
+        if self._done or pcm.shape[0] != self.frame_size:
+            return None
+
+        x = self._x
+        np.copyto(x, pcm, casting="unsafe")
+        rms = float(np.sqrt(np.dot(x, x) / x.shape[0]))
+
+        if not self._active:
+            if rms < self.speech_threshold:
+                return None
+            self._active = True
+
+        self._silent = self._silent + 1 if rms < self.silence_threshold else 0
+        if self._count < self._features.shape[0]:
+            self._frame_features(x, self._features[self._count])
+            self._count += 1
+
+        voiced = self._count - self._silent
+        if voiced > self.max_frames:
+            self._done = True  # too long for a command; leave it to STT
+            return None
+        if self._silent < self.end_frames:
+            return None
+
+        self._done = True
+        if voiced < self.min_frames:
+            return None
+        return self.match(self._features[:voiced])
+
+    def match(self, features: np.ndarray) -> str | None:
+        observed = self._normalise(features)
+        best_command, best = None, np.inf
+        for command, examples in self.templates.items():
+            for template in examples:
+                d = _dtw_distance(observed, template)
+                if d < best:
+                    best_command, best = command, d
+        return best_command if best <= self.threshold else None
+
+    # ── Features ──────────────────────────────────────────────────────────────
+
+    def _frame_features(self, x: np.ndarray, out: np.ndarray) -> None:
+        """Log filterbank energies of one frame into `out`; allocates nothing."""
+        proj, power, bands = self._proj, self._power, self._bands
+        np.matmul(x, self._basis, out=proj)
+        np.square(proj, out=proj)
+        np.add(proj[: power.shape[0]], proj[power.shape[0]:], out=power)
+        np.matmul(self._filters, power, out=bands)
+        bands += 1e-6
+        np.log(bands, out=out)
+
+    def _extract(self, audio: np.ndarray) -> np.ndarray:
+        """Features of the voiced part of a template recording."""
+        n = len(audio) // self.frame_size
+        frames = audio[: n * self.frame_size].reshape(n, self.frame_size).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        voiced = np.flatnonzero(rms >= self.silence_threshold)
+        if voiced.size:
+            frames = frames[voiced[0]: voiced[-1] + 1]
+        out = np.zeros((len(frames), self._filters.shape[0]), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            self._frame_features(frame, out[i])
+        return out
+
+    @staticmethod
+    def _normalise(features: np.ndarray) -> np.ndarray:
+        # Mean/variance normalisation per band removes level and channel effects.
+        centred = features - features.mean(axis=0)
+        return centred / (features.std() + 1e-6)
+
+
+def _filterbank(n_bands: int, frame_size: int, sample_rate: int) -> np.ndarray:
+    """Triangular filters evenly spaced on the mel scale, 100 Hz - 7 kHz."""
+    def mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+
+    def hz(m):
+        return 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+
+    edges = hz(np.linspace(mel(100.0), mel(min(7000.0, sample_rate / 2)), n_bands + 2))
+    freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+    bank = np.zeros((n_bands, freqs.shape[0]), dtype=np.float32)
+    for i in range(n_bands):
+        lo, mid, hi = edges[i], edges[i + 1], edges[i + 2]
+        rising = (freqs - lo) / (mid - lo)
+        falling = (hi - freqs) / (hi - mid)
+        bank[i] = np.clip(np.minimum(rising, falling), 0.0, None)
+    return bank
+
+
+def _dtw_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    DTW from a[0]~b[0] to a[-1]~b[-1] with steps (1,0), (1,1), (1,2),
+    so each row of the cost matrix only depends on the previous one and
+    is computed vectorised. Normalised by len(a).
+    """
+    cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).mean(axis=2))
+    n, m = cost.shape
+    prev = np.full(m, np.inf)
+    prev[0] = cost[0, 0]
+    for i in range(1, n):
+        best = prev.copy()
+        best[1:] = np.minimum(best[1:], prev[:-1])
+        best[2:] = np.minimum(best[2:], prev[:-2])
+        prev = cost[i] + best
+    return float(prev[-1] / n)
+
+
+def create_command_spotter(
+    kind: str = AUDIO_COMMAND_SPOTTER,
+    *,
+    sample_rate: int = 16000,
+    frame_size: int = 512,
+    speech_threshold: float = 260.0,
+    silence_threshold: float = 180.0,
+):
+    """Build the configured spotter, or None if it is off or has no models."""
+    if kind in ("off", "none", "false", ""):
+        return None
+
+    if kind in ("auto", "porcupine"):
+        try:
+            return PorcupineCommandSpotter()
+        except Exception as e:
+            if kind == "porcupine":
+                log.warning(f"command_spotter.porcupine.unavailable | {e}")
+                return None
+
+    if kind in ("auto", "template"):
+        try:
+            return TemplateCommandSpotter.from_directory(
+                sample_rate=sample_rate,
+                frame_size=frame_size,
+                speech_threshold=speech_threshold,
+                silence_threshold=silence_threshold,
+            )
+        except Exception as e:
+            if kind == "template":
+                log.warning(f"command_spotter.template.unavailable | {e}")
+            return None
+
+    log.warning(f"command_spotter.unknown_kind | {kind!r}")
+    return None
@@ -0,0 +1,135 @@
+"""
+file_stream.py — WAV replay source for the SafeBox audio pipeline
+
+FileInputStream stands in for the part of sounddevice.InputStream that
+mic_stream uses: it is a context manager that calls
+`callback(indata, frames, time_info, status)` with int16 blocks of
+`blocksize` frames from a background thread. The audio comes from WAV
+files instead of the ReSpeaker, so the real callback, FrameRing,
+FrameProcessor, SessionManager and SpeechRecorder run unchanged on a
+machine without the array attached.
+
+Files must already be at `samplerate`. Mono files are copied to every
+channel (so the ASR channel gets the audio); extra channels are
+dropped. Files are joined with `gap_seconds` of silence and followed by
+`tail_seconds` so the last utterance can reach its endpoint.
+
+Pacing: `speed=1.0` is real time, 4.0 four times faster. `speed=0`
+delivers blocks as fast as `ready()` allows, which lets a benchmark run
+flat out without overflowing the consumer's ring.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import soundfile as sf
+
+
+def load_replay_audio(path: str | Path, samplerate: int, channels: int) -> np.ndarray:
+    audio, sr = sf.read(str(path), dtype="int16", always_2d=True)
+    if sr != samplerate:
+        raise ValueError(f"{path}: sample rate {sr} != {samplerate}")
+    if audio.shape[1] < channels:
+        fill = np.repeat(audio[:, -1:], channels - audio.shape[1], axis=1)
+        audio = np.hstack([audio, fill])
+    return np.ascontiguousarray(audio[:, :channels])
+
+
+class FileInputStream:
+    def __init__(
+        self,
+        paths: list[str | Path],
+        *,
+        samplerate: int,
+        channels: int,
+        blocksize: int,
+        callback: Callable,
+        speed: float = 1.0,
+        gap_seconds: float = 1.0,
+        tail_seconds: float = 2.0,
+        ready: Callable[[], bool] | None = None,
+    ):
+        if not paths:
+            raise ValueError("FileInputStream needs at least one file")
+
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.callback = callback
+        self.speed = speed
+        self.ready = ready
+
+        gap = np.zeros((int(gap_seconds * samplerate), channels), dtype=np.int16)
+        parts = []
+        # (path, first sample in the stream) for mapping stream time back to files
+        self.file_starts: list[tuple[Path, int]] = []
+        offset = 0
+        for i, path in enumerate(paths):
+            if i:
+                parts.append(gap)
+                offset += len(gap)
+            audio = load_replay_audio(path, samplerate, channels)
+            self.file_starts.append((Path(path), offset))
+            parts.append(audio)
+            offset += len(audio)
+        parts.append(np.zeros((int(tail_seconds * samplerate), channels), dtype=np.int16))
+        self._audio = np.concatenate(parts)
+
+        self.position = 0  # samples delivered so far
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def duration(self) -> float:
+        return len(self._audio) / self.samplerate
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self.finished.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="file-input-stream")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    close = stop
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        block_seconds = self.blocksize / self.samplerate
+        started = time.monotonic()
+        n_blocks = len(self._audio) // self.blocksize
+
+        for k in range(n_blocks):
+            if self._stop.is_set():
+                break
+
+            if self.speed > 0:
+                delay = started + k * block_seconds / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            elif self.ready is not None:
+                while not self.ready() and not self._stop.is_set():
+                    time.sleep(0.0005)
+
+            block = self._audio[k * self.blocksize:(k + 1) * self.blocksize]
+            self.callback(block, self.blocksize, None, None)
+            self.position = (k + 1) * self.blocksize
+
+        self.finished.set()
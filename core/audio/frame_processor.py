@@ -0,0 +1,361 @@
+"""
+frame_processor.py — SafeBox per-frame audio path
+
+Everything that has to happen for each 32 ms input block lives here:
+ASR channel selection, pre-roll, manual trigger / wake detection, VAD
+and the SessionManager transitions that follow from them.
+
+THREADING:
+    The PortAudio callback only copies blocks into a FrameRing. run()
+    is the body of the dedicated audio-processing thread: it drains the
+    ring in order and calls process() for each block, so a slow
+    Porcupine or VAD call backs up the ring instead of overflowing the
+    input stream.
+
+HOT PATH RULES:
+    process() runs once per input block. On the steady-state path it
+    makes no filesystem or logging calls and allocates no NumPy buffers:
+    the ASR channel is copied into a reused scratch frame, pre-roll and
+    recording are preallocated circular buffers (the pre-roll is copied
+    straight into the recorder at wake) and session state is read once
+    per frame via a reused SessionSnapshot.
+
+    Other threads can only ask for a finalize via request_endpoint()
+    (streaming STT early endpointing); process() picks it up on the
+    next frame.
+
+    Anything that needs I/O (log lines, "Listening." prompts, barge-in
+    stop_audio(), saving the recording) is posted to `events` and
+    handled by a separate thread — see mic_stream.audio_event_worker().
+
+EVENTS (tuples on `events`):
+    (EVENT_WAKE, source, request_id, barge_in)     # source may be SOURCE_FOLLOW_UP
+    (EVENT_FINALIZE, reason, request_id)
+    (EVENT_COMMAND, command, request_id, spotted_at)   # time.monotonic()
+    (EVENT_ERROR, where, exception)
+"""
+
+import queue
+import threading
+import time
+from uuid import uuid4
+
+import numpy as np
+
+from core.audio.frame_ring import FrameRing
+from core.audio.front_end import FrontEnd
+from core.audio.recorder import SpeechRecorder
+from core.audio.session_manager import (
+    STATE_FOLLOW_UP,
+    STATE_IDLE,
+    STATE_LISTENING,
+    STATE_SPEAKING,
+    SessionManager,
+    SessionSnapshot,
+)
+
+EVENT_WAKE = "wake"
+EVENT_FINALIZE = "finalize"
+EVENT_ERROR = "error"
+EVENT_COMMAND = "command"
+
+SOURCE_MANUAL = "manual"
+SOURCE_WAKE_WORD = "wake_word"
+SOURCE_FOLLOW_UP = "follow_up"
+
+
+def make_audio_callback(processor: "FrameProcessor", ring: FrameRing, on_first_block=None):
+    """
+    The PortAudio callback (also driven by file_stream.FileInputStream):
+    copy the block into the ring and return. Everything else runs on
+    the audio-processing thread.
+
+    `on_first_block` runs once, on the callback thread (which PortAudio
+    creates), before the first block is pushed.
+    """
+    first = [on_first_block]
+
+    def audio_callback(indata, frames, time_info, status) -> None:
+        if first[0] is not None:
+            first[0], hook = None, first[0]
+            hook()
+        if status:
+            processor.note_status(status)
+        ring.push(indata)
+
+    return audio_callback
+
+
+class FrameProcessor:
+    """
+    Runs the wake / record / endpoint state machine over input blocks.
+
+    `wake_word` may be None and can be replaced at any time (the main
+    loop retries initialisation). `manual_trigger` is an Event set by a
+    background watcher so the audio path never checks the trigger file;
+    the watcher may first set `manual_request_id` so a trigger from the
+    web UI keeps the device_request_id it was given there. A manual turn
+    records nothing until prompt_finished() says the spoken "Listening."
+    prompt is over, so the prompt never ends up in the utterance; its
+    listening timers start from that point.
+
+    `command_spotter` (optional) sees every frame for the first
+    `command_window_frames` after wake, post-wake grace included. A
+    spotted command ends the recording with EVENT_COMMAND instead of
+    EVENT_FINALIZE, so it never reaches STT.
+
+    In the session's FOLLOW_UP window, `follow_up_speech_frames`
+    consecutive VAD speech frames start a turn without a wake word;
+    the pre-roll keeps the onset of what was said.
+    """
+
+    def __init__(
+        self,
+        front_end: FrontEnd,
+        session: SessionManager,
+        recorder: SpeechRecorder,
+        *,
+        wake_word=None,
+        manual_trigger: threading.Event | None = None,
+        events: queue.SimpleQueue | None = None,
+        command_spotter=None,
+        command_window_frames: int = 0,
+        follow_up_speech_frames: int = 3,
+    ) -> None:
+        self.front_end = front_end
+        self.session = session
+        self.recorder = recorder
+        self.wake_word = wake_word
+        self.manual_trigger = manual_trigger
+        self.events = events if events is not None else queue.SimpleQueue()
+        self.command_spotter = command_spotter
+        self.command_window_frames = command_window_frames
+        self._command_frames_left = 0
+        self.follow_up_speech_frames = max(1, follow_up_speech_frames)
+        self._follow_up_speech = 0
+        self._last_state = STATE_IDLE
+
+        self.request_id: str | None = None
+        self.manual_request_id: str | None = None
+        # Set from other threads by request_endpoint(); read once per frame.
+        self._endpoint_reason: str | None = None
+        # Manual turn waiting for its prompt; prompt_finished() sets _prompt_done.
+        self._prompting = False
+        self._prompt_done: str | None = None
+
+        # Stream status flags (input overflow etc.) are only counted here;
+        # the main loop reports them.
+        self.status_count = 0
+        self.last_status = None
+
+        # Consumer-side stats for run()
+        self.processed = 0
+        self.max_process_ms = 0.0
+
+        self._snapshot = SessionSnapshot()
+
+    def run(
+        self,
+        ring: FrameRing,
+        stop: threading.Event | None = None,
+        poll_seconds: float = 0.005,
+    ) -> None:
+        """Drain `ring` forever (or until `stop` is set). Thread body."""
+        while stop is None or not stop.is_set():
+            block = ring.peek()
+            if block is None:
+                time.sleep(poll_seconds)
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                self.process(block)
+            except Exception as e:
+                self.events.put((EVENT_ERROR, "audio.process_failed", e))
+            finally:
+                ring.release()
+
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            self.processed += 1
+            if elapsed_ms > self.max_process_ms:
+                self.max_process_ms = elapsed_ms
+
+    def stats(self) -> dict:
+        return {
+            "processed": self.processed,
+            "max_process_ms": round(self.max_process_ms, 2),
+            "stream_status_count": self.status_count,
+            "last_stream_status": str(self.last_status) if self.last_status else None,
+        }
+
+    def note_status(self, status) -> None:
+        self.status_count += 1
+        self.last_status = status
+
+    def request_endpoint(self, request_id: str, reason: str) -> None:
+        """Finalize the current recording early if it is still `request_id`."""
+        if request_id == self.request_id:
+            self._endpoint_reason = reason
+
+    def prompt_finished(self, request_id: str) -> None:
+        """The manual trigger's prompt has played; start recording `request_id`."""
+        if request_id == self.request_id:
+            self._prompt_done = request_id
+
+    def process(self, indata: np.ndarray) -> None:
+        if indata is None or len(indata) == 0:
+            return
+
+        snap = self._snapshot
+        self.session.tick(snap)
+
+        speech = self.front_end.speech_frame(indata)
+        self.front_end.push_preroll(speech)
+
+        state = snap.state
+        if state == STATE_IDLE:
+            self.front_end.observe_idle(speech)
+        if state == STATE_IDLE or state == STATE_SPEAKING:
+            self._check_wake(speech, barge_in=state == STATE_SPEAKING)
+        elif state == STATE_LISTENING:
+            self._listen(speech, snap)
+        elif state == STATE_FOLLOW_UP:
+            if self._last_state != STATE_FOLLOW_UP:
+                # VAD state from the previous turn (or TTS bleed) must not
+                # count as the start of the next one.
+                self.front_end.reset_vad()
+                self._follow_up_speech = 0
+            self._check_follow_up(speech)
+        self._last_state = state
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _check_wake(self, speech: np.ndarray, *, barge_in: bool) -> bool:
+        source = None
+        try:
+            trigger = self.manual_trigger
+            if trigger is not None and trigger.is_set():
+                trigger.clear()
+                source = SOURCE_MANUAL
+            elif self.wake_word is not None and self.wake_word.process_audio(speech):
+                source = SOURCE_WAKE_WORD
+        except Exception as e:
+            self.events.put((EVENT_ERROR, "wake.process_failed", e))
+            return False
+
+        if source is None:
+            return False
+
+        request_id = None
+        if source == SOURCE_MANUAL:
+            request_id, self.manual_request_id = self.manual_request_id, None
+        self._start_turn(speech, source, request_id, barge_in)
+        return True
+
+    def _check_follow_up(self, speech: np.ndarray) -> None:
+        # Saying the wake word in the window still works as usual.
+        if self._check_wake(speech, barge_in=False):
+            return
+        if not self.front_end.is_speech(speech):
+            self._follow_up_speech = 0
+            return
+        self._follow_up_speech += 1
+        if self._follow_up_speech >= self.follow_up_speech_frames:
+            self._follow_up_speech = 0
+            self._start_turn(speech, SOURCE_FOLLOW_UP, None, False)
+
+    def _start_turn(
+        self,
+        speech: np.ndarray,
+        source: str,
+        request_id: str | None,
+        barge_in: bool,
+    ) -> None:
+        follow_up = source == SOURCE_FOLLOW_UP
+        self.request_id = request_id or str(uuid4())
+        self._endpoint_reason = None
+        self._prompting = source == SOURCE_MANUAL
+        self._prompt_done = None
+        self._command_frames_left = self.command_window_frames
+        if self.command_spotter is not None:
+            self.command_spotter.reset()
+        if not follow_up:
+            # A follow-up turn keeps the VAD in the speech state it just
+            # detected, so trailing silence ends the recording as usual.
+            self.front_end.reset_vad()
+        if self._prompting:
+            # Nothing from before the trigger, nor the prompt, is wanted.
+            self.recorder.start()
+        else:
+            self.recorder.start(preroll=self.front_end.preroll)
+            self.recorder.add(speech)
+        self.session.start_listening(follow_up=follow_up)
+        self.events.put((EVENT_WAKE, source, self.request_id, barge_in))
+
+    def _listen(self, speech: np.ndarray, snap: SessionSnapshot) -> None:
+        if self._prompting:
+            self._await_prompt(snap)
+            return
+
+        self.recorder.add(speech)
+
+        if self._endpoint_reason is not None:
+            self._finalize(self._endpoint_reason)
+            return
+
+        if self._command_frames_left > 0 and self.command_spotter is not None:
+            self._command_frames_left -= 1
+            try:
+                command = self.command_spotter.process(speech)
+            except Exception as e:
+                self._command_frames_left = 0
+                self.events.put((EVENT_ERROR, "command_spotter.process_failed", e))
+                command = None
+            if command is not None:
+                self._command(command)
+                return
+
+        if snap.post_wake_remaining > 0:
+            return
+
+        speech_active = self.front_end.is_speech(speech)
+        has_seen_speech = snap.has_seen_speech
+        if speech_active and not has_seen_speech:
+            self.session.mark_speech_seen()
+            has_seen_speech = True
+
+        if not has_seen_speech and snap.speech_start_timeout_remaining <= 0:
+            self._finalize("speech_start_timeout")
+        elif has_seen_speech and not speech_active:
+            self._finalize("trailing_silence")
+        elif snap.max_utterance_remaining <= 0:
+            self._finalize("max_utterance")
+
+    def _await_prompt(self, snap: SessionSnapshot) -> None:
+        if self._endpoint_reason is not None:
+            self._finalize(self._endpoint_reason)
+        elif self._prompt_done == self.request_id:
+            # Start the turn over from here: grace, timeouts, VAD, spotter.
+            self._prompting = False
+            self._command_frames_left = self.command_window_frames
+            if self.command_spotter is not None:
+                self.command_spotter.reset()
+            self.front_end.reset_vad()
+            self.session.start_listening()
+        elif snap.max_utterance_remaining <= 0:
+            # The prompt never reported back; do not hold the session forever.
+            self._finalize("prompt_timeout")
+
+    def _command(self, command: str) -> None:
+        self._command_frames_left = 0
+        self.recorder.stop()
+        self.session.set_processing()
+        self.events.put((EVENT_COMMAND, command, self.request_id, time.monotonic()))
+
+    def _finalize(self, reason: str) -> None:
+        self._endpoint_reason = None
+        self._prompting = False
+        self._command_frames_left = 0
+        self.recorder.stop()
+        self.session.set_processing()
+        self.events.put((EVENT_FINALIZE, reason, self.request_id))
@@ -0,0 +1,94 @@
+"""
+frame_ring.py — lock-free SPSC ring between the PortAudio callback and
+the audio-processing thread
+
+The callback (single producer) copies each input block into a
+preallocated slot; the processing thread (single consumer) reads slots
+in order as zero-copy views and releases them when done.
+
+No locks: the producer only writes `_head`, the consumer only writes
+`_tail`, and each is published with a single attribute store after the
+slot data is in place. Under the GIL that store is atomic and ordered
+after the copy, which is all an SPSC ring needs.
+
+When the consumer falls behind and every slot is full, new blocks are
+dropped and counted in `overruns` rather than blocking the callback.
+"""
+
+import numpy as np
+
+
+class FrameRing:
+    def __init__(self, slots: int, frame_size: int, channels: int):
+        if slots < 2:
+            raise ValueError("FrameRing needs at least 2 slots")
+
+        self.slots = slots
+        self.frame_size = frame_size
+        self.channels = channels
+
+        self._data = np.zeros((slots, frame_size, channels), dtype=np.int16)
+        self._lengths = [0] * slots
+
+        # Monotonic counters; slot index is counter % slots.
+        self._head = 0  # written by producer only
+        self._tail = 0  # written by consumer only
+
+        # Producer-side stats
+        self.pushed = 0
+        self.overruns = 0
+        self.truncated = 0
+        self.high_water = 0
+
+    # ── Producer (PortAudio callback) ─────────────────────────────────────────
+
+    def push(self, indata: np.ndarray) -> bool:
+        head = self._head
+        used = head - self._tail
+        if used >= self.slots:
+            self.overruns += 1
+            return False
+
+        n = indata.shape[0]
+        if n > self.frame_size:
+            self.truncated += 1
+            n = self.frame_size
+
+        slot = head % self.slots
+        np.copyto(self._data[slot, :n], indata[:n, :self.channels])
+        self._lengths[slot] = n
+
+        self._head = head + 1
+        self.pushed += 1
+        if used + 1 > self.high_water:
+            self.high_water = used + 1
+        return True
+
+    # ── Consumer (audio-processing thread) ────────────────────────────────────
+
+    def peek(self) -> np.ndarray | None:
+        """Oldest unread block as a view, or None. Valid until release()."""
+        tail = self._tail
+        if tail == self._head:
+            return None
+        slot = tail % self.slots
+        return self._data[slot, :self._lengths[slot]]
+
+    def release(self) -> None:
+        self._tail += 1
+
+    # ── Stats (any thread) ────────────────────────────────────────────────────
+
+    def depth(self) -> int:
+        return self._head - self._tail
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "frame_size": self.frame_size,
+            "depth": self.depth(),
+            "pushed": self.pushed,
+            "overruns": self.overruns,
+            "truncated": self.truncated,
+            "high_water": self.high_water,
+        }
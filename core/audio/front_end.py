@@ -3,9 +3,13 @@ from dataclasses import dataclass
 
 import numpy as np
 
+from core.audio.adaptive_vad import AdaptiveVAD
 from core.audio.ring_buffer import AudioRingBuffer
 from core.audio.simple_vad import SimpleVAD
 
+VAD_IMPL_SIMPLE = "simple"
+VAD_IMPL_ADAPTIVE = "adaptive"
+
 
 @dataclass
 class FrontEndConfig:
@@ -17,6 +21,16 @@ class FrontEndConfig:
     trailing_silence_frames: int = int(
         os.getenv("AUDIO_VAD_TRAILING_SILENCE_FRAMES", "22")
     )
+    # "simple" (fixed RMS thresholds) or "adaptive" (noise-floor relative)
+    vad_impl: str = os.getenv("AUDIO_VAD_IMPL", VAD_IMPL_SIMPLE).strip().lower()
+    speech_snr_db: float = float(os.getenv("AUDIO_VAD_SPEECH_SNR_DB", "10.0"))
+    silence_snr_db: float = float(os.getenv("AUDIO_VAD_SILENCE_SNR_DB", "5.0"))
+
+
+# XVF3800 USB firmware:
+# ch0 = conference
+# ch1 = ASR
+ASR_CHANNEL = 1
 
 
 class FrontEnd:
@@ -24,7 +38,10 @@ class FrontEnd:
     Audio front-end:
     - chooses the ASR channel from XVF3800
     - maintains pre-roll buffer
-    - runs VAD
+    - runs VAD (SimpleVAD or AdaptiveVAD, per config.vad_impl)
+
+    speech_frame() copies the ASR channel into a scratch frame that is
+    reused for every block, so callers must copy it if they keep it.
     """
 
     def __init__(self, config: FrontEndConfig):
@@ -32,33 +49,59 @@ class FrontEnd:
         self.preroll = AudioRingBuffer(
             max_samples=int(config.sample_rate * config.preroll_seconds)
         )
-        self.vad = SimpleVAD(
-            speech_threshold=config.speech_threshold,
-            silence_threshold=config.silence_threshold,
-            trailing_silence_frames=config.trailing_silence_frames,
-        )
+        self.vad = build_vad(config)
+        self._speech = np.zeros(config.frame_size, dtype=np.int16)
 
     def reset_vad(self):
         self.vad.reset()
 
-    def split_channels(self, indata: np.ndarray):
-        left = indata[:, 0].astype(np.int16)
-        right = indata[:, 1].astype(np.int16) if indata.shape[1] > 1 else left
-
-        # XVF3800 USB firmware:
-        # ch0 = conference
-        # ch1 = ASR
-        wake_pcm = right
-        speech_pcm = right
-        mono_record = speech_pcm.reshape(-1, 1)
+    def speech_frame(self, indata: np.ndarray) -> np.ndarray:
+        """
+        Copy the ASR channel of an int16 input block into the reusable
+        scratch frame and return it. Contiguous, so Porcupine and the VAD
+        can consume it directly.
+        """
+        frames = indata.shape[0]
+        if self._speech.shape[0] != frames:
+            # Only happens if the stream delivers a non-default blocksize.
+            self._speech = np.zeros(frames, dtype=np.int16)
 
-        return left, right, wake_pcm, speech_pcm, mono_record
+        channel = ASR_CHANNEL if indata.shape[1] > 1 else 0
+        np.copyto(self._speech, indata[:, channel])
+        return self._speech
 
     def push_preroll(self, speech_pcm: np.ndarray):
         self.preroll.append(speech_pcm)
 
     def get_preroll_audio(self) -> np.ndarray:
+        """Copy of the pre-roll. The wake path uses self.preroll directly."""
         return self.preroll.get_audio_2d()
 
+    def observe_idle(self, speech_pcm: np.ndarray):
+        """Feed a frame heard while IDLE, so an adaptive VAD can learn the noise floor."""
+        self.vad.observe_noise(speech_pcm)
+
     def is_speech(self, speech_pcm: np.ndarray) -> bool:
         return self.vad.is_speech(speech_pcm)
+
+    def trim_thresholds(self) -> tuple[float, float]:
+        """The VAD's current (speech, silence) RMS levels, for core.audio.trim."""
+        return self.vad.rms_thresholds()
+
+
+def build_vad(config: FrontEndConfig) -> SimpleVAD | AdaptiveVAD:
+    if config.vad_impl == VAD_IMPL_ADAPTIVE:
+        return AdaptiveVAD(
+            sample_rate=config.sample_rate,
+            frame_size=config.frame_size,
+            speech_snr_db=config.speech_snr_db,
+            silence_snr_db=config.silence_snr_db,
+            trailing_silence_frames=config.trailing_silence_frames,
+        )
+    if config.vad_impl != VAD_IMPL_SIMPLE:
+        raise ValueError(f"Unknown AUDIO_VAD_IMPL: {config.vad_impl!r}")
+    return SimpleVAD(
+        speech_threshold=config.speech_threshold,
+        silence_threshold=config.silence_threshold,
+        trailing_silence_frames=config.trailing_silence_frames,
+    )
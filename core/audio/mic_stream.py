@@ -2,29 +2,86 @@
 mic_stream.py - SafeBox main audio pipeline
 """
 
+import contextvars
+import json
 import os
-import queue
 import threading
-import re
+import statistics
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import sounddevice as sd
 
 from core.config_runtime import build_runtime_context
 from core.logger import get_logger, with_request_id
-from core.request_context import new_request_id, clear_request_id, set_request_id
+from core.request_context import clear_request_id, set_request_id
 from core.cloud_heartbeat import start_heartbeat
-from core.audio.stt import SpeechToText
+from core.audio.stt import SpeechToText, StreamingTranscriber
+from core.audio.stt_client import (
+    PRIORITY_PARTIAL,
+    STT_SERVICE_TIMEOUT_SECONDS,
+    FallbackSTTClient,
+    STTClient,
+)
 from core.audio.tts_player import speak, stop_audio
 from core.audio.wake_word import WakeWordEngine
-from core.audio.recorder import SpeechRecorder
+from core.audio.recorder import SpeechRecorder, archive_path, archive_utterance
+from core.audio.trim import AUDIO_TRIM_ENABLED, AUDIO_TRIM_GUARD_SECONDS, find_speech
 from core.audio.front_end import FrontEnd, FrontEndConfig
-from core.audio.session_manager import SessionManager, SessionConfig
-from core.intent.pipeline import process_command
-from core.execution.executor import execute_intent
-from core.llm_client import ask_llm, warm_cloud_auth
+from core.audio.session_manager import (
+    STATE_COOLDOWN,
+    STATE_FOLLOW_UP,
+    STATE_IDLE,
+    STATE_PROCESSING,
+    STATE_SPEAKING,
+    SessionConfig,
+    SessionManager,
+)
+from core.audio.command_spotter import (
+    COMMAND_PAUSE,
+    COMMAND_STOP,
+    COMMANDS,
+    create_command_spotter,
+)
+from core.audio.frame_processor import (
+    EVENT_COMMAND,
+    EVENT_ERROR,
+    EVENT_FINALIZE,
+    EVENT_WAKE,
+    SOURCE_FOLLOW_UP,
+    SOURCE_MANUAL,
+    FrameProcessor,
+    make_audio_callback,
+)
+from core.audio.frame_ring import FrameRing
+from core.audio.task_pipeline import (
+    DROP_CANCELLED,
+    TASK_MAX_AGE_SECONDS,
+    TASK_PERSIST_QUEUE_SIZE,
+    Stage,
+    TaskItem,
+    TaskPipeline,
+)
+from core.audio.file_stream import FileInputStream
+from core import cancellation, cpu_profile, metrics, model_residency, thermal, tracing, warmup
+from core.cancellation import Cancelled
+from core.intent import custom as custom_intents
+from core.intent.normalize import strip_wake_prefix
+from core.intent.pipeline import COMPOUND, process_command, process_utterance
+from core.execution.executor import execute_intent, publish_stats as publish_executor_stats
+from core.llm_client import CLOUD_READ_TIMEOUT_SECONDS, ask_llm, warm_cloud_auth
+from core.local_llm_client import TIMEOUT_SECONDS as LOCAL_LLM_TIMEOUT_SECONDS
 from core.local_llm_client import ask_local_llm
+from core.deadline import (
+    DEGRADE_CACHE,
+    DEGRADE_FALLBACK,
+    DEGRADE_OFFLINE_KIT,
+    Deadline,
+)
+from core.offline_kit import best_snippet
+from core.result_cache import get_cached
 from core.vault.storage import save_interaction
 from core.runtime_mode import (
     MODE_CLOUD,
@@ -55,10 +112,19 @@ SPEECH_START_TIMEOUT_SECONDS = float(
 MAX_UTTERANCE_SECONDS = float(os.getenv("AUDIO_MAX_UTTERANCE_SECONDS", "8.0"))
 COOLDOWN_SECONDS = float(os.getenv("AUDIO_COOLDOWN_SECONDS", "0.5"))
 
+# Wake-free follow-up window after a spoken reply (0 disables it).
+FOLLOW_UP_SECONDS = float(os.getenv("AUDIO_FOLLOW_UP_SECONDS", "0"))
+FOLLOW_UP_MIN_SPEECH_SECONDS = float(os.getenv("AUDIO_FOLLOW_UP_MIN_SPEECH_SECONDS", "0.1"))
+# Typical time to say the wake phrase; only used for the estimated saved-latency figure.
+WAKE_PHRASE_SECONDS = float(os.getenv("AUDIO_WAKE_PHRASE_SECONDS", "0.8"))
+
 MANUAL_VOICE_TRIGGER_FILE = os.getenv(
     "MANUAL_VOICE_TRIGGER_FILE",
     "/opt/safebox/runtime/manual_voice_trigger",
 )
+MANUAL_VOICE_TRIGGER_POLL_SECONDS = float(
+    os.getenv("MANUAL_VOICE_TRIGGER_POLL_SECONDS", "0.2")
+)
 
 FRONTEND_PREROLL_SECONDS = float(os.getenv("AUDIO_PREROLL_SECONDS", "1.0"))
 FRONTEND_SPEECH_THRESHOLD = float(os.getenv("AUDIO_VAD_SPEECH_THRESHOLD", "260.0"))
@@ -69,16 +135,54 @@ FRONTEND_TRAILING_SILENCE_FRAMES = int(
 
 RECORDER_MIN_DURATION = float(os.getenv("AUDIO_MIN_RECORD_SECONDS", "0.60"))
 
+# Utterances are handed to STT in memory; WAVs are only written when
+# archiving is explicitly enabled.
+AUDIO_ARCHIVE_ENABLED = os.getenv("AUDIO_ARCHIVE_ENABLED", "false").lower() == "true"
+AUDIO_ARCHIVE_DIR = os.getenv("AUDIO_ARCHIVE_DIR", "/tmp/safebox_utterances")
+
+# Streaming STT: partial transcripts while LISTENING. A partial whose
+# intent reaches STT_EARLY_ENDPOINT_CONFIDENCE (1.0 = exact phrase)
+# finalizes the recording without waiting for trailing silence.
+STT_STREAMING_ENABLED = os.getenv("STT_STREAMING_ENABLED", "true").lower() == "true"
+STT_EARLY_ENDPOINT_ENABLED = os.getenv("STT_EARLY_ENDPOINT_ENABLED", "true").lower() == "true"
+STT_EARLY_ENDPOINT_CONFIDENCE = float(os.getenv("STT_EARLY_ENDPOINT_CONFIDENCE", "1.0"))
+
+# Use the shared STT service (safebox-stt) when its socket answers at
+# startup; otherwise load the model in this process as before.
+STT_SERVICE_ENABLED = os.getenv("STT_SERVICE_ENABLED", "true").lower() == "true"
+
+# Command spotting (stop/pause/volume/next) right after wake, without STT
+AUDIO_COMMAND_WINDOW_SECONDS = float(os.getenv("AUDIO_COMMAND_WINDOW_SECONDS", "2.5"))
+
+# Callback -> audio-processing thread handoff
+AUDIO_RING_SECONDS = float(os.getenv("AUDIO_RING_SECONDS", "2.0"))
+AUDIO_PROCESSING_POLL_SECONDS = float(os.getenv("AUDIO_PROCESSING_POLL_SECONDS", "0.005"))
+AUDIO_STATS_PUBLISH_SECONDS = float(os.getenv("AUDIO_STATS_PUBLISH_SECONDS", "5.0"))
+
+# Replay mode: comma-separated WAVs fed through the normal pipeline in
+# place of the microphone (no ReSpeaker needed). Speed 1.0 = real time.
+AUDIO_REPLAY_FILES = [
+    p.strip() for p in os.getenv("AUDIO_REPLAY_FILES", "").split(",") if p.strip()
+]
+AUDIO_REPLAY_SPEED = float(os.getenv("AUDIO_REPLAY_SPEED", "1.0"))
+
 # ---------------------------------------------------------------------------
 # Globals
 # ---------------------------------------------------------------------------
-task_queue: queue.Queue = queue.Queue()
 _last_runtime_mode: str | None = None
 _mode_lock = threading.Lock()
 
 _cached_persona: dict = {}
 _cached_behavior: dict = {}
 _config_cache_lock = threading.Lock()
+
+# Spotted commands, published to the "commands" metrics section.
+_command_counts: dict[str, int] = {}
+_command_to_silence_ms: deque = deque(maxlen=100)
+
+# Silence trimming totals, published to the "stt" metrics section by the
+# main loop (publish_trim_stats).
+_trim_stats = {"requests": 0, "saved_seconds": 0.0, "input_seconds": 0.0}
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -101,6 +205,15 @@ def refresh_runtime_persona_behavior() -> None:
         _cached_behavior = behavior or {}
 
 
+def start_intent_watcher() -> None:
+    """Swap in each synced release's compiled intents as it becomes active."""
+    try:
+        from core.config_sync import ACTIVE_LINK
+        custom_intents.start_watcher(ACTIVE_LINK)
+    except Exception as e:
+        log.warning(f"intents.watcher_failed | {e}")
+
+
 def get_runtime_persona_behavior() -> tuple[dict, dict]:
     with _config_cache_lock:
         return dict(_cached_persona), dict(_cached_behavior)
@@ -155,34 +268,40 @@ def get_wake_word_config() -> tuple[str, float]:
     return keyword, sensitivity
 
 
-def strip_wake_prefix(text: str) -> str:
-    if not text:
-        return text
-    text = text.strip()
-    for pattern in (
-        r"^(hey\s+clarity[\s,.:!-]*)",
-        r"^(okay\s+clarity[\s,.:!-]*)",
-        r"^(ok\s+clarity[\s,.:!-]*)",
-        r"^(a\s+clarity[\s,.:!-]*)",
-        r"^(take\s+clarity[\s,.:!-]*)",
-        r"^(clarity[\s,.:!-]*)",
-    ):
-        text = re.sub(pattern, "", text, flags=re.IGNORECASE).strip()
-    return text
-
-
-def consume_manual_voice_trigger() -> bool:
+def consume_manual_voice_trigger() -> dict | None:
+    """
+    Take the trigger file if it exists. Returns {"device_request_id",
+    "requested_at"}; the web UI writes both as JSON, older writers only
+    a bare timestamp (no request id).
+    """
     try:
         path = Path(MANUAL_VOICE_TRIGGER_FILE)
-        if path.exists():
-            path.unlink()
-            return True
+        if not path.exists():
+            return None
+        raw = path.read_text(encoding="utf-8").strip()
+        path.unlink()
+    except FileNotFoundError:
+        return None
     except Exception as e:
         log.warning(
             f"manual.voice_trigger.consume_failed | {e}",
             extra=with_request_id(),
         )
-    return False
+        return None
+
+    trigger = {"device_request_id": None, "requested_at": None}
+    try:
+        data = json.loads(raw) if raw else None
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        trigger.update(
+            device_request_id=data.get("device_request_id"),
+            requested_at=data.get("requested_at"),
+        )
+    elif isinstance(data, (int, float)):
+        trigger["requested_at"] = float(data)
+    return trigger
 
 
 # ---------------------------------------------------------------------------
@@ -233,14 +352,14 @@ def bootstrap_services() -> None:
 # ---------------------------------------------------------------------------
 # Mode resolution
 # ---------------------------------------------------------------------------
-def resolve_mode() -> tuple[str, bool]:
+def resolve_mode(internet_timeout: float = 3.0) -> tuple[str, bool]:
     state = load_runtime_mode_state()
 
     if manual_override_active(state):
         return state.get("mode", MODE_CLOUD), False
 
     if state.get("manual_override"):
-        if internet_available():
+        if internet_available(timeout=internet_timeout):
             save_runtime_mode_state(
                 {
                     "mode": MODE_CLOUD,
@@ -277,6 +396,8 @@ def _persist_interaction(
     cloud_request_id: str | None,
     mode: str | None,
     latency_ms: int | None,
+    audio_path: str | None = None,
+    trace_summary: dict | None = None,
 ) -> None:
     try:
         save_interaction(
@@ -287,6 +408,8 @@ def _persist_interaction(
             cloud_request_id=cloud_request_id,
             mode=mode,
             latency_ms=latency_ms,
+            audio_path=audio_path,
+            trace_summary=trace_summary,
         )
     except Exception as e:
         log.warning(
@@ -295,206 +418,472 @@ def _persist_interaction(
         )
 
 
+def _archive_in_background(audio, device_request_id: str) -> str:
+    """Start writing the utterance WAV off the critical path; return its path."""
+    path = archive_path(AUDIO_ARCHIVE_DIR, device_request_id)
+
+    def _write() -> None:
+        try:
+            archive_utterance(audio, SAMPLE_RATE, AUDIO_ARCHIVE_DIR, device_request_id)
+        except Exception as e:
+            log.warning(
+                f"audio.archive_failed | {e}",
+                extra=with_request_id(device_request_id),
+            )
+
+    threading.Thread(target=_write, daemon=True, name="audio-archive").start()
+    return str(path)
+
+
+def _trim_for_stt(
+    audio,
+    device_request_id: str,
+    front_end: FrontEnd | None = None,
+    tail_only: bool = False,
+):
+    """
+    Locate speech in the utterance, record the seconds trimming saves
+    and return (start, end) sample bounds for STT.
+
+    The thresholds are the front end's VAD's current ones (the learned
+    noise floor for AUDIO_VAD_IMPL=adaptive). With `tail_only` (the
+    streamer only gets audio[:end]) the leading silence is not cut and
+    is not counted as saved.
+    """
+    speech_threshold, silence_threshold = (
+        front_end.trim_thresholds()
+        if front_end is not None
+        else (FRONTEND_SPEECH_THRESHOLD, FRONTEND_SILENCE_THRESHOLD)
+    )
+    result = find_speech(
+        audio,
+        SAMPLE_RATE,
+        FRAME_SIZE,
+        speech_threshold,
+        silence_threshold,
+        AUDIO_TRIM_GUARD_SECONDS,
+    )
+    if tail_only:
+        result.start = 0
+    log.info(
+        f"audio.trim saved_s={result.saved_seconds:.2f} "
+        f"lead_s={result.lead_seconds:.2f} tail_s={result.tail_seconds:.2f} "
+        f"kept_s={(result.end - result.start) / SAMPLE_RATE:.2f}",
+        extra=with_request_id(device_request_id),
+    )
+
+    _trim_stats["requests"] += 1
+    _trim_stats["saved_seconds"] = round(_trim_stats["saved_seconds"] + result.saved_seconds, 2)
+    _trim_stats["input_seconds"] = round(
+        _trim_stats["input_seconds"] + result.total / SAMPLE_RATE, 2
+    )
+    _trim_stats["last_saved_seconds"] = round(result.saved_seconds, 2)
+    _trim_stats["last_request_id"] = device_request_id
+    return result.start, result.end
+
+
+def publish_trim_stats() -> None:
+    # From the main loop's stats tick: a file write per request would sit
+    # between finalize and the STT call.
+    metrics.publish("stt", {"trim": dict(_trim_stats)})
+
+
+def _finish_request(device_request_id: str, deadline: Deadline | None = None) -> dict | None:
+    """
+    End of a turn: release its cancel token, attach the deadline report
+    (per-stage budget use) and store its trace.
+    """
+    cancellation.release(device_request_id)
+    cpu_profile.boost_end(device_request_id)
+    if deadline is not None:
+        tracing.annotate(device_request_id, deadline=deadline.finish())
+    summary = tracing.finish_trace(device_request_id)
+    model_residency.on_finished(device_request_id, summary)
+    return summary
+
+
 def _play_reply(reply: str, session: SessionManager, device_request_id: str) -> None:
     session.set_speaking()
     log.info("tts.generate.start", extra=with_request_id(device_request_id))
     try:
-        speak(reply)
+        with tracing.span("tts.speak", chars=len(reply)):
+            speak(reply, cancellation.get(device_request_id))
     except Exception as e:
         log.warning(f"tts.speak_failed | {e}", extra=with_request_id(device_request_id))
     log.info("tts.play.done", extra=with_request_id(device_request_id))
-    session.set_cooldown()
-    clear_request_id()
+    # A barge-in may already have started the next turn.
+    if session.start_follow_up(device_request_id):
+        log.info(
+            f"follow_up.window_open seconds={FOLLOW_UP_SECONDS}",
+            extra=with_request_id(device_request_id),
+        )
+    else:
+        session.set_cooldown_if(STATE_SPEAKING)
 
 
 # ---------------------------------------------------------------------------
-# Task worker
+# Task pipeline: stt -> route -> playback -> persist
 # ---------------------------------------------------------------------------
-def task_worker(get_stt_fn, session: SessionManager) -> None:
+def stt_stage(
+    item: TaskItem,
+    get_stt_fn,
+    session: SessionManager,
+    streamer: StreamingTranscriber | None,
+    route: Stage,
+    front_end: FrontEnd | None = None,
+) -> None:
     """
-    Dedicated daemon thread. Pulls (wav_path, request_id) from task_queue,
-    runs STT -> intent -> LLM -> TTS. The audio callback is never blocked.
+    Transcribe the float32 utterance from SpeechRecorder.finish() and
+    pass it on to routing.
+
+    Leading and trailing silence is trimmed off before STT (see
+    core.audio.trim). When `streamer` already decoded this utterance
+    during LISTENING, only the part it has not committed yet is
+    transcribed; its sample offsets are from the untrimmed start, so
+    only the trailing silence is cut in that case.
+
+    IMPORTANT: every path that does not hand the item on must call
+    session.set_cooldown() or session.set_idle() and finish the trace,
+    otherwise the session stays in STATE_PROCESSING and can_run_wake()
+    returns False forever. The same holds for route_stage.
+    """
+    audio, device_request_id = item.audio, item.request_id
+    item.audio = None
+    if item.deadline is None:
+        item.deadline = Deadline(device_request_id, started_at=item.created_at)
+
+    if AUDIO_ARCHIVE_ENABLED:
+        item.audio_path = _archive_in_background(audio, device_request_id)
+
+    stt_started = time.time()
+    try:
+        with tracing.span("stt", audio_s=round(len(audio) / SAMPLE_RATE, 2)) as stt_span:
+            streamed = streamer is not None and streamer.active_for(device_request_id)
+            stt_span.set(streamed=streamed)
+            start, end = 0, len(audio)
+            if AUDIO_TRIM_ENABLED:
+                start, end = _trim_for_stt(audio, device_request_id, front_end, tail_only=streamed)
+
+            with item.deadline.stage("stt", STT_SERVICE_TIMEOUT_SECONDS) as timeout:
+                if streamed:
+                    text = streamer.finish(audio[:end], device_request_id)
+                else:
+                    stt = get_stt_fn()
+                    if isinstance(stt, STTClient):
+                        stt = stt.with_timeout(timeout)
+                    text = stt.transcribe(audio[start:end])
+    except TimeoutError:
+        # The budget ran out waiting for the service (the stage is recorded
+        # as an overrun); a late transcript would only delay the cooldown.
+        item.deadline.exhausted = True
+        log.warning(
+            f"stt.timeout budget_exhausted -> cooldown "
+            f"stt_ms={int((time.time() - stt_started) * 1000)}",
+            extra=with_request_id(device_request_id),
+        )
+        session.set_cooldown()
+        _finish_request(device_request_id, item.deadline)
+        return
+    except Exception as e:
+        log.exception(
+            f"stt.transcribe_failed | {e}",
+            extra=with_request_id(device_request_id),
+        )
+        session.set_cooldown()
+        _finish_request(device_request_id, item.deadline)
+        return
+
+    text = strip_wake_prefix(text)
+    log.info(
+        f"stt.completed text={text!r} "
+        f"stt_ms={int((time.time() - stt_started) * 1000)}",
+        extra=with_request_id(device_request_id),
+    )
+
+    if not text or not text.strip():
+        log.info(
+            "stt.empty_result -> cooldown",
+            extra=with_request_id(device_request_id),
+        )
+        session.set_cooldown()
+        _finish_request(device_request_id, item.deadline)
+        return
+
+    clean = text.strip().lower()
+
+    if any(cmd in clean for cmd in ("stop", "cancel", "shut up")):
+        stop_audio()
+        log.info(
+            "tts.stop.requested",
+            extra=with_request_id(device_request_id),
+        )
+        session.set_idle()
+        _finish_request(device_request_id, item.deadline)
+        return
+
+    item.text = text
+    route.submit(item, timeout=_handoff_timeout(item))
+
 
-    IMPORTANT: every code path must call session.set_cooldown() or
-    session.set_idle() before continuing, otherwise the session stays
-    in STATE_PROCESSING and can_run_wake() returns False forever.
+FALLBACK_PHRASE = "I cannot answer that right now."
+CLOUD_RESTORED_PHRASE = "Cloud connection restored. Switching back to Cloud Mode."
+
+
+def _handoff_timeout(item: TaskItem) -> float:
     """
-    while True:
-        try:
-            path, device_request_id = task_queue.get(timeout=1)
-            set_request_id(device_request_id)
+    How long a stage waits for room in the next one: what is left of the
+    request's budget (at least DEADLINE_MIN_STAGE_SECONDS), and never
+    past the item's max age. A full queue after that sheds the item.
+    """
+    return item.deadline.timeout(max(0.0, TASK_MAX_AGE_SECONDS - item.age_seconds))
 
-            try:
-                text = get_stt_fn().transcribe(path)
-            except Exception as e:
-                log.exception(
-                    f"stt.transcribe_failed | {e}",
-                    extra=with_request_id(device_request_id),
-                )
-                session.set_cooldown()
-                clear_request_id()
-                continue
-            finally:
-                try:
-                    Path(path).unlink(missing_ok=True)
-                except Exception:
-                    pass
-
-            text = strip_wake_prefix(text)
-            log.info(
-                f"stt.completed text={text!r}",
-                extra=with_request_id(device_request_id),
-            )
 
-            if not text or not text.strip():
-                log.info(
-                    "stt.empty_result -> cooldown",
-                    extra=with_request_id(device_request_id),
-                )
-                session.set_cooldown()
-                clear_request_id()
-                continue
+def _degraded_reply(text: str, deadline: Deadline, device_request_id: str) -> str:
+    """
+    No answer: a cached answer, else the best offline kit section, else
+    the fallback phrase, in that order. Stale cache entries and the
+    offline kit only stand in when the time budget ran out; a request
+    that failed for another reason (LLM error, no backend) only takes a
+    cache hit within its TTL.
+    """
+    reply, deadline.degraded = FALLBACK_PHRASE, DEGRADE_FALLBACK
+    exhausted = deadline.exhausted
+    cached = get_cached(text, max_age_seconds=None) if exhausted else get_cached(text)
+    if cached and cached.get("response"):
+        reply, deadline.degraded = cached["response"], DEGRADE_CACHE
+    elif exhausted:
+        snippet = best_snippet(text)
+        if snippet:
+            reply, deadline.degraded = snippet, DEGRADE_OFFLINE_KIT
+    log.warning(
+        f"reply.degraded -> {deadline.degraded} exhausted={deadline.exhausted}",
+        extra=with_request_id(device_request_id),
+    )
+    return reply
 
-            clean = text.strip().lower()
 
-            if any(cmd in clean for cmd in ("stop", "cancel", "shut up")):
-                stop_audio()
-                log.info(
-                    "tts.stop.requested",
-                    extra=with_request_id(device_request_id),
-                )
-                session.set_idle()
-                clear_request_id()
-                continue
-
-            selected_mode, recovered_to_cloud = resolve_mode()
-            log_mode_transition(selected_mode, "pre_dispatch")
-
-            if recovered_to_cloud:
-                try:
-                    speak("Cloud connection restored. Switching back to Cloud Mode.")
-                except Exception as e:
-                    log.warning(f"mode.auto_recovered.announce_failed | {e}")
-
-            reply: str | None = None
-            actual_mode: str | None = None
-            cloud_request_id: str | None = None
-            latency_ms: int | None = None
-
-            intent_result = process_command(text)
-            if (
-                intent_result["safe"]
-                and intent_result["confidence"] >= MIN_INTENT_CONFIDENCE
-            ):
-                reply = execute_intent(intent_result)
-                actual_mode = "intent"
-                if reply:
-                    _persist_interaction(
-                        text,
-                        reply,
-                        device_request_id,
-                        cloud_request_id=None,
-                        mode=actual_mode,
-                        latency_ms=None,
-                    )
-                    _play_reply(reply, session, device_request_id)
-                else:
-                    session.set_idle()
-                    clear_request_id()
-                continue
+def route_stage(item: TaskItem, session: SessionManager, playback: Stage) -> None:
+    """
+    Intent match, else cloud / local LLM; the reply goes to playback.
+    Timeouts come from the request's deadline; LLM calls are skipped
+    once it is spent and the reply is degraded instead. A "cloud
+    restored" announcement is spoken by playback ahead of the reply, so
+    it never talks over another reply and barge-in stops it.
+    """
+    text, device_request_id = item.text, item.request_id
+    deadline = item.deadline
+
+    with deadline.stage("resolve_mode", 3.0) as timeout:
+        selected_mode, recovered_to_cloud = resolve_mode(internet_timeout=timeout)
+    log_mode_transition(selected_mode, "pre_dispatch")
+
+    def hand_off(reply: str) -> None:
+        deadline.reply_ready()
+        item.reply = f"{CLOUD_RESTORED_PHRASE} {reply}" if recovered_to_cloud else reply
+        playback.submit(item, timeout=_handoff_timeout(item))
 
-            _persona, _behavior = get_runtime_persona_behavior()
+    reply: str | None = None
+    actual_mode: str | None = None
+    cloud_request_id: str | None = None
+    latency_ms: int | None = None
 
-            if selected_mode == MODE_CLOUD:
+    intent_result = process_utterance(text)
+    if intent_result["intent"] == COMPOUND:
+        log.info(
+            f"intent.compound clauses={[c['intent'] for c in intent_result['clauses']]}",
+            extra=with_request_id(device_request_id),
+        )
+    if (
+        intent_result["safe"]
+        and intent_result["confidence"] >= MIN_INTENT_CONFIDENCE
+    ):
+        # Each handler's own timeout is capped by the deadline; a timed
+        # out handler answers with its fallback phrase.
+        with deadline.stage("intent.execute"):
+            reply = execute_intent(intent_result, deadline)
+        if reply:
+            item.mode = "intent"
+            hand_off(reply)
+        else:
+            session.set_idle()
+            _finish_request(device_request_id, deadline)
+        return
+
+    _persona, _behavior = get_runtime_persona_behavior()
+
+    if deadline.check():
+        log.warning(
+            "route.budget_exhausted -> skip_llm",
+            extra=with_request_id(device_request_id),
+        )
+    elif selected_mode == MODE_CLOUD:
+        log.info(
+            "route.selected=cloud",
+            extra=with_request_id(device_request_id),
+        )
+        warmup.consume(device_request_id)
+        log_mode_transition(MODE_CLOUD, "mode_file_selected")
+        try:
+            runtime_context = build_runtime_context(selected_mode)
+
+            with deadline.stage("llm.cloud", CLOUD_READ_TIMEOUT_SECONDS) as timeout:
+                cloud = ask_llm(
+                    message=text,
+                    device_context={
+                        "device_id": os.environ.get("DEVICE_NAME", "safebox-001"),
+                        "timezone": runtime_context["timezone"],
+                        "clock_status": "synced",
+                        "caller_type": "device",
+                    },
+                    runtime_context=runtime_context,
+                    request_context={
+                        "device_request_id": device_request_id,
+                        "mode": selected_mode,
+                        "follow_up_of": item.follow_up_of,
+                    },
+                    cancel_token=item.cancel_token,
+                    timeout_seconds=timeout,
+                )
+            if cloud and cloud.get("response"):
+                reply = cloud["response"]
+                cloud_request_id = (
+                    cloud.get("cloud_request_id") or cloud.get("request_id")
+                )
+                latency_ms = cloud.get("latency_ms")
+                actual_mode = MODE_CLOUD
                 log.info(
-                    "route.selected=cloud",
+                    f"cloud.response_received cloud_request_id={cloud_request_id}",
                     extra=with_request_id(device_request_id),
                 )
-                log_mode_transition(MODE_CLOUD, "mode_file_selected")
-                try:
-                    runtime_context = build_runtime_context(selected_mode)
-
-                    cloud = ask_llm(
-                        message=text,
-                        device_context={
-                            "device_id": os.environ.get("DEVICE_NAME", "safebox-001"),
-                            "timezone": runtime_context["timezone"],
-                            "clock_status": "synced",
-                            "caller_type": "device",
-                        },
-                        runtime_context=runtime_context,
-                        request_context={
-                            "device_request_id": device_request_id,
-                            "mode": selected_mode,
-                        },
-                    )
-                    if cloud and cloud.get("response"):
-                        reply = cloud["response"]
-                        cloud_request_id = (
-                            cloud.get("cloud_request_id") or cloud.get("request_id")
-                        )
-                        latency_ms = cloud.get("latency_ms")
-                        actual_mode = MODE_CLOUD
-                        log.info(
-                            f"cloud.response_received cloud_request_id={cloud_request_id}",
-                            extra=with_request_id(device_request_id),
-                        )
-                        log_mode_transition(MODE_CLOUD, "cloud_request_succeeded")
-                    else:
-                        raise ValueError("empty cloud response")
-                except Exception as e:
-                    log.warning(
-                        f"cloud.request_failed | {e} | fallback=survival",
-                        extra=with_request_id(device_request_id),
-                    )
-                    log_mode_transition(MODE_SURVIVAL, "cloud_request_failed")
+                log_mode_transition(MODE_CLOUD, "cloud_request_succeeded")
+            else:
+                raise ValueError("empty cloud response")
+        except Cancelled:
+            raise
+        except Exception as e:
+            log.warning(
+                f"cloud.request_failed | {e} | fallback=survival",
+                extra=with_request_id(device_request_id),
+            )
+            log_mode_transition(MODE_SURVIVAL, "cloud_request_failed")
+            if deadline.check():
+                log.warning(
+                    "route.budget_exhausted -> skip_survival_fallback",
+                    extra=with_request_id(device_request_id),
+                )
+            else:
+                with deadline.stage("llm.local", LOCAL_LLM_TIMEOUT_SECONDS) as timeout:
                     reply = ask_local_llm(
                         text,
                         persona=_persona,
                         behavior=_behavior,
                         survival_fallback=True,
+                        cancel_token=item.cancel_token,
+                        timeout_seconds=timeout,
                     )
-                    actual_mode = MODE_SURVIVAL if reply else None
-            else:
-                log.info(
-                    "route.selected=survival",
-                    extra=with_request_id(device_request_id),
-                )
-                log_mode_transition(MODE_SURVIVAL, "mode_file_selected")
-                reply = ask_local_llm(
-                    text,
-                    persona=_persona,
-                    behavior=_behavior,
-                    survival_fallback=True,
-                )
                 actual_mode = MODE_SURVIVAL if reply else None
-
-            if not reply:
-                reply = "I cannot answer that right now."
-                log.warning(
-                    "reply.empty -> fallback_phrase",
-                    extra=with_request_id(device_request_id),
-                )
-
-            _persist_interaction(
+    else:
+        log.info(
+            "route.selected=survival",
+            extra=with_request_id(device_request_id),
+        )
+        warmup.consume(device_request_id)
+        log_mode_transition(MODE_SURVIVAL, "mode_file_selected")
+        with deadline.stage("llm.local", LOCAL_LLM_TIMEOUT_SECONDS) as timeout:
+            reply = ask_local_llm(
                 text,
-                reply,
-                device_request_id,
-                cloud_request_id=cloud_request_id,
-                mode=actual_mode,
-                latency_ms=latency_ms,
+                persona=_persona,
+                behavior=_behavior,
+                survival_fallback=True,
+                cancel_token=item.cancel_token,
+                timeout_seconds=timeout,
             )
-            _play_reply(reply, session, device_request_id)
+        actual_mode = MODE_SURVIVAL if reply else None
+
+    if not reply:
+        deadline.check()
+        reply = _degraded_reply(text, deadline, device_request_id)
+
+    item.mode = actual_mode
+    item.cloud_request_id = cloud_request_id
+    item.latency_ms = latency_ms
+    hand_off(reply)
+
+
+def playback_stage(item: TaskItem, session: SessionManager, persist: Stage) -> None:
+    """
+    Speak the reply, then queue the vault save. The trace is finished
+    here so the summary saved with the interaction includes TTS. A full
+    persist queue sheds the save (counted as queue_full) rather than
+    holding up the next reply.
+    """
+    _play_reply(item.reply, session, item.request_id)
+    item.trace_summary = _finish_request(item.request_id, item.deadline)
+    persist.submit(item)
+
+
+def persist_stage(item: TaskItem) -> None:
+    _persist_interaction(
+        item.text,
+        item.reply,
+        item.request_id,
+        cloud_request_id=item.cloud_request_id,
+        mode=item.mode,
+        latency_ms=item.latency_ms,
+        audio_path=item.audio_path,
+        trace_summary=item.trace_summary,
+    )
 
-        except queue.Empty:
-            continue
-        except Exception as e:
-            log.exception(f"task_worker.unhandled | {e}", extra=with_request_id())
-            try:
-                session.set_cooldown()
-            except Exception:
-                pass
-            clear_request_id()
+
+def build_task_pipeline(
+    get_stt_fn,
+    session: SessionManager,
+    streamer: StreamingTranscriber | None = None,
+    front_end: FrontEnd | None = None,
+) -> TaskPipeline:
+    """
+    Wire the stages. A stale or shed utterance ends its turn the same
+    way a failed one does (cooldown, trace finished); a dropped vault
+    save is only logged.
+    """
+
+    def abandon(item: TaskItem, reason: str) -> None:
+        if item.cancel_token is not None:
+            item.cancel_token.cancel(f"dropped_{reason}")
+        if streamer is not None and streamer.active_for(item.request_id):
+            streamer.cancel()
+        # A cancelled item was superseded by a newer turn, which owns the
+        # session now.
+        if reason != DROP_CANCELLED:
+            session.set_cooldown_if(STATE_PROCESSING, STATE_SPEAKING)
+        _finish_request(item.request_id, item.deadline)
+
+    persist = Stage(
+        "persist",
+        persist_stage,
+        maxsize=TASK_PERSIST_QUEUE_SIZE,
+        max_age_seconds=None,
+    )
+    playback = Stage(
+        "playback",
+        lambda item: playback_stage(item, session, persist),
+        on_drop=abandon,
+    )
+    route = Stage(
+        "route",
+        lambda item: route_stage(item, session, playback),
+        on_drop=abandon,
+    )
+    stt = Stage(
+        "stt",
+        lambda item: stt_stage(item, get_stt_fn, session, streamer, route, front_end),
+        on_drop=abandon,
+    )
+    return TaskPipeline([stt, route, playback, persist])
+
+
+def publish_pipeline_stats(pipeline: TaskPipeline) -> None:
+    metrics.publish("pipeline", pipeline.stats())
 
 
 def startup_announcement_text() -> str:
@@ -536,16 +925,399 @@ def try_init_wake_word(current_wake_word):
         return None
 
 
+def open_input_stream(callback):
+    """The microphone stream, or a WAV replay when AUDIO_REPLAY_FILES is set."""
+    if AUDIO_REPLAY_FILES:
+        return FileInputStream(
+            AUDIO_REPLAY_FILES,
+            samplerate=SAMPLE_RATE,
+            channels=CHANNELS,
+            blocksize=FRAME_SIZE,
+            callback=callback,
+            speed=AUDIO_REPLAY_SPEED,
+        )
+    return sd.InputStream(
+        device=DEVICE,
+        samplerate=SAMPLE_RATE,
+        channels=CHANNELS,
+        dtype="int16",
+        blocksize=FRAME_SIZE,
+        callback=callback,
+    )
+
+
+def publish_audio_stats(ring: FrameRing, processor: FrameProcessor) -> None:
+    stats = ring.stats()
+    stats.update(processor.stats())
+    stats["state"] = processor.session.get_state()
+    metrics.publish("audio", stats)
+
+
+def manual_trigger_watcher(trigger: threading.Event, processor: FrameProcessor) -> None:
+    """
+    Poll the manual trigger file off the audio thread. The frame
+    processor only checks the Event, so no per-frame stat() calls.
+
+    A device_request_id from the web UI is handed to the processor for
+    the wake it causes, and its trace starts at the web request so the
+    file handoff shows up as its own span.
+    """
+    while True:
+        trigger_data = consume_manual_voice_trigger()
+        if trigger_data is not None:
+            device_request_id = trigger_data["device_request_id"]
+            requested_at = trigger_data["requested_at"]
+            if device_request_id:
+                tracing.start_trace(
+                    device_request_id, started_at=requested_at, source=SOURCE_MANUAL
+                )
+                if requested_at:
+                    tracing.record_span(
+                        "trigger.handoff", requested_at, time.time(), device_request_id
+                    )
+            processor.manual_request_id = device_request_id
+            trigger.set()
+        time.sleep(MANUAL_VOICE_TRIGGER_POLL_SECONDS)
+
+
+def _publish_command_metrics(command: str, silence_ms: float | None, action_ms: float) -> None:
+    _command_counts[command] = _command_counts.get(command, 0) + 1
+    data = {
+        "counts": dict(_command_counts),
+        "last": {
+            "command": command,
+            "to_silence_ms": silence_ms,
+            "to_action_ms": action_ms,
+        },
+    }
+    if silence_ms is not None:
+        _command_to_silence_ms.append(silence_ms)
+    if _command_to_silence_ms:
+        samples = sorted(_command_to_silence_ms)
+        data["to_silence_ms"] = {
+            "count": len(samples),
+            "mean": round(statistics.fmean(samples), 1),
+            "p95": samples[min(len(samples) - 1, int(0.95 * len(samples)))],
+        }
+    metrics.publish("commands", data)
+
+
+# Spotted commands run here, in the order they were spotted, so a slow
+# handler never holds up the audio event worker (and the next wake).
+_command_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spotted-command")
+
+
+def run_spotted_command(
+    command: str,
+    device_request_id: str,
+    spotted_at: float,
+    session: SessionManager,
+    playback: Stage,
+) -> None:
+    """
+    Act on a command from the spotter: no STT, no intent pipeline.
+    stop/pause silence playback right here; the handler runs on
+    _command_pool. The session is released first, so a wake word or a
+    second "stop" is heard while a slow handler (PLAY_MUSIC) runs. Times
+    are measured from the frame that completed the command.
+    """
+    silence_ms = None
+    if command in (COMMAND_STOP, COMMAND_PAUSE):
+        stop_audio()
+        silence_ms = round((time.monotonic() - spotted_at) * 1000, 1)
+    session.set_cooldown_if(STATE_PROCESSING)
+    _command_pool.submit(
+        contextvars.copy_context().run,
+        _execute_spotted_command,
+        command,
+        device_request_id,
+        spotted_at,
+        silence_ms,
+        playback,
+    )
+
+
+def _execute_spotted_command(
+    command: str,
+    device_request_id: str,
+    spotted_at: float,
+    silence_ms: float | None,
+    playback: Stage,
+) -> None:
+    """
+    Run the command's handler. Its reply goes through the playback stage
+    like any other (spoken under the request's cancel token, then saved);
+    a turn without one is finished here.
+    """
+    try:
+        intent = COMMANDS[command]
+        now = time.time()
+        tracing.record_span(
+            "command.dispatch",
+            now - (time.monotonic() - spotted_at),
+            now,
+            device_request_id,
+            command=command,
+        )
+
+        reply = None
+        if intent != "STOP":
+            reply = execute_intent(
+                {"intent": intent, "confidence": 1.0, "safe": True, "raw_text": command}
+            )
+        action_ms = round((time.monotonic() - spotted_at) * 1000, 1)
+
+        log.info(
+            f"command.spotted command={command} intent={intent} "
+            f"to_silence_ms={silence_ms} to_action_ms={action_ms}",
+            extra=with_request_id(device_request_id),
+        )
+        _publish_command_metrics(command, silence_ms, action_ms)
+
+        if reply:
+            playback.submit(
+                TaskItem(
+                    device_request_id,
+                    text=command,
+                    reply=reply,
+                    mode="command",
+                    latency_ms=int(action_ms),
+                    cancel_token=cancellation.get(device_request_id),
+                )
+            )
+        else:
+            _finish_request(device_request_id)
+    except Exception as e:
+        log.exception(
+            f"command.failed command={command} | {e}", extra=with_request_id(device_request_id)
+        )
+        _finish_request(device_request_id)
+    finally:
+        clear_request_id()
+
+
+def early_endpoint_check(
+    processor: FrameProcessor,
+    device_request_id: str,
+    partial_text: str,
+) -> None:
+    """on_partial hook: finalize as soon as the partial is a confident command."""
+    text = strip_wake_prefix(partial_text)
+    if not text:
+        return
+    result = process_command(text)
+    if result["safe"] and result["confidence"] >= STT_EARLY_ENDPOINT_CONFIDENCE:
+        log.info(
+            f"stt.early_endpoint intent={result.get('intent')} "
+            f"confidence={result['confidence']:.2f}",
+            extra=with_request_id(device_request_id),
+        )
+        processor.request_endpoint(device_request_id, "early_endpoint")
+
+
+def _follow_up_savings(session: SessionManager) -> tuple[str | None, dict]:
+    """
+    What a wake-free follow-up turn skipped compared with saying the
+    wake word again: the wake phrase itself, the post-wake grace, and
+    whatever was left of the cooldown after the reply.
+
+    Only the cooldown part is measured. The wake phrase and post-wake
+    parts are the configured WAKE_PHRASE_SECONDS / POST_WAKE_SECONDS,
+    so they and the total are reported as *_estimated_ms.
+    """
+    previous_request_id, opened_at = session.follow_up_origin()
+    since_reply_ms = (time.monotonic() - opened_at) * 1000
+    wake_phrase_ms = WAKE_PHRASE_SECONDS * 1000
+    post_wake_ms = POST_WAKE_SECONDS * 1000
+    cooldown_ms = max(0.0, COOLDOWN_SECONDS * 1000 - since_reply_ms)
+    return previous_request_id, {
+        "follow_up_saved_estimated_ms": round(wake_phrase_ms + post_wake_ms + cooldown_ms, 1),
+        "follow_up_after_reply_ms": round(since_reply_ms, 1),
+        "follow_up_saved_wake_phrase_estimated_ms": round(wake_phrase_ms, 1),
+        "follow_up_saved_post_wake_estimated_ms": round(post_wake_ms, 1),
+        "follow_up_saved_cooldown_ms": round(cooldown_ms, 1),
+    }
+
+
+def audio_event_worker(
+    processor: FrameProcessor,
+    session: SessionManager,
+    pipeline: TaskPipeline,
+    streamer: StreamingTranscriber | None = None,
+) -> None:
+    """
+    Handles everything the frame processor is not allowed to do on the
+    audio thread: logging, barge-in stop_audio(), the "Listening." prompt,
+    starting/stopping streaming STT, silencing playback for spotted
+    commands (their handlers run on _command_pool) and handing the
+    finished recording to the task pipeline.
+
+    Each request's trace starts here on wake; LISTENING is recorded as
+    the span from wake to finalize. A follow-up turn (no wake word)
+    records an estimate of the latency it saved over waking the device
+    again.
+    """
+    listening_since: dict[str, float] = {}
+    follow_up_of: dict[str, str | None] = {}
+    while True:
+        event = processor.events.get()
+        kind = event[0]
+        try:
+            if kind == EVENT_WAKE:
+                _, source, device_request_id, barge_in = event
+                set_request_id(device_request_id)
+                follow_up_of.clear()
+                trace_attrs = {}
+                if source == SOURCE_FOLLOW_UP:
+                    previous_request_id, saved = _follow_up_savings(session)
+                    follow_up_of[device_request_id] = previous_request_id
+                    trace_attrs = dict(saved, follow_up_of=previous_request_id)
+                tracing.start_trace(
+                    device_request_id, source=source, barge_in=barge_in, **trace_attrs
+                )
+                cancellation.start(device_request_id)
+                cpu_profile.boost_begin(device_request_id)
+                # Ties latency regressions in the trace to thermal state.
+                tracing.annotate(device_request_id, thermal_tier=thermal.current_tier())
+                model_residency.on_wake(device_request_id)
+                # Get the LLM backend ready while the user is still talking.
+                warmup.on_wake(device_request_id, get_runtime_persona_behavior)
+                # Whatever an earlier turn still has in flight (LLM call,
+                # Piper) is not going to be heard now.
+                cancellation.cancel_others(
+                    device_request_id, "barge_in" if barge_in else "superseded"
+                )
+                tracing.mark("wake.detected", source=source)
+                listening_since.clear()
+                listening_since[device_request_id] = time.time()
+
+                if streamer is not None:
+                    streamer.start(device_request_id, processor.recorder.snapshot)
+
+                if barge_in:
+                    stop_audio()
+                    log.info(
+                        "barge_in.detected -> stop_audio",
+                        extra=with_request_id(device_request_id),
+                    )
+
+                if source == SOURCE_FOLLOW_UP:
+                    log.info(
+                        f"follow_up.detected follow_up_of={follow_up_of[device_request_id]} "
+                        f"saved_estimated_ms={trace_attrs['follow_up_saved_estimated_ms']} -> state=LISTENING",
+                        extra=with_request_id(device_request_id),
+                    )
+                elif source == SOURCE_MANUAL:
+                    log.info(
+                        "manual.voice_trigger.detected",
+                        extra=with_request_id(device_request_id),
+                    )
+                    try:
+                        speak("Listening.")
+                    except Exception as e:
+                        log.warning(
+                            f"manual.voice_trigger.announce_failed | {e}",
+                            extra=with_request_id(device_request_id),
+                        )
+                    # Recording of a manual turn starts only now, so the
+                    # prompt is not transcribed as part of the request.
+                    processor.prompt_finished(device_request_id)
+                    log.info(
+                        "manual.voice_trigger -> state=LISTENING",
+                        extra=with_request_id(device_request_id),
+                    )
+                else:
+                    keyword, _ = get_wake_word_config()
+                    log.info(
+                        f"wake_word.detected keyword={keyword}",
+                        extra=with_request_id(device_request_id),
+                    )
+                    log.info(
+                        "wake.detected -> state=LISTENING",
+                        extra=with_request_id(device_request_id),
+                    )
+
+            elif kind == EVENT_FINALIZE:
+                _, reason, device_request_id = event
+                log.info(
+                    f"recording.finalized reason={reason}",
+                    extra=with_request_id(device_request_id),
+                )
+                finalized_at = time.time()
+                tracing.mark("speech.end", device_request_id)
+                tracing.record_span(
+                    "audio.listening",
+                    listening_since.pop(device_request_id, finalized_at),
+                    finalized_at,
+                    device_request_id,
+                    reason=reason,
+                )
+                if streamer is not None:
+                    streamer.stop()
+
+                with tracing.span("audio.finalize", device_request_id):
+                    audio = processor.recorder.finish()
+                if audio is not None:
+                    pipeline.submit(
+                        TaskItem(
+                            device_request_id,
+                            audio=audio,
+                            cancel_token=cancellation.get(device_request_id),
+                            follow_up_of=follow_up_of.pop(device_request_id, None),
+                            # The time budget starts when the user stops talking.
+                            deadline=Deadline(device_request_id),
+                        )
+                    )
+                else:
+                    if streamer is not None:
+                        streamer.cancel()
+                    log.warning(
+                        "recording.too_short -> cooldown",
+                        extra=with_request_id(device_request_id),
+                    )
+                    session.set_cooldown()
+                    _finish_request(device_request_id)
+                    clear_request_id()
+
+            elif kind == EVENT_COMMAND:
+                _, command, device_request_id, spotted_at = event
+                listening_since.pop(device_request_id, None)
+                if streamer is not None:
+                    streamer.cancel()
+                processor.recorder.stop()
+                run_spotted_command(
+                    command, device_request_id, spotted_at, session, pipeline.by_name["playback"]
+                )
+
+            elif kind == EVENT_ERROR:
+                _, where, error = event
+                log.warning(f"{where} | {error}", extra=with_request_id())
+
+        except Exception as e:
+            log.exception(f"audio_event_worker.unhandled | {e}", extra=with_request_id())
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 def main() -> None:
+    # Before any thread starts: the process and every thread it starts
+    # share the general cores; the two real-time audio threads move
+    # themselves to the audio core (cpu_profile.pin_thread).
+    cpu_profile.apply("wake")
     bootstrap_services()
     refresh_runtime_persona_behavior()
+    start_intent_watcher()
     threading.Thread(target=warm_cloud_auth, daemon=True, name="cloud-auth-warmup").start()
     global DEVICE
-    DEVICE = resolve_input_device()
-    log.info(f"startup.audio_input.ready device={DEVICE} sample_rate={SAMPLE_RATE} channels={CHANNELS}")
+    if AUDIO_REPLAY_FILES:
+        log.info(
+            f"startup.audio_input.replay files={len(AUDIO_REPLAY_FILES)} "
+            f"speed={AUDIO_REPLAY_SPEED}"
+        )
+    else:
+        DEVICE = resolve_input_device()
+        log.info(f"startup.audio_input.ready device={DEVICE} sample_rate={SAMPLE_RATE} channels={CHANNELS}")
 
     if not is_setup_completed():
         try:
@@ -560,7 +1332,7 @@ def main() -> None:
     try:
         if startup_recovered:
             log.info("mode.auto_recovered.announce.start")
-            speak("Cloud connection restored. Switching back to Cloud Mode.")
+            speak(CLOUD_RESTORED_PHRASE)
             log.info("mode.auto_recovered.announce.done")
         else:
             log.info("startup.onboarding_announce.start")
@@ -572,15 +1344,18 @@ def main() -> None:
     frames_per_second = SAMPLE_RATE / FRAME_SIZE
 
     session = SessionManager(
-        SessionConfig(
-            post_wake_grace_frames=int(POST_WAKE_SECONDS * frames_per_second),
-            speech_start_timeout_frames=int(
-                SPEECH_START_TIMEOUT_SECONDS * frames_per_second
-            ),
-            max_utterance_frames=int(MAX_UTTERANCE_SECONDS * frames_per_second),
-            cooldown_frames=int(COOLDOWN_SECONDS * frames_per_second),
+        SessionConfig.from_seconds(
+            frames_per_second,
+            post_wake=POST_WAKE_SECONDS,
+            speech_start_timeout=SPEECH_START_TIMEOUT_SECONDS,
+            max_utterance=MAX_UTTERANCE_SECONDS,
+            cooldown=COOLDOWN_SECONDS,
+            follow_up=FOLLOW_UP_SECONDS,
         )
     )
+    model_residency.start(session)
+    if FOLLOW_UP_SECONDS > 0:
+        log.info(f"startup.follow_up.enabled seconds={FOLLOW_UP_SECONDS}")
 
     front_end = FrontEnd(
         FrontEndConfig(
@@ -593,6 +1368,8 @@ def main() -> None:
         )
     )
 
+    log.info(f"startup.vad impl={front_end.config.vad_impl}")
+
     try:
         log.info("startup.init.wake_word.begin")
         wake_word = None
@@ -618,190 +1395,167 @@ def main() -> None:
         recorder = SpeechRecorder(
             sample_rate=SAMPLE_RATE,
             min_duration=RECORDER_MIN_DURATION,
+            capacity_seconds=MAX_UTTERANCE_SECONDS + FRONTEND_PREROLL_SECONDS,
         )
         log.info("startup.init.recorder.done")
     except Exception as e:
         log.exception(f"startup.init.failed | {e}")
         raise
 
-    stt: SpeechToText | None = None
-    stt_lock = threading.Lock()
-
-    def get_stt() -> SpeechToText:
-        nonlocal stt
-        if stt is None:
-            with stt_lock:
-                if stt is None:
-                    log.info("startup.init.stt.begin")
-                    stt = SpeechToText()
-                    log.info("startup.init.stt.done")
-        return stt
-
-    get_stt()
-
-    def _start_worker() -> threading.Thread:
-        t = threading.Thread(
-            target=task_worker,
-            args=(get_stt, session),
-            daemon=True,
-            name="safebox-task-worker",
-        )
-        t.start()
-        return t
-
-    worker = _start_worker()
-    log.info("startup.task_worker.started")
-
-    def finalize_recording(reason: str) -> None:
-        path = recorder.stop_and_save()
-        session.set_processing()
-        device_request_id = getattr(recorder, "_device_request_id", None)
-
-        log.info(
-            f"recording.finalized reason={reason}",
-            extra=with_request_id(device_request_id),
-        )
-
-        if path:
-            task_queue.put((path, device_request_id))
+    log.info("startup.init.stt.begin")
+    stt: SpeechToText | STTClient
+    if STT_SERVICE_ENABLED:
+        # Keeps re-probing a service that is down; decodes locally in the
+        # meantime only with STT_LOCAL_FALLBACK=true.
+        stt = FallbackSTTClient(SpeechToText)
+        if stt.ping():
+            log.info(f"startup.init.stt.service socket={stt.socket_path}")
+        elif stt.local_enabled:
+            log.warning("startup.init.stt.service_unavailable -> local model until it answers")
+            stt.local()
         else:
-            log.warning(
-                "recording.no_path -> cooldown",
-                extra=with_request_id(device_request_id),
-            )
-            session.set_cooldown()
-            clear_request_id()
-
-    def audio_callback(indata, frames, time_info, status) -> None:
-        if status:
-            log.warning(f"audio_callback.status | {status}", extra=with_request_id())
-
-        if indata is None or len(indata) == 0:
-            return
-
-        session.tick()
-
-        _, _, wake_pcm, speech_pcm, mono_record = front_end.split_channels(indata)
-        front_end.push_preroll(speech_pcm)
-
-        if session.can_run_wake():
-            try:
-                if consume_manual_voice_trigger():
-                    device_request_id = new_request_id()
-                    recorder._device_request_id = device_request_id
-
-                    if session.speaking():
-                        stop_audio()
-                        log.info(
-                            "barge_in.detected -> stop_audio",
-                            extra=with_request_id(device_request_id),
-                        )
-
-                    log.info(
-                        "manual.voice_trigger.detected",
-                        extra=with_request_id(device_request_id),
-                    )
-                    try:
-                        speak("Listening.")
-                    except Exception as e:
-                        log.warning(
-                            f"manual.voice_trigger.announce_failed | {e}",
-                            extra=with_request_id(device_request_id),
-                        )
-
-                    front_end.reset_vad()
-                    preroll = front_end.get_preroll_audio()
-                    recorder.start(initial_audio=preroll)
-                    recorder.add(mono_record)
-                    session.start_listening()
-                    log.info(
-                        "manual.voice_trigger -> state=LISTENING",
-                        extra=with_request_id(device_request_id),
-                    )
-                    return
+            log.warning("startup.init.stt.service_unavailable -> requests fail until it answers")
+    else:
+        stt = SpeechToText()
+        stt.warm_up()
+    log.info("startup.init.stt.done")
 
-                if wake_word is not None and wake_word.process_audio(wake_pcm):
-                    device_request_id = new_request_id()
-                    recorder._device_request_id = device_request_id
-
-                    if session.speaking():
-                        stop_audio()
-                        log.info(
-                            "barge_in.detected -> stop_audio",
-                            extra=with_request_id(device_request_id),
-                        )
-
-                    keyword, _ = get_wake_word_config()
-                    log.info(
-                        f"wake_word.detected keyword={keyword}",
-                        extra=with_request_id(device_request_id),
-                    )
-                    front_end.reset_vad()
-                    preroll = front_end.get_preroll_audio()
-                    recorder.start(initial_audio=preroll)
-                    recorder.add(mono_record)
-                    session.start_listening()
-                    log.info(
-                        "wake.detected -> state=LISTENING",
-                        extra=with_request_id(device_request_id),
-                    )
-                    return
-
-            except Exception as e:
-                log.warning(f"wake.process_failed | {e}", extra=with_request_id())
+    def get_stt() -> SpeechToText | STTClient:
+        return stt
 
-        if session.listening():
-            recorder.add(mono_record)
+    streamer: StreamingTranscriber | None = None
+    if STT_STREAMING_ENABLED:
+        # `processor` is bound below, before any audio can produce a partial.
+        streamer = StreamingTranscriber(
+            stt,
+            on_partial=(
+                (lambda rid, text: early_endpoint_check(processor, rid, text))
+                if STT_EARLY_ENDPOINT_ENABLED
+                else None
+            ),
+            # Partials queue behind final transcripts in the STT service.
+            partial_stt=(
+                stt.with_priority(PRIORITY_PARTIAL) if isinstance(stt, STTClient) else None
+            ),
+        )
+        log.info("startup.stt_streaming.enabled")
 
-            if session.get_post_wake_remaining() > 0:
-                return
+    pipeline = build_task_pipeline(get_stt, session, streamer, front_end)
+    pipeline.start()
+    log.info(f"startup.task_pipeline.started stages={list(pipeline.by_name)}")
 
-            speech_active = front_end.is_speech(speech_pcm)
-            if speech_active:
-                session.mark_speech_seen()
+    manual_trigger = threading.Event()
 
-            if (
-                not session.get_has_seen_speech()
-                and session.get_speech_start_timeout_remaining() <= 0
-            ):
-                finalize_recording("speech_start_timeout")
-                return
+    command_spotter = create_command_spotter(
+        sample_rate=SAMPLE_RATE,
+        frame_size=FRAME_SIZE,
+        speech_threshold=FRONTEND_SPEECH_THRESHOLD,
+        silence_threshold=FRONTEND_SILENCE_THRESHOLD,
+    )
+    log.info(
+        f"startup.command_spotter={type(command_spotter).__name__ if command_spotter else None}"
+    )
 
-            if session.get_has_seen_speech() and not speech_active:
-                finalize_recording("trailing_silence")
-                return
+    processor = FrameProcessor(
+        front_end,
+        session,
+        recorder,
+        wake_word=wake_word,
+        manual_trigger=manual_trigger,
+        command_spotter=command_spotter,
+        command_window_frames=int(AUDIO_COMMAND_WINDOW_SECONDS * frames_per_second),
+        follow_up_speech_frames=int(FOLLOW_UP_MIN_SPEECH_SECONDS * frames_per_second),
+    )
 
-            if session.get_max_utterance_remaining() <= 0:
-                finalize_recording("max_utterance")
-                return
+    threading.Thread(
+        target=manual_trigger_watcher,
+        args=(manual_trigger, processor),
+        daemon=True,
+        name="manual-trigger-watcher",
+    ).start()
+
+    threading.Thread(
+        target=audio_event_worker,
+        args=(processor, session, pipeline, streamer),
+        daemon=True,
+        name="audio-event-worker",
+    ).start()
+
+    ring = FrameRing(
+        slots=max(2, int(AUDIO_RING_SECONDS * frames_per_second)),
+        frame_size=FRAME_SIZE,
+        channels=CHANNELS,
+    )
+    def audio_processing(*args, **kwargs) -> None:
+        cpu_profile.pin_thread("audio")
+        processor.run(*args, **kwargs)
+
+    threading.Thread(
+        target=audio_processing,
+        args=(ring,),
+        kwargs={"poll_seconds": AUDIO_PROCESSING_POLL_SECONDS},
+        daemon=True,
+        name="audio-processing",
+    ).start()
+    log.info(f"startup.audio_ring.ready slots={ring.slots}")
+
+    audio_callback = make_audio_callback(
+        processor, ring, on_first_block=lambda: cpu_profile.pin_thread("audio")
+    )
 
     log.info("startup.stream.opening")
     print("[SYS] Listening...")
 
-    with sd.InputStream(
-        device=DEVICE,
-        samplerate=SAMPLE_RATE,
-        channels=CHANNELS,
-        dtype="int16",
-        blocksize=FRAME_SIZE,
-        callback=audio_callback,
-    ):
+    with open_input_stream(audio_callback) as stream:
         log.info("startup.stream.open")
         try:
             last_wake_retry = 0.0
+            reported_status_count = 0
+            reported_overruns = 0
+            last_stats_publish = 0.0
 
             while True:
                 now = time.time()
 
-                if wake_word is None and now - last_wake_retry > 10:
-                    wake_word = try_init_wake_word(wake_word)
+                if processor.wake_word is None and now - last_wake_retry > 10:
+                    processor.wake_word = try_init_wake_word(processor.wake_word)
                     last_wake_retry = now
 
-                if not worker.is_alive():
-                    log.error("task_worker.died -> restarting")
-                    worker = _start_worker()
+                if now - last_stats_publish >= AUDIO_STATS_PUBLISH_SECONDS:
+                    publish_audio_stats(ring, processor)
+                    publish_pipeline_stats(pipeline)
+                    publish_trim_stats()
+                    publish_executor_stats()
+                    last_stats_publish = now
 
-                worker.join(timeout=1)
+                if processor.status_count != reported_status_count:
+                    log.warning(
+                        f"audio_callback.status | {processor.last_status} "
+                        f"count={processor.status_count - reported_status_count}",
+                        extra=with_request_id(),
+                    )
+                    reported_status_count = processor.status_count
+
+                if ring.overruns != reported_overruns:
+                    log.warning(
+                        f"audio_ring.overrun dropped={ring.overruns - reported_overruns} "
+                        f"high_water={ring.high_water}/{ring.slots}",
+                        extra=with_request_id(),
+                    )
+                    reported_overruns = ring.overruns
+
+                if (
+                    AUDIO_REPLAY_FILES
+                    and stream.finished.is_set()
+                    and session.get_state() in (STATE_IDLE, STATE_COOLDOWN, STATE_FOLLOW_UP)
+                    and pipeline.idle()
+                ):
+                    log.info("replay.finished -> shutting down")
+                    break
+
+                pipeline.restart_dead()
+                cpu_profile.boost_end()
+                time.sleep(1)
         except KeyboardInterrupt:
             log.info("main.keyboard_interrupt -> shutting down")
             print("[SYS] Stopped by user")
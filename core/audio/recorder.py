@@ -1,63 +1,122 @@
 import os
-import time
+from pathlib import Path
 
 import numpy as np
 import soundfile as sf
 
+from core.audio.ring_buffer import AudioRingBuffer
+
 
 class SpeechRecorder:
+    """
+    Utterance recorder backed by a preallocated int16 circular buffer.
+
+    Capacity covers the longest utterance plus pre-roll, so a normal
+    recording never wraps and audio() is a zero-copy view. add() copies
+    the frame into the buffer and never allocates, which keeps memory
+    constant during LISTENING.
+    """
+
     def __init__(
         self,
         sample_rate: int | None = None,
         min_duration: float | None = None,
+        capacity_seconds: float | None = None,
     ):
         if sample_rate is None:
             sample_rate = int(os.getenv("AUDIO_INPUT_SAMPLE_RATE", "16000"))
         if min_duration is None:
             min_duration = float(os.getenv("AUDIO_MIN_RECORD_SECONDS", "0.60"))
+        if capacity_seconds is None:
+            capacity_seconds = (
+                float(os.getenv("AUDIO_MAX_UTTERANCE_SECONDS", "8.0"))
+                + float(os.getenv("AUDIO_PREROLL_SECONDS", "1.0"))
+            )
 
         self.sample_rate = sample_rate
         self.min_samples = int(sample_rate * min_duration)
-        self.frames = []
+        # One extra second of slack for the wake frame and block rounding.
+        self.buffer = AudioRingBuffer(
+            max_samples=int(sample_rate * (capacity_seconds + 1.0))
+        )
         self.recording = False
 
-    def start(self, initial_audio: np.ndarray | None = None):
-        self.frames = []
+    @property
+    def num_samples(self) -> int:
+        return len(self.buffer)
+
+    def start(
+        self,
+        initial_audio: np.ndarray | None = None,
+        preroll: AudioRingBuffer | None = None,
+    ):
+        self.buffer.clear()
         self.recording = True
 
-        if initial_audio is not None and len(initial_audio) > 0:
-            initial_audio = np.asarray(initial_audio, dtype=np.int16)
-            if initial_audio.ndim == 1:
-                initial_audio = initial_audio.reshape(-1, 1)
-            self.frames.append(initial_audio.copy())
+        if preroll is not None:
+            self.buffer.extend_from(preroll)
 
-        print("[REC] Recording started")
+        if initial_audio is not None and len(initial_audio) > 0:
+            self.buffer.append(np.asarray(initial_audio, dtype=np.int16).reshape(-1))
 
     def add(self, audio: np.ndarray):
         if not self.recording:
             return
+        self.buffer.append(audio)
 
-        audio = np.asarray(audio, dtype=np.int16)
-        if audio.ndim == 1:
-            audio = audio.reshape(-1, 1)
+    def audio(self) -> np.ndarray:
+        """Recorded samples (1-D int16). A view: valid until the next start()."""
+        return self.buffer.view()
 
-        self.frames.append(audio.copy())
+    def snapshot(self) -> np.ndarray:
+        """
+        Float32 copy of what has been recorded so far, for readers on
+        other threads (streaming STT) while add() keeps appending.
+        Samples below the length read here are already written.
+        """
+        n = self.num_samples
+        if n == 0 or self.buffer.wrapped:
+            return np.zeros(0, dtype=np.float32)
+        return np.multiply(self.buffer.view()[:n], 1.0 / 32768.0, dtype=np.float32)
 
-    def stop_and_save(self):
+    def stop(self):
+        """Stop accepting frames. Cheap; safe to call from the audio callback."""
         self.recording = False
 
-        if not self.frames:
+    def finish(self) -> np.ndarray | None:
+        """
+        Return the utterance as float32 PCM in [-1, 1), the format
+        faster-whisper takes directly. The int16 -> float32 conversion is
+        the only copy, and it frees the ring for the next recording.
+        Returns None if nothing (or too little) was captured.
+        """
+        self.stop()
+
+        if self.num_samples == 0:
             print("[REC] No audio captured")
             return None
 
-        audio = np.concatenate(self.frames, axis=0)
-
-        if audio.shape[0] < self.min_samples:
-            dur = audio.shape[0] / self.sample_rate
+        if self.num_samples < self.min_samples:
+            dur = self.num_samples / self.sample_rate
             print(f"[REC] Ignored (too short: {dur:.2f}s)")
             return None
 
-        path = f"/tmp/command_{int(time.time())}.wav"
-        sf.write(path, audio, self.sample_rate)
-        print(f"[REC] Recording saved: {path}")
-        return path
+        return np.multiply(self.audio(), 1.0 / 32768.0, dtype=np.float32)
+
+
+def archive_path(directory: str | Path, request_id: str) -> Path:
+    # Named by request id, so two utterances in the same second never collide.
+    return Path(directory) / f"command_{request_id}.wav"
+
+
+def archive_utterance(
+    audio: np.ndarray,
+    sample_rate: int,
+    directory: str | Path,
+    request_id: str,
+) -> Path:
+    """Write an utterance to `directory` as 16-bit WAV."""
+    path = archive_path(directory, request_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(str(path), audio, sample_rate, subtype="PCM_16")
+    return path
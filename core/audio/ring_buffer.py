@@ -1,33 +1,80 @@
-from collections import deque
 import numpy as np
 
 
 class AudioRingBuffer:
+    """
+    Fixed-capacity int16 circular buffer.
+
+    Storage is allocated once; append() copies into it with wrap-around
+    writes, so pushing a frame never allocates. Once full, the oldest
+    samples are overwritten.
+
+    Reads:
+    - view(): contiguous oldest-first samples. Zero-copy until the
+      buffer wraps, then a single copy.
+    - segments(): the same samples as (older, newer) views, never copies.
+    Views alias the storage and are only valid until the next append().
+    """
+
     def __init__(self, max_samples: int):
-        self.max_samples = max_samples
-        self._buf = deque()
+        self.max_samples = max(0, int(max_samples))
+        self._buf = np.zeros(self.max_samples, dtype=np.int16)
+        self._empty = self._buf[:0]
+        self._write = 0
         self._count = 0
 
+    def __len__(self) -> int:
+        return self._count
+
     def append(self, frame: np.ndarray):
-        if frame is None or len(frame) == 0:
+        if frame is None or len(frame) == 0 or self.max_samples == 0:
             return
 
-        frame = np.asarray(frame, dtype=np.int16).reshape(-1)
-        self._buf.append(frame)
-        self._count += len(frame)
+        n = len(frame)
+        cap = self.max_samples
+
+        if n >= cap:
+            self._buf[:] = frame[n - cap:]
+            self._write = 0
+            self._count = cap
+            return
 
-        while self._count > self.max_samples and self._buf:
-            removed = self._buf.popleft()
-            self._count -= len(removed)
+        first = min(n, cap - self._write)
+        self._buf[self._write:self._write + first] = frame[:first]
+        if first < n:
+            self._buf[:n - first] = frame[first:]
+
+        self._write = (self._write + n) % cap
+        self._count = min(self._count + n, cap)
+
+    def extend_from(self, other: "AudioRingBuffer"):
+        """Append another ring's contents (oldest first) without an intermediate copy."""
+        for segment in other.segments():
+            self.append(segment)
 
     def clear(self):
-        self._buf.clear()
+        self._write = 0
         self._count = 0
 
+    @property
+    def wrapped(self) -> bool:
+        return self._count == self.max_samples and self._write != 0
+
+    def segments(self) -> tuple[np.ndarray, np.ndarray]:
+        if not self.wrapped:
+            return self._buf[:self._count], self._empty
+        return self._buf[self._write:], self._buf[:self._write]
+
+    def view(self) -> np.ndarray:
+        if not self.wrapped:
+            return self._buf[:self._count]
+        return np.concatenate(self.segments())
+
     def get_audio(self) -> np.ndarray:
-        if not self._buf:
-            return np.zeros((0,), dtype=np.int16)
-        return np.concatenate(list(self._buf), axis=0)
+        """Return the buffered samples, oldest first, as a new array."""
+        if not self.wrapped:
+            return self._buf[:self._count].copy()
+        return np.concatenate(self.segments())
 
     def get_audio_2d(self) -> np.ndarray:
         audio = self.get_audio()
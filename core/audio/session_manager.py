@@ -9,18 +9,29 @@ STATE MACHINE:
     SPEAKING is entered while TTS plays; wake word can still fire
     from SPEAKING state (barge-in support).
 
+    FOLLOW_UP (optional, config.follow_up_frames > 0) replaces COOLDOWN
+    after a spoken reply: for a few seconds speech alone starts the next
+    turn, with no wake word and no post-wake grace.
+
+        SPEAKING ──start_follow_up──► FOLLOW_UP ──speech──► LISTENING
+                                          │
+                                          └──window expires──► IDLE
+
 THREAD SAFETY:
-    audio_callback (sounddevice thread) calls: tick(), can_run_wake(),
-    listening(), speaking(), start_listening().
+    audio_callback (sounddevice thread) calls: tick(), start_listening(),
+    mark_speech_seen(). tick() fills a SessionSnapshot so the per-frame
+    path reads all state under a single lock acquisition.
 
-    task_worker thread calls: set_processing(), set_speaking(),
-    set_cooldown(), set_idle().
+    task pipeline stages (core.audio.task_pipeline) call: set_speaking(),
+    set_cooldown(), set_cooldown_if(), set_idle(). The frame processor
+    calls set_processing() on finalize.
 
     All public methods are protected by a single re-entrant lock so
     state is never observed half-written across threads.
 """
 
 import threading
+import time
 from dataclasses import dataclass
 
 # ── States ────────────────────────────────────────────────────────────────────
@@ -29,6 +40,7 @@ STATE_LISTENING  = "listening"
 STATE_PROCESSING = "processing"
 STATE_SPEAKING   = "speaking"
 STATE_COOLDOWN   = "cooldown"
+STATE_FOLLOW_UP  = "follow_up"
 
 
 @dataclass
@@ -37,6 +49,50 @@ class SessionConfig:
     speech_start_timeout_frames: int
     max_utterance_frames:        int
     cooldown_frames:             int
+    follow_up_frames:            int = 0
+
+    @classmethod
+    def from_seconds(
+        cls,
+        frames_per_second: float,
+        *,
+        post_wake: float,
+        speech_start_timeout: float,
+        max_utterance: float,
+        cooldown: float,
+        follow_up: float = 0.0,
+    ) -> "SessionConfig":
+        return cls(
+            post_wake_grace_frames=int(post_wake * frames_per_second),
+            speech_start_timeout_frames=int(speech_start_timeout * frames_per_second),
+            max_utterance_frames=int(max_utterance * frames_per_second),
+            cooldown_frames=int(cooldown * frames_per_second),
+            follow_up_frames=int(follow_up * frames_per_second),
+        )
+
+
+class SessionSnapshot:
+    """
+    Reusable per-frame view of the session state.
+
+    Allocated once by the caller and refreshed in place by tick(), so the
+    audio callback reads state once per frame without creating objects.
+    """
+
+    __slots__ = (
+        "state",
+        "post_wake_remaining",
+        "speech_start_timeout_remaining",
+        "max_utterance_remaining",
+        "has_seen_speech",
+    )
+
+    def __init__(self) -> None:
+        self.state                          = STATE_IDLE
+        self.post_wake_remaining            = 0
+        self.speech_start_timeout_remaining = 0
+        self.max_utterance_remaining        = 0
+        self.has_seen_speech                = False
 
 
 class SessionManager:
@@ -59,11 +115,16 @@ class SessionManager:
         self.speech_start_timeout_remaining   = 0
         self.max_utterance_remaining          = 0
         self.cooldown_remaining               = 0
+        self.follow_up_remaining              = 0
+
+        # Turn that opened the current follow-up window, and when (monotonic)
+        self.follow_up_request_id: str | None = None
+        self.follow_up_opened_at              = 0.0
 
         # VAD flag
         self.has_seen_speech = False
 
-    # ── Transitions (called from task_worker thread) ──────────────────────────
+    # ── Transitions (called from task pipeline threads) ───────────────────────
 
     def set_idle(self) -> None:
         with self._lock:
@@ -72,6 +133,7 @@ class SessionManager:
             self.speech_start_timeout_remaining = 0
             self.max_utterance_remaining        = 0
             self.cooldown_remaining             = 0
+            self.follow_up_remaining            = 0
             self.has_seen_speech                = False
 
     def set_speaking(self) -> None:
@@ -91,18 +153,70 @@ class SessionManager:
             self.max_utterance_remaining        = 0
             self.has_seen_speech                = False
 
+    def set_cooldown_if(self, *states: str) -> bool:
+        """
+        set_cooldown() only while in one of `states`. Pipeline stages end
+        their turn with this so a newer turn (e.g. LISTENING after a
+        barge-in) is not cut short by an older one finishing.
+        """
+        with self._lock:
+            if self.state not in states:
+                return False
+            self.state                          = STATE_COOLDOWN
+            self.cooldown_remaining             = self.config.cooldown_frames
+            self.post_wake_remaining            = 0
+            self.speech_start_timeout_remaining = 0
+            self.max_utterance_remaining        = 0
+            self.has_seen_speech                = False
+            return True
+
+    def start_follow_up(self, request_id: str | None = None) -> bool:
+        """
+        After a spoken reply, open the follow-up window instead of
+        cooling down. Only from SPEAKING (a barge-in may already have
+        started the next turn) and only when the window is enabled;
+        returns False otherwise so the caller can cool down as usual.
+        """
+        with self._lock:
+            if self.state != STATE_SPEAKING or self.config.follow_up_frames <= 0:
+                return False
+            self.state                          = STATE_FOLLOW_UP
+            self.follow_up_remaining            = self.config.follow_up_frames
+            self.follow_up_request_id           = request_id
+            self.follow_up_opened_at            = time.monotonic()
+            self.post_wake_remaining            = 0
+            self.speech_start_timeout_remaining = 0
+            self.max_utterance_remaining        = 0
+            self.has_seen_speech                = False
+            return True
+
+    def follow_up_origin(self) -> tuple[str | None, float]:
+        """(request_id, monotonic open time) of the last follow-up window."""
+        with self._lock:
+            return self.follow_up_request_id, self.follow_up_opened_at
+
     # ── Transitions (called from audio_callback thread) ───────────────────────
 
-    def start_listening(self) -> None:
+    def start_listening(self, follow_up: bool = False) -> None:
+        """
+        Begin recording. A follow-up turn was started by speech itself,
+        so it skips the post-wake grace and counts speech as seen.
+        """
         with self._lock:
             self.state                          = STATE_LISTENING
-            self.post_wake_remaining            = self.config.post_wake_grace_frames
+            self.post_wake_remaining            = 0 if follow_up else self.config.post_wake_grace_frames
             self.speech_start_timeout_remaining = self.config.speech_start_timeout_frames
             self.max_utterance_remaining        = self.config.max_utterance_frames
-            self.has_seen_speech                = False
+            self.follow_up_remaining            = 0
+            self.has_seen_speech                = follow_up
 
-    def tick(self) -> None:
-        """Advance all frame counters by one. Called once per audio frame."""
+    def tick(self, snapshot: SessionSnapshot | None = None) -> None:
+        """
+        Advance all frame counters by one. Called once per audio frame.
+
+        When a snapshot is passed it is filled with the post-tick state
+        under the same lock acquisition.
+        """
         with self._lock:
             if self.state == STATE_COOLDOWN:
                 if self.cooldown_remaining > 0:
@@ -115,6 +229,12 @@ class SessionManager:
                     self.max_utterance_remaining        = 0
                     self.has_seen_speech                = False
 
+            elif self.state == STATE_FOLLOW_UP:
+                if self.follow_up_remaining > 0:
+                    self.follow_up_remaining -= 1
+                if self.follow_up_remaining <= 0:
+                    self.state = STATE_IDLE
+
             elif self.state == STATE_LISTENING:
                 if self.post_wake_remaining > 0:
                     self.post_wake_remaining -= 1
@@ -125,16 +245,24 @@ class SessionManager:
                 if self.max_utterance_remaining > 0:
                     self.max_utterance_remaining -= 1
 
+            if snapshot is not None:
+                snapshot.state                          = self.state
+                snapshot.post_wake_remaining            = self.post_wake_remaining
+                snapshot.speech_start_timeout_remaining = self.speech_start_timeout_remaining
+                snapshot.max_utterance_remaining        = self.max_utterance_remaining
+                snapshot.has_seen_speech                = self.has_seen_speech
+
     # ── Queries (called from audio_callback thread) ───────────────────────────
 
     def can_run_wake(self) -> bool:
         """
         Wake word detection and manual trigger checks run only when
-        idle or speaking (barge-in). Never run during recording,
-        processing, or cooldown — those states have their own handlers.
+        idle, speaking (barge-in) or in the follow-up window. Never run
+        during recording, processing, or cooldown — those states have
+        their own handlers.
         """
         with self._lock:
-            return self.state in (STATE_IDLE, STATE_SPEAKING)
+            return self.state in (STATE_IDLE, STATE_SPEAKING, STATE_FOLLOW_UP)
 
     def listening(self) -> bool:
         with self._lock:
@@ -1,3 +1,5 @@
+import math
+
 import numpy as np
 
 
@@ -26,14 +28,31 @@ class SimpleVAD:
         self._in_speech = False
         self._silence_count = 0
 
+        # float32 scratch frame reused by energy() to avoid per-frame allocs
+        self._scratch = np.zeros(0, dtype=np.float32)
+
     def reset(self):
         self._ema_energy = 0.0
         self._in_speech = False
         self._silence_count = 0
 
+    def observe_noise(self, frame: np.ndarray):
+        """Fixed thresholds: nothing to learn while idle."""
+
+    def rms_thresholds(self) -> tuple[float, float]:
+        """(speech, silence) thresholds in int16 RMS units."""
+        return self.speech_threshold, self.silence_threshold
+
     def energy(self, frame: np.ndarray) -> float:
-        x = frame.astype(np.float32)
-        rms = float(np.sqrt(np.mean(np.square(x)))) if x.size else 0.0
+        n = frame.shape[0]
+        if n:
+            if self._scratch.shape[0] != n:
+                self._scratch = np.zeros(n, dtype=np.float32)
+            x = self._scratch
+            np.copyto(x, frame, casting="unsafe")
+            rms = math.sqrt(float(np.dot(x, x)) / n)
+        else:
+            rms = 0.0
         self._ema_energy = (self.smoothing * rms) + ((1.0 - self.smoothing) * self._ema_energy)
         return self._ema_energy
 
@@ -1,20 +1,509 @@
+import os
+import threading
+import time
+from typing import Callable
+
+import numpy as np
 from faster_whisper import WhisperModel
 
+from core import cpu_profile, tracing
+from core.audio.stt_client import STTResult
+from core.logger import get_logger, with_request_id
+
+log = get_logger("stt")
+
+STT_SAMPLE_RATE = 16000
+STT_MODEL = os.getenv("STT_MODEL", "tiny.en")
+
+# Cascade: re-decode low-confidence results with a larger model
+STT_CASCADE_ENABLED = os.getenv("STT_CASCADE_ENABLED", "false").lower() == "true"
+STT_CASCADE_MODEL = os.getenv("STT_CASCADE_MODEL", "base.en")
+STT_CASCADE_MIN_AVG_LOGPROB = float(os.getenv("STT_CASCADE_MIN_AVG_LOGPROB", "-0.7"))
+STT_CASCADE_MAX_NO_SPEECH_PROB = float(os.getenv("STT_CASCADE_MAX_NO_SPEECH_PROB", "0.6"))
+
+# Streaming (partial transcripts during LISTENING)
+STT_STREAM_INTERVAL_SECONDS = float(os.getenv("STT_STREAM_INTERVAL_MS", "400")) / 1000.0
+STT_STREAM_MIN_SECONDS = float(os.getenv("STT_STREAM_MIN_SECONDS", "0.6"))
+STT_STREAM_STABLE_MARGIN_SECONDS = float(os.getenv("STT_STREAM_STABLE_MARGIN_SECONDS", "1.0"))
+# Tail audio after the last partial decode below this RMS (float PCM) is
+# treated as silence, so the last partial is reused as the final text.
+STT_STREAM_TAIL_SPEECH_RMS = float(os.getenv("STT_STREAM_TAIL_SPEECH_RMS", "0.008"))
+
 
 class SpeechToText:
-    def __init__(self):
-        self.model = WhisperModel(
-            "tiny.en",
-            device="cpu",
-            compute_type="int8"
+    """
+    faster-whisper STT, optionally as a two-tier cascade.
+
+    With STT_CASCADE_ENABLED the STT_MODEL result (tiny.en) is checked
+    first: if its duration-weighted avg_logprob is below
+    STT_CASCADE_MIN_AVG_LOGPROB, or a segment with text has a
+    no_speech_prob above STT_CASCADE_MAX_NO_SPEECH_PROB (a likely
+    hallucination), the audio is decoded again with STT_CASCADE_MODEL,
+    which is loaded up front and kept warm. Audio the fast model calls
+    silence (no text) is never escalated. Streaming partials pass
+    cascade=False and always use the fast model; escalate=True skips
+    the fast pass and goes straight to the cascade model (the streaming
+    final, whose fast-model confidence is already known). When the
+    cascade model is not available then, nothing is decoded and the
+    empty result has escalated=False.
+    """
+
+    def __init__(
+        self,
+        model: str = STT_MODEL,
+        cascade_model: str | None = STT_CASCADE_MODEL if STT_CASCADE_ENABLED else None,
+    ):
+        self.model_name = model
+        self.cpu_threads = cpu_profile.threads("stt")
+        self.model = _load(model, self.cpu_threads)
+        self.cascade_model_name = cascade_model
+        self.cascade_model = None
+        # The thermal governor turns escalation off without unloading.
+        self.cascade_enabled = True
+        # The memory manager may unload the cascade model. After an idle
+        # unload a decode that needs it loads it again on the spot; while
+        # it is evicted for memory (cascade_allowed False) the decode only
+        # sets cascade_wanted so safebox-stt reloads it once allowed.
+        self.cascade_last_used = time.monotonic()
+        self.cascade_allowed = True
+        self.cascade_wanted = False
+        if cascade_model:
+            self.cascade_model = _load(cascade_model, self.cpu_threads)
+            log.info(f"stt.cascade.enabled fast={model} accurate={cascade_model}")
+        # Streaming partials and the final pass share one model.
+        self._lock = threading.Lock()
+
+    def set_cpu_threads(self, cpu_threads: int) -> None:
+        """
+        Reload the fast model with a different CTranslate2 thread count (0 =
+        library default). The cascade model is dropped first and reloads
+        with the new count when next wanted, so at most one extra copy of
+        one tier is ever resident. Loading and warming happen outside the
+        lock; decodes only wait for the swap.
+        """
+        if cpu_threads == self.cpu_threads:
+            return
+        with self._lock:
+            previous, self.cpu_threads = self.cpu_threads, cpu_threads
+            dropped = self.cascade_model is not None
+            self.cascade_model = None
+        if dropped:
+            log.info(f"stt.cascade.unloaded model={self.cascade_model_name} reason=cpu_threads")
+        model = _load(self.model_name, cpu_threads)
+        _decode(model, np.zeros(STT_SAMPLE_RATE, dtype=np.float32), None)
+        with self._lock:
+            self.model = model
+        log.info(f"stt.cpu_threads.changed from={previous} to={cpu_threads}")
+
+    def unload_cascade(self, reason: str) -> bool:
+        with self._lock:
+            if self.cascade_model is None:
+                return False
+            self.cascade_model = None
+        log.info(f"stt.cascade.unloaded model={self.cascade_model_name} reason={reason}")
+        return True
+
+    def load_cascade(self) -> bool:
+        """Load (and warm) the cascade model outside the lock, then swap it in."""
+        if self.cascade_model_name is None or self.cascade_model is not None:
+            return False
+        model = _load(self.cascade_model_name, self.cpu_threads)
+        _decode(model, np.zeros(STT_SAMPLE_RATE, dtype=np.float32), None)
+        with self._lock:
+            self.cascade_model = model
+            self.cascade_wanted = False
+            self.cascade_last_used = time.monotonic()
+        log.info(f"stt.cascade.loaded model={self.cascade_model_name}")
+        return True
+
+    def _cascade_ready(self) -> bool:
+        """
+        Called with _lock held by a decode that wants the cascade model.
+        One that was only unloaded for being idle is loaded right here,
+        so the request still gets the accurate tier; one evicted for
+        memory (cascade_allowed cleared) is only marked as wanted.
+        """
+        if not self.cascade_enabled or self.cascade_model_name is None:
+            return False
+        if self.cascade_model is not None:
+            return True
+        if not self.cascade_allowed:
+            self.cascade_wanted = True
+            return False
+        started = time.time()
+        self.cascade_model = _load(self.cascade_model_name, self.cpu_threads)
+        self.cascade_wanted = False
+        log.info(
+            f"stt.cascade.loaded_on_demand model={self.cascade_model_name} "
+            f"load_ms={int((time.time() - started) * 1000)}",
+            extra=with_request_id(),
         )
+        return True
+
+    def warm_up(self) -> None:
+        """Run one short decode through every tier so first requests are not cold."""
+        silence = np.zeros(STT_SAMPLE_RATE, dtype=np.float32)
+        with self._lock:
+            for model in (self.model, self.cascade_model):
+                if model is not None:
+                    _decode(model, silence, None)
+
+    def transcribe(self, audio: str | np.ndarray) -> str:
+        """`audio` is a file path or 16 kHz mono float32 PCM in [-1, 1)."""
+        segments = self.transcribe_segments(audio)
+        return " ".join(text for _, _, text in segments).strip()
+
+    def transcribe_segments(
+        self,
+        audio: str | np.ndarray,
+        initial_prompt: str | None = None,
+        cascade: bool = True,
+    ) -> list[tuple[float, float, str]]:
+        """Decode and return (start_s, end_s, text) per segment."""
+        return self.transcribe_detailed(audio, initial_prompt, cascade).segments
+
+    def transcribe_detailed(
+        self,
+        audio: str | np.ndarray,
+        initial_prompt: str | None = None,
+        cascade: bool = True,
+        escalate: bool = False,
+    ) -> STTResult:
+        audio_s = round(len(audio) / STT_SAMPLE_RATE, 2) if isinstance(audio, np.ndarray) else None
+        with self._lock, tracing.span("stt.decode", audio_s=audio_s) as sp:
+            if escalate:
+                if not self._cascade_ready():
+                    return STTResult([], self.model_name)
+                self.cascade_last_used = time.monotonic()
+                raw = _decode(self.cascade_model, audio, initial_prompt)
+                result = STTResult(_plain(raw), self.cascade_model_name, True, *_confidence(raw))
+                sp.set(tier=result.tier, escalated=True)
+                return result
+
+            raw = _decode(self.model, audio, initial_prompt)
+            avg_logprob, no_speech_prob = _confidence(raw)
+            result = STTResult(_plain(raw), self.model_name, False, avg_logprob, no_speech_prob)
+
+            if (
+                cascade
+                and _needs_escalation(avg_logprob, no_speech_prob)
+                and self._cascade_ready()
+            ):
+                self.cascade_last_used = time.monotonic()
+                started = time.time()
+                raw = _decode(self.cascade_model, audio, initial_prompt)
+                avg_logprob, no_speech_prob = _confidence(raw)
+                log.info(
+                    f"stt.cascade.escalated from={self.model_name} to={self.cascade_model_name} "
+                    f"fast_avg_logprob={result.avg_logprob} "
+                    f"redecode_ms={int((time.time() - started) * 1000)}",
+                    extra=with_request_id(),
+                )
+                result = STTResult(
+                    _plain(raw), self.cascade_model_name, True, avg_logprob, no_speech_prob
+                )
+
+            sp.set(tier=result.tier, escalated=result.escalated)
+        if cascade and self.cascade_model is not None:
+            log.info(
+                f"stt.tier answered={result.tier} escalated={result.escalated} "
+                f"avg_logprob={result.avg_logprob} no_speech_prob={result.no_speech_prob}",
+                extra=with_request_id(),
+            )
+        return result
+
+
+def _load(model: str, cpu_threads: int) -> WhisperModel:
+    return WhisperModel(model, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+
+
+def _decode(model, audio, initial_prompt: str | None) -> list:
+    segments, _ = model.transcribe(
+        audio,
+        language="en",
+        beam_size=1,
+        best_of=1,
+        vad_filter=False,
+        initial_prompt=initial_prompt,
+    )
+    return list(segments)
+
+
+def _plain(raw: list) -> list[tuple[float, float, str]]:
+    return [(seg.start, seg.end, seg.text.strip()) for seg in raw]
+
+
+def _confidence(raw: list) -> tuple[float | None, float | None]:
+    """Duration-weighted avg_logprob and the highest no_speech_prob of segments with text."""
+    voiced = [seg for seg in raw if seg.text.strip()]
+    if not voiced:
+        return None, None
+    weights = [max(seg.end - seg.start, 0.01) for seg in voiced]
+    avg_logprob = sum(w * seg.avg_logprob for w, seg in zip(weights, voiced)) / sum(weights)
+    no_speech_prob = max(seg.no_speech_prob for seg in voiced)
+    return round(avg_logprob, 3), round(no_speech_prob, 3)
+
+
+def _needs_escalation(
+    avg_logprob: float | None,
+    no_speech_prob: float | None,
+    min_avg_logprob: float = STT_CASCADE_MIN_AVG_LOGPROB,
+    max_no_speech_prob: float = STT_CASCADE_MAX_NO_SPEECH_PROB,
+) -> bool:
+    """`avg_logprob` / `no_speech_prob` as returned by _confidence()."""
+    if avg_logprob is None:
+        return False  # nothing recognised: silence, not a hard utterance
+    if avg_logprob < min_avg_logprob:
+        return True
+    return no_speech_prob is not None and no_speech_prob > max_no_speech_prob
+
+
+class StreamingTranscriber:
+    """
+    Incremental STT for one utterance at a time.
 
-    def transcribe(self, wav_path: str) -> str:
-        segments, _ = self.model.transcribe(
-            wav_path,
-            language="en",
-            beam_size=1,
-            best_of=1,
-            vad_filter=False
+    While the session is LISTENING, a background thread re-decodes the
+    growing recording every STT_STREAM_INTERVAL_MS and reports the
+    partial text through `on_partial(request_id, text)`.
+
+    Segments that end more than STT_STREAM_STABLE_MARGIN_SECONDS before
+    the end of the audio are committed: their text is kept and later
+    decodes only cover audio after them (with the committed text as the
+    prompt). finish() therefore decodes just the uncommitted tail, or
+    reuses the last partial outright when nothing but silence arrived
+    after it. Either way the cascade check then runs on the confidence
+    of every piece (partial decodes included): if it trips, the whole
+    utterance is decoded again with the cascade model.
+
+    `stt` is a SpeechToText or an STTClient; `partial_stt` (default
+    `stt`) lets partials go to the STT service at a lower priority
+    than the final pass.
+    """
+
+    def __init__(
+        self,
+        stt,
+        on_partial: Callable[[str, str], None] | None = None,
+        interval_seconds: float = STT_STREAM_INTERVAL_SECONDS,
+        sample_rate: int = STT_SAMPLE_RATE,
+        partial_stt=None,
+    ) -> None:
+        self.stt = stt
+        self.partial_stt = partial_stt if partial_stt is not None else stt
+        self.on_partial = on_partial
+        self.interval_seconds = interval_seconds
+        self.sample_rate = sample_rate
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._request_id: str | None = None
+        self._source: Callable[[], np.ndarray] | None = None
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._committed_text = ""
+        self._committed_samples = 0
+        self._partial_text = ""
+        self._decoded_samples = 0
+        self.partial_decodes = 0
+        # (seconds, avg_logprob, no_speech_prob) of the fast-model decodes
+        # behind the committed text, and behind the uncommitted rest.
+        self._committed_confidence: list[tuple] = []
+        self._partial_confidence: tuple | None = None
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+
+    def start(self, request_id: str, source: Callable[[], np.ndarray]) -> None:
+        """Begin streaming. `source()` returns the float32 recording so far."""
+        self.cancel()
+        with self._lock:
+            self._reset_state()
+            self._request_id = request_id
+            self._source = source
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._loop,
+                args=(self._stop, request_id),
+                daemon=True,
+                name="stt-streaming",
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop partial decoding (recording finalized). Keeps decoded state."""
+        self._stop.set()
+
+    def cancel(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            self._thread = None
+            self._request_id = None
+            self._source = None
+
+    def active_for(self, request_id: str | None) -> bool:
+        return request_id is not None and self._request_id == request_id
+
+    def finish(self, audio: np.ndarray, request_id: str) -> str:
+        """Final transcript for `audio`, reusing what streaming already decoded."""
+        self.stop()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+        with self._lock:
+            committed_text = self._committed_text
+            committed_samples = self._committed_samples
+            partial_text = self._partial_text
+            decoded_samples = self._decoded_samples
+            confidence = list(self._committed_confidence)
+            partial_confidence = self._partial_confidence
+            self._thread = None
+            self._request_id = None
+            self._source = None
+
+        tail = audio[decoded_samples:]
+        if decoded_samples and _rms(tail) < STT_STREAM_TAIL_SPEECH_RMS:
+            tracing.mark("stt.reused_partial", request_id)
+            log.info(
+                f"stt.stream.final reused_partial=True "
+                f"skipped_seconds={len(audio) / self.sample_rate:.2f}",
+                extra=with_request_id(request_id),
+            )
+            text = partial_text
+            confidence.append(partial_confidence)
+        else:
+            remainder = audio[committed_samples:]
+            result = self.stt.transcribe_detailed(remainder, initial_prompt=committed_text or None)
+            text = _join(committed_text, *(t for _, _, t in result.segments))
+            log.info(
+                f"stt.stream.final reused_partial=False "
+                f"skipped_seconds={committed_samples / self.sample_rate:.2f}",
+                extra=with_request_id(request_id),
+            )
+            confidence.append(
+                (len(remainder) / self.sample_rate, result.avg_logprob, result.no_speech_prob)
+            )
+
+        # The committed text came from the fast model only; the cascade
+        # check covers the whole utterance, not just the last piece.
+        if text and _needs_escalation(*_combined_confidence(confidence)):
+            text = self._escalate(audio, request_id, text)
+        return text
+
+    def _escalate(self, audio: np.ndarray, request_id: str, streamed_text: str) -> str:
+        """Re-decode the whole utterance with the cascade model, if it is available."""
+        started = time.time()
+        result = self.stt.transcribe_detailed(audio, escalate=True)
+        if not result.escalated:
+            return streamed_text
+        log.info(
+            f"stt.stream.escalated to={result.tier} "
+            f"redecode_ms={int((time.time() - started) * 1000)}",
+            extra=with_request_id(request_id),
         )
-        return " ".join(seg.text.strip() for seg in segments).strip()
+        return _join(*(t for _, _, t in result.segments))
+
+    # ── Background decode loop ────────────────────────────────────────────────
+
+    def _loop(self, stop: threading.Event, request_id: str) -> None:
+        min_samples = int(STT_STREAM_MIN_SECONDS * self.sample_rate)
+        margin_samples = int(STT_STREAM_STABLE_MARGIN_SECONDS * self.sample_rate)
+
+        while not stop.wait(self.interval_seconds):
+            try:
+                source = self._source
+                if source is None:
+                    return
+                audio = source()
+                if len(audio) < min_samples or len(audio) <= self._decoded_samples:
+                    continue
+
+                t0 = time.time()
+                base = self._committed_samples
+                result = self.partial_stt.transcribe_detailed(
+                    audio[base:], initial_prompt=self._committed_text or None, cascade=False
+                )
+                segments = result.segments
+                if stop.is_set() and not self.active_for(request_id):
+                    return
+
+                committed_text = self._committed_text
+                committed_samples = base
+                # Never commit the last segment: Whisper may still revise it.
+                for start_s, end_s, text in segments[:-1]:
+                    end_sample = base + int(end_s * self.sample_rate)
+                    if end_sample > len(audio) - margin_samples:
+                        break
+                    committed_text = _join(committed_text, text)
+                    committed_samples = end_sample
+
+                uncommitted = [
+                    t for _, end_s, t in segments
+                    if base + int(end_s * self.sample_rate) > committed_samples
+                ]
+                partial = _join(committed_text, *uncommitted)
+                # The decode's confidence stands for both the audio it
+                # committed and the rest it decoded.
+                confidence = (result.avg_logprob, result.no_speech_prob)
+                committed_confidence = self._committed_confidence
+                if committed_samples > base:
+                    committed_confidence = committed_confidence + [
+                        ((committed_samples - base) / self.sample_rate, *confidence)
+                    ]
+
+                with self._lock:
+                    if self._request_id != request_id:
+                        return
+                    self._committed_text = committed_text
+                    self._committed_samples = committed_samples
+                    self._committed_confidence = committed_confidence
+                    self._partial_confidence = (
+                        (len(audio) - committed_samples) / self.sample_rate, *confidence
+                    )
+                    self._partial_text = partial
+                    self._decoded_samples = len(audio)
+                    self.partial_decodes += 1
+
+                t1 = time.time()
+                log.info(
+                    f"stt.partial text={partial!r} audio_s={len(audio) / self.sample_rate:.2f} "
+                    f"decode_ms={int((t1 - t0) * 1000)}",
+                    extra=with_request_id(request_id),
+                )
+                tracing.record_span(
+                    "stt.partial", t0, t1, request_id,
+                    audio_s=round(len(audio) / self.sample_rate, 2),
+                )
+                if self.on_partial is not None and partial:
+                    self.on_partial(request_id, partial)
+
+            except Exception as e:
+                log.warning(
+                    f"stt.partial_failed | {e}",
+                    extra=with_request_id(request_id),
+                )
+
+
+def _rms(audio: np.ndarray) -> float:
+    if audio.size == 0:
+        return 0.0
+    return float(np.sqrt(np.dot(audio, audio) / audio.size))
+
+
+def _combined_confidence(parts: list[tuple | None]) -> tuple[float | None, float | None]:
+    """_confidence() over (seconds, avg_logprob, no_speech_prob) pieces of one utterance."""
+    voiced = [p for p in parts if p is not None and p[1] is not None]
+    if not voiced:
+        return None, None
+    weights = [max(seconds, 0.01) for seconds, _, _ in voiced]
+    avg_logprob = sum(w * p[1] for w, p in zip(weights, voiced)) / sum(weights)
+    no_speech_prob = max((p[2] for p in voiced if p[2] is not None), default=None)
+    return round(avg_logprob, 3), no_speech_prob
+
+
+def _join(*parts: str) -> str:
+    return " ".join(p.strip() for p in parts if p and p.strip())
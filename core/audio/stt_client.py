@@ -0,0 +1,320 @@
+"""
+stt_client.py — client for the SafeBox STT service (core/audio/stt_service.py)
+
+The service holds the one faster-whisper model on the box and serves
+transcription over a Unix socket, so the wake pipeline, the web UI and
+background jobs share it instead of each loading their own copy.
+
+STTClient has the same transcribe()/transcribe_segments()/
+transcribe_detailed() interface as SpeechToText and can be used in its
+place. It does not import
+faster-whisper, so the web process can use it without loading a model.
+
+Wire format, both directions: 4-byte big-endian header length, a JSON
+header, then `payload_bytes` bytes of payload (float32 PCM for audio
+requests, empty otherwise). One request per connection.
+
+Priorities (lower runs first): PRIORITY_LIVE for the final transcript
+of a voice request, PRIORITY_PARTIAL for streaming partials,
+PRIORITY_BACKGROUND for voice memos and other jobs nobody is waiting
+on. When the queue is full the service answers "busy" and the client
+raises STTServiceBusy instead of waiting.
+
+FallbackSTTClient is the wake pipeline's view of the service. Only a
+service that is absent (no socket, connection refused) counts as down:
+it is skipped for STT_SERVICE_RETRY_SECONDS and then tried again, so a
+service that restarts or started late is picked up without restarting
+safebox-wake. Busy replies and timeouts are raised to the caller, which
+degrades the reply; the service is up and the box has one model. Only
+with STT_LOCAL_FALLBACK=true does a down service mean decoding with a
+local model in safebox-wake (a second copy, outside the memory
+manager's view), loaded on first need.
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from core import tracing
+from core.logger import get_logger, with_request_id
+from core.request_context import get_request_id
+
+log = get_logger("stt_client")
+
+STT_SERVICE_SOCKET = os.getenv("STT_SERVICE_SOCKET", "/opt/safebox/runtime/stt.sock")
+STT_SERVICE_TIMEOUT_SECONDS = float(os.getenv("STT_SERVICE_TIMEOUT_SECONDS", "30"))
+STT_SERVICE_RETRY_SECONDS = float(os.getenv("STT_SERVICE_RETRY_SECONDS", "10"))
+STT_LOCAL_FALLBACK = os.getenv("STT_LOCAL_FALLBACK", "false").lower() == "true"
+
+PRIORITY_LIVE = 0
+PRIORITY_PARTIAL = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_LIVE: "live",
+    PRIORITY_PARTIAL: "partial",
+    PRIORITY_BACKGROUND: "background",
+}
+
+MAX_HEADER_BYTES = 64 * 1024
+
+_LENGTH = struct.Struct("!I")
+
+
+class STTServiceError(Exception):
+    pass
+
+
+class STTServiceBusy(STTServiceError):
+    """The service queue is full; retry later or fall back."""
+
+
+class STTServiceUnavailable(STTServiceError):
+    """Nothing is listening on the socket (service stopped or not started yet)."""
+
+
+class STTAudioTooLong(STTServiceError):
+    """The audio is longer than the service accepts (STT_SERVICE_MAX_AUDIO_SECONDS)."""
+
+
+class STTResult:
+    """One decode: the segments plus which cascade tier produced them."""
+
+    __slots__ = ("segments", "tier", "escalated", "avg_logprob", "no_speech_prob")
+
+    def __init__(self, segments, tier, escalated=False, avg_logprob=None, no_speech_prob=None):
+        self.segments: list[tuple[float, float, str]] = segments
+        self.tier: str = tier
+        self.escalated: bool = escalated
+        self.avg_logprob: float | None = avg_logprob
+        self.no_speech_prob: float | None = no_speech_prob
+
+
+# ── Framing (shared with the service) ─────────────────────────────────────────
+
+def send_message(sock: socket.socket, header: dict, payload: bytes | memoryview = b"") -> None:
+    header = dict(header, payload_bytes=len(payload))
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+    if len(payload):
+        sock.sendall(payload)
+
+
+def recv_message(sock: socket.socket, max_payload_bytes: int | None = None) -> tuple[dict, bytes]:
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    if length > MAX_HEADER_BYTES:
+        raise STTServiceError(f"header too large ({length} bytes)")
+    header = json.loads(_recv_exact(sock, length))
+    size = int(header.get("payload_bytes", 0))
+    if max_payload_bytes is not None and size > max_payload_bytes:
+        raise STTServiceError(f"payload too large ({size} bytes)")
+    return header, _recv_exact(sock, size) if size else b""
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if not k:
+            raise STTServiceError("connection closed")
+        got += k
+    return bytes(buf)
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+class STTClient:
+    def __init__(
+        self,
+        socket_path: str = STT_SERVICE_SOCKET,
+        priority: int = PRIORITY_LIVE,
+        timeout: float = STT_SERVICE_TIMEOUT_SECONDS,
+    ):
+        self.socket_path = socket_path
+        self.priority = priority
+        self.timeout = timeout
+
+    def with_priority(self, priority: int) -> "STTClient":
+        return STTClient(self.socket_path, priority, self.timeout)
+
+    def with_timeout(self, timeout: float) -> "STTClient":
+        return STTClient(self.socket_path, self.priority, timeout)
+
+    def transcribe(self, audio: str | Path | np.ndarray) -> str:
+        """`audio` is a file path or 16 kHz mono float32 PCM in [-1, 1)."""
+        segments = self.transcribe_segments(audio)
+        return " ".join(text for _, _, text in segments).strip()
+
+    def transcribe_segments(
+        self,
+        audio: str | Path | np.ndarray,
+        initial_prompt: str | None = None,
+        cascade: bool = True,
+    ) -> list[tuple[float, float, str]]:
+        return self.transcribe_detailed(audio, initial_prompt, cascade).segments
+
+    def transcribe_detailed(
+        self,
+        audio: str | Path | np.ndarray,
+        initial_prompt: str | None = None,
+        cascade: bool = True,
+        escalate: bool = False,
+    ) -> STTResult:
+        header = {
+            "op": "transcribe",
+            "priority": self.priority,
+            "initial_prompt": initial_prompt,
+            "cascade": cascade,
+            "escalate": escalate,
+            "request_id": get_request_id(),
+        }
+        payload = b""
+        if isinstance(audio, np.ndarray):
+            pcm = np.ascontiguousarray(audio, dtype=np.float32)
+            header["format"] = "f32"
+            payload = memoryview(pcm).cast("B")
+        else:
+            header["path"] = str(Path(audio).resolve())
+
+        with tracing.span("stt.service", priority=PRIORITY_NAMES.get(self.priority)) as sp:
+            reply = self._call(header, payload)
+            sp.set(
+                queue_ms=reply.get("queue_ms"),
+                decode_ms=reply.get("decode_ms"),
+                tier=reply.get("tier"),
+            )
+        return STTResult(
+            [tuple(s) for s in reply["segments"]],
+            reply.get("tier"),
+            bool(reply.get("escalated")),
+            reply.get("avg_logprob"),
+            reply.get("no_speech_prob"),
+        )
+
+    def stats(self) -> dict:
+        return self._call({"op": "stats"})
+
+    def ping(self) -> bool:
+        try:
+            return bool(self._call({"op": "ping"}, timeout=2.0).get("ok"))
+        except (OSError, STTServiceError):
+            return False
+
+    def _call(self, header: dict, payload: bytes | memoryview = b"", timeout: float | None = None) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout or self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError) as e:
+                raise STTServiceUnavailable(f"{self.socket_path}: {e}") from e
+            send_message(sock, header, payload)
+            reply, _ = recv_message(sock)
+        if reply.get("ok"):
+            return reply
+        if reply.get("error") == "busy":
+            raise STTServiceBusy(reply.get("message", "queue full"))
+        if reply.get("error") == "too_long":
+            raise STTAudioTooLong(reply.get("message", "audio too long"))
+        raise STTServiceError(reply.get("message") or reply.get("error") or "request failed")
+
+
+class _LocalFallback:
+    """Local model and service health shared by a FallbackSTTClient and its copies."""
+
+    def __init__(self, factory: Callable[[], object], retry_seconds: float, enabled: bool):
+        self.factory = factory
+        self.retry_seconds = retry_seconds
+        self.enabled = enabled
+        self.down_until = 0.0
+        self._model = None
+        self._lock = threading.Lock()
+
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    log.info("stt.local_fallback.loading", extra=with_request_id())
+                    model = self.factory()
+                    model.warm_up()
+                    self._model = model
+        return self._model
+
+
+class FallbackSTTClient(STTClient):
+    """
+    STTClient that remembers when the service is absent and, with
+    `local_enabled`, decodes those calls with a local model built by
+    `local_factory` (SpeechToText) the first time it is needed. Without
+    it, STTServiceUnavailable is raised like any other service error.
+    """
+
+    def __init__(
+        self,
+        local_factory: Callable[[], object],
+        socket_path: str = STT_SERVICE_SOCKET,
+        priority: int = PRIORITY_LIVE,
+        timeout: float = STT_SERVICE_TIMEOUT_SECONDS,
+        retry_seconds: float = STT_SERVICE_RETRY_SECONDS,
+        local_enabled: bool = STT_LOCAL_FALLBACK,
+        _fallback: _LocalFallback | None = None,
+    ):
+        super().__init__(socket_path, priority, timeout)
+        self._fallback = _fallback or _LocalFallback(local_factory, retry_seconds, local_enabled)
+
+    def with_priority(self, priority: int) -> "FallbackSTTClient":
+        return self._copy(priority, self.timeout)
+
+    def with_timeout(self, timeout: float) -> "FallbackSTTClient":
+        return self._copy(self.priority, timeout)
+
+    def _copy(self, priority: int, timeout: float) -> "FallbackSTTClient":
+        fallback = self._fallback
+        return FallbackSTTClient(
+            fallback.factory,
+            self.socket_path,
+            priority,
+            timeout,
+            fallback.retry_seconds,
+            fallback.enabled,
+            fallback,
+        )
+
+    @property
+    def local_enabled(self) -> bool:
+        return self._fallback.enabled
+
+    def local(self):
+        """The local model, loading it if this is the first time it is needed."""
+        return self._fallback.model()
+
+    def transcribe_detailed(
+        self,
+        audio: str | Path | np.ndarray,
+        initial_prompt: str | None = None,
+        cascade: bool = True,
+        escalate: bool = False,
+    ) -> STTResult:
+        fallback = self._fallback
+        if time.monotonic() >= fallback.down_until:
+            try:
+                return super().transcribe_detailed(audio, initial_prompt, cascade, escalate)
+            except STTServiceUnavailable as e:
+                fallback.down_until = time.monotonic() + fallback.retry_seconds
+                log.warning(
+                    f"stt.service_unavailable retry_s={fallback.retry_seconds:.0f} "
+                    f"local={fallback.enabled} | {e}",
+                    extra=with_request_id(),
+                )
+        if not fallback.enabled:
+            raise STTServiceUnavailable(f"{self.socket_path}: service down")
+        with tracing.span("stt.local_fallback", reason="unavailable"):
+            return self.local().transcribe_detailed(audio, initial_prompt, cascade, escalate)
@@ -0,0 +1,453 @@
+"""
+stt_service.py — SafeBox STT service (systemd: safebox-stt)
+
+Loads the faster-whisper model once and serves transcription requests
+from other processes over a Unix socket (STT_SERVICE_SOCKET). Clients
+use core.audio.stt_client.STTClient; the wire format is described
+there.
+
+Requests wait in a priority queue (live voice before streaming
+partials before background jobs such as voice memos) and one worker
+thread decodes them in order, since the model runs one decode at a
+time anyway. Backpressure: when STT_SERVICE_MAX_QUEUE requests are
+waiting, or STT_SERVICE_MAX_BACKGROUND background requests, new ones
+are refused with "busy" rather than queued behind work that cannot
+finish in time. Live requests are only refused by the overall limit.
+Audio longer than STT_SERVICE_MAX_AUDIO_SECONDS is refused ("too_long"),
+and a queued job whose client has disconnected (gave up, or a voice
+memo upload that was abandoned) is dropped instead of decoded.
+
+With systemd Type=notify the service reports READY=1 once the model is
+loaded and the socket accepts requests, so safebox-wake (ordered after
+it) does not start against a socket that is not there yet.
+
+Queue depth, refusals and queue/decode times per priority are
+published as the "stt_service" metrics section.
+
+    python -m core.audio.stt_service
+"""
+
+import itertools
+import os
+import queue
+import socket
+import socketserver
+import statistics
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+from faster_whisper import decode_audio
+
+from core import cpu_profile, metrics, model_lifecycle, thermal
+from core.audio.stt import STT_SAMPLE_RATE, SpeechToText
+from core.audio.stt_client import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_LIVE,
+    PRIORITY_NAMES,
+    STT_SERVICE_SOCKET,
+    STTResult,
+    STTServiceError,
+    recv_message,
+    send_message,
+)
+from core.logger import get_logger, with_request_id
+
+log = get_logger("stt_service")
+
+STT_SERVICE_MAX_QUEUE = int(os.getenv("STT_SERVICE_MAX_QUEUE", "8"))
+STT_SERVICE_MAX_BACKGROUND = int(os.getenv("STT_SERVICE_MAX_BACKGROUND", "2"))
+# 60 s of float32 PCM at 16 kHz is ~3.8 MB.
+STT_SERVICE_MAX_PAYLOAD_BYTES = int(os.getenv("STT_SERVICE_MAX_PAYLOAD_BYTES", str(8 * 1024 * 1024)))
+STT_SERVICE_STATS_SECONDS = float(os.getenv("STT_SERVICE_STATS_SECONDS", "5.0"))
+# Longest audio decoded, in any priority (voice memos are the long ones).
+STT_SERVICE_MAX_AUDIO_SECONDS = float(os.getenv("STT_SERVICE_MAX_AUDIO_SECONDS", "300"))
+# How often a waiting request checks that its client is still connected.
+STT_SERVICE_CLIENT_CHECK_SECONDS = 0.5
+
+
+class Job:
+    __slots__ = (
+        "priority", "audio", "initial_prompt", "cascade", "escalate", "request_id",
+        "enqueued", "started", "finished", "result", "error", "done", "cancelled",
+    )
+
+    def __init__(
+        self,
+        priority: int,
+        audio,
+        initial_prompt: str | None,
+        request_id: str | None,
+        cascade: bool = True,
+        escalate: bool = False,
+    ):
+        self.priority = priority
+        self.audio = audio
+        self.initial_prompt = initial_prompt
+        self.cascade = cascade
+        self.escalate = escalate
+        self.request_id = request_id
+        self.enqueued = time.monotonic()
+        self.started = 0.0
+        self.finished = 0.0
+        self.result: STTResult | None = None
+        self.error: Exception | None = None
+        self.done = threading.Event()
+        # Set when the client went away while the job was queued.
+        self.cancelled = False
+
+
+class STTService:
+    """Priority queue + single decode worker in front of one model."""
+
+    def __init__(
+        self,
+        stt,
+        max_queue: int = STT_SERVICE_MAX_QUEUE,
+        max_background: int = STT_SERVICE_MAX_BACKGROUND,
+    ):
+        self.stt = stt
+        self.max_queue = max_queue
+        self.max_background = max_background
+        # Cleared by the thermal governor's hotter tiers.
+        self.background_allowed = True
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._waiting = {p: 0 for p in PRIORITY_NAMES}
+        self.high_water = 0
+        self.served = {p: 0 for p in PRIORITY_NAMES}
+        self.rejected = {p: 0 for p in PRIORITY_NAMES}
+        self.failed = 0
+        self.cancelled = 0
+        self.busy = False
+        self.decoded_audio_seconds = 0.0
+        self.tiers: dict[str, int] = {}
+        self.escalated = 0
+        self._queue_ms = {p: deque(maxlen=200) for p in PRIORITY_NAMES}
+        self._decode_ms = {p: deque(maxlen=200) for p in PRIORITY_NAMES}
+
+        self._worker = threading.Thread(target=self._run, daemon=True, name="stt-decode")
+        self._worker.start()
+
+    # ── Queue ─────────────────────────────────────────────────────────────────
+
+    def submit(self, job: Job) -> bool:
+        """Queue `job`, or return False when backpressure refuses it."""
+        with self._lock:
+            depth = sum(self._waiting.values())
+            if depth >= self.max_queue or (
+                job.priority == PRIORITY_BACKGROUND
+                and (
+                    self._waiting[PRIORITY_BACKGROUND] >= self.max_background
+                    or not self.background_allowed
+                )
+            ):
+                self.rejected[job.priority] += 1
+                return False
+            self._waiting[job.priority] += 1
+            self.high_water = max(self.high_water, depth + 1)
+        self._queue.put((job.priority, next(self._seq), job))
+        return True
+
+    def depth(self) -> int:
+        with self._lock:
+            return sum(self._waiting.values())
+
+    def _run(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            with self._lock:
+                self._waiting[job.priority] -= 1
+                if job.cancelled:
+                    self.cancelled += 1
+                    job.done.set()
+                    continue
+                self.busy = True
+            job.started = time.monotonic()
+            try:
+                job.result = self.stt.transcribe_detailed(
+                    job.audio, job.initial_prompt, job.cascade, job.escalate
+                )
+            except Exception as e:
+                job.error = e
+            job.finished = time.monotonic()
+
+            with self._lock:
+                self.busy = False
+                if job.error is None:
+                    self.served[job.priority] += 1
+                    self._queue_ms[job.priority].append((job.started - job.enqueued) * 1000)
+                    self._decode_ms[job.priority].append((job.finished - job.started) * 1000)
+                    self.tiers[job.result.tier] = self.tiers.get(job.result.tier, 0) + 1
+                    self.escalated += job.result.escalated
+                    if isinstance(job.audio, np.ndarray):
+                        self.decoded_audio_seconds += len(job.audio) / STT_SAMPLE_RATE
+                else:
+                    self.failed += 1
+            job.done.set()
+
+    # ── Stats ─────────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_priority = {}
+            for p, name in PRIORITY_NAMES.items():
+                per_priority[name] = {
+                    "waiting": self._waiting[p],
+                    "served": self.served[p],
+                    "rejected": self.rejected[p],
+                    "queue_ms": _summary(self._queue_ms[p]),
+                    "decode_ms": _summary(self._decode_ms[p]),
+                }
+            return {
+                "depth": sum(self._waiting.values()),
+                "high_water": self.high_water,
+                "busy": self.busy,
+                "max_queue": self.max_queue,
+                "max_background": self.max_background,
+                "background_allowed": self.background_allowed,
+                "cpu_threads": getattr(self.stt, "cpu_threads", None),
+                "cascade_loaded": getattr(self.stt, "cascade_model", None) is not None,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "decoded_audio_seconds": round(self.decoded_audio_seconds, 1),
+                "tiers": dict(self.tiers),
+                "escalated": self.escalated,
+                "priorities": per_priority,
+            }
+
+
+def _summary(samples) -> dict | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 1),
+    }
+
+
+# ── Socket server ─────────────────────────────────────────────────────────────
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "_Server"
+
+    def handle(self) -> None:
+        sock = self.request
+        try:
+            header, payload = recv_message(sock, STT_SERVICE_MAX_PAYLOAD_BYTES)
+        except (OSError, ValueError, STTServiceError) as e:
+            log.warning(f"stt_service.bad_request | {e}")
+            return
+
+        op = header.get("op")
+        try:
+            if op == "ping":
+                send_message(sock, {"ok": True})
+            elif op == "stats":
+                send_message(sock, dict(self.server.service.stats(), ok=True))
+            elif op == "transcribe":
+                send_message(sock, self._transcribe(header, payload))
+            else:
+                send_message(sock, {"ok": False, "error": "bad_request", "message": f"unknown op {op!r}"})
+        except OSError as e:
+            # Client gave up (timeout, disconnect); the decode result is dropped.
+            log.warning(f"stt_service.reply_failed op={op} | {e}")
+
+    def _transcribe(self, header: dict, payload: bytes) -> dict:
+        service = self.server.service
+        request_id = header.get("request_id")
+        priority = int(header.get("priority", PRIORITY_LIVE))
+        if priority not in PRIORITY_NAMES:
+            priority = PRIORITY_BACKGROUND
+
+        if header.get("path"):
+            path = Path(header["path"])
+            if not path.is_file():
+                return {"ok": False, "error": "bad_request", "message": f"no such file: {path}"}
+            # Decoded here, on the connection's thread, so its length is
+            # known before it can take the decode worker.
+            try:
+                audio = decode_audio(str(path), sampling_rate=STT_SAMPLE_RATE)
+            except Exception as e:
+                return {"ok": False, "error": "bad_request", "message": f"unreadable audio: {e}"}
+        elif header.get("format") == "f32" and len(payload) % 4 == 0:
+            audio = np.frombuffer(payload, dtype=np.float32)
+        else:
+            return {"ok": False, "error": "bad_request", "message": "expected f32 PCM or a path"}
+
+        seconds = len(audio) / STT_SAMPLE_RATE
+        if seconds > STT_SERVICE_MAX_AUDIO_SECONDS:
+            return {
+                "ok": False,
+                "error": "too_long",
+                "message": f"{seconds:.0f}s of audio, limit is {STT_SERVICE_MAX_AUDIO_SECONDS:.0f}s",
+            }
+
+        job = Job(
+            priority,
+            audio,
+            header.get("initial_prompt"),
+            request_id,
+            cascade=bool(header.get("cascade", True)),
+            escalate=bool(header.get("escalate", False)),
+        )
+        if not service.submit(job):
+            log.warning(
+                f"stt_service.busy priority={PRIORITY_NAMES[priority]} depth={service.depth()}",
+                extra=with_request_id(request_id),
+            )
+            return {"ok": False, "error": "busy", "message": f"STT queue full (depth {service.depth()})"}
+
+        while not job.done.wait(STT_SERVICE_CLIENT_CHECK_SECONDS):
+            if job.started == 0.0 and _client_gone(self.request):
+                # Still queued: drop it; a running decode cannot be stopped.
+                job.cancelled = True
+                log.info(
+                    f"stt_service.cancelled priority={PRIORITY_NAMES[priority]} client gone",
+                    extra=with_request_id(request_id),
+                )
+                job.done.wait()
+                return {"ok": False, "error": "cancelled"}
+        if job.cancelled:
+            return {"ok": False, "error": "cancelled"}
+        if job.error is not None:
+            log.warning(f"stt_service.decode_failed | {job.error}", extra=with_request_id(request_id))
+            return {"ok": False, "error": "decode_failed", "message": str(job.error)}
+
+        queue_ms = round((job.started - job.enqueued) * 1000, 1)
+        decode_ms = round((job.finished - job.started) * 1000, 1)
+        log.info(
+            f"stt_service.done priority={PRIORITY_NAMES[priority]} tier={job.result.tier} "
+            f"queue_ms={queue_ms} decode_ms={decode_ms}",
+            extra=with_request_id(request_id),
+        )
+        return {
+            "ok": True,
+            "segments": [list(s) for s in job.result.segments],
+            "tier": job.result.tier,
+            "escalated": job.result.escalated,
+            "avg_logprob": job.result.avg_logprob,
+            "no_speech_prob": job.result.no_speech_prob,
+            "queue_ms": queue_ms,
+            "decode_ms": decode_ms,
+        }
+
+
+def _client_gone(sock: socket.socket) -> bool:
+    """True once the client closed its end (it sends nothing after the request)."""
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: STTService):
+        self.service = service
+        super().__init__(path, _Handler)
+
+
+def serve(service: STTService, socket_path: str = STT_SERVICE_SOCKET) -> _Server:
+    """Bind the socket (replacing a stale one) and return the server."""
+    path = Path(socket_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        path.unlink()
+    server = _Server(str(path), service)
+    os.chmod(path, 0o660)
+    return server
+
+
+def notify_ready() -> None:
+    """sd_notify(READY=1) for Type=notify; nothing when not run by systemd."""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(b"READY=1")
+    except OSError as e:
+        log.warning(f"stt_service.notify_failed | {e}")
+
+
+def apply_thermal_tier(service: STTService) -> None:
+    """Follow the thermal governor's tier: cascade, threads, background jobs."""
+    stt = service.stt
+    service.background_allowed = thermal.setting("background_jobs", True)
+    if hasattr(stt, "cascade_enabled"):
+        stt.cascade_enabled = thermal.setting("stt_cascade", True)
+    if hasattr(stt, "set_cpu_threads"):
+        stt.set_cpu_threads(thermal.setting("stt_threads", cpu_profile.threads("stt")))
+
+
+def apply_memory_policy(service: STTService) -> None:
+    """Unload the cascade tier when idle or evicted; reload it when wanted."""
+    stt = service.stt
+    if getattr(stt, "cascade_model_name", None) is None:
+        return
+    evicted = model_lifecycle.evicted(model_lifecycle.EVICT_STT_CASCADE)
+    # Decodes may load an idle-unloaded cascade themselves, never an evicted one.
+    stt.cascade_allowed = not evicted
+    if stt.cascade_model is not None:
+        idle = time.monotonic() - stt.cascade_last_used
+        if evicted:
+            stt.unload_cascade("memory_budget")
+        elif idle > model_lifecycle.STT_CASCADE_IDLE_TTL_SECONDS:
+            stt.unload_cascade(f"idle_ttl idle_s={idle:.0f}")
+    elif stt.cascade_wanted and not evicted:
+        stt.load_cascade()
+
+
+def publish_stats_loop(service: STTService) -> None:
+    while True:
+        try:
+            apply_thermal_tier(service)
+        except Exception as e:
+            log.warning(f"stt_service.thermal_apply_failed | {e}")
+        try:
+            apply_memory_policy(service)
+        except Exception as e:
+            log.warning(f"stt_service.memory_policy_failed | {e}")
+        metrics.publish("stt_service", service.stats())
+        time.sleep(STT_SERVICE_STATS_SECONDS)
+
+
+def main() -> None:
+    cpu_profile.apply("stt")
+    log.info("stt_service.init.begin")
+    stt = SpeechToText()
+    stt.warm_up()
+    service = STTService(stt)
+    log.info(
+        f"stt_service.init.done socket={STT_SERVICE_SOCKET} "
+        f"max_queue={service.max_queue} max_background={service.max_background}"
+    )
+
+    threading.Thread(
+        target=publish_stats_loop, args=(service,), daemon=True, name="stt-service-stats"
+    ).start()
+
+    server = serve(service)
+    notify_ready()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        Path(STT_SERVICE_SOCKET).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+task_pipeline.py — staged worker threads for finished utterances
+
+mic_stream hands every finalized recording to a chain of stages:
+
+    stt ──► route ──► playback ──► persist
+    (transcribe)  (intent / LLM)  (TTS)   (vault save)
+
+Each Stage is one daemon thread behind its own bounded queue, so a
+slow cloud call only holds up routing, a long reply only holds up
+playback, and the vault write runs on its own thread once the reply
+has played, so it can never delay the start of playback.
+
+Items carry the time their recording was finalized. A stage drops an
+item that has waited longer than its `max_age_seconds` instead of
+acting on an utterance the user has long given up on, and a full
+queue sheds new items rather than letting work pile up. Items whose
+cancel token fired (barge-in) are dropped too, before or during the
+handler (which then raises core.cancellation.Cancelled). All of these
+go through the stage's `on_drop(item, reason)` so the caller can reset
+the session and close the trace.
+
+Per-stage depth, high water, wait time, handler time and drop counts
+come from TaskPipeline.stats() (the "pipeline" metrics section).
+"""
+
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+from core.cancellation import Cancelled, CancelToken
+from core.deadline import Deadline
+from core.logger import get_logger, with_request_id
+from core.request_context import clear_request_id, set_request_id
+
+log = get_logger("task_pipeline")
+
+TASK_MAX_AGE_SECONDS = float(os.getenv("TASK_MAX_AGE_SECONDS", "45"))
+TASK_STAGE_QUEUE_SIZE = int(os.getenv("TASK_STAGE_QUEUE_SIZE", "2"))
+TASK_PERSIST_QUEUE_SIZE = int(os.getenv("TASK_PERSIST_QUEUE_SIZE", "32"))
+
+DROP_STALE = "stale"
+DROP_QUEUE_FULL = "queue_full"
+DROP_ERROR = "error"
+DROP_CANCELLED = "cancelled"
+
+
+@dataclass
+class TaskItem:
+    """One utterance on its way through the stages; later stages fill in fields."""
+
+    request_id: str
+    audio: object = None
+    created_at: float = field(default_factory=time.monotonic)
+    audio_path: str | None = None
+    text: str | None = None
+    reply: str | None = None
+    mode: str | None = None
+    cloud_request_id: str | None = None
+    latency_ms: int | None = None
+    trace_summary: dict | None = None
+    cancel_token: CancelToken | None = None
+    follow_up_of: str | None = None
+    deadline: Deadline | None = None
+    enqueued_at: float = 0.0
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class Stage:
+    """One worker thread and a bounded queue in front of `handler(item)`."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[TaskItem], None],
+        *,
+        maxsize: int = TASK_STAGE_QUEUE_SIZE,
+        max_age_seconds: float | None = TASK_MAX_AGE_SECONDS,
+        on_drop: Callable[[TaskItem, str], None] | None = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.maxsize = maxsize
+        self.max_age_seconds = max_age_seconds
+        self.on_drop = on_drop
+
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: threading.Thread | None = None
+        # Taken off the queue but not yet task_done(); see restart().
+        self._current: TaskItem | None = None
+        self.busy = False
+        self.high_water = 0
+        self.processed = 0
+        self.dropped = {DROP_STALE: 0, DROP_QUEUE_FULL: 0, DROP_ERROR: 0, DROP_CANCELLED: 0}
+        self._wait_ms: deque = deque(maxlen=100)
+        self._run_ms: deque = deque(maxlen=100)
+        self._stats_lock = threading.Lock()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name=f"task-{self.name}"
+        )
+        self._thread.start()
+
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def restart(self) -> None:
+        """
+        Start a new worker after the old one died. The item it died
+        holding was never task_done(), so idle() would stay False for
+        good: it is dropped and marked done. Items still queued are left
+        for the new worker (the age check drops them if they waited too
+        long).
+        """
+        stranded, self._current = self._current, None
+        if stranded is not None:
+            self.busy = False
+            self._drop(stranded, DROP_ERROR)
+            self._queue.task_done()
+        self.start()
+
+    def idle(self) -> bool:
+        return self._queue.unfinished_tasks == 0
+
+    def submit(self, item: TaskItem, timeout: float | None = None) -> bool:
+        """
+        Queue `item`. With timeout=None a full queue sheds it at once;
+        otherwise wait up to `timeout` seconds for room (backpressure
+        on the upstream stage).
+        """
+        item.enqueued_at = time.monotonic()
+        try:
+            self._queue.put(item, block=timeout is not None, timeout=timeout)
+        except queue.Full:
+            self._drop(item, DROP_QUEUE_FULL)
+            return False
+        self.high_water = max(self.high_water, self._queue.qsize())
+        return True
+
+    def _drop(self, item: TaskItem, reason: str) -> None:
+        self.dropped[reason] += 1
+        log.warning(
+            f"task.{self.name}.dropped reason={reason} age_s={item.age_seconds:.1f}",
+            extra=with_request_id(item.request_id),
+        )
+        if self.on_drop is not None:
+            try:
+                self.on_drop(item, reason)
+            except Exception as e:
+                log.warning(f"task.{self.name}.on_drop_failed | {e}")
+
+    def _run(self) -> None:
+        while True:
+            item = self._current = self._queue.get()
+            now = time.monotonic()
+            with self._stats_lock:
+                self._wait_ms.append((now - item.enqueued_at) * 1000)
+
+            if self.max_age_seconds is not None and now - item.created_at > self.max_age_seconds:
+                self._drop(item, DROP_STALE)
+                self._done()
+                continue
+            if item.cancel_token is not None and item.cancel_token.cancelled:
+                self._drop(item, DROP_CANCELLED)
+                self._done()
+                continue
+
+            self.busy = True
+            set_request_id(item.request_id)
+            try:
+                self.handler(item)
+                self.processed += 1
+            except Cancelled:
+                self._drop(item, DROP_CANCELLED)
+            except Exception as e:
+                log.exception(
+                    f"task.{self.name}.unhandled | {e}",
+                    extra=with_request_id(item.request_id),
+                )
+                self._drop(item, DROP_ERROR)
+            finally:
+                with self._stats_lock:
+                    self._run_ms.append((time.monotonic() - now) * 1000)
+                self.busy = False
+                clear_request_id()
+                self._done()
+
+    def _done(self) -> None:
+        self._current = None
+        self._queue.task_done()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            wait_ms, run_ms = list(self._wait_ms), list(self._run_ms)
+        return {
+            "depth": self._queue.qsize(),
+            "maxsize": self.maxsize,
+            "high_water": self.high_water,
+            "busy": self.busy,
+            "processed": self.processed,
+            "dropped": dict(self.dropped),
+            "wait_ms": _summary(wait_ms),
+            "run_ms": _summary(run_ms),
+        }
+
+
+class TaskPipeline:
+    """Stages in order; the first one receives finished recordings."""
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = stages
+        self.by_name = {stage.name: stage for stage in stages}
+
+    def start(self) -> None:
+        for stage in self.stages:
+            stage.start()
+
+    def submit(self, item: TaskItem) -> bool:
+        return self.stages[0].submit(item)
+
+    def idle(self) -> bool:
+        return all(stage.idle() for stage in self.stages)
+
+    def restart_dead(self) -> None:
+        for stage in self.stages:
+            if not stage.alive():
+                log.error(f"task.{stage.name}.died -> restarting")
+                stage.restart()
+
+    def stats(self) -> dict:
+        return {stage.name: stage.stats() for stage in self.stages}
+
+
+def _summary(samples) -> dict | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "mean": round(statistics.fmean(ordered), 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 1),
+        "max": round(ordered[-1], 1),
+    }
@@ -0,0 +1,114 @@
+"""
+trim.py — Silence trimming between SpeechRecorder and SpeechToText
+
+A finished utterance carries the pre-roll, the post-wake grace period
+and the VAD's trailing silence, none of which Whisper needs. find_speech()
+locates the first and last voiced frames using the same per-frame RMS
+as SimpleVAD and the front end's current thresholds (the fixed ones, or
+AdaptiveVAD's noise floor plus its SNR margins), and trim_silence() cuts
+everything outside them except a guard band on each side.
+"""
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+AUDIO_TRIM_ENABLED = os.getenv("AUDIO_TRIM_ENABLED", "true").lower() == "true"
+AUDIO_TRIM_GUARD_SECONDS = float(os.getenv("AUDIO_TRIM_GUARD_SECONDS", "0.25"))
+
+
+@dataclass
+class TrimResult:
+    start: int
+    end: int
+    total: int
+    sample_rate: int
+
+    @property
+    def lead_seconds(self) -> float:
+        return self.start / self.sample_rate
+
+    @property
+    def tail_seconds(self) -> float:
+        return (self.total - self.end) / self.sample_rate
+
+    @property
+    def saved_seconds(self) -> float:
+        return (self.total - (self.end - self.start)) / self.sample_rate
+
+
+def frame_rms(audio: np.ndarray, frame_size: int) -> np.ndarray:
+    """
+    RMS per `frame_size` block, in int16 units like SimpleVAD.energy()
+    (before its smoothing). Accepts int16 or float32 PCM in [-1, 1).
+    A partial last block is measured on its own length.
+    """
+    n = audio.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    x = audio.astype(np.float32, copy=False)
+    if audio.dtype != np.int16:
+        x = x * 32768.0
+
+    full = n // frame_size
+    rms = np.empty(full + (1 if n % frame_size else 0), dtype=np.float32)
+    if full:
+        blocks = x[: full * frame_size].reshape(full, frame_size)
+        rms[:full] = np.sqrt(np.einsum("ij,ij->i", blocks, blocks) / frame_size)
+    if n % frame_size:
+        tail = x[full * frame_size:]
+        rms[full] = np.sqrt(np.dot(tail, tail) / tail.shape[0])
+    return rms
+
+
+def find_speech(
+    audio: np.ndarray,
+    sample_rate: int,
+    frame_size: int,
+    speech_threshold: float,
+    silence_threshold: float,
+    guard_seconds: float = AUDIO_TRIM_GUARD_SECONDS,
+) -> TrimResult:
+    """
+    Speech starts at the first frame at or above `speech_threshold` and
+    ends at the last frame at or above `silence_threshold` (the VAD's
+    hysteresis). If nothing crosses the speech threshold the audio is
+    left untouched, so STT still gets a chance at quiet speech.
+    """
+    total = audio.shape[0]
+    rms = frame_rms(audio, frame_size)
+
+    voiced = np.flatnonzero(rms >= speech_threshold)
+    if voiced.size == 0:
+        return TrimResult(0, total, total, sample_rate)
+
+    first = int(voiced[0])
+    sustained = np.flatnonzero(rms[first:] >= silence_threshold)
+    last = first + int(sustained[-1])
+
+    guard = int(guard_seconds * sample_rate)
+    start = max(0, first * frame_size - guard)
+    end = min(total, (last + 1) * frame_size + guard)
+    return TrimResult(start, end, total, sample_rate)
+
+
+def trim_silence(
+    audio: np.ndarray,
+    sample_rate: int,
+    frame_size: int,
+    speech_threshold: float,
+    silence_threshold: float,
+    guard_seconds: float = AUDIO_TRIM_GUARD_SECONDS,
+) -> tuple[np.ndarray, TrimResult]:
+    """Return (view of the speech region plus guard band, TrimResult)."""
+    result = find_speech(
+        audio,
+        sample_rate,
+        frame_size,
+        speech_threshold,
+        silence_threshold,
+        guard_seconds,
+    )
+    return audio[result.start:result.end], result
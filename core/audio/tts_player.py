@@ -7,6 +7,9 @@ import subprocess
 import threading
 from pathlib import Path
 
+from core import cancellation, cpu_profile, thermal, tracing
+from core.request_context import get_request_id
+
 BASE_DIR = Path(__file__).resolve().parents[2]
 
 PIPER_BIN = BASE_DIR / "piper" / "venv" / "bin" / "piper"
@@ -20,6 +23,8 @@ TTS_CHUNK_MAX_CHARS = int(os.getenv("TTS_CHUNK_MAX_CHARS", "500"))
 TTS_PREFETCH_CHUNKS = int(os.getenv("TTS_PREFETCH_CHUNKS", "2"))
 
 _current_player = None
+_current_synth = None
+_speech_generation = 0
 _stop_event = threading.Event()
 _lock = threading.Lock()
 
@@ -33,6 +38,17 @@ def stop_audio():
         if _current_player and _current_player.poll() is None:
             _current_player.terminate()
         _current_player = None
+        # Piper may be synthesizing a chunk nobody will hear.
+        if _current_synth and _current_synth.poll() is None:
+            _current_synth.kill()
+
+
+def _stop_if_current(generation: int):
+    # Cancel-token callback: only stop the speech it was registered for.
+    with _lock:
+        current = generation == _speech_generation
+    if current:
+        stop_audio()
 
 
 def _cache_path(text: str) -> Path:
@@ -112,7 +128,10 @@ def _split_into_chunks(text: str, max_chars: int) -> list[str]:
     return chunks
 
 
-def _generate_wav(text: str) -> Path:
+def _generate_wav(text: str) -> Path | None:
+    """Synthesize `text` into the cache; None if stop_audio() killed Piper."""
+    global _current_synth
+
     wav_path = _cache_path(text)
 
     if wav_path.exists():
@@ -120,20 +139,42 @@ def _generate_wav(text: str) -> Path:
         return wav_path
 
     print("[TTS] Prefetch generating")
-    subprocess.run(
-        [
-            str(PIPER_BIN),
-            "--model",
-            str(PIPER_MODEL),
-            "--output_file",
-            str(wav_path),
-        ],
-        input=text.encode("utf-8"),
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-        check=True,
-    )
+    # Write next to the cache entry and rename, so a killed run never
+    # leaves a truncated WAV behind as a cache hit.
+    tmp_path = wav_path.with_suffix(".part.wav")
 
+    with _lock:
+        if _stop_event.is_set():
+            return None
+        proc = subprocess.Popen(
+            # mic_stream's audio threads keep the audio core to themselves.
+            cpu_profile.taskset(
+                "tts",
+                [str(PIPER_BIN), "--model", str(PIPER_MODEL), "--output_file", str(tmp_path)],
+            ),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        _current_synth = proc
+
+    try:
+        proc.communicate(text.encode("utf-8"))
+    except (BrokenPipeError, OSError):
+        proc.wait()
+    finally:
+        with _lock:
+            if _current_synth is proc:
+                _current_synth = None
+
+    if _stop_event.is_set() and proc.returncode != 0:
+        tmp_path.unlink(missing_ok=True)
+        return None
+    if proc.returncode != 0:
+        tmp_path.unlink(missing_ok=True)
+        raise subprocess.CalledProcessError(proc.returncode, str(PIPER_BIN))
+
+    os.replace(tmp_path, wav_path)
     return wav_path
 
 
@@ -168,47 +209,93 @@ def _play_wav(wav_path: Path):
         time.sleep(0.05)
 
 
-def _producer(chunks: list[str], out_queue: queue.Queue):
+def _producer(chunks: list[str], out_queue: queue.Queue, request_id: str | None = None):
+    # Runs in its own thread, so the request id is passed in explicitly.
+    started = time.monotonic()
     for index, chunk in enumerate(chunks):
         if _stop_event.is_set():
             break
 
         try:
-            wav_path = _generate_wav(chunk)
+            with tracing.span("tts.synthesize", request_id, chunk=index, chars=len(chunk)):
+                wav_path = _generate_wav(chunk)
+            if wav_path is None:
+                # Killed mid-chunk: this chunk counts as not synthesized.
+                break
             out_queue.put((index, wav_path))
         except Exception as e:
             print("[TTS PRODUCER ERROR]", e)
             out_queue.put((index, None))
+    else:
+        index = len(chunks)
+
+    if index < len(chunks):
+        skipped = chunks[index:]
+        cancellation.record_reclaimed(
+            "tts",
+            request_id,
+            chunks_skipped=len(skipped),
+            chars_skipped=sum(len(c) for c in skipped),
+            ran_ms=round((time.monotonic() - started) * 1000, 1),
+        )
 
     out_queue.put((None, None))
 
 
-def speak(text: str):
+def speak(text: str, cancel_token: cancellation.CancelToken | None = None):
+    """
+    Synthesize and play `text`, blocking until playback ends.
+
+    `cancel_token` defaults to the current request's token; when it
+    fires, playback stops and Piper is killed.
+    """
+    global _speech_generation
+
     if not text:
         return
 
     stop_audio()
     _stop_event.clear()
 
+    with _lock:
+        _speech_generation += 1
+        generation = _speech_generation
+
+    token = cancel_token or cancellation.get()
+    remove = (
+        token.on_cancel(lambda: _stop_if_current(generation))
+        if token is not None
+        else (lambda: None)
+    )
+    try:
+        _speak_chunks(text)
+    finally:
+        remove()
+
+
+def _speak_chunks(text: str):
+
     chunks = _split_into_chunks(text, TTS_CHUNK_MAX_CHARS)
 
     if not chunks:
         return
 
-    print(f"[TTS] chunks={len(chunks)} prefetch={TTS_PREFETCH_CHUNKS}")
+    prefetch = thermal.setting("tts_prefetch_chunks", TTS_PREFETCH_CHUNKS)
+    print(f"[TTS] chunks={len(chunks)} prefetch={prefetch}")
 
     # Queue size controls how far ahead generation can run.
-    wav_queue = queue.Queue(maxsize=max(1, TTS_PREFETCH_CHUNKS))
+    wav_queue = queue.Queue(maxsize=max(1, prefetch))
 
     producer_thread = threading.Thread(
         target=_producer,
-        args=(chunks, wav_queue),
+        args=(chunks, wav_queue, get_request_id()),
         daemon=True,
     )
     producer_thread.start()
 
     next_index = 0
     pending = {}
+    played = 0
 
     try:
         while not _stop_event.is_set():
@@ -227,7 +314,11 @@ def speak(text: str):
                 if next_wav is None:
                     continue
 
-                _play_wav(next_wav)
+                if not played:
+                    tracing.mark("tts.first_audio")
+                played += 1
+                with tracing.span("tts.play", chunk=next_index - 1):
+                    _play_wav(next_wav)
 
                 if _stop_event.is_set():
                     break
@@ -44,11 +44,8 @@ class WakeWordEngine:
         return self.porcupine.frame_length
 
     def process_audio(self, pcm) -> bool:
-        result = self.porcupine.process(pcm)
-        detected = result >= 0
-        if detected:
-            log.info(f"wake_word.detected keyword={self.keyword}")
-        return detected
+        # Runs on the audio path: no logging here, callers log detections.
+        return self.porcupine.process(pcm) >= 0
 
     def cleanup(self):
         if getattr(self, "porcupine", None) is not None:
@@ -0,0 +1,233 @@
+"""
+core/cancellation.py
+Per-request cancellation tokens.
+
+Every device_request_id gets a CancelToken when its turn starts (wake,
+manual trigger). Work done on behalf of the request registers cleanup
+with token.on_cancel(): the cloud call abandons its HTTP request, the
+local LLM closes its llama-server stream (which frees the server slot)
+and Piper synthesis kills its subprocess. Barge-in, a spoken "stop"
+and pipeline drops cancel the token, so the CPU goes to the next
+request instead of finishing a reply nobody will hear.
+
+    token = cancellation.start(rid)
+    remove = token.on_cancel(proc.kill)
+    ...
+    cancellation.cancel_others(new_rid, "barge_in")
+    cancellation.release(rid)           # turn finished normally
+
+How much work each cancellation saved (tokens not generated,
+characters not synthesized, time spent before the abort) is added up
+per kind and published as the "cancellation" metrics section.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from core import metrics
+from core.logger import get_logger, with_request_id
+from core.request_context import get_request_id
+
+log = get_logger("cancellation")
+
+# Tokens of turns that never call release() are evicted oldest first.
+MAX_ACTIVE_TOKENS = 32
+
+
+class Cancelled(Exception):
+    """Raised by work that noticed its request was cancelled."""
+
+    def __init__(self, request_id: str | None = None, reason: str | None = None):
+        super().__init__(f"request {request_id} cancelled ({reason})")
+        self.request_id = request_id
+        self.reason = reason
+
+
+class CancelToken:
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.created_at = time.monotonic()
+        self.reason: str | None = None
+        self._event = threading.Event()
+        self._callbacks: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.request_id, self.reason)
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run `callback` when the token is cancelled (at once if it already
+        is). Returns a function that unregisters it; call that when the
+        guarded work finishes normally.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        _run_callback(self, callback)
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Fire the token once; returns False if it already was."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        log.info(
+            f"cancel.fired reason={reason} cleanups={len(callbacks)}",
+            extra=with_request_id(self.request_id),
+        )
+        for callback in callbacks:
+            _run_callback(self, callback)
+        return True
+
+
+def _run_callback(token: CancelToken, callback: Callable[[], None]) -> None:
+    try:
+        callback()
+    except Exception as e:
+        log.warning(
+            f"cancel.cleanup_failed | {e}",
+            extra=with_request_id(token.request_id),
+        )
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+
+_tokens: "OrderedDict[str, CancelToken]" = OrderedDict()
+_tokens_lock = threading.Lock()
+
+
+def start(request_id: str) -> CancelToken:
+    token = CancelToken(request_id)
+    with _tokens_lock:
+        _tokens[request_id] = token
+        _tokens.move_to_end(request_id)
+        while len(_tokens) > MAX_ACTIVE_TOKENS:
+            _tokens.popitem(last=False)
+    return token
+
+
+def get(request_id: str | None = None) -> CancelToken | None:
+    """Token for `request_id` (default: the current request), if active."""
+    rid = request_id or get_request_id()
+    if rid is None:
+        return None
+    with _tokens_lock:
+        return _tokens.get(rid)
+
+
+def cancel(request_id: str, reason: str = "cancelled") -> bool:
+    token = get(request_id)
+    return token.cancel(reason) if token is not None else False
+
+
+def cancel_others(request_id: str | None, reason: str) -> int:
+    """Cancel every active token except `request_id`'s; returns how many fired."""
+    with _tokens_lock:
+        others = [t for rid, t in _tokens.items() if rid != request_id]
+    return sum(token.cancel(reason) for token in others)
+
+
+def release(request_id: str | None) -> None:
+    """The request finished; its token can no longer be cancelled."""
+    if request_id is None:
+        return
+    with _tokens_lock:
+        _tokens.pop(request_id, None)
+
+
+def run_cancellable(token: CancelToken | None, fn: Callable, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs) but stop waiting as soon as `token` fires.
+
+    Blocking calls such as requests.post() cannot be interrupted from
+    another thread, so the call runs on a helper thread and Cancelled is
+    raised in the caller. Whatever the abandoned call returns later is
+    closed (if it has close()), which drops the connection. A call that
+    fails once the token has fired (its socket was shut down by another
+    cleanup) raises Cancelled too.
+    """
+    if token is None:
+        return fn(*args, **kwargs)
+    token.raise_if_cancelled()
+
+    done = threading.Event()
+    box: dict = {}
+    abandoned = False
+    box_lock = threading.Lock()
+
+    def target() -> None:
+        try:
+            box["result"] = fn(*args, **kwargs)
+        except BaseException as e:  # re-raised in the caller
+            box["error"] = e
+        with box_lock:
+            late = abandoned
+        if late and hasattr(box.get("result"), "close"):
+            try:
+                box["result"].close()
+            except Exception:
+                pass
+        done.set()
+
+    remove = token.on_cancel(done.set)
+    threading.Thread(target=target, daemon=True, name="cancellable-call").start()
+    done.wait()
+    remove()
+
+    with box_lock:
+        if "result" not in box and "error" not in box:
+            abandoned = True
+    if abandoned or ("error" in box and token.cancelled):
+        raise Cancelled(token.request_id, token.reason)
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+# ── Reclaimed-compute metric ──────────────────────────────────────────────────
+
+_reclaimed: dict[str, dict[str, float]] = {}
+_reclaimed_lock = threading.Lock()
+
+
+def record_reclaimed(kind: str, request_id: str | None = None, **amounts: float) -> None:
+    """
+    Count one aborted piece of work of `kind` ("cloud", "local_llm",
+    "tts") and add `amounts` (e.g. tokens_skipped=60, ran_ms=800) to its
+    running totals.
+    """
+    with _reclaimed_lock:
+        totals = _reclaimed.setdefault(kind, {"aborted": 0})
+        totals["aborted"] += 1
+        for key, value in amounts.items():
+            totals[key] = round(totals.get(key, 0) + value, 1)
+        snapshot = {k: dict(v) for k, v in _reclaimed.items()}
+
+    detail = " ".join(f"{k}={v}" for k, v in amounts.items())
+    log.info(
+        f"cancel.reclaimed kind={kind} {detail}".rstrip(),
+        extra=with_request_id(request_id),
+    )
+    metrics.publish("cancellation", snapshot)
@@ -6,6 +6,7 @@ from pathlib import Path
 
 import requests
 
+from core.intent import custom as custom_intents
 from core.logger import get_logger, with_request_id
 from config.settings import API_BASE_URL
 
@@ -24,6 +25,7 @@ DEFAULT_STATE = {
     "last_attempt_status": "never",
     "last_error": None,
     "source_endpoint": None,
+    "intents": None,
 }
 
 DEFAULT_FALLBACK_CONFIG = {
@@ -83,16 +85,20 @@ class ConfigSyncManager:
             manifest = {
                 "version": "local-bootstrap",
                 "schema_version": 1,
-                "domains": ["persona", "behavior", "tap_tags", "tuning"],
+                "domains": ["persona", "behavior", "tap_tags", "tuning", "intents"],
                 "files": [
                     "persona.json",
                     "behavior.json",
                     "tap_tags.json",
                     "tuning.json",
                     "raw_cloud_config.json",
+                    custom_intents.INTENTS_FILE,
+                    custom_intents.ARTIFACT_FILE,
                 ],
             }
 
+            self._write_json(bootstrap_dir / custom_intents.INTENTS_FILE, {})
+            manifest["intents"] = custom_intents.compile_artifact(bootstrap_dir, {})
             self._write_json(bootstrap_dir / "manifest.json", manifest)
             self._write_json(bootstrap_dir / "persona.json", DEFAULT_FALLBACK_CONFIG["persona"])
             self._write_json(bootstrap_dir / "behavior.json", DEFAULT_FALLBACK_CONFIG["behavior"])
@@ -139,6 +145,7 @@ class ConfigSyncManager:
             "last_attempt_status": state.get("last_attempt_status"),
             "last_error": state.get("last_error"),
             "source_endpoint": state.get("source_endpoint"),
+            "intents": state.get("intents"),
         }
 
     def get_active_version(self) -> str:
@@ -153,6 +160,7 @@ class ConfigSyncManager:
             "tap_tags": self._read_json(active_dir / "tap_tags.json", DEFAULT_FALLBACK_CONFIG["tap_tags"].copy()),
             "tuning": self._read_json(active_dir / "tuning.json", DEFAULT_FALLBACK_CONFIG["tuning"].copy()),
             "raw_cloud_config": self._read_json(active_dir / "raw_cloud_config.json", {}),
+            "intents": self._read_json(active_dir / custom_intents.INTENTS_FILE, {}),
         }
 
     # ------------------------------------------------------------------
@@ -175,6 +183,10 @@ class ConfigSyncManager:
         cfg = self.get_active_config()
         return cfg.get("tuning", {}) or {}
 
+    def get_custom_intents(self) -> dict:
+        cfg = self.get_active_config()
+        return cfg.get("intents", {}) or {}
+
     def get_persona_name(self) -> str:
         return (
             self.get_persona().get("assistant_name")
@@ -275,6 +287,7 @@ class ConfigSyncManager:
             },
             "tap_tags": self.get_tap_tags(),
             "tuning": self.get_tuning(),
+            "intents": self.get_custom_intents(),
             "raw_cloud_config": self.get_active_config().get("raw_cloud_config", {}),
         }
 
@@ -408,6 +421,11 @@ class ConfigSyncManager:
         if boot_document is not None:
             tuning["boot_document"] = boot_document
 
+        try:
+            intents = custom_intents.validate(config.get("intents"))
+        except custom_intents.IntentConfigError as e:
+            raise ConfigSyncError(f"invalid intents: {e}") from e
+
         if "sync_interval_seconds" in config:
             tuning["sync_interval_seconds"] = config.get("sync_interval_seconds")
         else:
@@ -418,6 +436,7 @@ class ConfigSyncManager:
             "behavior": behavior,
             "tap_tags": tap_tags,
             "tuning": tuning,
+            "intents": intents,
             "raw_cloud_config": config,
         }
 
@@ -433,22 +452,35 @@ class ConfigSyncManager:
         manifest = {
             "version": version,
             "schema_version": 1,
-            "domains": ["persona", "behavior", "tap_tags", "tuning"],
+            "domains": ["persona", "behavior", "tap_tags", "tuning", "intents"],
             "files": [
                 "persona.json",
                 "behavior.json",
                 "tap_tags.json",
                 "tuning.json",
                 "raw_cloud_config.json",
+                custom_intents.INTENTS_FILE,
+                custom_intents.ARTIFACT_FILE,
             ],
         }
 
+        # Compiled here so safebox-wake only has to load it on activation.
+        manifest["intents"] = custom_intents.compile_artifact(release_dir, normalized["intents"])
+        log.info(
+            f"config.intents.compiled version={version} "
+            f"custom_phrases={manifest['intents']['custom_phrases']} "
+            f"compile_ms={manifest['intents']['compile_ms']} "
+            f"bytes={manifest['intents']['artifact_bytes']}",
+            extra=with_request_id(),
+        )
+
         self._write_json(release_dir / "manifest.json", manifest)
         self._write_json(release_dir / "persona.json", normalized["persona"])
         self._write_json(release_dir / "behavior.json", normalized["behavior"])
         self._write_json(release_dir / "tap_tags.json", normalized["tap_tags"])
         self._write_json(release_dir / "tuning.json", normalized["tuning"])
         self._write_json(release_dir / "raw_cloud_config.json", normalized["raw_cloud_config"])
+        self._write_json(release_dir / custom_intents.INTENTS_FILE, normalized["intents"])
 
         return release_dir
 
@@ -493,9 +525,11 @@ class ConfigSyncManager:
 
             release_dir = self._write_release_from_config(version, config)
             self._activate_release(release_dir)
+            manifest = self._read_json(release_dir / "manifest.json", {})
 
             self._save_state(
                 current_version=version,
+                intents=manifest.get("intents"),
                 last_successful_sync_at=self._utc_now(),
                 last_attempt_status="success",
                 last_error=None,
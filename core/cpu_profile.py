@@ -0,0 +1,390 @@
+"""
+core/cpu_profile.py
+Core sets and thread counts for every SafeBox component on the Pi 5.
+
+Without coordination the audio callback, Porcupine, faster-whisper,
+llama-server, Piper, ffmpeg (offline music) and the Flask app all float
+over the same four cores, and CTranslate2 / llama.cpp each start one
+thread per core. A profile assigns each component a core set and, for
+the inference engines, a thread count:
+
+    audio   mic_stream's real-time threads (PortAudio callback, the
+            frame processor with VAD and Porcupine), pinned per thread
+    wake    the rest of the mic_stream process (event worker, routing,
+            playback), which must not compete with those two threads
+    stt     stt_service process; threads -> WhisperModel(cpu_threads=)
+    llm     llama-server; threads -> --threads
+    tts     Piper subprocesses
+    music   ffmpeg | aplay for offline music
+    web, cloud, device   the Flask UI, local cloud API, device controller
+
+The profile (CPU_PROFILE) is applied with os.sched_setaffinity: Python
+services call apply() at startup, threads that need their own cores
+call pin_thread(), subprocesses are started with taskset(argv) (no
+preexec_fn: mic_stream is multi-threaded when it forks), and
+non-Python services are started through
+
+    python -m core.cpu_profile exec llm -- /opt/llama.cpp/.../llama-server ...
+
+which pins itself, adds the thread flag and execs the command (same pid).
+The systemd units carry no CPUAffinity=, so the profile is the only
+source of placement and CPU_PROFILE=off really leaves everything
+unpinned; `python -m core.cpu_profile show` prints a profile.
+
+Interaction boost: while a request is active (wake to end of turn),
+background components (BACKGROUND) are confined to the profile's
+boost_cores so STT and the LLM get the remaining cores, and are put back
+when the last request ends. Only affinity is changed: raising a nice
+value cannot be undone without CAP_SYS_NICE.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+from core import metrics
+from core.logger import get_logger, with_request_id
+
+log = get_logger("cpu_profile")
+
+CPU_PROFILE = os.getenv("CPU_PROFILE", "shared")
+CPU_BOOST_ENABLED = os.getenv("CPU_BOOST_ENABLED", "true").lower() == "true"
+# A turn that never reports its end stops holding the boost after this.
+CPU_BOOST_MAX_SECONDS = float(os.getenv("CPU_BOOST_MAX_SECONDS", "30"))
+CPU_PROFILE_PID_DIR = Path(os.getenv("CPU_PROFILE_PID_DIR", "/opt/safebox/runtime/cpu_profile"))
+
+BACKGROUND = ("music", "web", "cloud", "device")
+
+# Flag each engine takes for its thread count when started via `exec`.
+THREAD_FLAGS = {"llm": "--threads"}
+TASKSET = shutil.which("taskset")
+
+PROFILES: dict[str, dict] = {
+    # No pinning, library default thread counts; the benchmark baseline.
+    "off": {"cores": {}, "threads": {}, "boost_cores": None},
+    # Core 0 only runs the audio threads; everything else shares 1-3.
+    "shared": {
+        "cores": {
+            "audio": [0],
+            "wake": [1, 2, 3],
+            "stt": [1, 2, 3],
+            "llm": [1, 2, 3],
+            "tts": [1, 2, 3],
+            "music": [1, 2, 3],
+            "web": [1, 2, 3],
+            "cloud": [1, 2, 3],
+            "device": [1, 2, 3],
+        },
+        "threads": {"stt": 3, "llm": 3},
+        "boost_cores": [3],
+    },
+    # STT keeps cores 1-2 to itself; Piper and background work live on 3.
+    "split": {
+        "cores": {
+            "audio": [0],
+            "wake": [3],
+            "stt": [1, 2],
+            "llm": [1, 2, 3],
+            "tts": [3],
+            "music": [3],
+            "web": [3],
+            "cloud": [3],
+            "device": [3],
+        },
+        "threads": {"stt": 2, "llm": 3},
+        "boost_cores": None,
+    },
+}
+
+
+def get_profile(name: str | None = None) -> dict:
+    name = name or CPU_PROFILE
+    profile = PROFILES.get(name)
+    if profile is None:
+        log.warning(f"cpu_profile.unknown name={name} -> off")
+        return PROFILES["off"]
+    return profile
+
+
+def _available(core_list) -> set[int] | None:
+    """The profile's cores that exist on this machine; None means no pinning."""
+    if not core_list:
+        return None
+    cores = {c for c in core_list if c < (os.cpu_count() or 1)}
+    return cores or None
+
+
+def cores(component: str, profile: str | None = None) -> set[int] | None:
+    return _available(get_profile(profile)["cores"].get(component))
+
+
+def boost_cores(profile: str | None = None) -> set[int] | None:
+    return _available(get_profile(profile)["boost_cores"])
+
+
+def threads(component: str, profile: str | None = None) -> int:
+    """Thread count for an inference engine; 0 leaves the library default."""
+    return int(get_profile(profile)["threads"].get(component, 0))
+
+
+def _set_affinity(pid: int, cpus: set[int]) -> bool:
+    try:
+        os.sched_setaffinity(pid, cpus)
+        return True
+    except (OSError, AttributeError) as e:
+        # Process gone, not ours, or no sched_setaffinity (non-Linux dev box).
+        log.debug(f"cpu_profile.affinity_failed pid={pid} | {e}")
+        return False
+
+
+def apply(component: str) -> bool:
+    """
+    Pin the calling process to `component`'s cores. Call it before
+    starting threads; they inherit the mask (pin_thread() moves single
+    threads afterwards). It also leaves a pid file so the interaction
+    boost and the thermal governor can find the process.
+    """
+    cpus = cores(component)
+    _write_pid(component, os.getpid())
+    if cpus is None:
+        return False
+    applied = _set_affinity(0, cpus)
+    if applied:
+        log.info(
+            f"cpu_profile.applied profile={CPU_PROFILE} component={component} "
+            f"cores={sorted(cpus)} threads={threads(component)}"
+        )
+    return applied
+
+
+def component_pid(component: str) -> int | None:
+    """Pid recorded by the component's apply(), if it is still running."""
+    pid = _read_pid(CPU_PROFILE_PID_DIR / f"{component}.pid")
+    if pid is None:
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return pid
+
+
+def pin(component: str, cpus: set[int] | None = None) -> bool:
+    """
+    Move a running component (found through its pid file) to `cpus`,
+    or back to its profile cores when None.
+    """
+    pid = component_pid(component)
+    if pid is None:
+        return False
+    return _set_affinity(pid, cpus or cores(component) or set(range(os.cpu_count() or 1)))
+
+
+def pin_thread(component: str) -> bool:
+    """Move only the calling thread (by native id) to `component`'s cores."""
+    cpus = cores(component)
+    if cpus is None:
+        return False
+    return _set_affinity(threading.get_native_id(), cpus)
+
+
+def taskset(component: str, argv: list[str]) -> list[str]:
+    """
+    `argv` started on `component`'s cores: taskset pins itself and execs
+    the command, so the Popen pid and its children carry the mask from
+    their first instruction. Unchanged when unpinned or taskset is missing.
+    """
+    cpus = cores(component)
+    if cpus is None or TASKSET is None:
+        return argv
+    return [TASKSET, "-c", ",".join(str(c) for c in sorted(cpus)), *argv]
+
+
+def exec_component(component: str, argv: list[str]) -> None:
+    """Pin this process, add the engine's thread flag and exec `argv`.
+
+    The thread count is the thermal tier's `<component>_threads` when it
+    sets one (see core.thermal), else the profile's.
+    """
+    from core import thermal  # thermal imports this module
+
+    apply(component)
+    count = thermal.setting(f"{component}_threads", threads(component))
+    flag = THREAD_FLAGS.get(component)
+    if count and flag and flag not in argv:
+        argv = [*argv, flag, str(count)]
+    os.execvp(argv[0], argv)
+
+
+def core_lists(profile: str | None = None) -> dict[str, str]:
+    """Core list per pinned component, in CPUAffinity= / taskset form."""
+    return {
+        component: " ".join(str(c) for c in sorted(core_list))
+        for component, core_list in get_profile(profile)["cores"].items()
+    }
+
+
+# ── Interaction boost ─────────────────────────────────────────────────────────
+
+_active: dict[str, float] = {}
+_boost_lock = threading.Lock()
+_boost_stats = {"boosts": 0, "boosted_seconds": 0.0, "expired": 0}
+_boost_started: float | None = None
+
+
+def _write_pid(component: str, pid: int) -> None:
+    try:
+        CPU_PROFILE_PID_DIR.mkdir(parents=True, exist_ok=True)
+        (CPU_PROFILE_PID_DIR / f"{component}.pid").write_text(str(pid))
+    except OSError as e:
+        log.warning(f"cpu_profile.pid_write_failed component={component} | {e}")
+
+
+def _read_pid(path: Path) -> int | None:
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _group_members(pgid: int) -> list[int]:
+    """Pids in process group `pgid` (offline music is bash | ffmpeg | aplay)."""
+    members = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            # pgrp is the 3rd field after "(comm)", which may contain spaces.
+            fields = (entry / "stat").read_text().rsplit(")", 1)[1].split()
+            if int(fields[2]) == pgid:
+                members.append(int(entry.name))
+        except (OSError, IndexError, ValueError):
+            continue
+    return members
+
+
+def _background_pids() -> dict[str, list[int]]:
+    pids: dict[str, list[int]] = {}
+    for component in BACKGROUND:
+        if component == "music":
+            from core.local_music import PID_FILE
+
+            leader = _read_pid(PID_FILE)
+            # Popen(start_new_session=True): the leader's pid is the group id.
+            members = _group_members(leader) if leader else []
+        else:
+            pid = _read_pid(CPU_PROFILE_PID_DIR / f"{component}.pid")
+            members = [pid] if pid else []
+        if members:
+            pids[component] = members
+    return pids
+
+
+def _place_background(boosted: bool) -> int:
+    boost_cpus = boost_cores()
+    moved = 0
+    for component, pids in _background_pids().items():
+        cpus = boost_cpus if boosted else cores(component)
+        if cpus is None:
+            cpus = set(range(os.cpu_count() or 1))
+        moved += sum(_set_affinity(pid, cpus) for pid in pids)
+    return moved
+
+
+def _publish_boost() -> None:
+    metrics.publish(
+        "cpu_profile",
+        {
+            "profile": CPU_PROFILE,
+            "boost_enabled": CPU_BOOST_ENABLED,
+            "boost_active": _boost_started is not None,
+            "active_requests": len(_active),
+            **_boost_stats,
+        },
+    )
+
+
+def _update_boost(request_id: str | None) -> None:
+    """Called with _boost_lock held after _active changed."""
+    global _boost_started
+    now = time.monotonic()
+    for rid, since in list(_active.items()):
+        if now - since > CPU_BOOST_MAX_SECONDS:
+            del _active[rid]
+            _boost_stats["expired"] += 1
+
+    if _active and _boost_started is None:
+        _boost_started = now
+        _boost_stats["boosts"] += 1
+        moved = _place_background(True)
+        log.info(f"cpu_profile.boost.on processes={moved}", extra=with_request_id(request_id))
+    elif not _active and _boost_started is not None:
+        held = now - _boost_started
+        _boost_started = None
+        _boost_stats["boosted_seconds"] = round(_boost_stats["boosted_seconds"] + held, 2)
+        moved = _place_background(False)
+        log.info(
+            f"cpu_profile.boost.off processes={moved} held_ms={held * 1000:.0f}",
+            extra=with_request_id(request_id),
+        )
+    else:
+        return
+    _publish_boost()
+
+
+def boost_begin(request_id: str) -> None:
+    """A request became active; background work yields the shared cores."""
+    if not CPU_BOOST_ENABLED or get_profile()["boost_cores"] is None:
+        return
+    with _boost_lock:
+        _active[request_id] = time.monotonic()
+        _update_boost(request_id)
+
+
+def boost_end(request_id: str | None = None) -> None:
+    """
+    The request's turn ended. With no request_id only expired turns are
+    dropped (periodic housekeeping).
+    """
+    if not CPU_BOOST_ENABLED or get_profile()["boost_cores"] is None:
+        return
+    with _boost_lock:
+        if request_id is not None:
+            _active.pop(request_id, None)
+        _update_boost(request_id)
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SafeBox CPU profile")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="print a profile's cores and thread counts")
+    show.add_argument("--profile", default=None)
+    run = sub.add_parser("exec", help="pin to a component's cores and exec a command")
+    run.add_argument("component")
+    run.add_argument("argv", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.command == "exec":
+        argv = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+        if not argv:
+            parser.error("exec needs a command after --")
+        exec_component(args.component, argv)
+        return
+
+    name = args.profile or CPU_PROFILE
+    profile = get_profile(name)
+    print(f"profile: {name}  boost_cores: {profile['boost_cores']}")
+    for component, value in core_lists(name).items():
+        print(f"{component:<7} cores={value:<8} threads={threads(component, name) or 'default'}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
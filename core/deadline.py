@@ -0,0 +1,203 @@
+"""
+core/deadline.py
+Per-request time budget for the voice pipeline.
+
+A Deadline is created when a recording is finalized and travels with
+the request through every stage. Each stage asks it for a timeout
+instead of using its own fixed one:
+
+    deadline = Deadline(rid)                      # REQUEST_BUDGET_SECONDS
+    with deadline.stage("llm.cloud", cap=20.0) as timeout:
+        ask_llm(..., timeout_seconds=timeout)
+    reply = execute_intent(result, deadline)      # handler timeout capped by timeout()
+
+timeout(cap) is the smaller of `cap` and what is left of the budget,
+but never below DEADLINE_MIN_STAGE_SECONDS so cheap local work still
+gets a chance once the budget is spent. Stages that cannot be
+interrupted (local Whisper) are only measured.
+
+Every stage's allotted and used time is kept; a stage that ran past
+its allotment counts as an overrun. Overruns, exhausted budgets and
+how replies were degraded (cache / offline kit / fallback phrase) are
+published as the "deadline" metrics section.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from core import metrics
+from core.logger import get_logger, with_request_id
+
+log = get_logger("deadline")
+
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "8.0"))
+DEADLINE_MIN_STAGE_SECONDS = float(os.getenv("DEADLINE_MIN_STAGE_SECONDS", "0.5"))
+
+# Ways a reply was produced once the budget ran out, in the order tried.
+DEGRADE_CACHE = "cache"
+DEGRADE_OFFLINE_KIT = "offline_kit"
+DEGRADE_FALLBACK = "fallback_phrase"
+DEGRADE_ORDER = (DEGRADE_CACHE, DEGRADE_OFFLINE_KIT, DEGRADE_FALLBACK)
+
+
+class BudgetExhausted(Exception):
+    """A stage did not finish inside its share of the request budget."""
+
+    def __init__(self, stage: str, allotted: float):
+        super().__init__(f"{stage} exceeded {allotted:.2f}s budget")
+        self.stage = stage
+        self.allotted = allotted
+
+
+class Deadline:
+    def __init__(
+        self,
+        request_id: str | None,
+        budget_seconds: float = REQUEST_BUDGET_SECONDS,
+        started_at: float | None = None,
+    ):
+        self.request_id = request_id
+        self.budget_seconds = budget_seconds
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.stages: dict[str, dict] = {}
+        self.degraded: str | None = None
+        self.exhausted = False
+        self.reply_ready_ms: float | None = None
+
+    def remaining(self) -> float:
+        return self.budget_seconds - (time.monotonic() - self.started_at)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self) -> bool:
+        """True once the budget is spent; a stage skipped because of it
+        marks the request as exhausted."""
+        if self.expired:
+            self.exhausted = True
+        return self.exhausted
+
+    def timeout(self, cap: float | None = None) -> float:
+        remaining, floor = self.remaining(), DEADLINE_MIN_STAGE_SECONDS
+        if cap is not None:
+            remaining, floor = min(cap, remaining), min(cap, floor)
+        return max(remaining, floor)
+
+    @contextmanager
+    def stage(self, name: str, cap: float | None = None):
+        """Time a stage against its allotment; yields the timeout to use."""
+        allotted = self.timeout(cap)
+        started = time.monotonic()
+        try:
+            yield allotted
+        finally:
+            self._record(name, allotted, time.monotonic() - started)
+
+    def call(self, name: str, cap: float | None, fn: Callable, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) and give up after the stage's timeout
+        with BudgetExhausted. The call keeps running on its helper
+        thread (handlers are not interruptible); only the wait ends.
+        """
+        box: dict = {}
+
+        def target() -> None:
+            try:
+                box["result"] = fn(*args, **kwargs)
+            except BaseException as e:  # re-raised in the caller
+                box["error"] = e
+
+        with self.stage(name, cap) as timeout:
+            # copy_context keeps the request id (logging, tracing) in the helper.
+            worker = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(target,),
+                daemon=True,
+                name=f"deadline-{name}",
+            )
+            worker.start()
+            worker.join(timeout)
+        if worker.is_alive():
+            self.exhausted = True
+            raise BudgetExhausted(name, timeout)
+        if "error" in box:
+            raise box["error"]
+        return box.get("result")
+
+    def reply_ready(self) -> None:
+        """The reply text exists; playback time is not part of the budget."""
+        self.reply_ready_ms = round((time.monotonic() - self.started_at) * 1000, 1)
+
+    def _record(self, name: str, allotted: float, used: float) -> None:
+        over = used - allotted
+        self.stages[name] = {
+            "allotted_ms": round(allotted * 1000, 1),
+            "used_ms": round(used * 1000, 1),
+            "overrun_ms": round(max(0.0, over) * 1000, 1),
+        }
+        if over > 0:
+            log.warning(
+                f"deadline.overrun stage={name} allotted_ms={allotted * 1000:.0f} "
+                f"used_ms={used * 1000:.0f}",
+                extra=with_request_id(self.request_id),
+            )
+        _note_stage(name, over)
+
+    def report(self) -> dict:
+        return {
+            "budget_ms": round(self.budget_seconds * 1000, 1),
+            "reply_ready_ms": self.reply_ready_ms,
+            "exhausted": self.exhausted,
+            "degraded": self.degraded,
+            "stages": dict(self.stages),
+        }
+
+    def finish(self) -> dict:
+        """Count the request in the metrics and return its report."""
+        report = self.report()
+        _note_request(self.exhausted, self.degraded)
+        return report
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+
+_totals = {
+    "requests": 0,
+    "exhausted": 0,
+    "degraded": {kind: 0 for kind in DEGRADE_ORDER},
+    "stages": {},
+}
+_totals_lock = threading.Lock()
+
+
+def _note_stage(name: str, over: float) -> None:
+    with _totals_lock:
+        stage = _totals["stages"].setdefault(
+            name, {"runs": 0, "overruns": 0, "overrun_ms_total": 0.0, "overrun_ms_max": 0.0}
+        )
+        stage["runs"] += 1
+        if over > 0:
+            stage["overruns"] += 1
+            stage["overrun_ms_total"] = round(stage["overrun_ms_total"] + over * 1000, 1)
+            stage["overrun_ms_max"] = round(max(stage["overrun_ms_max"], over * 1000), 1)
+
+
+def _note_request(exhausted: bool, degraded: str | None) -> None:
+    with _totals_lock:
+        _totals["requests"] += 1
+        _totals["exhausted"] += exhausted
+        if degraded is not None:
+            _totals["degraded"][degraded] += 1
+        snapshot = {
+            "budget_seconds": REQUEST_BUDGET_SECONDS,
+            "requests": _totals["requests"],
+            "exhausted": _totals["exhausted"],
+            "degraded": dict(_totals["degraded"]),
+            "stages": {k: dict(v) for k, v in _totals["stages"].items()},
+        }
+    metrics.publish("deadline", snapshot)
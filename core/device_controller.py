@@ -3,6 +3,7 @@ import os
 import time
 import socket
 import subprocess
+from core import cpu_profile, model_lifecycle, thermal
 from core.logger import setup_logger, with_request_id
 from core.survival_mode import SurvivalModeController
 from core.cloud_heartbeat import send_heartbeat
@@ -40,6 +41,9 @@ def health_snapshot():
 
 def main():
     print("DEVICE_CONTROLLER: starting", flush=True)
+    cpu_profile.apply("device")
+    thermal.start_governor()
+    lifecycle = model_lifecycle.start_manager()
     device_logger.info("device.booted", extra=with_request_id())
     ensure_runtime()
     survival = SurvivalModeController()
@@ -97,6 +101,9 @@ def main():
                 extra=with_request_id()
             )
             if new_mode == "survival":
+                # Offline questions will need the local LLM; load it now.
+                if lifecycle is not None:
+                    lifecycle.preload_llm("network_offline")
                 survival.enter()
             else:
                 survival.exit()
@@ -115,7 +122,8 @@ def main():
             "uptime": health_snapshot(),
             "timestamp": time.time(),
         })
-        if CONFIG_SYNC_ENABLED and current_mode == "cloud":
+        # Hot thermal tiers defer config sync until the SoC has cooled.
+        if CONFIG_SYNC_ENABLED and current_mode == "cloud" and thermal.setting("background_jobs", True):
             now = time.time()
             if now - last_config_sync_check >= CONFIG_SYNC_INTERVAL_SECONDS:
                 try:
@@ -2,80 +2,246 @@ import os
 # core/execution/executor.py
 # Production Grade — SafeBox M3 — Complete
 
+import bisect
+import contextvars
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from dataclasses import dataclass
+from typing import Callable
 from core.logger import get_logger
+from core import metrics, tracing
 
 log = get_logger("EXECUTOR")
 
+EXECUTOR_MAX_WORKERS = int(os.getenv("EXECUTOR_MAX_WORKERS", "4"))
+COMPOUND_MAX_WORKERS = int(os.getenv("COMPOUND_MAX_WORKERS", "4"))
+# Handler latency histogram, published to the "executor" metrics section.
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
 
-def execute_intent(result: dict) -> str:
+# Resource of a handler that must run alone in a compound command.
+RESOURCE_ALL = "*"
+
+
+@dataclass(frozen=True)
+class HandlerSpec:
+    intent: str
+    fn: Callable[..., str | None]
+    # Pool handlers are abandoned after this; inline ones are only logged as slow.
+    timeout_s: float
+    # Device, network or subprocess work: runs on the handler pool.
+    io_bound: bool
+    # Spoken when the handler times out or raises. A timed out handler
+    # may still finish, so for actions it must say the action may not
+    # have happened, never that it did or did not.
+    fallback: str
+    # Device it drives; intents on the same resource in a compound
+    # command run one after another, in the order they were spoken.
+    resource: str | None = None
+    # Gets the utterance (raw_text) as its only argument.
+    takes_text: bool = False
+
+
+HANDLERS: dict[str, HandlerSpec] = {}
+
+
+def handler(intent: str, *, timeout_s: float, fallback: str, io_bound: bool = True,
+            resource: str | None = None, takes_text: bool = False):
+    """Register fn as the handler for intent."""
+    def decorator(fn):
+        HANDLERS[intent] = HandlerSpec(intent, fn, timeout_s, io_bound, fallback, resource, takes_text)
+        return fn
+    return decorator
+
+
+_handler_pool = ThreadPoolExecutor(max_workers=EXECUTOR_MAX_WORKERS, thread_name_prefix="handler")
+# Separate from the handler pool: compound tasks wait on handler futures.
+_compound_pool = ThreadPoolExecutor(max_workers=COMPOUND_MAX_WORKERS, thread_name_prefix="intent")
+
+
+@tracing.traced("intent.execute")
+def execute_intent(result: dict, deadline=None) -> str:
+    """Run the intent's handler; `deadline` (core.deadline) caps its timeout."""
     intent = result.get("intent")
     log.info(f"executor.intent | intent={intent}")
 
-    if intent == "STATUS":
-        return handle_status()
-    elif intent == "OPEN_BOX":
-        return handle_open_box()
-    elif intent == "CLOSE_BOX":
-        return handle_close_box()
-    elif intent == "PLUG_ON":
-        return handle_plug_on()
-    elif intent == "PLUG_OFF":
-        return handle_plug_off()
-    elif intent == "PLUG_STATUS":
-        return handle_plug_status()
-    elif intent == "GET_TEMPERATURE":
-        return handle_temperature()
-    elif intent == "GOODNIGHT":
-        return handle_goodnight()
-    elif intent == "BT_PAIR":
-        return handle_bt_pair()
-    elif intent == "BT_DISCONNECT":
-        return handle_bt_disconnect()
-    elif intent == "BT_STATUS":
-        return handle_bt_status()
-    elif intent == "PLAY_MUSIC":
-        return handle_play()
-    elif intent == "PAUSE_MUSIC":
-        return handle_pause()
-    elif intent == "NEXT_TRACK":
-        return handle_next()
-    elif intent == "PREV_TRACK":
-        return handle_previous()
-    elif intent == "VOLUME_UP":
-        return handle_volume_up()
-    elif intent == "VOLUME_DOWN":
-        return handle_volume_down()
-    elif intent == "NFC_ENROLL_ONBOARDING":
-        return handle_nfc_enroll_onboarding()
-    elif intent == "NFC_ENROLL_GOODNIGHT":
-        return handle_nfc_enroll_goodnight()
-    elif intent == "NFC_ENROLL_MORNING":
-        return handle_nfc_enroll_morning()
-    elif intent == "NFC_ENROLL_MUSIC":
-        return handle_nfc_enroll_music()
-    elif intent == "NFC_ENROLL_TAP_KEY":
-        return handle_nfc_enroll_tap_key()
-    elif intent == "NFC_LIST_TAGS":
-        return handle_nfc_list_tags()
-    elif intent == "VAULT_SAVE":
-        return handle_vault_save(result.get("raw_text", ""))
-    elif intent == "VAULT_RETRIEVE":
-        return handle_vault_retrieve()
-    else:
+    if intent == "COMPOUND":
+        return execute_compound(result.get("clauses") or [], deadline)
+    spec = HANDLERS.get(intent)
+    if spec is None:
         log.warning(f"executor.no_handler | intent={intent}")
         return None
+    return run_handler(spec, result, deadline)
+
+
+def run_handler(spec: HandlerSpec, result: dict, deadline=None) -> str | None:
+    """
+    Run one handler under its timeout, or what is left of the request's
+    deadline if that is less. A hung device command answers with the
+    handler's fallback phrase; its thread is left to finish (or hit its
+    own subprocess timeout) in the background.
+    """
+    args = (result.get("raw_text", ""),) if spec.takes_text else ()
+    timeout = spec.timeout_s if deadline is None else deadline.timeout(spec.timeout_s)
+    started = time.monotonic()
+    outcome = "ok"
+    future = None
+    try:
+        if spec.io_bound:
+            future = _handler_pool.submit(contextvars.copy_context().run, spec.fn, *args)
+            reply = future.result(timeout=timeout)
+        else:
+            reply = spec.fn(*args)
+    except FuturesTimeout:
+        future.cancel()  # only helps if it was still queued behind hung handlers
+        outcome, reply = "timeout", spec.fallback
+        if deadline is not None and timeout < spec.timeout_s:
+            deadline.exhausted = True
+        log.warning(f"executor.handler.timeout | intent={spec.intent} timeout_s={timeout:.2f}")
+    except Exception as e:
+        outcome, reply = "error", spec.fallback
+        log.warning(f"executor.handler.failed | intent={spec.intent} {e}")
+    elapsed_ms = (time.monotonic() - started) * 1000
+    if outcome == "ok" and elapsed_ms > spec.timeout_s * 1000:
+        log.warning(f"executor.handler.slow | intent={spec.intent} ms={elapsed_ms:.0f}")
+    _stats.record(spec.intent, elapsed_ms, outcome)
+    return reply
+
+
+class HandlerStats:
+    """
+    Per-intent latency histogram and outcome counts. record() only
+    counts; publish() writes the "executor" metrics section and is
+    called from safebox-wake's periodic stats tick, so no handler call
+    waits on a metrics file write.
+    """
+
+    def __init__(self):
+        self._by_intent: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, intent: str, ms: float, outcome: str) -> None:
+        with self._lock:
+            entry = self._by_intent.setdefault(
+                intent,
+                {
+                    "count": 0, "ok": 0, "timeout": 0, "error": 0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                    "recent": deque(maxlen=100),
+                },
+            )
+            entry["count"] += 1
+            entry[outcome] += 1
+            entry["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+            entry["recent"].append(ms)
+
+    def publish(self) -> None:
+        with self._lock:
+            snapshot = self.snapshot()
+        metrics.publish("executor", snapshot)
+
+    def snapshot(self) -> dict:
+        handlers = {}
+        for intent, entry in self._by_intent.items():
+            recent = sorted(entry["recent"])
+            handlers[intent] = {
+                "count": entry["count"],
+                "ok": entry["ok"],
+                "timeout": entry["timeout"],
+                "error": entry["error"],
+                "p50_ms": round(recent[len(recent) // 2], 1),
+                "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 1),
+                "max_ms": round(recent[-1], 1),
+                "histogram": dict(zip([f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"], entry["buckets"])),
+                "timeout_s": HANDLERS[intent].timeout_s,
+            }
+        return {"buckets_ms": list(LATENCY_BUCKETS_MS), "handlers": handlers}
+
+
+_stats = HandlerStats()
+
+
+def publish_stats() -> None:
+    _stats.publish()
+
+
+# ── Compound commands ─────────────────────────────────────────────────────
+
+def _run_group(clauses: list[dict], deadline=None) -> list[tuple[dict, str | None]]:
+    out = []
+    for clause in clauses:
+        try:
+            out.append((clause, execute_intent(clause, deadline)))
+        except Exception as e:
+            log.warning(f"executor.compound.clause_failed | intent={clause.get('intent')} {e}")
+            out.append((clause, None))
+    return out
+
+
+def merge_replies(replies: list[str | None]) -> str | None:
+    """
+    One spoken response: the replies as sentences in spoken order, with
+    a reply that repeats the one before it said once.
+    """
+    merged = []
+    for reply in replies:
+        reply = (reply or "").strip()
+        if not reply:
+            continue
+        reply = reply if reply[-1] in ".!?" else reply + "."
+        if merged and merged[-1] == reply:
+            continue
+        merged.append(reply)
+    return " ".join(merged) or None
+
+
+def execute_compound(clauses: list[dict], deadline=None) -> str | None:
+    """
+    Run the clauses of a compound command concurrently on the intent
+    pool, one task per device (HandlerSpec.resource), so slow network handlers
+    such as the smart plug and Bluetooth overlap instead of adding up.
+    """
+    resources = [getattr(HANDLERS.get(c.get("intent")), "resource", None) for c in clauses]
+    if RESOURCE_ALL in resources:
+        groups = [clauses]
+    else:
+        by_resource: dict[str, list[dict]] = {}
+        for i, (clause, resource) in enumerate(zip(clauses, resources)):
+            by_resource.setdefault(resource or f"own-{i}", []).append(clause)
+        groups = list(by_resource.values())
+
+    started = time.monotonic()
+    log.info(
+        f"executor.compound | intents={[c.get('intent') for c in clauses]} groups={len(groups)}"
+    )
+    # Each task gets its own copy of the context so logs and spans keep the request id.
+    futures = [
+        _compound_pool.submit(contextvars.copy_context().run, _run_group, group, deadline)
+        for group in groups
+    ]
+    replies = {}
+    for future in futures:
+        for clause, reply in future.result():
+            replies[id(clause)] = reply
+    log.info(f"executor.compound.done | ms={(time.monotonic() - started) * 1000:.0f}")
+    return merge_replies([replies.get(id(c)) for c in clauses])
 
 
 # ── Core ──────────────────────────────────────────────────────────────────
 
+@handler("STATUS", timeout_s=1.0, io_bound=False, fallback="Safebox is online.")
 def handle_status() -> str:
     return "Safebox is online and locked."
 
+# Lock actions run inline, to completion: abandoning one mid-flight would
+# leave the lock state unknown while the user is told something else.
+@handler("OPEN_BOX", timeout_s=3.0, io_bound=False, resource="box", fallback="Sorry, the box may not have opened. Please check it.")
 def handle_open_box() -> str:
     time.sleep(0.5)
     return "Box opened."
 
+@handler("CLOSE_BOX", timeout_s=3.0, io_bound=False, resource="box", fallback="Sorry, the box may not have closed. Please check it.")
 def handle_close_box() -> str:
     time.sleep(0.5)
     return "Box closed."
@@ -83,6 +249,7 @@ def handle_close_box() -> str:
 
 # ── WS2: Smart Plug ───────────────────────────────────────────────────────
 
+@handler("PLUG_ON", timeout_s=8.0, resource="plug", fallback="The smart plug isn't responding, so it may not have turned on.")
 def handle_plug_on() -> str:
     try:
         from core.smart_plug import turn_on
@@ -91,6 +258,7 @@ def handle_plug_on() -> str:
         log.warning(f"executor.plug_on.failed | {e}")
         return "Sorry, I couldn't turn on the plug right now."
 
+@handler("PLUG_OFF", timeout_s=8.0, resource="plug", fallback="The smart plug isn't responding, so it may not have turned off.")
 def handle_plug_off() -> str:
     try:
         from core.smart_plug import turn_off
@@ -99,6 +267,7 @@ def handle_plug_off() -> str:
         log.warning(f"executor.plug_off.failed | {e}")
         return "Sorry, I couldn't turn off the plug right now."
 
+@handler("PLUG_STATUS", timeout_s=8.0, resource="plug", fallback="Sorry, I couldn't get the plug status right now.")
 def handle_plug_status() -> str:
     try:
         from core.smart_plug import get_power_usage
@@ -110,6 +279,7 @@ def handle_plug_status() -> str:
 
 # ── WS2: Temperature ──────────────────────────────────────────────────────
 
+@handler("GET_TEMPERATURE", timeout_s=4.0, fallback="Sorry, I couldn't read the temperature sensor right now.")
 def handle_temperature() -> str:
     try:
         from core.temperature import get_temperature_response
@@ -121,6 +291,7 @@ def handle_temperature() -> str:
 
 # ── WS2: Goodnight ────────────────────────────────────────────────────────
 
+@handler("GOODNIGHT", timeout_s=15.0, resource=RESOURCE_ALL, fallback="Sorry, the goodnight routine didn't finish. The plug and music may still be on.")
 def handle_goodnight() -> str:
     log.info("executor.goodnight.start")
     parts = []
@@ -152,6 +323,7 @@ def handle_goodnight() -> str:
 
 # ── WS3: Bluetooth Pairing ────────────────────────────────────────────────
 
+@handler("BT_PAIR", timeout_s=12.0, resource="audio", fallback="Sorry, Bluetooth pairing may not have started.")
 def handle_bt_pair() -> str:
     try:
         from core.bluetooth_manager import start_pairing_mode
@@ -160,6 +332,7 @@ def handle_bt_pair() -> str:
         log.warning(f"executor.bt_pair.failed | {e}")
         return "Sorry, I couldn't start Bluetooth pairing right now."
 
+@handler("BT_DISCONNECT", timeout_s=8.0, resource="audio", fallback="Sorry, the phone may not have disconnected.")
 def handle_bt_disconnect() -> str:
     try:
         from core.bluetooth_manager import disconnect_device
@@ -168,6 +341,7 @@ def handle_bt_disconnect() -> str:
         log.warning(f"executor.bt_disconnect.failed | {e}")
         return "Sorry, I couldn't disconnect the phone."
 
+@handler("BT_STATUS", timeout_s=6.0, resource="audio", fallback="I couldn't get the Bluetooth status right now.")
 def handle_bt_status() -> str:
     try:
         from core.bluetooth_manager import get_state
@@ -184,6 +358,7 @@ def handle_bt_status() -> str:
 
 # ── WS3: AVRCP Playback ───────────────────────────────────────────────────
 
+@handler("PLAY_MUSIC", timeout_s=8.0, resource="audio", fallback="Sorry, the music may not have started.")
 def handle_play() -> str:
     try:
         from core.bluetooth_manager import get_state, play as bt_play
@@ -200,6 +375,7 @@ def handle_play() -> str:
         log.warning(f"executor.local_play.failed | {e}")
         return "Sorry, I couldn't play music right now."
 
+@handler("PAUSE_MUSIC", timeout_s=8.0, resource="audio", fallback="Sorry, the music may not have paused.")
 def handle_pause() -> str:
     try:
         from core.bluetooth_manager import get_state, pause as bt_pause
@@ -217,6 +393,7 @@ def handle_pause() -> str:
     except Exception as e:
         log.warning(f"executor.local_pause.failed | {e}")
         return "Sorry, I couldn't pause music right now."
+@handler("NEXT_TRACK", timeout_s=6.0, resource="audio", fallback="Sorry, the track may not have changed.")
 def handle_next() -> str:
     try:
         from core.bluetooth_manager import next_track
@@ -225,6 +402,7 @@ def handle_next() -> str:
         log.warning(f"executor.next.failed | {e}")
         return "Sorry, I couldn't skip the track."
 
+@handler("PREV_TRACK", timeout_s=6.0, resource="audio", fallback="Sorry, the track may not have changed.")
 def handle_previous() -> str:
     try:
         from core.bluetooth_manager import previous_track
@@ -233,6 +411,7 @@ def handle_previous() -> str:
         log.warning(f"executor.previous.failed | {e}")
         return "Sorry, I couldn't go to the previous track."
 
+@handler("VOLUME_UP", timeout_s=6.0, resource="audio", fallback="Sorry, the volume may not have changed.")
 def handle_volume_up() -> str:
     try:
         from core.bluetooth_manager import volume_up
@@ -241,6 +420,7 @@ def handle_volume_up() -> str:
         log.warning(f"executor.volume_up.failed | {e}")
         return "Sorry, I couldn't adjust the volume."
 
+@handler("VOLUME_DOWN", timeout_s=6.0, resource="audio", fallback="Sorry, the volume may not have changed.")
 def handle_volume_down() -> str:
     try:
         from core.bluetooth_manager import volume_down
@@ -252,6 +432,7 @@ def handle_volume_down() -> str:
 
 # ── WS1: NFC Enrollment ───────────────────────────────────────────────────
 
+@handler("NFC_ENROLL_ONBOARDING", timeout_s=4.0, resource="nfc", fallback="Sorry, NFC enrollment may not have started.")
 def handle_nfc_enroll_onboarding() -> str:
     try:
         from core.nfc_manager import start_enrollment
@@ -261,6 +442,7 @@ def handle_nfc_enroll_onboarding() -> str:
         log.warning(f"executor.nfc_enroll.failed | {e}")
         return "Sorry, I couldn't start NFC enrollment right now."
 
+@handler("NFC_ENROLL_GOODNIGHT", timeout_s=4.0, resource="nfc", fallback="Sorry, NFC enrollment may not have started.")
 def handle_nfc_enroll_goodnight() -> str:
     try:
         from core.nfc_manager import start_enrollment
@@ -270,6 +452,7 @@ def handle_nfc_enroll_goodnight() -> str:
         log.warning(f"executor.nfc_enroll.failed | {e}")
         return "Sorry, I couldn't start NFC enrollment right now."
 
+@handler("NFC_ENROLL_MORNING", timeout_s=4.0, resource="nfc", fallback="Sorry, NFC enrollment may not have started.")
 def handle_nfc_enroll_morning() -> str:
     try:
         from core.nfc_manager import start_enrollment
@@ -279,6 +462,7 @@ def handle_nfc_enroll_morning() -> str:
         log.warning(f"executor.nfc_enroll.failed | {e}")
         return "Sorry, I couldn't start NFC enrollment right now."
 
+@handler("NFC_ENROLL_MUSIC", timeout_s=4.0, resource="nfc", fallback="Sorry, NFC enrollment may not have started.")
 def handle_nfc_enroll_music() -> str:
     try:
         from core.nfc_manager import start_enrollment
@@ -288,6 +472,7 @@ def handle_nfc_enroll_music() -> str:
         log.warning(f"executor.nfc_enroll.failed | {e}")
         return "Sorry, I couldn't start NFC enrollment right now."
 
+@handler("NFC_ENROLL_TAP_KEY", timeout_s=4.0, resource="nfc", fallback="Sorry, Tap KEY enrollment may not have started.")
 def handle_nfc_enroll_tap_key() -> str:
     try:
         from core.nfc_manager import start_enrollment
@@ -297,6 +482,7 @@ def handle_nfc_enroll_tap_key() -> str:
         log.warning(f"executor.nfc_tap_key.failed | {e}")
         return "Sorry, I couldn't start Tap KEY enrollment right now."
 
+@handler("NFC_LIST_TAGS", timeout_s=4.0, resource="nfc", fallback="Sorry, I couldn't list your tags right now.")
 def handle_nfc_list_tags() -> str:
     try:
         from core.nfc_manager import list_tags
@@ -313,6 +499,7 @@ def handle_nfc_list_tags() -> str:
 
 # ── Vault Voice Commands ──────────────────────────────────────────────────
 
+@handler("VAULT_SAVE", timeout_s=3.0, io_bound=False, takes_text=True, fallback="Sorry, that may not have been saved to your vault.")
 def handle_vault_save(text: str) -> str:
     """
     Save a voice note to the vault.
@@ -360,6 +547,7 @@ def handle_vault_save(text: str) -> str:
         return "Sorry, I couldn't save that to your vault right now."
 
 
+@handler("VAULT_RETRIEVE", timeout_s=3.0, io_bound=False, fallback="Sorry, I couldn't read your vault right now.")
 def handle_vault_retrieve() -> str:
     """
     Read back the most recent vault notes by voice.
@@ -0,0 +1,182 @@
+"""
+core/intent/custom.py
+Cloud-delivered intent phrases, compiled at config-sync time.
+
+The synced config may carry an "intents" domain that adds phrases (for
+example Hindi variants) to the built-in intents:
+
+    "intents": {"PLAY_MUSIC": ["gaane bajao"], "VOLUME_UP": ["thoda tez karo"]}
+
+Only intents the executor knows (the keys of INTENTS) are accepted, and
+every custom phrase needs at least MIN_PHRASE_WORDS words: the prefix
+and substring tiers score any phrase found inside an utterance at 0.95 /
+0.90, so a one-word phrase like "on" or "band" would take over every
+command containing it. The config sync validates the domain, merges it with INTENTS, compiles the
+PhraseIndex and pickles it into the release directory (ARTIFACT_FILE)
+next to the validated phrases (intents.json). A release without custom
+phrases still gets the artifact, so every release is self-contained.
+
+safebox-wake never compiles on the voice path: a watcher thread follows
+the "active" symlink and, when it points at a new release, loads that
+release's artifact and swaps it into the matcher. Only if the artifact
+is missing or was built by a different index.py (ARTIFACT_FORMAT is a
+hash of that file, so any change to PhraseIndex invalidates old
+artifacts) does the watcher compile it itself, still off the voice path.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+
+from core.intent import index as index_module, matcher
+from core.intent.index import PhraseIndex
+from core.intent.intents import INTENTS
+from core.intent.normalize import normalize
+from core.logger import get_logger, with_request_id
+
+log = get_logger("intent.custom")
+
+INTENTS_FILE = "intents.json"
+ARTIFACT_FILE = "intents.idx"
+# Artifacts pickle a PhraseIndex; one pickled by other code is recompiled.
+ARTIFACT_FORMAT = hashlib.sha256(Path(index_module.__file__).read_bytes()).hexdigest()[:16]
+MAX_CUSTOM_PHRASES = int(os.getenv("INTENT_MAX_CUSTOM_PHRASES", "5000"))
+MAX_PHRASE_CHARS = 120
+MIN_PHRASE_WORDS = int(os.getenv("INTENT_MIN_PHRASE_WORDS", "2"))
+INTENT_WATCH_SECONDS = float(os.getenv("INTENT_WATCH_SECONDS", "5"))
+
+
+class IntentConfigError(ValueError):
+    pass
+
+
+def validate(custom) -> dict[str, list[str]]:
+    """Cleaned {intent: [phrases]}; raises IntentConfigError when malformed."""
+    if custom is None:
+        return {}
+    if not isinstance(custom, dict):
+        raise IntentConfigError("intents must be an object of intent -> phrases")
+    cleaned: dict[str, list[str]] = {}
+    total = 0
+    for intent, phrases in custom.items():
+        if intent not in INTENTS:
+            raise IntentConfigError(f"unknown intent {intent!r}")
+        if not isinstance(phrases, list):
+            raise IntentConfigError(f"phrases for {intent} must be a list")
+        seen = set()
+        for phrase in phrases:
+            if not isinstance(phrase, str):
+                raise IntentConfigError(f"non-string phrase for {intent}: {phrase!r}")
+            # Utterances reach the matcher normalized; phrases must match that form.
+            phrase = normalize(phrase)
+            if not phrase:
+                raise IntentConfigError(f"empty phrase for {intent}")
+            if len(phrase) > MAX_PHRASE_CHARS:
+                raise IntentConfigError(f"phrase longer than {MAX_PHRASE_CHARS} chars for {intent}")
+            if len(phrase.split()) < MIN_PHRASE_WORDS:
+                raise IntentConfigError(
+                    f"phrase {phrase!r} for {intent} has fewer than {MIN_PHRASE_WORDS} words"
+                )
+            if phrase not in seen:
+                seen.add(phrase)
+                cleaned.setdefault(intent, []).append(phrase)
+        total += len(seen)
+    if total > MAX_CUSTOM_PHRASES:
+        raise IntentConfigError(f"{total} custom phrases, limit is {MAX_CUSTOM_PHRASES}")
+    return cleaned
+
+
+def merged(custom: dict[str, list[str]]) -> dict[str, list[str]]:
+    """Built-in phrases first (they keep winning ties), then custom ones."""
+    return {intent: phrases + custom.get(intent, []) for intent, phrases in INTENTS.items()}
+
+
+def compile_artifact(release_dir: Path, custom: dict[str, list[str]]) -> dict:
+    """Compile INTENTS + custom into release_dir/ARTIFACT_FILE; returns a report."""
+    started = time.perf_counter()
+    index = PhraseIndex(merged(custom))
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    path = release_dir / ARTIFACT_FILE
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump({"format": ARTIFACT_FORMAT, "index": index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return {
+        "artifact": ARTIFACT_FILE,
+        "format": ARTIFACT_FORMAT,
+        "custom_phrases": sum(len(p) for p in custom.values()),
+        "total_phrases": len(index),
+        "compile_ms": round(compile_ms, 1),
+        "artifact_bytes": path.stat().st_size,
+    }
+
+
+def load_artifact(release_dir: Path) -> PhraseIndex | None:
+    """The release's compiled index, or None if missing / incompatible."""
+    try:
+        with open(release_dir / ARTIFACT_FILE, "rb") as f:
+            data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning(f"intents.artifact_unreadable release={release_dir.name} | {e}", extra=with_request_id())
+        return None
+    if not isinstance(data, dict) or data.get("format") != ARTIFACT_FORMAT:
+        return None
+    return data.get("index")
+
+
+def _read_custom(release_dir: Path) -> dict[str, list[str]]:
+    try:
+        with open(release_dir / INTENTS_FILE, "r", encoding="utf-8") as f:
+            return validate(json.load(f))
+    except FileNotFoundError:
+        return {}
+
+
+def activate_release(release_dir: Path) -> PhraseIndex:
+    """Swap the release's index into the matcher (compiling it if needed)."""
+    started = time.perf_counter()
+    index = load_artifact(release_dir)
+    source = "artifact"
+    if index is None:
+        custom = _read_custom(release_dir)
+        index, source = PhraseIndex(merged(custom)), "compiled"
+    matcher.set_index(index)
+    log.info(
+        f"intents.swapped release={release_dir.name} source={source} phrases={len(index)} "
+        f"ms={(time.perf_counter() - started) * 1000:.1f}",
+        extra=with_request_id(),
+    )
+    return index
+
+
+def _watch(active_link: Path) -> None:
+    current = None
+    while True:
+        try:
+            release_dir = active_link.resolve()
+            if release_dir != current and release_dir.is_dir():
+                # Releases never change once active: one attempt each.
+                current = release_dir
+                activate_release(release_dir)
+        except Exception as e:
+            log.warning(f"intents.watch_failed | {e}", extra=with_request_id())
+        time.sleep(INTENT_WATCH_SECONDS)
+
+
+_watcher_started = False
+
+
+def start_watcher(active_link: Path) -> None:
+    """Follow the config sync's active release (once per process)."""
+    global _watcher_started
+    if _watcher_started:
+        return
+    _watcher_started = True
+    threading.Thread(target=_watch, args=(active_link,), daemon=True, name="intent-watcher").start()
@@ -0,0 +1,228 @@
+"""
+core/intent/index.py
+Compiled phrase index behind match_intent.
+
+The linear matcher compares the utterance with every phrase in turn:
+equality, startswith (0.95), substring (0.90), else the difflib
+SequenceMatcher ratio, keeping the first phrase with the highest score.
+PhraseIndex gives the same (intent, score) without the full scan:
+
+  exact       dict lookup
+  prefix /    one Aho-Corasick pass over the utterance finds every phrase
+  substring   occurring in it, and where
+  fuzzy       a character-trigram TF-IDF matrix (stored per trigram, so a
+              query is one sparse matrix-vector product via bincount)
+              picks the top-k likely phrases; their exact ratio sets a
+              floor. quick_ratio(), computed for all phrases at once
+              from a character-count matrix, is an upper bound of
+              ratio(), so only phrases whose bound reaches the floor are
+              scored with SequenceMatcher.
+
+Duplicate phrases keep their first occurrence, so ties still go to the
+phrase that comes first in INTENTS order.
+"""
+
+from collections import deque
+from difflib import SequenceMatcher
+
+import numpy as np
+
+NGRAM = 3
+FUZZY_TOP_K = 8
+PREFIX_SCORE = 0.95
+SUBSTRING_SCORE = 0.90
+# Bound and ratio are both 2*M/T in float64; the slack only guards rounding.
+_EPS = 1e-9
+
+
+class AhoCorasick:
+    """Multi-pattern substring search: find() yields (start, pattern_id)."""
+
+    def __init__(self, patterns: list[str]):
+        self.lengths = [len(p) for p in patterns]
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[list[int]] = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pattern_id)
+
+        # Breadth-first failure links; each node's output also gets the
+        # outputs of its failure target (the suffixes that end there).
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str):
+        node = 0
+        for end, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for pattern_id in self._out[node]:
+                yield end + 1 - self.lengths[pattern_id], pattern_id
+
+
+def _ngrams(text: str) -> list[str]:
+    padded = f" {text} "
+    return [padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))]
+
+
+class PhraseIndex:
+    def __init__(self, intents: dict[str, list[str]], top_k: int = FUZZY_TOP_K):
+        self.top_k = top_k
+        self.phrases: list[str] = []
+        self.intents: list[str] = []
+        self._by_phrase: dict[str, int] = {}
+        for intent, phrases in intents.items():
+            for phrase in phrases:
+                phrase_lower = phrase.lower()
+                if phrase_lower not in self._by_phrase:
+                    self._by_phrase[phrase_lower] = len(self.phrases)
+                    self.phrases.append(phrase_lower)
+                    self.intents.append(intent)
+
+        # An empty phrase is a prefix of everything; the automaton cannot hold it.
+        self._empty = self._by_phrase.get("")
+        self._automaton = AhoCorasick(self.phrases)
+        self._build_fuzzy()
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def _build_fuzzy(self) -> None:
+        count = len(self.phrases)
+        self._lengths = np.array([len(p) for p in self.phrases], dtype=np.float64)
+
+        # Character counts for the quick_ratio bound.
+        self._chars: dict[str, int] = {}
+        rows, cols = [], []
+        for row, phrase in enumerate(self.phrases):
+            for ch in phrase:
+                rows.append(row)
+                cols.append(self._chars.setdefault(ch, len(self._chars)))
+        self._char_counts = np.zeros((count, max(1, len(self._chars))), dtype=np.int16)
+        np.add.at(self._char_counts, (rows, cols), 1)
+
+        # Trigram TF-IDF, L2-normalised rows, kept column-wise (trigram ->
+        # phrase rows and weights) so a query only touches its own trigrams.
+        postings: dict[str, dict[int, float]] = {}
+        for row, phrase in enumerate(self.phrases):
+            for gram in _ngrams(phrase):
+                column = postings.setdefault(gram, {})
+                column[row] = column.get(row, 0.0) + 1.0
+        self._idf = {
+            gram: float(np.log((1 + count) / (1 + len(column))) + 1.0)
+            for gram, column in postings.items()
+        }
+        norms = np.zeros(count)
+        for gram, column in postings.items():
+            for row, tf in column.items():
+                norms[row] += (tf * self._idf[gram]) ** 2
+        norms = np.sqrt(norms)
+        norms[norms == 0] = 1.0
+        self._columns: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for gram, column in postings.items():
+            members = np.fromiter(column.keys(), dtype=np.int64, count=len(column))
+            weights = np.fromiter(column.values(), dtype=np.float64, count=len(column))
+            self._columns[gram] = (members, weights * self._idf[gram] / norms[members])
+
+    # ── Tiers ─────────────────────────────────────────────────────────────────
+
+    def _occurrences(self, text: str) -> dict[int, float]:
+        """Phrase row -> prefix / substring score for phrases found in text."""
+        found: dict[int, float] = {}
+        for start, row in self._automaton.find(text):
+            score = PREFIX_SCORE if start == 0 else SUBSTRING_SCORE
+            if score > found.get(row, 0.0):
+                found[row] = score
+        if self._empty is not None:
+            found[self._empty] = PREFIX_SCORE
+        return found
+
+    def _tfidf_top(self, text: str) -> np.ndarray:
+        grams: dict[str, float] = {}
+        for gram in _ngrams(text):
+            if gram in self._columns:
+                grams[gram] = grams.get(gram, 0.0) + 1.0
+        if not grams:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate([self._columns[g][0] for g in grams])
+        weights = np.concatenate([self._columns[g][1] * tf * self._idf[g] for g, tf in grams.items()])
+        scores = np.bincount(rows, weights=weights, minlength=len(self.phrases))
+        k = min(self.top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[scores[top] > 0]
+
+    def _ratio_bounds(self, text: str) -> np.ndarray:
+        """SequenceMatcher.quick_ratio() of text against every phrase."""
+        query: dict[int, int] = {}
+        for ch in text:
+            col = self._chars.get(ch)
+            if col is not None:
+                query[col] = query.get(col, 0) + 1
+        total = self._lengths + len(text)
+        total[total == 0] = 1.0
+        if not query:
+            return np.zeros(len(self.phrases))
+        cols = np.fromiter(query.keys(), dtype=np.int64, count=len(query))
+        counts = np.fromiter(query.values(), dtype=np.int16, count=len(query))
+        common = np.minimum(self._char_counts[:, cols], counts).sum(axis=1)
+        return 2.0 * common / total
+
+    # ── Matching ──────────────────────────────────────────────────────────────
+
+    def match(self, text_lower: str) -> tuple[str | None, float]:
+        if not self.phrases:
+            return None, 0.0
+        row = self._by_phrase.get(text_lower)
+        if row is not None:
+            return self.intents[row], 1.0
+
+        # (score, row) of the best phrase so far; lower row wins ties.
+        best_score, best_row = 0.0, None
+        found = self._occurrences(text_lower)
+        for row, score in found.items():
+            if score > best_score or (score == best_score and row < best_row):
+                best_score, best_row = score, row
+
+        scored = set(found)
+
+        def consider(row: int) -> None:
+            nonlocal best_score, best_row
+            scored.add(row)
+            score = SequenceMatcher(None, text_lower, self.phrases[row]).ratio()
+            if score > best_score or (score == best_score and best_row is not None and row < best_row):
+                best_score, best_row = score, row
+
+        for row in self._tfidf_top(text_lower).tolist():
+            if row not in scored:
+                consider(row)
+
+        bounds = self._ratio_bounds(text_lower)
+        # A zero ratio never beats "no match" (None, 0.0).
+        candidates = np.flatnonzero((bounds >= best_score - _EPS) & (bounds > 0))
+        for row in candidates[np.argsort(-bounds[candidates], kind="stable")].tolist():
+            if bounds[row] < best_score - _EPS:
+                break
+            if row not in scored:
+                consider(row)
+
+        if best_row is None:
+            return None, best_score
+        return self.intents[best_row], best_score
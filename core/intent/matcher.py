@@ -1,27 +1,50 @@
 from difflib import SequenceMatcher
+
+from core.intent.index import PhraseIndex
 from core.intent.intents import INTENTS
 
+# Compiled once at import; set_intents() swaps in a new table.
+_index = PhraseIndex(INTENTS)
+
 
 def similarity(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
 
+def set_intents(intents: dict[str, list[str]]) -> PhraseIndex:
+    """Compile `intents` and make it the table match_intent uses."""
+    return set_index(PhraseIndex(intents))
+
+
+def set_index(index: PhraseIndex) -> PhraseIndex:
+    """Swap in an already compiled index (see core.intent.custom)."""
+    global _index
+    _index = index
+    return index
+
+
+def get_index() -> PhraseIndex:
+    return _index
+
+
 def match_intent(text: str):
-    
+    return get_index().match(text.lower().strip())
+
+
+def match_intent_linear(text: str, intents=None):
+    """The original full scan; the reference PhraseIndex must agree with."""
     text_lower = text.lower().strip()
 
     best_intent = None
     best_score  = 0.0
 
-    for intent, phrases in INTENTS.items():
+    for intent, phrases in (intents if intents is not None else INTENTS).items():
         for phrase in phrases:
             phrase_lower = phrase.lower()
 
-            
             if text_lower == phrase_lower:
                 return intent, 1.0
 
-            
             if text_lower.startswith(phrase_lower):
                 score = 0.95
                 if score > best_score:
@@ -29,7 +52,6 @@ def match_intent(text: str):
                     best_intent = intent
                 continue
 
-            
             if phrase_lower in text_lower:
                 score = 0.90
                 if score > best_score:
@@ -37,7 +59,6 @@ def match_intent(text: str):
                     best_intent = intent
                 continue
 
-            
             score = similarity(text_lower, phrase_lower)
             if score > best_score:
                 best_score  = score
@@ -1,5 +1,25 @@
 import re
 
+WAKE_PREFIX_PATTERNS = (
+    r"^(hey\s+clarity[\s,.:!-]*)",
+    r"^(okay\s+clarity[\s,.:!-]*)",
+    r"^(ok\s+clarity[\s,.:!-]*)",
+    r"^(a\s+clarity[\s,.:!-]*)",
+    r"^(take\s+clarity[\s,.:!-]*)",
+    r"^(clarity[\s,.:!-]*)",
+)
+
+
+def strip_wake_prefix(text: str) -> str:
+    """Drop the wake phrase (and Whisper's usual mishearings of it) from a transcript."""
+    if not text:
+        return text
+    text = text.strip()
+    for pattern in WAKE_PREFIX_PATTERNS:
+        text = re.sub(pattern, "", text, flags=re.IGNORECASE).strip()
+    return text
+
+
 def normalize(text: str) -> str:
     text = text.lower().strip()
     text = re.sub(r"[^\w\s]", "", text)
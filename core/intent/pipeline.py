@@ -1,10 +1,22 @@
 # core/intent/pipeline.py
 
+import re
+
 from core.intent.normalize import normalize
 from core.intent.matcher import match_intent
 from core.intent.guard import is_safe
+from core import tracing
+
+COMPOUND = "COMPOUND"
+
+# Conjunctions between independent commands: "turn off the light and pause the music".
+CLAUSE_SPLIT = re.compile(r"\s+(?:and then|and also|and|then|also|aur|phir)\s+")
+
+# These use the whole utterance as their payload, so they never split.
+NOT_COMPOUNDABLE = {"STOP", "VAULT_SAVE", "VAULT_RETRIEVE"}
 
 
+@tracing.traced("intent.process_command")
 def process_command(text: str):
     clean = normalize(text)
     text_lower = clean.lower()
@@ -33,3 +45,40 @@ def process_command(text: str):
         "safe": True,
         "raw_text": text,
     }
+
+
+def split_clauses(clean: str) -> list[str]:
+    return [c for c in CLAUSE_SPLIT.split(clean) if c]
+
+
+@tracing.traced("intent.process_utterance")
+def process_utterance(text: str):
+    """
+    process_command, or a COMPOUND result whose "clauses" are one
+    process_command result per clause, when the utterance joins
+    several commands and every clause is a safe intent on its own.
+    Anything less stays a single command, as before. Clauses keep their
+    spoken order, repeats included ("volume up and volume up").
+    """
+    single = process_command(text)
+    if single["safe"] and single["confidence"] >= 1.0:
+        return single  # an exact phrase, even one that contains "and"
+
+    clauses = split_clauses(normalize(text))
+    if len(clauses) < 2:
+        return single
+
+    results = []
+    for clause in clauses:
+        result = process_command(clause)
+        if not result["safe"] or result["intent"] in NOT_COMPOUNDABLE:
+            return single
+        results.append(result)
+
+    return {
+        "intent": COMPOUND,
+        "confidence": min(r["confidence"] for r in results),
+        "safe": True,
+        "raw_text": text,
+        "clauses": results,
+    }
@@ -1,18 +1,114 @@
 import os
+import socket
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 from config.settings import API_BASE_URL
 from core.logger import get_logger, with_request_id
 from core.result_cache import get_cached, store_result
+from core import cancellation, tracing
+from core.cancellation import CancelToken, Cancelled
 
 log = get_logger("cloud")
 
 MAX_HISTORY = 10
+CLOUD_CONNECT_TIMEOUT_SECONDS = 5.0
+CLOUD_READ_TIMEOUT_SECONDS = 20.0
 _conversations: dict[str, list[dict]] = {}
 
+
+# ── Abortable requests ────────────────────────────────────────────────────────
+#
+# The chat API answers only once the reply is generated, so the wait is
+# for the response headers and there is no stream to close. A cancelled
+# request instead shuts down the socket it is waiting on: the blocked
+# read fails at once, urllib3 discards the connection and the backend
+# sees the client go away.
+
+_inflight = threading.local()
+
+
+class _Abort:
+    """Shuts down the socket of one in-flight request when fired."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._fired = False
+
+    def attach(self, sock: socket.socket | None) -> None:
+        with self._lock:
+            self._sock = sock
+            fired = self._fired
+        if fired:
+            _shutdown(sock)
+
+    def fire(self) -> None:
+        with self._lock:
+            self._fired = True
+            sock = self._sock
+        _shutdown(sock)
+
+
+def _shutdown(sock: socket.socket | None) -> None:
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class _AbortableMixin:
+    def getresponse(self, *args, **kwargs):
+        abort = getattr(_inflight, "abort", None)
+        if abort is not None:
+            abort.attach(self.sock)
+        return super().getresponse(*args, **kwargs)
+
+
+class _AbortableHTTPConnection(_AbortableMixin, HTTPConnection):
+    pass
+
+
+class _AbortableHTTPSConnection(_AbortableMixin, HTTPSConnection):
+    pass
+
+
+class _AbortableHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _AbortableHTTPConnection
+
+
+class _AbortableHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _AbortableHTTPSConnection
+
+
+class _AbortableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _AbortableHTTPPool,
+            "https": _AbortableHTTPSPool,
+        }
+
+
+def _post_abortable(abort: _Abort, url: str, **kwargs) -> requests.Response:
+    """_http.post whose socket `abort.fire()` shuts down (from any thread)."""
+    _inflight.abort = abort
+    try:
+        return _http.post(url, **kwargs)
+    finally:
+        _inflight.abort = None
+
+
 # Reuse one HTTP session for connection pooling / cookies.
 _http = requests.Session()
+_http.mount("http://", _AbortableAdapter())
+_http.mount("https://", _AbortableAdapter())
 _session_token: str | None = None
 
 def warm_cloud_auth() -> None:
@@ -21,6 +117,32 @@ def warm_cloud_auth() -> None:
     except Exception as e:
         log.warning(f"cloud.warmup.failed {e}", extra=with_request_id())
 
+
+def warm_cloud_connection(timeout: float = 3.0) -> dict:
+    """
+    Get the pooled HTTPS connection to API_BASE_URL (DNS, TCP, TLS) and a
+    session token ready before the chat request needs them. Returns
+    timings for tracing.
+    """
+    started = time.time()
+    had_token = _session_token is not None
+    _login_and_get_token()
+    login_ms = round((time.time() - started) * 1000, 1)
+
+    connected_at = time.time()
+    try:
+        ok = _http.get(f"{API_BASE_URL}/health", timeout=timeout).status_code == 200
+    except requests.RequestException as e:
+        log.warning(f"cloud.warmup.connect_failed {e}", extra=with_request_id())
+        ok = False
+    return {
+        "ok": ok,
+        "login": not had_token and _session_token is not None,
+        "login_ms": login_ms,
+        "connect_ms": round((time.time() - connected_at) * 1000, 1),
+    }
+
+
 def _mask_token(token: str | None) -> str:
     if not token:
         return "None"
@@ -29,9 +151,9 @@ def _mask_token(token: str | None) -> str:
     return f"{token[:6]}...{token[-4:]}"
 
 
-def internet_available() -> bool:
+def internet_available(timeout: float = 3.0) -> bool:
     try:
-        response = _http.get(f"{API_BASE_URL}/health", timeout=3)
+        response = _http.get(f"{API_BASE_URL}/health", timeout=timeout)
         return response.status_code == 200
     except requests.RequestException:
         return False
@@ -153,12 +275,23 @@ def _is_backend_error_reply(reply: str | None) -> bool:
     )
 
 
+@tracing.traced("llm.cloud")
 def ask_llm(
     message: str,
     device_context: dict,
     runtime_context: dict,
     request_context: dict | None = None,
+    cancel_token: CancelToken | None = None,
+    timeout_seconds: float | None = None,
 ):
+    """
+    Send one utterance to the cloud chat API.
+
+    When `cancel_token` fires the socket of the in-flight request is shut
+    down, so the connection closes right away, and Cancelled is raised.
+    `timeout_seconds` (the request's remaining budget) caps the default
+    (5, 20) connect / read timeouts.
+    """
     request_context = request_context or {}
 
     device_request_id = request_context.get("device_request_id")
@@ -219,12 +352,27 @@ def ask_llm(
 
         start_time = time.time()
 
-        response = _http.post(
-            f"{API_BASE_URL}/v1/chat",
-            json=payload,
-            headers=headers,
-            timeout=(5, 20),
-        )
+        abort = _Abort()
+        remove_abort = cancel_token.on_cancel(abort.fire) if cancel_token is not None else (lambda: None)
+        try:
+            response = cancellation.run_cancellable(
+                cancel_token,
+                _post_abortable,
+                abort,
+                f"{API_BASE_URL}/v1/chat",
+                json=payload,
+                headers=headers,
+                timeout=(
+                    (CLOUD_CONNECT_TIMEOUT_SECONDS, CLOUD_READ_TIMEOUT_SECONDS)
+                    if timeout_seconds is None
+                    else (
+                        min(CLOUD_CONNECT_TIMEOUT_SECONDS, timeout_seconds),
+                        min(CLOUD_READ_TIMEOUT_SECONDS, timeout_seconds),
+                    )
+                ),
+            )
+        finally:
+            remove_abort()
 
         latency_ms = int((time.time() - start_time) * 1000)
         log.info(f"cloud.latency_ms={latency_ms}", extra=log_extra)
@@ -284,6 +432,18 @@ def ask_llm(
         store_result(message, result)
         return result
 
+    except Cancelled:
+        waited_ms = int((time.time() - start_time) * 1000)
+        log.info(
+            f"cloud.cancelled reason={cancel_token.reason} waited_ms={waited_ms}",
+            extra=log_extra,
+        )
+        # The question was never answered; keep it out of the history.
+        if history and history[-1] == {"role": "user", "content": message}:
+            history.pop()
+        cancellation.record_reclaimed("cloud", device_request_id, ran_ms=waited_ms)
+        raise
+
     except requests.exceptions.Timeout:
         log.warning("cloud.timeout", extra=log_extra)
         return None
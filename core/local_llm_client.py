@@ -1,10 +1,15 @@
+import json
 import os
+import time
 import requests
 from core.logger import get_logger
+from core import cancellation, model_lifecycle, thermal, tracing
+from core.cancellation import CancelToken, Cancelled
 
 log = get_logger("local_llm")
 
 LOCAL_LLM_URL = "http://localhost:8080/v1/chat/completions"
+LOCAL_LLM_TOKENIZE_URL = "http://localhost:8080/tokenize"
 _http = requests.Session()
 TIMEOUT_SECONDS = 40
 MAX_TOKENS = 90
@@ -98,6 +103,132 @@ def _build_user_prompt(prompt: str, inject_kit: bool) -> str:
     return user_prompt
 
 
+def _stream_completion(
+    system_prompt: str,
+    user_prompt: str,
+    token: CancelToken | None,
+    timeout_seconds: float = TIMEOUT_SECONDS,
+) -> str | None:
+    """
+    Stream the completion from llama-server and return the joined text.
+
+    Streaming lets a cancelled request close the connection between
+    tokens; llama-server stops generating and frees the slot as soon as
+    it notices the client is gone.
+    """
+    started = time.monotonic()
+    max_tokens = thermal.setting("llm_max_tokens", MAX_TOKENS)
+    response = cancellation.run_cancellable(
+        token,
+        _http.post,
+        LOCAL_LLM_URL,
+        json={
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "max_tokens": max_tokens,
+            "temperature": TEMPERATURE,
+            "stream": True,
+            # Reuse the KV cache for the shared system-prompt prefix.
+            "cache_prompt": True,
+        },
+        timeout=timeout_seconds,
+        stream=True,
+    )
+
+    if response.status_code != 200:
+        log.warning(f"local_llm.http_error | status={response.status_code}")
+        response.close()
+        return None
+
+    remove = token.on_cancel(response.close) if token is not None else (lambda: None)
+    parts: list[str] = []
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if token is not None and token.cancelled:
+                break
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            delta = (json.loads(data).get("choices") or [{}])[0].get("delta") or {}
+            if delta.get("content"):
+                parts.append(delta["content"])
+            if time.monotonic() - started > timeout_seconds:
+                raise requests.exceptions.Timeout("local LLM stream exceeded timeout")
+    except Exception:
+        # Closing the response from the cancel callback surfaces here as
+        # whatever the read was doing; anything else is a real failure.
+        if token is None or not token.cancelled:
+            raise
+    finally:
+        remove()
+        response.close()
+
+    if token is not None and token.cancelled:
+        amounts = {"ran_ms": round((time.monotonic() - started) * 1000, 1)}
+        generated = _count_tokens("".join(parts))
+        if generated is not None:
+            amounts["tokens_generated"] = generated
+            amounts["tokens_skipped"] = max(0, max_tokens - generated)
+        cancellation.record_reclaimed("local_llm", token.request_id, **amounts)
+        raise Cancelled(token.request_id, token.reason)
+
+    return "".join(parts)
+
+
+def _count_tokens(text: str) -> int | None:
+    """
+    Tokens in `text` per llama-server's tokenizer. SSE chunks are not
+    tokens (a chunk may carry several, or a partial UTF-8 character), so
+    a cancelled stream's output is re-tokenized to count what it cost.
+    """
+    if not text:
+        return 0
+    try:
+        response = _http.post(LOCAL_LLM_TOKENIZE_URL, json={"content": text}, timeout=1.0)
+        if response.status_code == 200:
+            return len(response.json().get("tokens") or [])
+    except (requests.RequestException, ValueError) as e:
+        log.warning(f"local_llm.tokenize_failed | {e}")
+    return None
+
+
+def warm_prompt_cache(
+    persona: dict | None = None,
+    behavior: dict | None = None,
+    timeout: float = 10.0,
+) -> bool:
+    """
+    Have llama-server evaluate the system prompt now (one token, cached),
+    so the real request only processes the user's question.
+    """
+    if persona is None or behavior is None:
+        _persona, _behavior = _load_runtime_config()
+        persona = persona or _persona
+        behavior = behavior or _behavior
+    try:
+        response = _http.post(
+            LOCAL_LLM_URL,
+            json={
+                "messages": [
+                    {"role": "system", "content": _build_system_prompt(persona, behavior)},
+                    {"role": "user", "content": "Question:"},
+                ],
+                "max_tokens": 1,
+                "temperature": TEMPERATURE,
+                "cache_prompt": True,
+            },
+            timeout=timeout,
+        )
+        return response.status_code == 200
+    except requests.RequestException as e:
+        log.warning(f"local_llm.warmup_failed | {e}")
+        return False
+
+
 def _is_bad_answer(answer: str) -> bool:
     if not answer:
         return True
@@ -110,12 +241,15 @@ def _is_bad_answer(answer: str) -> bool:
     return any(marker in answer_lower for marker in bad_markers)
 
 
+@tracing.traced("llm.local")
 def ask_local_llm(
     prompt: str,
     inject_kit: bool = True,
     persona: dict | None = None,
     behavior: dict | None = None,
     survival_fallback: bool = False,
+    cancel_token: CancelToken | None = None,
+    timeout_seconds: float | None = None,
 ) -> str | None:
     """
     Ask the local LLM.
@@ -127,6 +261,11 @@ def ask_local_llm(
         behavior:          Runtime behavior dict. If None, loaded automatically.
         survival_fallback: When True, prepend the survival_mode_disclosure so
                            the user knows they are in offline mode.
+        cancel_token:      Closes the llama-server stream when it fires;
+                           Cancelled is raised to the caller.
+        timeout_seconds:   Overall limit for the completion (default
+                           TIMEOUT_SECONDS), e.g. the request's remaining
+                           time budget.
     """
     if not prompt:
         return None
@@ -147,31 +286,15 @@ def ask_local_llm(
 
     user_prompt = _build_user_prompt(prompt, inject_kit)
     system_prompt = _build_system_prompt(persona, behavior)
+    model_lifecycle.note_local_llm_use()
 
     try:
         log.info("local_llm.sending")
-        response = _http.post(
-            LOCAL_LLM_URL,
-            json={
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "max_tokens": MAX_TOKENS,
-                "temperature": TEMPERATURE,
-            },
-            timeout=TIMEOUT_SECONDS,
-        )
-
-        if response.status_code != 200:
-            log.warning(f"local_llm.http_error | status={response.status_code}")
-            return None
-
-        content = (
-            response.json()
-            .get("choices", [{}])[0]
-            .get("message", {})
-            .get("content")
+        content = _stream_completion(
+            system_prompt,
+            user_prompt,
+            cancel_token,
+            TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds,
         )
 
         if not content:
@@ -192,6 +315,9 @@ def ask_local_llm(
 
         return answer
 
+    except Cancelled:
+        log.info(f"local_llm.cancelled reason={cancel_token.reason}")
+        raise
     except requests.exceptions.Timeout:
         log.warning("local_llm.timeout")
         return None
@@ -5,6 +5,7 @@ import signal
 import subprocess
 from pathlib import Path
 
+from core import cpu_profile
 from core.logger import get_logger
 
 log = get_logger("local_music")
@@ -101,7 +102,7 @@ def play_local() -> str:
 
     try:
         proc = subprocess.Popen(
-            cmd,
+            cpu_profile.taskset("music", cmd),
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             start_new_session=True,
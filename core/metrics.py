@@ -0,0 +1,65 @@
+"""
+core/metrics.py
+Runtime metrics shared between SafeBox processes.
+
+Each process publishes its own sections as small JSON files under
+METRICS_DIR (one file per section, written atomically), and the web
+status payload reads them back. Keeping one writer per file means no
+cross-process locking is needed.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+from core.logger import get_logger
+
+log = get_logger("metrics")
+
+METRICS_DIR = Path(os.getenv("SAFEBOX_METRICS_DIR", "/opt/safebox/runtime/metrics"))
+
+
+def _section_path(section: str) -> Path:
+    return METRICS_DIR / f"{section}.json"
+
+
+def publish(section: str, data: dict) -> None:
+    """Write one metrics section. Never raises — metrics must not break callers."""
+    try:
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        payload = dict(data)
+        payload["updated_at"] = time.time()
+        path = _section_path(section)
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        log.warning(f"metrics.publish_failed | section={section} {e}")
+
+
+def read_section(section: str) -> dict | None:
+    try:
+        path = _section_path(section)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        log.warning(f"metrics.read_failed | section={section} {e}")
+        return None
+
+
+def read_all() -> dict:
+    sections: dict = {}
+    try:
+        if not METRICS_DIR.exists():
+            return sections
+        for path in sorted(METRICS_DIR.glob("*.json")):
+            data = read_section(path.stem)
+            if data is not None:
+                sections[path.stem] = data
+    except Exception as e:
+        log.warning(f"metrics.read_all_failed | {e}")
+    return sections
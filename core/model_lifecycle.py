@@ -0,0 +1,323 @@
+"""
+core/model_lifecycle.py
+Resident memory of model-holding components and a budget for it.
+
+On a 4 GB Pi every model stays resident by default: Whisper (fast and
+cascade tier) in safebox-stt, TinyLlama in llama-server, plus Piper's
+ONNX model for every synthesis and the Python services themselves. A
+heavier STT tier or a bigger local model then pushes the device into
+swap. The manager runs as a thread in the device controller and every
+MEMORY_SAMPLE_SECONDS:
+
+  * measures anonymous resident memory (RssAnon) per component (pid
+    files written by cpu_profile.apply, Piper found by process name) and
+    appends it to MEMORY_HISTORY_FILE for Scripts/memory_report.py;
+  * unloads idle models after their TTL:
+        stt.cascade   idle longer than STT_CASCADE_IDLE_TTL_SECONDS
+        llm           in cloud mode, unused for LLM_IDLE_TTL_SECONDS
+  * enforces MODEL_MEMORY_BUDGET_MB by evicting the same models early,
+    cascade first;
+  * reloads ahead of need on runtime-mode transitions: entering survival
+    starts llama-server before the first offline question arrives.
+
+Only anonymous memory is counted: file-backed pages (llama-server's
+mmapped GGUF, the model files core/model_residency keeps cached in
+safebox-wake) show up in VmRSS of every process mapping them, but are
+page cache the kernel can drop, not memory an eviction would free.
+
+llama-server is stopped / started through systemd (sudoers entry from
+install.sh). The STT cascade lives in another process, so eviction is
+published in the "memory" metrics section and safebox-stt acts on it
+(evicted()); it reloads the cascade on its own when a decode needs it
+and it is not evicted.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from core import cpu_profile, metrics
+from core.logger import get_logger, with_request_id
+from core.runtime_mode import MODE_CLOUD, MODE_SURVIVAL, load_runtime_mode_state
+
+log = get_logger("model_lifecycle")
+
+MODEL_LIFECYCLE_ENABLED = os.getenv("MODEL_LIFECYCLE_ENABLED", "true").lower() == "true"
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "2800"))
+MEMORY_SAMPLE_SECONDS = float(os.getenv("MEMORY_SAMPLE_SECONDS", "10"))
+STT_CASCADE_IDLE_TTL_SECONDS = float(os.getenv("STT_CASCADE_IDLE_TTL_SECONDS", "600"))
+LLM_IDLE_TTL_SECONDS = float(os.getenv("LLM_IDLE_TTL_SECONDS", "900"))
+LLAMA_SERVICE = os.getenv("LLAMA_SERVICE", "llama-server")
+MEMORY_HISTORY_FILE = Path(
+    os.getenv("MEMORY_HISTORY_FILE", "/opt/safebox/runtime/memory_history.jsonl")
+)
+# An evicted STT cascade may come back once the total is this far under budget.
+MEMORY_REALLOW_FRACTION = float(os.getenv("MEMORY_REALLOW_FRACTION", "0.85"))
+# One day at the default sample interval.
+MEMORY_HISTORY_MAX_LINES = int(os.getenv("MEMORY_HISTORY_MAX_LINES", "8640"))
+
+# Component -> cpu_profile component whose pid file identifies it.
+COMPONENTS = {
+    "wake": "wake",
+    "stt": "stt",
+    "llm": "llm",
+    "web": "web",
+    "cloud": "cloud",
+    "device": "device",
+}
+PIPER_PROCESS_NAME = "piper"
+
+# Evictable models, in the order they go when over budget.
+EVICT_STT_CASCADE = "stt.cascade"
+EVICT_LLM = "llm"
+
+
+# ── Measuring ─────────────────────────────────────────────────────────────────
+
+def anon_mb(pid: int) -> float | None:
+    """RssAnon of pid in MB: heap, model weights loaded into it, stacks."""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def _pids_named(name: str) -> list[int]:
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            if (entry / "comm").read_text().strip() == name:
+                pids.append(int(entry.name))
+        except OSError:
+            continue
+    return pids
+
+
+def sample_rss() -> dict[str, float]:
+    """Anonymous resident MB per running component."""
+    usage: dict[str, float] = {}
+    for component, profile_name in COMPONENTS.items():
+        pid = cpu_profile.component_pid(profile_name)
+        value = anon_mb(pid) if pid else None
+        if value is not None:
+            usage[component] = value
+    piper = [anon_mb(pid) or 0.0 for pid in _pids_named(PIPER_PROCESS_NAME)]
+    if piper:
+        usage["piper"] = round(sum(piper), 1)
+    return usage
+
+
+# Lines in MEMORY_HISTORY_FILE; counted once, then kept up to date here.
+_history_lines: int | None = None
+
+
+def _append_history(entry: dict) -> None:
+    global _history_lines
+    try:
+        MEMORY_HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        if _history_lines is None:
+            try:
+                with open(MEMORY_HISTORY_FILE, "rb") as f:
+                    _history_lines = sum(1 for _ in f)
+            except FileNotFoundError:
+                _history_lines = 0
+        with open(MEMORY_HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        _history_lines += 1
+        # Trim to the newest lines once the file is 10% over the cap.
+        if _history_lines > MEMORY_HISTORY_MAX_LINES * 1.1:
+            with open(MEMORY_HISTORY_FILE, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+            tmp = MEMORY_HISTORY_FILE.with_suffix(".jsonl.tmp")
+            tmp.write_text("".join(lines[-MEMORY_HISTORY_MAX_LINES:]), encoding="utf-8")
+            os.replace(tmp, MEMORY_HISTORY_FILE)
+            _history_lines = min(len(lines), MEMORY_HISTORY_MAX_LINES)
+    except OSError as e:
+        _history_lines = None  # recount next time
+        log.warning(f"memory.history_write_failed | {e}")
+
+
+def load_history(path: Path = MEMORY_HISTORY_FILE) -> list[dict]:
+    entries = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return entries
+
+
+# ── llama-server control ──────────────────────────────────────────────────────
+
+def _systemctl(*args: str) -> bool:
+    command = ["systemctl", *args]
+    if args[0] in ("start", "stop", "restart"):
+        command = ["sudo", "-n", *command]
+    try:
+        return subprocess.run(command, capture_output=True, timeout=20).returncode == 0
+    except (OSError, subprocess.SubprocessError) as e:
+        log.warning(f"memory.systemctl_failed args={' '.join(args)} | {e}")
+        return False
+
+
+def llm_running() -> bool:
+    return _systemctl("is-active", "--quiet", LLAMA_SERVICE)
+
+
+def restart_llm() -> bool:
+    """Restart llama-server so it relaunches with the current --threads."""
+    return _systemctl("restart", LLAMA_SERVICE)
+
+
+def llm_last_used() -> float:
+    """When safebox-wake last asked the local LLM (see local_llm_client)."""
+    return (metrics.read_section("local_llm") or {}).get("last_used_at", 0.0)
+
+
+# ── Manager ───────────────────────────────────────────────────────────────────
+
+class ModelLifecycleManager:
+    def __init__(self, budget_mb: float = MODEL_MEMORY_BUDGET_MB):
+        self.budget_mb = budget_mb
+        self.mode: str | None = None
+        self.llm_started_at = time.time()
+        self.evicted: set[str] = set()
+        self.events: deque = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def _event(self, action: str, target: str, reason: str) -> None:
+        self.events.append({"at": time.time(), "action": action, "target": target, "reason": reason})
+        log.info(
+            f"memory.{action} target={target} reason={reason}",
+            extra=with_request_id(),
+        )
+
+    def on_mode(self, mode: str) -> None:
+        """Follow runtime_mode; entering survival loads the local LLM."""
+        with self._lock:
+            previous, self.mode = self.mode, mode
+        if previous == mode:
+            return
+        log.info(f"memory.mode_transition from={previous} to={mode}", extra=with_request_id())
+        if mode == MODE_SURVIVAL:
+            self.preload_llm("survival_mode")
+
+    def preload_llm(self, reason: str) -> None:
+        """
+        Start llama-server ahead of need, e.g. as soon as the device
+        controller sees the network drop, before any request switches
+        runtime_mode to survival.
+        """
+        with self._lock:
+            self.evicted.discard(EVICT_LLM)
+            if not llm_running() and _systemctl("start", LLAMA_SERVICE):
+                self.llm_started_at = time.time()
+                self._event("load", EVICT_LLM, reason)
+
+    def _llm_idle_seconds(self) -> float:
+        return time.time() - max(llm_last_used(), self.llm_started_at)
+
+    def step(self, usage: dict[str, float]) -> None:
+        with self._lock:
+            total = round(sum(usage.values()), 1)
+            running = "llm" in usage
+            if running:
+                self.evicted.discard(EVICT_LLM)
+
+            # A fallback asked the stopped LLM: bring it back for the next one.
+            if not running and EVICT_LLM in self.evicted and llm_last_used() > self.llm_started_at:
+                if _systemctl("start", LLAMA_SERVICE):
+                    self.evicted.discard(EVICT_LLM)
+                    self.llm_started_at = time.time()
+                    self._event("load", EVICT_LLM, "requested")
+
+            cloud = self.mode == MODE_CLOUD
+            if running and cloud and self._llm_idle_seconds() > LLM_IDLE_TTL_SECONDS:
+                self._unload_llm("idle_ttl")
+
+            over = total - self.budget_mb
+            if over > 0 and EVICT_STT_CASCADE not in self.evicted:
+                self.evicted.add(EVICT_STT_CASCADE)
+                self._event("unload", EVICT_STT_CASCADE, f"over_budget_mb={over:.0f}")
+            elif over > 0 and running and cloud:
+                self._unload_llm(f"over_budget_mb={over:.0f}")
+            elif total < self.budget_mb * MEMORY_REALLOW_FRACTION and EVICT_STT_CASCADE in self.evicted:
+                # Well under budget again: let safebox-stt reload it on demand.
+                self.evicted.discard(EVICT_STT_CASCADE)
+                self._event("allow", EVICT_STT_CASCADE, "under_budget")
+
+            snapshot = {
+                "budget_mb": self.budget_mb,
+                "total_mb": total,
+                "components": usage,
+                "mode": self.mode,
+                "evicted": sorted(self.evicted),
+                "events": list(self.events),
+            }
+        metrics.publish("memory", snapshot)
+        _append_history({"at": time.time(), "total_mb": total, "components": usage})
+
+    def _unload_llm(self, reason: str) -> None:
+        if _systemctl("stop", LLAMA_SERVICE):
+            self.evicted.add(EVICT_LLM)
+            self._event("unload", EVICT_LLM, reason)
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.on_mode(load_runtime_mode_state().get("mode", MODE_CLOUD))
+                self.step(sample_rss())
+            except Exception as e:
+                log.warning(f"memory.sample_failed | {e}", extra=with_request_id())
+            time.sleep(MEMORY_SAMPLE_SECONDS)
+
+
+_manager: ModelLifecycleManager | None = None
+
+
+def start_manager() -> ModelLifecycleManager | None:
+    """Start the sampling thread (once per process)."""
+    global _manager
+    if not MODEL_LIFECYCLE_ENABLED or _manager is not None:
+        return _manager
+    _manager = ModelLifecycleManager()
+    threading.Thread(target=_manager.run, daemon=True, name="model-lifecycle").start()
+    log.info(
+        f"memory.manager.started budget_mb={MODEL_MEMORY_BUDGET_MB} "
+        f"sample_s={MEMORY_SAMPLE_SECONDS}",
+        extra=with_request_id(),
+    )
+    return _manager
+
+
+def current_manager() -> ModelLifecycleManager | None:
+    return _manager
+
+
+# ── Readers (any process) ─────────────────────────────────────────────────────
+
+def evicted(name: str) -> bool:
+    """Whether the manager currently wants model `name` unloaded."""
+    data = metrics.read_section("memory") or {}
+    if time.time() - data.get("updated_at", 0) > 3 * MEMORY_SAMPLE_SECONDS:
+        return False
+    return name in (data.get("evicted") or [])
+
+
+def note_local_llm_use() -> None:
+    """Called by the local LLM client so idle TTL and reload see real use."""
+    metrics.publish("local_llm", {"last_used_at": time.time()})
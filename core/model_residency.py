@@ -0,0 +1,383 @@
+"""
+core/model_residency.py
+Keep model files in the page cache across quiet periods.
+
+After a few idle hours, vault and log I/O evict the pages of the model
+files, and the first "Hey Clarity" pays for SSD page faults. That only
+applies to files read again on use:
+
+  piper   Piper's .onnx is loaded by every Piper run
+  llm     the TinyLlama GGUF is mmapped by llama-server and faulted in
+          by generation, but only matters in survival mode
+
+Porcupine's .ppn and the Whisper model.bin are read once into their
+loaders' heap memory and never touched on disk again, so they are left
+alone.
+
+This component, running in safebox-wake, maps those files read-only
+and shared (MAP_SHARED, so they are the same page-cache pages the other
+processes use):
+
+  * Piper is mlock()ed while it fits RESIDENCY_MLOCK_BUDGET_MB (needs
+    LimitMEMLOCK in the unit; without it it is only re-touched);
+  * the GGUF is mapped only while the runtime mode is survival and the
+    model lifecycle manager has not stopped llama-server, and unmapped
+    again otherwise, so it never holds the page cache of a model that
+    was unloaded to free memory;
+  * once the SessionManager has been IDLE for RESIDENCY_IDLE_SECONDS,
+    a low-priority thread re-touches the mapped files (MADV_WILLNEED,
+    then one read per page), again every RESIDENCY_RETOUCH_INTERVAL_SECONDS
+    while still idle, and stops as soon as the session leaves IDLE.
+
+Touched pages count in safebox-wake's VmRSS; the memory budget in
+core/model_lifecycle counts RssAnon only, so they do not trigger
+evictions.
+
+Each wake records how much of the model data was resident (mincore) on
+the trace. The first request after a quiet period is classed cold
+(below RESIDENCY_WARM_PCT resident) or warm and its end-of-speech to
+first-audio latency is kept per class in the "residency" metrics
+section, so the cold versus warm difference is measured on the device.
+"""
+
+import ctypes
+import ctypes.util
+import mmap
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+from core import metrics, tracing
+from core.logger import get_logger, with_request_id
+
+log = get_logger("model_residency")
+
+RESIDENCY_ENABLED = os.getenv("RESIDENCY_ENABLED", "true").lower() == "true"
+RESIDENCY_IDLE_SECONDS = float(os.getenv("RESIDENCY_IDLE_SECONDS", "600"))
+RESIDENCY_RETOUCH_INTERVAL_SECONDS = float(os.getenv("RESIDENCY_RETOUCH_INTERVAL_SECONDS", "1800"))
+RESIDENCY_MLOCK_BUDGET_MB = float(os.getenv("RESIDENCY_MLOCK_BUDGET_MB", "192"))
+RESIDENCY_WARM_PCT = float(os.getenv("RESIDENCY_WARM_PCT", "90"))
+RESIDENCY_POLL_SECONDS = 5.0
+LLAMA_MODEL_PATH = Path(
+    os.getenv("LLAMA_MODEL_PATH", "/opt/safebox/models/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
+)
+
+PAGE_SIZE = mmap.PAGESIZE
+MADV_WILLNEED = 3
+PROT_READ = 0x1
+MAP_SHARED = 0x01
+MAP_FAILED = ctypes.c_void_p(-1).value
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    _libc.mmap.restype = ctypes.c_void_p
+    _libc.mmap.argtypes = [
+        ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long,
+    ]
+    for _name in ("munmap", "mlock", "munlock"):
+        getattr(_libc, _name).argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    _libc.madvise.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+    _libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+except (OSError, AttributeError):  # not Linux / no libc: residency is disabled
+    _libc = None
+
+
+@dataclass
+class ModelFile:
+    name: str
+    path: Path
+    hot: bool
+
+
+LLM_FILE = ModelFile("llm", LLAMA_MODEL_PATH, False)
+
+
+def discover_model_files() -> list[ModelFile]:
+    """Model files read from disk on every use; the GGUF is handled separately."""
+    from core.audio.tts_player import PIPER_MODEL
+
+    files = [ModelFile("piper", PIPER_MODEL, True)]
+    return [f for f in files if f.path.is_file()]
+
+
+def llm_file_wanted() -> bool:
+    """The GGUF only matters while llama-server is running for survival mode."""
+    from core.model_lifecycle import EVICT_LLM, evicted
+    from core.runtime_mode import MODE_SURVIVAL, load_runtime_mode_state
+
+    return (
+        load_runtime_mode_state().get("mode") == MODE_SURVIVAL
+        and not evicted(EVICT_LLM)
+        and LLM_FILE.path.is_file()
+    )
+
+
+class _Mapping:
+    """One read-only MAP_SHARED mapping of a model file."""
+
+    def __init__(self, model: ModelFile):
+        self.model = model
+        self.size = model.path.stat().st_size
+        self.pages = (self.size + PAGE_SIZE - 1) // PAGE_SIZE
+        self.locked = False
+        fd = os.open(model.path, os.O_RDONLY)
+        try:
+            addr = _libc.mmap(None, self.size, PROT_READ, MAP_SHARED, fd, 0)
+        finally:
+            os.close(fd)  # the mapping keeps the file referenced
+        if addr in (None, MAP_FAILED):
+            raise OSError(ctypes.get_errno(), f"mmap failed for {model.path}")
+        self.addr = addr
+
+    @property
+    def size_mb(self) -> float:
+        return self.size / (1024 * 1024)
+
+    def resident_pages(self) -> int:
+        vec = (ctypes.c_ubyte * self.pages)()
+        if _libc.mincore(self.addr, self.size, vec) != 0:
+            return 0
+        # Only bit 0 (resident) is defined; the others are always 0.
+        return self.pages - bytes(vec).count(0)
+
+    def lock(self) -> bool:
+        self.locked = _libc.mlock(self.addr, self.size) == 0
+        return self.locked
+
+    def touch(self, should_stop) -> bool:
+        """Fault every page in; False if should_stop() interrupted it."""
+        _libc.madvise(self.addr, self.size, MADV_WILLNEED)
+        for index, offset in enumerate(range(0, self.size, PAGE_SIZE)):
+            if index % 4096 == 0 and should_stop():
+                return False
+            ctypes.string_at(self.addr + offset, 1)
+        return True
+
+    def close(self) -> None:
+        if self.locked:
+            _libc.munlock(self.addr, self.size)
+        _libc.munmap(self.addr, self.size)
+
+
+class ModelResidency:
+    def __init__(self, session, files: list[ModelFile] | None = None):
+        self.session = session
+        self.mappings: list[_Mapping] = []
+        for model in files if files is not None else discover_model_files():
+            try:
+                self.mappings.append(_Mapping(model))
+            except OSError as e:
+                log.warning(f"residency.map_failed file={model.path} | {e}", extra=with_request_id())
+        self.idle_since: float | None = None
+        # End of the last turn (or start-up): the quiet period before a wake.
+        self.last_active_at = time.monotonic()
+        self.last_touch_at = 0.0
+        self.last_touch: dict = {}
+        self._pending: dict[str, dict] = {}
+        self._latency = {"cold": deque(maxlen=50), "warm": deque(maxlen=50)}
+        self._lock = threading.Lock()
+
+    def lock_hot(self, budget_mb: float = RESIDENCY_MLOCK_BUDGET_MB) -> float:
+        """mlock hot files, smallest first, while they fit the budget."""
+        used = 0.0
+        for mapping in sorted(self.mappings, key=lambda m: m.size):
+            if not mapping.model.hot or used + mapping.size_mb > budget_mb:
+                continue
+            if mapping.lock():
+                used += mapping.size_mb
+            else:
+                log.warning(
+                    f"residency.mlock_failed file={mapping.model.name} "
+                    f"errno={ctypes.get_errno()} (LimitMEMLOCK?)",
+                    extra=with_request_id(),
+                )
+        log.info(
+            f"residency.locked mb={used:.0f} budget_mb={budget_mb:.0f}",
+            extra=with_request_id(),
+        )
+        return used
+
+    def resident_pct(self, mappings: list[_Mapping] | None = None) -> dict[str, float]:
+        return {
+            m.model.name: round(100.0 * m.resident_pages() / max(1, m.pages), 1)
+            for m in (self.mappings if mappings is None else mappings)
+        }
+
+    @staticmethod
+    def _overall_pct(mappings: list[_Mapping], per_file: dict[str, float]) -> float:
+        total = sum(m.size for m in mappings) or 1
+        return round(sum(per_file[m.model.name] * m.size for m in mappings) / total, 1)
+
+    # ── GGUF (survival mode only) ─────────────────────────────────────────────
+
+    def _sync_llm(self) -> None:
+        """Map the GGUF while llama-server needs it, unmap it once it is stopped.
+
+        Only this (the run) thread changes the list; it is replaced, never
+        mutated, so readers on other threads keep a consistent snapshot.
+        """
+        mapped = next((m for m in self.mappings if m.model is LLM_FILE), None)
+        wanted = llm_file_wanted()
+        if wanted and mapped is None:
+            try:
+                mapping = _Mapping(LLM_FILE)
+            except OSError as e:
+                log.warning(f"residency.map_failed file={LLM_FILE.path} | {e}", extra=with_request_id())
+                return
+            self.mappings = self.mappings + [mapping]
+            log.info(f"residency.llm_mapped mb={mapping.size_mb:.0f}", extra=with_request_id())
+        elif not wanted and mapped is not None:
+            self.mappings = [m for m in self.mappings if m is not mapped]
+            mapped.close()
+            log.info("residency.llm_unmapped", extra=with_request_id())
+        else:
+            return
+        self._publish()
+
+    # ── Background re-touch ───────────────────────────────────────────────────
+
+    def _idle(self) -> bool:
+        from core.audio.session_manager import STATE_IDLE
+
+        return self.session.get_state() == STATE_IDLE
+
+    def retouch(self) -> dict:
+        mappings = self.mappings
+        before = self.resident_pct(mappings)
+        started = time.monotonic()
+        completed = all(m.touch(lambda: not self._idle()) for m in mappings)
+        result = {
+            "at": time.time(),
+            "ms": round((time.monotonic() - started) * 1000, 1),
+            "completed": completed,
+            "resident_before_pct": self._overall_pct(mappings, before),
+            "resident_after_pct": self._overall_pct(mappings, self.resident_pct(mappings)),
+        }
+        self.last_touch_at, self.last_touch = time.monotonic(), result
+        log.info(
+            f"residency.retouch ms={result['ms']:.0f} completed={completed} "
+            f"resident_pct={result['resident_before_pct']}->{result['resident_after_pct']}",
+            extra=with_request_id(),
+        )
+        self._publish()
+        return result
+
+    def run(self) -> None:
+        try:
+            # Re-touching competes with nothing urgent; let requests win.
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (OSError, AttributeError):
+            pass
+        while True:
+            try:
+                self._sync_llm()
+                now = time.monotonic()
+                if not self._idle():
+                    self.idle_since = None
+                elif self.idle_since is None:
+                    self.idle_since = now
+                elif now - self.idle_since >= RESIDENCY_IDLE_SECONDS and (
+                    self.last_touch_at < self.idle_since
+                    or now - self.last_touch_at >= RESIDENCY_RETOUCH_INTERVAL_SECONDS
+                ):
+                    self.retouch()
+            except Exception as e:
+                log.warning(f"residency.loop_failed | {e}", extra=with_request_id())
+            time.sleep(RESIDENCY_POLL_SECONDS)
+
+    # ── Cold / warm first requests ────────────────────────────────────────────
+
+    def on_wake(self, request_id: str) -> None:
+        now = time.monotonic()
+        idle_s, self.last_active_at = now - self.last_active_at, now
+        mappings = self.mappings
+        per_file = self.resident_pct(mappings)
+        overall = self._overall_pct(mappings, per_file)
+        first = idle_s >= RESIDENCY_IDLE_SECONDS
+        kind = "warm" if overall >= RESIDENCY_WARM_PCT else "cold"
+        if first:
+            with self._lock:
+                self._pending[request_id] = {"kind": kind}
+        tracing.annotate(
+            request_id,
+            residency={
+                "resident_pct": overall,
+                "idle_s": round(idle_s),
+                "first_after_idle": first,
+                "kind": kind,
+                "files": per_file,
+            },
+        )
+
+    def on_finished(self, request_id: str, summary: dict | None) -> None:
+        self.last_active_at = time.monotonic()
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+        marks = (summary or {}).get("marks") or {}
+        if pending is None or "tts.first_audio" not in marks or "speech.end" not in marks:
+            return
+        latency = round(marks["tts.first_audio"] - marks["speech.end"], 1)
+        with self._lock:
+            self._latency[pending["kind"]].append(latency)
+        log.info(
+            f"residency.first_request kind={pending['kind']} speech_end_to_audio_ms={latency:.0f}",
+            extra=with_request_id(request_id),
+        )
+        self._publish()
+
+    def _publish(self) -> None:
+        with self._lock:
+            latency = {
+                kind: {
+                    "count": len(values),
+                    "median_ms": round(statistics.median(values), 1) if values else None,
+                    "last_ms": values[-1] if values else None,
+                }
+                for kind, values in self._latency.items()
+            }
+        metrics.publish(
+            "residency",
+            {
+                "files": [
+                    {"name": m.model.name, "mb": round(m.size_mb, 1), "hot": m.model.hot, "locked": m.locked}
+                    for m in self.mappings
+                ],
+                "last_retouch": self.last_touch,
+                "first_request": latency,
+            },
+        )
+
+
+_residency: ModelResidency | None = None
+
+
+def start(session) -> ModelResidency | None:
+    """Map the model files, lock the hot ones and start the re-touch thread."""
+    global _residency
+    if not RESIDENCY_ENABLED or _libc is None or _residency is not None:
+        return _residency
+    _residency = ModelResidency(session)
+    if RESIDENCY_MLOCK_BUDGET_MB > 0:
+        _residency.lock_hot()
+    _residency._publish()
+    threading.Thread(target=_residency.run, daemon=True, name="model-residency").start()
+    log.info(
+        f"residency.started files={len(_residency.mappings)} "
+        f"mb={sum(m.size_mb for m in _residency.mappings):.0f}",
+        extra=with_request_id(),
+    )
+    return _residency
+
+
+def on_wake(request_id: str) -> None:
+    if _residency is not None:
+        _residency.on_wake(request_id)
+
+
+def on_finished(request_id: str, summary: dict | None) -> None:
+    if _residency is not None:
+        _residency.on_finished(request_id, summary)
@@ -338,7 +338,7 @@ def _best_section(query: str, content: str, max_chars: int = 300) -> str | None:
     return best[:max_chars]
 
 
-def search_and_inject(query: str) -> str | None:
+def _best_match(query: str) -> tuple[dict, str] | None:
     matches = search(query, max_results=1)
 
     if not matches:
@@ -360,6 +360,25 @@ def search_and_inject(query: str) -> str | None:
         )
         return None
 
+    return top, best
+
+
+def best_snippet(query: str) -> str | None:
+    """The most relevant section as plain text, for speaking it directly."""
+    match = _best_match(query)
+    if match is None:
+        return None
+    top, best = match
+    log.info(f"offline_kit.snippet | doc={top['id']} query={query!r}")
+    return best
+
+
+def search_and_inject(query: str) -> str | None:
+    match = _best_match(query)
+    if match is None:
+        return None
+    top, best = match
+
     context = f"[OFFLINE KIT: {top['title']}]\n{best}"
 
     log.info(f"offline_kit.injected | doc={top['id']} query={query!r}")
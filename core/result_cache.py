@@ -69,9 +69,12 @@ def _prune(cache: dict) -> dict:
     return cache
 
 
-def get_cached(user_text: str) -> dict | None:
+def get_cached(user_text: str, max_age_seconds: float | None = CACHE_TTL_SECONDS) -> dict | None:
     """
     Return a cached result for this query if one exists and hasn't expired.
+
+    max_age_seconds=None accepts any entry still on disk (used as a
+    last resort when the request's time budget is spent).
     """
     if not user_text:
         return None
@@ -84,7 +87,7 @@ def get_cached(user_text: str) -> dict | None:
         return None
 
     age = time.time() - entry.get("cached_at", 0)
-    if age > CACHE_TTL_SECONDS:
+    if max_age_seconds is not None and age > max_age_seconds:
         log.info(
             f"result_cache.expired | key={key} age={int(age)}s",
             extra=with_request_id(),
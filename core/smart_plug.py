@@ -7,12 +7,14 @@ log = get_logger("smart_plug")
 PLUG_IP = os.environ.get("TAPO_PLUG_IP", "")
 TAPO_USER = os.environ.get("TAPO_USER", "")
 TAPO_PASS = os.environ.get("TAPO_PASS", "")
+# Upper bound for one plug command (discovery + command + update).
+TAPO_TIMEOUT_SECONDS = float(os.environ.get("TAPO_TIMEOUT_SECONDS", "5"))
 
 
 def _run(coro):
     loop = asyncio.new_event_loop()
     try:
-        return loop.run_until_complete(coro)
+        return loop.run_until_complete(asyncio.wait_for(coro, TAPO_TIMEOUT_SECONDS))
     finally:
         loop.run_until_complete(asyncio.sleep(0))
         loop.close()
@@ -0,0 +1,302 @@
+"""
+core/thermal.py
+Thermal-aware performance governor.
+
+In an enclosure the Pi 5 reaches its soft limit (80 °C) within minutes
+of sustained STT / LLM work and the firmware then caps the ARM clock,
+often in the middle of a reply. The governor samples the SoC
+temperature and the firmware throttle flags and moves between
+performance tiers before that happens:
+
+    tier         enter at   stt                   llm                  tts         background
+    performance  -          cascade, profile thr  90 tokens, profile   prefetch 2  yes
+    warm         65 °C      no cascade            90 tokens            prefetch 2  yes
+    hot          75 °C      no cascade, 2 threads 60 tokens, 2 threads prefetch 1  no
+    critical     80 °C      no cascade, 1 thread  40 tokens, 1 thread  prefetch 1  no
+
+A tier is entered as soon as its threshold is reached (or, for "hot",
+whenever the firmware reports active throttling / soft temperature
+limit). It is left one tier at a time, only after the temperature has
+been THERMAL_HYSTERESIS_C below the threshold for THERMAL_COOL_SAMPLES
+samples in a row, so the tiers do not oscillate around a threshold.
+
+The governor thread runs in the device controller and publishes the
+current tier as the "thermal" metrics section; the other processes read
+it back with setting(). A missing or stale section means "performance",
+so nothing changes when the governor is not running.
+
+    max_tokens = thermal.setting("llm_max_tokens", MAX_TOKENS)
+
+llama-server's --threads is fixed at launch and it keeps its full core
+set (narrowing the cores under a fixed thread count only makes the
+threads contend). When the tier's llm_threads differs from what the
+running llama-server was started with, the governor restarts it after
+publishing the tier; `cpu_profile exec` then starts it with the tier's
+count. The restart waits until the local LLM has been unused for
+THERMAL_LLM_RESTART_IDLE_SECONDS.
+"""
+
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+
+from core import cpu_profile, metrics, model_lifecycle
+from core.logger import get_logger, with_request_id
+
+log = get_logger("thermal")
+
+THERMAL_ENABLED = os.getenv("THERMAL_GOVERNOR_ENABLED", "true").lower() == "true"
+THERMAL_SAMPLE_SECONDS = float(os.getenv("THERMAL_SAMPLE_SECONDS", "5"))
+THERMAL_HYSTERESIS_C = float(os.getenv("THERMAL_HYSTERESIS_C", "5"))
+THERMAL_COOL_SAMPLES = int(os.getenv("THERMAL_COOL_SAMPLES", "3"))
+THERMAL_ZONE_PATH = os.getenv("THERMAL_ZONE_PATH", "/sys/class/thermal/thermal_zone0/temp")
+THERMAL_LLM_RESTART_IDLE_SECONDS = float(os.getenv("THERMAL_LLM_RESTART_IDLE_SECONDS", "20"))
+
+# Readers re-read the published tier at most this often.
+READ_CACHE_SECONDS = 2.0
+
+# vcgencmd get_throttled bits that mean "slowed down right now".
+THROTTLE_ARM_CAPPED = 0x2
+THROTTLE_ACTIVE = 0x4
+THROTTLE_SOFT_TEMP_LIMIT = 0x8
+THROTTLE_NOW = THROTTLE_ARM_CAPPED | THROTTLE_ACTIVE | THROTTLE_SOFT_TEMP_LIMIT
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    enter_c: float | None
+    # Overrides of component defaults; keys missing here keep the default.
+    settings: dict = field(default_factory=dict)
+
+
+TIERS: tuple[Tier, ...] = (
+    Tier("performance", None, {}),
+    Tier(
+        "warm",
+        float(os.getenv("THERMAL_WARM_C", "65")),
+        {"stt_cascade": False},
+    ),
+    Tier(
+        "hot",
+        float(os.getenv("THERMAL_HOT_C", "75")),
+        {
+            "stt_cascade": False,
+            "stt_threads": 2,
+            "llm_max_tokens": 60,
+            "llm_threads": 2,
+            "tts_prefetch_chunks": 1,
+            "background_jobs": False,
+        },
+    ),
+    Tier(
+        "critical",
+        float(os.getenv("THERMAL_CRITICAL_C", "80")),
+        {
+            "stt_cascade": False,
+            "stt_threads": 1,
+            "llm_max_tokens": 40,
+            "llm_threads": 1,
+            "tts_prefetch_chunks": 1,
+            "background_jobs": False,
+        },
+    ),
+)
+TIER_NAMES = [tier.name for tier in TIERS]
+# Firmware throttling means we are already too hot, whatever the sensor says.
+THROTTLED_MIN_TIER = TIER_NAMES.index("hot")
+
+
+# ── Sampling ──────────────────────────────────────────────────────────────────
+
+def read_soc_celsius() -> float | None:
+    try:
+        with open(THERMAL_ZONE_PATH, "r", encoding="utf-8") as f:
+            value = float(f.read().strip())
+        return round(value / 1000.0 if value > 1000 else value, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def read_throttled() -> int | None:
+    """The firmware's get_throttled bitmask, or None without vcgencmd."""
+    try:
+        out = subprocess.run(
+            ["vcgencmd", "get_throttled"], capture_output=True, text=True, timeout=2
+        ).stdout
+        return int(out.strip().split("=", 1)[1], 16)
+    except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+        return None
+
+
+# ── Governor ──────────────────────────────────────────────────────────────────
+
+class ThermalGovernor:
+    def __init__(
+        self,
+        hysteresis_c: float = THERMAL_HYSTERESIS_C,
+        cool_samples: int = THERMAL_COOL_SAMPLES,
+    ):
+        self.hysteresis_c = hysteresis_c
+        self.cool_samples = cool_samples
+        self.level = 0
+        self.since = time.time()
+        self.changes = 0
+        self.temp_c: float | None = None
+        self.throttled: int | None = None
+        self._cool_streak = 0
+
+    @property
+    def tier(self) -> Tier:
+        return TIERS[self.level]
+
+    def step(self, temp_c: float | None, throttled: int | None = None) -> Tier:
+        """Feed one sample; returns the (possibly new) tier."""
+        self.temp_c, self.throttled = temp_c, throttled
+        target = 0
+        if temp_c is not None:
+            for level, tier in enumerate(TIERS):
+                if tier.enter_c is not None and temp_c >= tier.enter_c:
+                    target = level
+        if throttled is not None and throttled & THROTTLE_NOW:
+            target = max(target, THROTTLED_MIN_TIER)
+
+        if target > self.level:
+            self._cool_streak = 0
+            self._change(target, "heating")
+        elif target < self.level:
+            # target already stays >= "hot" while the firmware throttles;
+            # without a temperature only that flag can hold the tier.
+            leave_below = (self.tier.enter_c or 0.0) - self.hysteresis_c
+            cooled = temp_c is None or temp_c < leave_below
+            self._cool_streak = self._cool_streak + 1 if cooled else 0
+            if self._cool_streak >= self.cool_samples:
+                self._cool_streak = 0
+                self._change(self.level - 1, "cooled")
+        else:
+            self._cool_streak = 0
+        return self.tier
+
+    def _change(self, level: int, reason: str) -> None:
+        previous = self.tier
+        self.level = level
+        self.since = time.time()
+        self.changes += 1
+        log.warning(
+            f"thermal.tier_change from={previous.name} to={self.tier.name} reason={reason} "
+            f"temp_c={self.temp_c} throttled={_hex(self.throttled)}",
+            extra=with_request_id(),
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "tier": self.tier.name,
+            "level": self.level,
+            "temp_c": self.temp_c,
+            "throttled": _hex(self.throttled),
+            "throttled_now": bool((self.throttled or 0) & THROTTLE_NOW),
+            "since": self.since,
+            "changes": self.changes,
+            "settings": dict(self.tier.settings),
+            "sample_seconds": THERMAL_SAMPLE_SECONDS,
+        }
+
+    def sample(self) -> Tier:
+        tier = self.step(read_soc_celsius(), read_throttled())
+        metrics.publish("thermal", self.snapshot())
+        _match_llm_threads(tier)
+        return tier
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                log.warning(f"thermal.sample_failed | {e}", extra=with_request_id())
+            time.sleep(THERMAL_SAMPLE_SECONDS)
+
+
+def _hex(value: int | None) -> str | None:
+    return None if value is None else hex(value)
+
+
+def _running_llm_threads() -> int | None:
+    """--threads of the running llama-server (exec keeps the pid), if any."""
+    pid = cpu_profile.component_pid("llm")
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            argv = f.read().decode("utf-8", "replace").split("\0")
+        return int(argv[argv.index("--threads") + 1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _match_llm_threads(tier: Tier) -> None:
+    # Runs after the tier is published: the restarted llama-server reads it.
+    running = _running_llm_threads()
+    wanted = tier.settings.get("llm_threads", cpu_profile.threads("llm"))
+    if running is None or not wanted or running == wanted:
+        return
+    if time.time() - model_lifecycle.llm_last_used() < THERMAL_LLM_RESTART_IDLE_SECONDS:
+        return  # in use; try again on a later sample
+    restarted = model_lifecycle.restart_llm()
+    log.warning(
+        f"thermal.llm_threads from={running} to={wanted} tier={tier.name} restarted={restarted}",
+        extra=with_request_id(),
+    )
+
+
+_governor: ThermalGovernor | None = None
+
+
+def start_governor() -> ThermalGovernor | None:
+    """Start the sampling thread (once per process)."""
+    global _governor
+    if not THERMAL_ENABLED or _governor is not None:
+        return _governor
+    _governor = ThermalGovernor()
+    threading.Thread(target=_governor.run, daemon=True, name="thermal-governor").start()
+    log.info(
+        f"thermal.governor.started sample_s={THERMAL_SAMPLE_SECONDS} "
+        f"hysteresis_c={THERMAL_HYSTERESIS_C}",
+        extra=with_request_id(),
+    )
+    return _governor
+
+
+def current_governor() -> ThermalGovernor | None:
+    return _governor
+
+
+# ── Readers (any process) ─────────────────────────────────────────────────────
+
+_cached: dict = {}
+_cached_at = 0.0
+_cache_lock = threading.Lock()
+
+
+def current() -> dict:
+    """The published governor state; {} when none is running or it is stale."""
+    global _cached, _cached_at
+    now = time.monotonic()
+    with _cache_lock:
+        if now - _cached_at < READ_CACHE_SECONDS:
+            return _cached
+        data = metrics.read_section("thermal") or {}
+        if time.time() - data.get("updated_at", 0) > 3 * THERMAL_SAMPLE_SECONDS:
+            data = {}
+        _cached, _cached_at = data, now
+        return data
+
+
+def current_tier() -> str:
+    return current().get("tier") or TIER_NAMES[0]
+
+
+def setting(name: str, default):
+    """The current tier's override for `name`, else `default`."""
+    return (current().get("settings") or {}).get(name, default)
@@ -0,0 +1,331 @@
+"""
+core/tracing.py
+Per-request latency tracing for the voice pipeline.
+
+A trace is keyed by device_request_id and collects spans (name, start,
+end, attributes, process, thread) from every stage that handles the
+request. Timestamps are wall-clock epoch seconds so spans recorded in
+different processes (web -> wake) line up.
+
+    tracing.start_trace(rid, source="wake_word")
+    with tracing.span("stt.transcribe", audio_s=2.1):
+        ...
+    tracing.mark("tts.first_audio")
+    summary = tracing.summary(rid)      # attached to the vault record
+    tracing.finish_trace(rid)           # written to the on-disk store
+
+span()/mark() find the trace through the request_id context var (or an
+explicit request_id=) and are no-ops when there is no active trace, so
+instrumented functions cost nothing when called outside a traced
+request (e.g. from the web UI).
+
+Finished traces are stored as one JSON file per request and process in
+TRACE_DIR, capped at TRACE_MAX_FILES (oldest removed first), and can be
+exported in Chrome trace-event format (chrome://tracing, Perfetto) with
+to_chrome_trace() or Scripts/export_trace.py.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.logger import get_logger
+from core.request_context import get_request_id
+
+log = get_logger("tracing")
+
+TRACING_ENABLED = os.getenv("SAFEBOX_TRACING_ENABLED", "true").lower() == "true"
+TRACE_DIR = Path(os.getenv("SAFEBOX_TRACE_DIR", "/opt/safebox/runtime/traces"))
+TRACE_MAX_FILES = int(os.getenv("SAFEBOX_TRACE_MAX_FILES", "500"))
+
+# Bounds for traces that are never finished, and for runaway span counts.
+MAX_ACTIVE_TRACES = 32
+MAX_SPANS_PER_TRACE = 256
+
+PROCESS_NAME = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else "python"
+
+
+class Trace:
+    def __init__(self, request_id: str, started_at: float, attrs: dict):
+        self.request_id = request_id
+        self.started_at = started_at
+        self.attrs = dict(attrs)
+        self.spans: list[dict] = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: dict) -> None:
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS_PER_TRACE:
+                self.dropped_spans += 1
+                return
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        """Per-stage milliseconds (spans with the same name are summed)."""
+        with self._lock:
+            spans = list(self.spans)
+        stages: dict[str, float] = {}
+        marks: dict[str, float] = {}
+        end = self.started_at
+        for s in spans:
+            if s["end"] is None:
+                marks.setdefault(s["name"], round((s["start"] - self.started_at) * 1000, 1))
+                end = max(end, s["start"])
+                continue
+            stages[s["name"]] = round(stages.get(s["name"], 0.0) + (s["end"] - s["start"]) * 1000, 1)
+            end = max(end, s["end"])
+        return {
+            "total_ms": round((end - self.started_at) * 1000, 1),
+            "stages": stages,
+            "marks": marks,
+            "attrs": dict(self.attrs),
+        }
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "request_id": self.request_id,
+            "process": PROCESS_NAME,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "attrs": self.attrs,
+            "spans": spans,
+            "dropped_spans": self.dropped_spans,
+            "summary": self.summary(),
+        }
+
+
+_traces: dict[str, Trace] = {}
+_traces_lock = threading.Lock()
+
+
+class _Span:
+    """Handle yielded by span(); set() adds attributes before the span ends."""
+
+    __slots__ = ("attrs",)
+
+    def __init__(self, attrs: dict):
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+# ── Trace lifecycle ───────────────────────────────────────────────────────────
+
+def start_trace(request_id: str | None, started_at: float | None = None, **attrs) -> Trace | None:
+    """Start (or return the already active) trace for `request_id`."""
+    if not TRACING_ENABLED or not request_id:
+        return None
+    with _traces_lock:
+        trace = _traces.get(request_id)
+        if trace is not None:
+            trace.attrs.update(attrs)
+            return trace
+        if len(_traces) >= MAX_ACTIVE_TRACES:
+            oldest = min(_traces.values(), key=lambda t: t.started_at)
+            _traces.pop(oldest.request_id, None)
+            log.warning(f"trace.evicted_unfinished request_id={oldest.request_id}")
+        trace = Trace(request_id, started_at or time.time(), attrs)
+        _traces[request_id] = trace
+        return trace
+
+
+def get_trace(request_id: str | None = None) -> Trace | None:
+    request_id = request_id or get_request_id()
+    if not request_id:
+        return None
+    with _traces_lock:
+        return _traces.get(request_id)
+
+
+def annotate(request_id: str | None = None, **attrs) -> None:
+    """Add attributes to an active trace (they appear in its summary)."""
+    trace = get_trace(request_id)
+    if trace is None:
+        return
+    with trace._lock:
+        trace.attrs.update(attrs)
+
+
+def summary(request_id: str | None = None) -> dict | None:
+    trace = get_trace(request_id)
+    return trace.summary() if trace is not None else None
+
+
+def finish_trace(request_id: str | None = None) -> dict | None:
+    """End the trace, write it to the store and return its summary."""
+    request_id = request_id or get_request_id()
+    if not request_id:
+        return None
+    with _traces_lock:
+        trace = _traces.pop(request_id, None)
+    if trace is None:
+        return None
+    data = trace.to_dict()
+    _write(data)
+    return data["summary"]
+
+
+# ── Recording ─────────────────────────────────────────────────────────────────
+
+def record_span(
+    name: str,
+    start: float,
+    end: float | None,
+    request_id: str | None = None,
+    **attrs,
+) -> None:
+    """Add a span measured elsewhere (epoch seconds). end=None records an instant."""
+    trace = get_trace(request_id)
+    if trace is None:
+        return
+    trace.add(
+        {
+            "name": name,
+            "start": start,
+            "end": end,
+            "attrs": attrs,
+            "process": PROCESS_NAME,
+            "thread": threading.current_thread().name,
+        }
+    )
+
+
+def mark(name: str, request_id: str | None = None, **attrs) -> None:
+    record_span(name, time.time(), None, request_id, **attrs)
+
+
+@contextmanager
+def span(name: str, request_id: str | None = None, **attrs):
+    trace = get_trace(request_id)
+    handle = _Span(dict(attrs))
+    if trace is None:
+        yield handle
+        return
+    start = time.time()
+    try:
+        yield handle
+    except BaseException as e:
+        handle.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add(
+            {
+                "name": name,
+                "start": start,
+                "end": time.time(),
+                "attrs": handle.attrs,
+                "process": PROCESS_NAME,
+                "thread": threading.current_thread().name,
+            }
+        )
+
+
+def traced(name: str):
+    """Decorator form of span() for whole functions."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ── Store ─────────────────────────────────────────────────────────────────────
+
+def _trace_path(request_id: str, process: str) -> Path:
+    return TRACE_DIR / f"{request_id}.{process}.json"
+
+
+def _write(data: dict) -> None:
+    """Never raises — tracing must not break the pipeline."""
+    try:
+        TRACE_DIR.mkdir(parents=True, exist_ok=True)
+        path = _trace_path(data["request_id"], data["process"])
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+        _prune()
+    except Exception as e:
+        log.warning(f"trace.write_failed | {e}")
+
+
+def _prune() -> None:
+    files = sorted(TRACE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for old in files[: max(0, len(files) - TRACE_MAX_FILES)]:
+        try:
+            old.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def list_traces(limit: int = 20) -> list[str]:
+    """Most recent request ids in the store, newest first."""
+    if not TRACE_DIR.exists():
+        return []
+    seen: list[str] = []
+    for path in sorted(TRACE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        request_id = path.name.split(".", 1)[0]
+        if request_id not in seen:
+            seen.append(request_id)
+        if len(seen) >= limit:
+            break
+    return seen
+
+
+def load_trace(request_id: str) -> list[dict]:
+    """Every stored part of a trace (one per process that recorded spans)."""
+    parts = []
+    for path in sorted(TRACE_DIR.glob(f"{request_id}.*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                parts.append(json.load(f))
+        except Exception as e:
+            log.warning(f"trace.read_failed | {path.name} {e}")
+    return parts
+
+
+def to_chrome_trace(request_ids: list[str]) -> dict:
+    """Chrome trace-event JSON: one row per request, one track per process/thread."""
+    events: list[dict] = []
+    tids: dict[tuple[str, str, str], int] = {}
+
+    for pid, request_id in enumerate(request_ids, 1):
+        events.append(
+            {"ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+             "args": {"name": f"request {request_id[:8]}"}}
+        )
+        for part in load_trace(request_id):
+            for s in part["spans"]:
+                key = (request_id, s["process"], s["thread"])
+                if key not in tids:
+                    tids[key] = len(tids) + 1
+                    events.append(
+                        {"ph": "M", "name": "thread_name", "pid": pid, "tid": tids[key],
+                         "args": {"name": f"{s['process']}:{s['thread']}"}}
+                    )
+                event = {
+                    "name": s["name"],
+                    "cat": s["name"].split(".", 1)[0],
+                    "pid": pid,
+                    "tid": tids[key],
+                    "ts": s["start"] * 1e6,
+                    "args": s.get("attrs") or {},
+                }
+                if s["end"] is None:
+                    event.update(ph="i", s="t")
+                else:
+                    event.update(ph="X", dur=(s["end"] - s["start"]) * 1e6)
+                events.append(event)
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -30,6 +30,7 @@ def save_interaction(
     mode: str = "cloud",
     latency_ms: int = None,
     audio_path: str = None,
+    trace_summary: dict = None,
 ):
     try:
         ensure_vault_dirs()
@@ -56,6 +57,8 @@ def save_interaction(
             "latency_ms": latency_ms,
             "audio_file": audio_path,
         }
+        if trace_summary:
+            data["trace"] = trace_summary
 
         with open(json_path, "w") as f:
             json.dump(data, f, indent=2)
@@ -0,0 +1,132 @@
+"""
+core/warmup.py
+Speculative warm-up of the inference backend when a wake is detected.
+
+Between wake and the end of STT there are a few seconds in which we
+already know a request is coming. on_wake() uses them, on its own
+thread, to get the backend for the current mode ready:
+
+    cloud     pooled HTTPS connection to API_BASE_URL (DNS, TCP, TLS)
+              plus a session token (llm_client.warm_cloud_connection)
+    survival  llama-server evaluates and caches the system prompt
+              (local_llm_client.warm_prompt_cache)
+
+When the request reaches its LLM call, consume() reports how much of
+that setup time finished before the call started, i.e. moved off the
+critical path. It is recorded on the request's trace as "warmup".
+
+Warm-ups are skipped while the previous one is recent enough
+(WARMUP_MIN_INTERVAL_SECONDS) that the connection / cache is still hot.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from core import tracing
+from core.logger import get_logger, with_request_id
+from core.runtime_mode import MODE_CLOUD, load_runtime_mode_state
+
+log = get_logger("warmup")
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_MIN_INTERVAL_SECONDS = float(os.getenv("WARMUP_MIN_INTERVAL_SECONDS", "15"))
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "5"))
+
+# Warm-ups of requests that never reach an LLM call are evicted oldest first.
+MAX_PENDING = 16
+
+_pending: "OrderedDict[str, dict]" = OrderedDict()
+_lock = threading.Lock()
+_last_started: dict[str, float] = {}
+
+
+def on_wake(
+    request_id: str,
+    persona_behavior: Callable[[], tuple[dict, dict]] | None = None,
+) -> bool:
+    """
+    Start the warm-up for the current mode in the background. Never
+    blocks; returns False when disabled or skipped as still warm.
+    """
+    if not WARMUP_ENABLED:
+        return False
+    # Read the mode without resolve_mode()'s side effects (it may
+    # persist an auto-recovery the request itself should announce).
+    kind = "cloud" if load_runtime_mode_state().get("mode", MODE_CLOUD) == MODE_CLOUD else "local_llm"
+
+    now = time.monotonic()
+    with _lock:
+        recent = now - _last_started.get(kind, float("-inf")) < WARMUP_MIN_INTERVAL_SECONDS
+        if not recent:
+            _last_started[kind] = now
+            entry = {"kind": kind, "started": now, "finished": None, "ok": None, "detail": {}}
+            _pending[request_id] = entry
+            while len(_pending) > MAX_PENDING:
+                _pending.popitem(last=False)
+    if recent:
+        log.info(f"warmup.skipped kind={kind} reason=recent", extra=with_request_id(request_id))
+        return False
+
+    threading.Thread(
+        target=_run,
+        args=(request_id, entry, persona_behavior),
+        daemon=True,
+        name=f"warmup-{kind}",
+    ).start()
+    return True
+
+
+def _run(request_id: str, entry: dict, persona_behavior) -> None:
+    from core.llm_client import warm_cloud_connection
+    from core.local_llm_client import warm_prompt_cache
+
+    started = time.time()
+    try:
+        if entry["kind"] == "cloud":
+            detail = warm_cloud_connection(timeout=WARMUP_TIMEOUT_SECONDS)
+            ok = detail.pop("ok")
+        else:
+            persona, behavior = persona_behavior() if persona_behavior else (None, None)
+            detail = {}
+            ok = warm_prompt_cache(persona, behavior, timeout=WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        log.warning(f"warmup.failed kind={entry['kind']} | {e}", extra=with_request_id(request_id))
+        detail, ok = {}, False
+    finished = time.time()
+
+    with _lock:
+        entry["finished"] = time.monotonic()
+        entry["ok"] = ok
+        entry["detail"] = detail
+    tracing.record_span(f"warmup.{entry['kind']}", started, finished, request_id, ok=ok, **detail)
+    log.info(
+        f"warmup.done kind={entry['kind']} ok={ok} ms={(finished - started) * 1000:.0f}",
+        extra=with_request_id(request_id),
+    )
+
+
+def consume(request_id: str) -> dict | None:
+    """
+    Called right before the request's LLM call. Returns (and records on
+    the trace) how much warm-up time overlapped the request before it.
+    """
+    with _lock:
+        entry = _pending.pop(request_id, None)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        finished = entry["finished"]
+        result = {
+            "kind": entry["kind"],
+            "ok": entry["ok"],
+            "ready": finished is not None,
+            # Setup work done before the LLM call started; if the warm-up
+            # is still running, the call waits on the same connection /
+            # slot, so only the elapsed part counts.
+            "moved_ms": round(((finished if finished is not None else now) - entry["started"]) * 1000, 1),
+        }
+    tracing.annotate(request_id, warmup=result)
+    return result
@@ -26,7 +26,7 @@ ENV_DIR="/etc/safebox"
 ENV_FILE="$ENV_DIR/safebox.env"
 SERVICE_USER="$USER"
 LLAMA_DIR="/opt/llama.cpp"
-UNITS=("llama-server" "safebox-cloud" "safebox-wake" "safebox-web" "safebox-device")
+UNITS=("llama-server" "safebox-cloud" "safebox-stt" "safebox-wake" "safebox-web" "safebox-device")
 
 IS_REMOTE_INSTALL=false
 if [[ -n "${SSH_CONNECTION:-}" || -n "${SSH_CLIENT:-}" ]]; then
@@ -111,7 +111,13 @@ enable_interfaces() {
     sudo chmod 440 /etc/sudoers.d/safebox-nmcli
     sudo visudo -c -f /etc/sudoers.d/safebox-nmcli >/dev/null || die "Invalid sudoers for nmcli"
 
-    ok "SPI, 1-Wire, and nmcli sudoers configured."
+    # The model lifecycle manager stops/starts llama-server to free memory;
+    # the thermal governor restarts it with fewer --threads when hot
+    echo "$SERVICE_USER ALL=(ALL) NOPASSWD: /usr/bin/systemctl start llama-server, /usr/bin/systemctl stop llama-server, /usr/bin/systemctl restart llama-server" | sudo tee /etc/sudoers.d/safebox-llama >/dev/null
+    sudo chmod 440 /etc/sudoers.d/safebox-llama
+    sudo visudo -c -f /etc/sudoers.d/safebox-llama >/dev/null || die "Invalid sudoers for llama-server"
+
+    ok "SPI, 1-Wire, nmcli and llama-server sudoers configured."
 }
 
 # ---------------------------------------------------------------------------
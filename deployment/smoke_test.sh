@@ -100,6 +100,7 @@ check_service() {
   systemctl is-active --quiet "$1"
 }
 
+run_check "safebox-stt service" check_service safebox-stt
 run_check "safebox-wake service" check_service safebox-wake
 run_check "safebox-device service" check_service safebox-device
 run_check "safebox-web service" check_service safebox-web
@@ -24,6 +24,7 @@ from flask import Flask, jsonify, render_template, request, redirect, url_for
 from core.cloud_heartbeat import send_heartbeat
 from core.logger import get_logger
 from core.config_sync import ConfigSyncManager
+from core import cpu_profile, metrics, tracing
 import subprocess
 import time
 import json
@@ -32,8 +33,16 @@ import threading
 import shutil
 import socket
 from pathlib import Path
+from uuid import uuid4
 from werkzeug.utils import secure_filename
 from core.audio.tts_player import speak
+from core.audio.stt_client import (
+    PRIORITY_BACKGROUND,
+    STTAudioTooLong,
+    STTClient,
+    STTServiceBusy,
+    STTServiceError,
+)
 from core.ap_setup import stop_hotspot
 from core.onboarding_state import get_hostname_url, setup_complete_message
 from core.setup_state import load_setup_state, mark_setup_completed
@@ -47,6 +56,10 @@ BASE_DIR    = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 CONFIG_FILE = os.path.join(BASE_DIR, "config", "device_config.json")
 SAFEBOX_VAULT_ROOT = os.environ.get("SAFEBOX_VAULT_ROOT", "/mnt/ssd/safebox-device/vault")
 VAULT_DIR   = os.path.join(SAFEBOX_VAULT_ROOT, "uploads")
+VOICE_MEMO_DIR = os.path.join(SAFEBOX_VAULT_ROOT, "voice_memos")
+# Uploads over this are refused before they are saved; the STT service
+# also refuses audio longer than STT_SERVICE_MAX_AUDIO_SECONDS.
+VOICE_MEMO_MAX_BYTES = int(os.environ.get("VOICE_MEMO_MAX_BYTES", str(20 * 1024 * 1024)))
 MODE_FILE   = "/opt/safebox/runtime/mode"
 MANUAL_VOICE_TRIGGER_FILE = "/opt/safebox/runtime/manual_voice_trigger"
 # ---------------------------------------------------------------------------
@@ -196,6 +209,114 @@ def get_temperature_state() -> dict:
     }
 
 
+def get_audio_pipeline_state() -> dict:
+    """Capture ring / processing-thread counters published by safebox-wake."""
+    data = metrics.read_section("audio") or {}
+    return {
+        "available": bool(data),
+        "state": data.get("state"),
+        "ring_slots": data.get("slots"),
+        "ring_depth": data.get("depth"),
+        "ring_high_water": data.get("high_water"),
+        "ring_overruns": data.get("overruns", 0),
+        "frames_processed": data.get("processed"),
+        "max_process_ms": data.get("max_process_ms"),
+        "stream_status_count": data.get("stream_status_count", 0),
+        "updated_at": data.get("updated_at"),
+    }
+
+
+def get_stt_service_state() -> dict:
+    """Queue depth and refusals published by safebox-stt."""
+    data = metrics.read_section("stt_service") or {}
+    live = (data.get("priorities") or {}).get("live") or {}
+    return {
+        "available": bool(data),
+        "depth": data.get("depth"),
+        "high_water": data.get("high_water"),
+        "max_queue": data.get("max_queue"),
+        "rejected": sum(p.get("rejected", 0) for p in (data.get("priorities") or {}).values()),
+        "live_queue_ms": live.get("queue_ms"),
+        "live_decode_ms": live.get("decode_ms"),
+        "updated_at": data.get("updated_at"),
+    }
+
+
+def get_task_pipeline_state() -> dict:
+    """Per-stage queue depth and drops of the safebox-wake task pipeline."""
+    data = metrics.read_section("pipeline") or {}
+    stages = {name: stage for name, stage in data.items() if isinstance(stage, dict)}
+    return {
+        "available": bool(stages),
+        "stages": [
+            {
+                "name": name,
+                "depth": stage.get("depth"),
+                "busy": stage.get("busy"),
+                "dropped": sum((stage.get("dropped") or {}).values()),
+                "wait_p95_ms": (stage.get("wait_ms") or {}).get("p95"),
+            }
+            for name, stage in stages.items()
+        ],
+        "updated_at": data.get("updated_at"),
+    }
+
+
+def get_thermal_state() -> dict:
+    """Current performance tier of the thermal governor in safebox-device."""
+    data = metrics.read_section("thermal") or {}
+    return {
+        "available": bool(data),
+        "tier": data.get("tier"),
+        "temp_c": data.get("temp_c"),
+        "throttled": data.get("throttled"),
+        "throttled_now": data.get("throttled_now", False),
+        "since": data.get("since"),
+        "changes": data.get("changes", 0),
+        "settings": data.get("settings", {}),
+        "updated_at": data.get("updated_at"),
+    }
+
+
+def get_memory_state() -> dict:
+    """Resident memory per component and the model budget (safebox-device)."""
+    data = metrics.read_section("memory") or {}
+    return {
+        "available": bool(data),
+        "budget_mb": data.get("budget_mb"),
+        "total_mb": data.get("total_mb"),
+        "components": data.get("components", {}),
+        "evicted": data.get("evicted", []),
+        "updated_at": data.get("updated_at"),
+    }
+
+
+def get_residency_state() -> dict:
+    """Model files kept in the page cache by safebox-wake, and cold vs warm first requests."""
+    data = metrics.read_section("residency") or {}
+    return {
+        "available": bool(data),
+        "files": data.get("files", []),
+        "last_retouch": data.get("last_retouch") or {},
+        "first_request": data.get("first_request", {}),
+        "updated_at": data.get("updated_at"),
+    }
+
+
+def get_executor_state() -> dict:
+    """Intent handler latency and timeouts, published by safebox-wake's executor."""
+    data = metrics.read_section("executor") or {}
+    handlers = data.get("handlers", {})
+    slowest = sorted(handlers.items(), key=lambda kv: kv[1].get("p95_ms", 0), reverse=True)[:3]
+    return {
+        "available": bool(handlers),
+        "handlers": handlers,
+        "slowest": [{"intent": name, "p95_ms": h.get("p95_ms")} for name, h in slowest],
+        "timeouts": sum(h.get("timeout", 0) for h in handlers.values()),
+        "updated_at": data.get("updated_at"),
+    }
+
+
 def _tcp_check(host: str, port: int, timeout: float = 2.0) -> bool:
     try:
         with socket.create_connection((host, port), timeout=timeout):
@@ -601,6 +722,13 @@ def status_payload() -> dict:
         "disk_usage": get_disk_usage(),
         "disk": get_disk_usage(),  # keep for backward compatibility
         "temperature": get_temperature_state(),
+        "audio_pipeline": get_audio_pipeline_state(),
+        "stt_service": get_stt_service_state(),
+        "task_pipeline": get_task_pipeline_state(),
+        "thermal": get_thermal_state(),
+        "memory": get_memory_state(),
+        "residency": get_residency_state(),
+        "executor": get_executor_state(),
         "plug": get_plug_state(),
         "vault": get_vault_state(),
         "vault_files": count_vault_files(),
@@ -751,6 +879,67 @@ def upload_file():
     log.info(f"vault.upload.ok | file={filename}")
     return redirect(url_for("status"))
 
+
+@app.route("/vault/voice-memo", methods=["POST"])
+def upload_voice_memo():
+    """
+    Save a recorded voice memo to the vault and transcribe it through
+    the shared STT service at background priority. The transcript is
+    stored next to the audio as <name>.txt. When the service is busy or
+    down the memo is still kept and 503 tells the client to retry the
+    transcription later; live voice requests always go first.
+
+    Memos are bounded: uploads over VOICE_MEMO_MAX_BYTES are refused,
+    and a memo longer than the service accepts is kept untranscribed
+    (413). A memo still queued when the STT request times out is
+    dropped by the service rather than decoded for nobody.
+    """
+    if not _vault_access_allowed():
+        log.warning("vault.voice_memo.blocked | vault locked, tap_key_gating active")
+        return jsonify({
+            "error":   "vault_locked",
+            "message": "Tap KEY required. Tap your registered NFC key to unlock the vault.",
+        }), 403
+
+    # Checked before request.files reads the body.
+    if request.content_length and request.content_length > VOICE_MEMO_MAX_BYTES:
+        return jsonify({
+            "error":   "too_large",
+            "message": f"Voice memos are limited to {VOICE_MEMO_MAX_BYTES // (1024 * 1024)} MB.",
+        }), 413
+
+    if "file" not in request.files:
+        return jsonify({"error": "no_file", "message": "No file part in request."}), 400
+
+    file = request.files["file"]
+    if not file.filename:
+        return jsonify({"error": "empty_filename", "message": "Filename is empty."}), 400
+
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}_{secure_filename(file.filename)}"
+    os.makedirs(VOICE_MEMO_DIR, exist_ok=True)
+    memo_path = Path(VOICE_MEMO_DIR) / filename
+    file.save(str(memo_path))
+
+    try:
+        started = time.time()
+        transcript = STTClient(priority=PRIORITY_BACKGROUND).transcribe(memo_path)
+    except STTAudioTooLong as e:
+        log.warning(f"vault.voice_memo.too_long | file={filename} {e}")
+        return jsonify({"ok": False, "file": filename, "error": "too_long", "message": str(e)}), 413
+    except STTServiceBusy as e:
+        log.warning(f"vault.voice_memo.stt_busy | file={filename} {e}")
+        return jsonify({"ok": False, "file": filename, "error": "stt_busy", "message": str(e)}), 503
+    except (OSError, STTServiceError) as e:
+        log.warning(f"vault.voice_memo.stt_unavailable | file={filename} {e}")
+        return jsonify({"ok": False, "file": filename, "error": "stt_unavailable", "message": str(e)}), 503
+
+    memo_path.with_suffix(".txt").write_text(transcript + "\n", encoding="utf-8")
+    log.info(
+        f"vault.voice_memo.ok | file={filename} chars={len(transcript)} "
+        f"stt_ms={int((time.time() - started) * 1000)}"
+    )
+    return jsonify({"ok": True, "file": filename, "transcript": transcript})
+
 # ---------------------------------------------------------------------------
 # Routes — NFC Management API
 # ---------------------------------------------------------------------------
@@ -1021,11 +1210,28 @@ def device_set_mode():
 
 @app.route("/device/voice-trigger", methods=["POST"])
 def device_voice_trigger():
+    # The wake process reuses this id, so the request is traced end to end.
+    device_request_id = str(uuid4())
     try:
-        Path(MANUAL_VOICE_TRIGGER_FILE).parent.mkdir(parents=True, exist_ok=True)
-        Path(MANUAL_VOICE_TRIGGER_FILE).write_text(str(time.time()), encoding="utf-8")
-        log.info("device.voice_trigger.armed")
-        return jsonify({"ok": True, "trigger": "manual_voice_trigger_armed"})
+        requested_at = time.time()
+        tracing.start_trace(device_request_id, started_at=requested_at, source="web")
+        with tracing.span("web.voice_trigger", device_request_id):
+            Path(MANUAL_VOICE_TRIGGER_FILE).parent.mkdir(parents=True, exist_ok=True)
+            Path(MANUAL_VOICE_TRIGGER_FILE).write_text(
+                json.dumps(
+                    {"device_request_id": device_request_id, "requested_at": requested_at}
+                ),
+                encoding="utf-8",
+            )
+        tracing.finish_trace(device_request_id)
+        log.info(f"device.voice_trigger.armed device_request_id={device_request_id}")
+        return jsonify(
+            {
+                "ok": True,
+                "trigger": "manual_voice_trigger_armed",
+                "device_request_id": device_request_id,
+            }
+        )
     except Exception as e:
         log.warning(f"device.voice_trigger.failed error={e}")
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -1124,4 +1330,5 @@ def device_capabilities():
 # ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
+    cpu_profile.apply("web")
     app.run(host="0.0.0.0", port=8081, debug=False)